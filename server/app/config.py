@@ -9,6 +9,96 @@ class Settings(BaseSettings):
 	AZURE_OPENAI_ENDPOINT: str = ""
 	AZURE_OPENAI_API_KEY: str = ""
 	AZURE_OPENAI_DEPLOYMENT: str = ""
+	VAPI_BASE_URL: str = ""
+	VAPI_POOL_MAX_CLIENTS: int = 256
+	VAPI_POOL_IDLE_TTL: float = 600.0
+	VAPI_HTTP_MAX_CONNECTIONS: int = 100
+	VAPI_HTTP_MAX_KEEPALIVE: int = 20
+	VAPI_HTTP_TIMEOUT: float = 60.0
+	DATA_DIR: str = "data"
+	CALL_INDEX_REFRESH_SECONDS: float = 5.0
+	CALL_INDEX_PAGE_SIZE: int = 1000
+	CALL_INDEX_MAX_CALLS: int = 50000
+	CALL_INDEX_MAX_TOKENS: int = 32
+	CALL_INDEX_FULL_SYNC_SECONDS: float = 900.0
+	CALL_INDEX_FULL_REFRESH_MIN_SECONDS: float = 60.0
+	SCHEDULE_CHUNK_SIZE: int = 500
+	SCHEDULE_CONCURRENCY: int = 4
+	SCHEDULE_MAX_RETRIES: int = 5
+	SCHEDULE_MAX_OPEN_WINDOWS: int = 1000
+	SCHEDULE_WORKER_TIMEOUT_SECONDS: float = 30.0
+	CACHE_MAX_ENTRIES: int = 2048
+	CACHE_TTL_ASSISTANTS: float = 30.0
+	CACHE_TTL_KNOWLEDGE_BASES: float = 60.0
+	CACHE_TTL_NUMBERS: float = 30.0
+	MONITOR_SOURCE_SAMPLE_RATE: int = 16000
+	MONITOR_LISTENER_BUFFER_FRAMES: int = 50
+	MONITOR_IDLE_GRACE_SECONDS: float = 5.0
+	VAPI_WEBHOOK_SECRET: str = ""
+	TICKET_SECRET: str = ""
+	TICKET_TTL_SECONDS: float = 300.0
+	LIVE_EVENTS_QUEUE_SIZE: int = 256
+	LIVE_EVENTS_HISTORY: int = 1000
+	LIVE_ENDED_RETENTION_SECONDS: float = 300.0
+	INSIGHTS_CONCURRENCY: int = 8
+	INSIGHTS_MAX_RETRIES: int = 5
+	INSIGHTS_BATCH_MAX_ITEMS: int = 5000
+	ARTIFACT_CACHE_MAX_BYTES: int = 5 * 1024 ** 3
+	ARTIFACT_MAX_FILE_BYTES: int = 512 * 1024 ** 2
+	ARTIFACT_PREFETCH_CONCURRENCY: int = 2
+	ARTIFACT_ALLOWED_HOSTS: str = "storage.vapi.ai,*.amazonaws.com,storage.googleapis.com,*.blob.core.windows.net,*.r2.cloudflarestorage.com"
+	ARTIFACT_ALLOW_PRIVATE_HOSTS: bool = False
+	SEARCH_RANK_WINDOW: int = 10000
+	VAPI_RATE_PER_SECOND: float = 10.0
+	VAPI_RATE_BURST: int = 20
+	VAPI_CONCURRENCY_INITIAL: float = 8.0
+	VAPI_CONCURRENCY_MIN: float = 1.0
+	VAPI_CONCURRENCY_MAX: float = 32.0
+	VAPI_LATENCY_TOLERANCE: float = 2.0
+	VAPI_CONTROL_RESERVE: int = 2
+	METRICS_ENABLED: bool = True
+	PROFILER_ENABLED: bool = False
+	PROFILER_MAX_SECONDS: float = 60.0
+	ADMIN_SECRET: str = ""
+	KB_UPLOAD_CONCURRENCY: int = 4
+	KB_UPLOAD_CHUNK_BYTES: int = 256 * 1024
+	KB_UPLOAD_TIMEOUT: float = 300.0
+	KB_UPLOAD_MAX_FILES: int = 50
+	RESPONSE_COMPRESSION_MIN_BYTES: int = 1024
+	RESPONSE_GZIP_LEVEL: int = 5
+	RESPONSE_BROTLI_QUALITY: int = 4
+	PREWARM: str = "background"
+	AGENTS_BULK_CONCURRENCY: int = 8
+	AGENTS_BULK_MAX: int = 500
+	NUMBER_INDEX_PAGE_SIZE: int = 500
+	NUMBER_INDEX_FULL_SYNC_SECONDS: float = 600.0
+	SCHEDULE_PACING: bool = False
+	PACING_RATE_PER_SECOND: float = 1.0
+	PACING_MAX_LIVE_PER_ORG: int = 10
+	PACING_MAX_LIVE_PER_ASSISTANT: int = 10
+	PACING_MAX_LIVE_PER_NUMBER: int = 2
+	PACING_CALLING_HOURS: str = "09:00-20:00"
+	PACING_DEFAULT_TIMEZONE: str = "UTC"
+	PACING_CALL_TIMEOUT_SECONDS: float = 1800.0
+	PACING_STATUS_POLL_SECONDS: float = 60.0
+	EXPORT_PAGE_SIZE: int = 500
+	EXPORT_CONCURRENCY: int = 8
+	EXPORT_BATCH_ROWS: int = 500
+	EXPORT_MAX_RETRIES: int = 5
+	AUDIO_WORKERS: int = 0
+	AUDIO_DOWNLOAD_CONCURRENCY: int = 8
+	AUDIO_CUSTOMER_CHANNEL: str = "left"
+	AUDIO_FRAME_MS: int = 20
+	AUDIO_VAD_MARGIN_DB: float = 15.0
+	AUDIO_VAD_MIN_DBFS: float = -50.0
+	AUDIO_MIN_SPEECH_MS: int = 120
+	AUDIO_MIN_PAUSE_MS: int = 300
+	AUDIO_SILENCE_GAP_MS: int = 2000
+	SHARED_STATE: str = "sqlite"
+	SHARED_STATE_REDIS_URL: str = "redis://localhost:6379/0"
+	SHARED_STATE_PREFIX: str = "aicalling:"
+	SHARED_STATE_POLL_MS: float = 50.0
+	SHARED_STATE_LOCK_TTL: float = 30.0
 
 	class Config:
 		env_file = ".env"
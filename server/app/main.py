@@ -1,16 +1,65 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
 import os
 from .config import settings
 from .routers import agents, calls, live, knowledge_base
 from .routers import numbers
 from .routers import insights
+from .routers import search
+from .routers import system
+from .routers import tickets as ticket_routes
+from .routers import webhooks
+from .services.http import close_http_client
+from .services.artifact_store import artifact_store
+from .services.audio_analytics import audio_analyzer
+from .services.event_hub import event_hub
+from .services.jobs import job_queue
+from .services.kb_uploads import kb_uploader
+from .services.metrics import MetricsMiddleware, registry as metrics_registry
+from .services.monitor_relay import monitor_relays
+from .services.pacing import pacer
+from .services.scoring import scorer
+from .services.shared_state import shared_state
+from .services.tickets import tickets
+from .services.transcript_search import transcript_search
+from .services.vapi_client import async_vapi_registry, vapi_registry
+from .services.warmup import prewarmer
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+	if shared_state is not None:
+		await shared_state.start()
+	await tickets.start()
+	await prewarmer.start(settings.PREWARM)
+	await job_queue.start()
+	await pacer.start()
+	yield
+	await pacer.stop()
+	await job_queue.stop()
+	await prewarmer.stop()
+	await monitor_relays.close()
+	await async_vapi_registry.aclose()
+	await close_http_client()
+	vapi_registry.close()
+	scorer.store.close()
+	artifact_store.close()
+	audio_analyzer.close()
+	transcript_search.close()
+	kb_uploader.hashes.close()
+	if shared_state is not None:
+		await shared_state.close()
 
 
+app = FastAPI(title="Vapi AI Call Management API", lifespan=lifespan)
 
-app = FastAPI(title="Vapi AI Call Management API")
+event_hub.add_listener(artifact_store.on_call_event)
+artifact_store.add_listener(lambda org_id, call: transcript_search.index_calls(org_id, [call]))
+event_hub.add_listener(pacer.on_call_event, everywhere=True)
 
 # CORS
 origins = [o.strip() for o in settings.CORS_ORIGINS.split(",") if o.strip()]
@@ -20,7 +69,10 @@ app.add_middleware(
 	allow_credentials=True,
 	allow_methods=["*"],
 	allow_headers=["*"],
+	expose_headers=["X-Total-Count", "X-Next-Cursor", "X-Index-State"],
 )
+if settings.METRICS_ENABLED:
+	app.add_middleware(MetricsMiddleware)
 
 
 @app.get("/health")
@@ -28,13 +80,22 @@ def health_check():
 	return {"ok": True}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics() -> PlainTextResponse:
+	return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+
 # Routers
 app.include_router(agents.router)
+app.include_router(search.router)
 app.include_router(calls.router)
 app.include_router(live.router)
 app.include_router(knowledge_base.router)
 app.include_router(numbers.router)
 app.include_router(insights.router)
+app.include_router(webhooks.router)
+app.include_router(system.router)
+app.include_router(ticket_routes.router)
 
 # Optionally serve the frontend if built
 FRONTEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../web/frontend/dist"))
@@ -1,116 +1,205 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, HTTPException, Request, Response
+from pydantic import BaseModel
 
-from vapi.assistants.types.update_assistant_dto_model import UpdateAssistantDtoModel
-from vapi.types.open_ai_message import OpenAiMessage
-from vapi.types.open_ai_message_role import OpenAiMessageRole
-from vapi.types.open_ai_model import OpenAiModel
-
-from ..services.vapi_client import get_vapi_client_from_request
+from ..config import settings
+from ..services import assistant_bulk
+from ..services.cache import cache_key, invalidate_for, read_cache
+from ..services.metrics import timed_sdk, timed_serialization
+from ..services.projection import projection
+from ..services.responses import etag_json, ndjson_response, wants_ndjson
+from ..services.vapi_client import as_dict, get_async_vapi_client_from_request
 
 
 router = APIRouter(prefix="/api/agents", tags=["agents"])
 
 
+async def _cached_assistant(agent_id: str, request: Request) -> Dict[str, Any]:
+	client = get_async_vapi_client_from_request(request)
+
+	async def load() -> Dict[str, Any]:
+		with timed_sdk("assistants.get"):
+			assistant = await client.assistants.get(agent_id)
+		with timed_serialization("assistants.get"):
+			return assistant.dict()
+
+	return await read_cache.get_or_load(cache_key(request, "assistant", agent_id), load, settings.CACHE_TTL_ASSISTANTS)
+
+
+async def _forget_assistant(agent_id: str, request: Request) -> None:
+	await invalidate_for(request, ("assistant", agent_id), ("assistants",))
+
+
 @router.get("")
-def list_agents(request: Request) -> List[Dict[str, Any]]:
-	client = get_vapi_client_from_request(request)
-	agents = client.assistants.list()
-	return [a.dict() for a in agents]
+async def list_agents(
+	request: Request,
+	fields: Optional[str] = None,
+	view: Literal["summary", "full"] = "summary",
+	format: Optional[Literal["json", "ndjson"]] = None,
+) -> Response:
+	"""Assistants in the summary view unless `view=full` or `fields=a,b.c`; `format=ndjson` streams them."""
+	project = projection("assistants", fields, view)
+	client = get_async_vapi_client_from_request(request)
+
+	async def load() -> List[Dict[str, Any]]:
+		with timed_sdk("assistants.list"):
+			assistants = await client.assistants.list()
+		with timed_serialization("assistants.list"):
+			return [a.dict() for a in assistants]
+
+	agents = await read_cache.get_or_load(cache_key(request, "assistants"), load, settings.CACHE_TTL_ASSISTANTS)
+	if wants_ndjson(request, format):
+		return ndjson_response(request, map(project, agents))
+	return etag_json(request, project.many(agents))
+
+
+class BulkSelector(BaseModel):
+	ids: List[str] = []
+	name_pattern: Optional[str] = None
+	knowledge_base_id: Optional[str] = None
+
+
+class BulkPatch(BaseModel):
+	system_prompt: Optional[str] = None
+	knowledge_base_id: Optional[str] = None
+
+
+class BulkAgentsBody(BaseModel):
+	selector: BulkSelector
+	patch: BulkPatch
+	dry_run: bool = True
+	expected: Dict[str, str] = {}
+
+
+@router.post("/bulk")
+async def bulk_update_agents(body: BulkAgentsBody, request: Request) -> Dict[str, Any]:
+	"""Apply a system prompt and/or knowledge base change to many assistants.
+
+	The selector takes `ids`, a shell-style `name_pattern` (case-insensitive) and/or the
+	assistants' current `knowledge_base_id`; all given criteria must match. In the patch, an
+	explicit `knowledge_base_id: null` detaches the knowledge base. With `dry_run` (the default)
+	nothing is written and each assistant reports `would-update` with a before/after diff,
+	`unchanged` or `skipped`. Otherwise changes are written AGENTS_BULK_CONCURRENCY at a time and
+	each reports `updated`, `unchanged`, `conflict` (its updatedAt no longer matches `expected`
+	or the value read at selection), `skipped`, `not-found` or `failed`.
+	"""
+	selector = body.selector
+	if not (selector.ids or selector.name_pattern or selector.knowledge_base_id):
+		raise HTTPException(status_code=400, detail="Select assistants by ids, name_pattern or knowledge_base_id")
+	changes: Dict[str, Any] = {}
+	if body.patch.system_prompt is not None:
+		changes["systemPrompt"] = body.patch.system_prompt
+	if "knowledge_base_id" in body.patch.model_fields_set:
+		changes["knowledgeBaseId"] = body.patch.knowledge_base_id
+	if not changes:
+		raise HTTPException(status_code=400, detail="Patch needs system_prompt or knowledge_base_id")
+	if len(selector.ids) > settings.AGENTS_BULK_MAX:
+		raise HTTPException(status_code=413, detail=f"At most {settings.AGENTS_BULK_MAX} assistants per request")
+
+	client = get_async_vapi_client_from_request(request)
+	concurrency = settings.AGENTS_BULK_CONCURRENCY
+	assistants, missing = await assistant_bulk.select(client, selector.ids, selector.name_pattern, selector.knowledge_base_id, concurrency)
+	if len(assistants) > settings.AGENTS_BULK_MAX:
+		raise HTTPException(status_code=413, detail=f"{len(assistants)} assistants match; at most {settings.AGENTS_BULK_MAX} per request")
+	results = [assistant_bulk.plan(a, changes) for a in assistants]
+	if not body.dry_run:
+		results = await assistant_bulk.apply(client, results, changes, body.expected, concurrency)
+		for r in results:
+			if r["status"] in ("updated", "conflict"):
+				await _forget_assistant(r["id"], request)
+	results += missing
+	counts: Dict[str, int] = {}
+	for r in results:
+		counts[r["status"]] = counts.get(r["status"], 0) + 1
+	return {"dryRun": body.dry_run, "matched": len(assistants), "counts": counts, "results": results}
 
 
 @router.get("/{agent_id}")
-def get_agent(agent_id: str, request: Request) -> Dict[str, Any]:
-	client = get_vapi_client_from_request(request)
+async def get_agent(agent_id: str, request: Request) -> Response:
 	try:
-		assistant = client.assistants.get(agent_id)
-		return assistant.dict()
+		assistant = await _cached_assistant(agent_id, request)
 	except Exception as e:  # SDK raises ApiError subclasses; return 404/400 generically
 		raise HTTPException(status_code=404, detail=str(e))
+	return etag_json(request, assistant)
 
 
 @router.get("/{agent_id}/system-prompt")
-def get_system_prompt(agent_id: str, request: Request) -> Dict[str, Any]:
-	client = get_vapi_client_from_request(request)
-	assistant = client.assistants.get(agent_id)
-	model = assistant.model
-	if model is None:
+async def get_system_prompt(agent_id: str, request: Request) -> Response:
+	assistant = await _cached_assistant(agent_id, request)
+	model_dict = assistant.get("model")
+	if model_dict is None:
 		raise HTTPException(status_code=400, detail="Assistant has no model configured")
-	model_dict = model.dict()
 	messages = model_dict.get("messages") or []
 	current = ""
 	for m in messages:
 		if m.get("role") == "system":
 			current = m.get("content") or ""
 			break
-	return {"prompt": current, "messages": messages}
+	return etag_json(request, {"prompt": current, "messages": messages})
 
 
 @router.put("/{agent_id}/system-prompt")
-def update_system_prompt(agent_id: str, prompt: str, request: Request):
+async def update_system_prompt(agent_id: str, prompt: str, request: Request):
 	"""Replace the assistant's system prompt for OpenAI-like models.
 
 	We update assistant.model.messages, preserving other fields.
 	"""
-	client = get_vapi_client_from_request(request)
-	assistant = client.assistants.get(agent_id)
+	client = get_async_vapi_client_from_request(request)
+	assistant = await client.assistants.get(agent_id)
 	model = assistant.model
 	if model is None:
 		raise HTTPException(status_code=400, detail="Assistant has no model configured")
 
-	# Convert to dict, replace messages with a single system message
-	model_dict = model.dict()
-	model_dict["messages"] = [
-		OpenAiMessage(role=OpenAiMessageRole("system"), content=prompt).dict()
-	]
-
-	updated = client.assistants.update(
+	updated = await client.assistants.update(
 		agent_id,
-		model=UpdateAssistantDtoModel.parse_obj(model_dict),
+		model=await assistant_bulk.model_update(assistant_bulk.patched_model(as_dict(model), {"systemPrompt": prompt})),
 	)
+	await _forget_assistant(agent_id, request)
 	return updated.dict()
 
 
 @router.put("/{agent_id}/knowledge-base")
-def update_knowledge_base(agent_id: str, request: Request, knowledge_base_id: Optional[str] = None):
+async def update_knowledge_base(agent_id: str, request: Request, knowledge_base_id: Optional[str] = None):
 	"""Point the assistant model to a specific knowledge base by ID.
 
 	This sets assistant.model.knowledgeBaseId. For transient KBs, a separate flow is needed.
 	"""
-	client = get_vapi_client_from_request(request)
-	assistant = client.assistants.get(agent_id)
+	client = get_async_vapi_client_from_request(request)
+	assistant = await client.assistants.get(agent_id)
 	model = assistant.model
 	if model is None:
 		raise HTTPException(status_code=400, detail="Assistant has no model configured")
 
-	model_dict = model.dict()
-	model_dict["knowledgeBaseId"] = knowledge_base_id
-
-	updated = client.assistants.update(
+	updated = await client.assistants.update(
 		agent_id,
-		model=UpdateAssistantDtoModel.parse_obj(model_dict),
+		model=await assistant_bulk.model_update(assistant_bulk.patched_model(as_dict(model), {"knowledgeBaseId": knowledge_base_id})),
 	)
+	await _forget_assistant(agent_id, request)
 	return updated.dict()
 
 
 @router.get("/{agent_id}/kb")
-def get_assistant_kb(agent_id: str, request: Request) -> Dict[str, Any]:
-	client = get_vapi_client_from_request(request)
-	assistant = client.assistants.get(agent_id)
-	model = assistant.model
-	if model is None:
-		return {"knowledgeBaseId": None}
-	model_dict = model.dict()
+async def get_assistant_kb(agent_id: str, request: Request) -> Response:
+	assistant = await _cached_assistant(agent_id, request)
+	model_dict = assistant.get("model")
+	if model_dict is None:
+		return etag_json(request, {"knowledgeBaseId": None})
 	kb_id = model_dict.get("knowledgeBaseId")
 	resp: Dict[str, Any] = {"knowledgeBaseId": kb_id}
 	if kb_id:
+		client = get_async_vapi_client_from_request(request)
+
+		async def load() -> Dict[str, Any]:
+			kb = await client.knowledge_bases.get(kb_id)
+			return {"name": getattr(kb, "name", None)}
+
 		try:
-			kb = client.knowledge_bases.get(kb_id)
-			resp["knowledgeBaseName"] = getattr(kb, "name", None)
+			kb = await read_cache.get_or_load(cache_key(request, "kb", kb_id), load, settings.CACHE_TTL_KNOWLEDGE_BASES)
+			resp["knowledgeBaseName"] = kb["name"]
 		except Exception:
 			pass
-	return resp
+	return etag_json(request, resp)
 
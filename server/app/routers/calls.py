@@ -1,75 +1,232 @@
 from __future__ import annotations
 
-from datetime import datetime
-from typing import Any, Dict, List, Optional
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Literal, Optional
 
-from fastapi import APIRouter, HTTPException, UploadFile, File, Request, Body
+import httpx
+from fastapi import APIRouter, HTTPException, UploadFile, File, Request, Response, Body, Header, Query
+from fastapi.responses import RedirectResponse
 from pydantic import BaseModel
-from openpyxl import load_workbook
-
-from vapi.types.create_customer_dto import CreateCustomerDto
-from vapi.types.schedule_plan import SchedulePlan
-from vapi.types.assistant_overrides import AssistantOverrides
 
-from ..services.vapi_client import get_vapi_client_from_request
+from ..services.vapi_client import as_dict, async_vapi_registry, get_async_vapi_client_from_request, get_request_token
+from ..services.artifact_store import RECORDING_KINDS, ArtifactTooLarge, UnsafeArtifactUrl, artifact_store, call_artifacts
+from ..services.call_index import call_indexes
+from ..services.export import CallExport, ExportError, export_response, open_writer, parse_columns
+from ..services.governor import Priority, upstream_priority
+from ..services.http import get_http_client
+from ..services.jobs import job_queue
+from ..services.metrics import timed_sdk, timed_serialization
+from ..services.orgs import org_id_for
+from ..services.projection import projection
+from ..services.responses import RangeFileResponse, etag_json, ndjson_response, wants_ndjson
+from ..services.schedule_ingest import ScheduleFileError, ScheduleRow, iter_schedule_rows, iter_sheet_rows, normalize_number
+from ..services.tickets import TicketError, tickets
+from ..services.transcript_search import transcript_search
+from ..services.warmup import sdk_type
 from ..config import settings
-import httpx
 
 
 router = APIRouter(prefix="/api/calls", tags=["calls"])
 
 
+def _forget_call(request: Request, call_id: str) -> None:
+	index = call_indexes.peek(get_request_token(request))
+	if index is not None:
+		index.remove(call_id)
+
+
 @router.get("")
-def list_calls(limit: int = 100, status: Optional[str] = None, request: Request = None) -> List[Dict[str, Any]]:
-	client = get_vapi_client_from_request(request)
-	calls = client.calls.list(limit=limit)
-	items = [c.dict() for c in calls]
-	if status:
-		status_lower = status.lower()
-		items = [c for c in items if (c.get("status") or "").lower() == status_lower]
-	return items
+async def list_calls(
+	request: Request,
+	limit: int = Query(100, ge=1, le=1000),
+	offset: int = Query(0, ge=0),
+	status: Optional[str] = None,
+	assistant_id: Optional[str] = None,
+	phone_number: Optional[str] = None,
+	created_after: Optional[datetime] = None,
+	created_before: Optional[datetime] = None,
+	refresh: bool = False,
+	fields: Optional[str] = None,
+	view: Literal["summary", "full"] = "summary",
+	format: Optional[Literal["json", "ndjson"]] = None,
+) -> Response:
+	"""List calls newest first from the per-token call index.
+
+	The index syncs incrementally from Vapi at most every CALL_INDEX_REFRESH_SECONDS;
+	`refresh=true` forces a sync, a full one at most every CALL_INDEX_FULL_REFRESH_MIN_SECONDS.
+	X-Total-Count carries the number of matches and X-Index-State is `syncing` while a full sync
+	is still filling the index (the first one returns after its first page), else `ready`.
+	`phone_number` matches either the phoneNumberId or the customer number. Rows are the summary
+	view unless `view=full` or `fields=a,b.c` is given; `format=ndjson` (or Accept:
+	application/x-ndjson) streams one call per line.
+	"""
+	project = projection("calls", fields, view)
+	token = get_request_token(request)
+	index = call_indexes.get(token)
+	await index.refresh(get_async_vapi_client_from_request(request), max_age=settings.CALL_INDEX_REFRESH_SECONDS, full=refresh)
+	total, items = index.query(
+		status=status,
+		assistant_id=assistant_id,
+		phone_number=phone_number,
+		created_after=created_after,
+		created_before=created_before,
+		offset=offset,
+		limit=limit,
+	)
+	headers = {"X-Total-Count": str(total), "X-Index-State": "syncing" if index.syncing else "ready"}
+	if wants_ndjson(request, format):
+		return ndjson_response(request, map(project, items), headers)
+	return etag_json(request, project.many(items), headers)
+
+
+@router.get("/export", response_model=None)
+async def export_calls(
+	request: Request,
+	format: Literal["csv", "ndjson", "xlsx", "parquet"] = "csv",
+	columns: Optional[str] = None,
+	status: Optional[str] = None,
+	assistant_id: Optional[str] = None,
+	phone_number_id: Optional[str] = None,
+	created_after: Optional[datetime] = None,
+	created_before: Optional[datetime] = None,
+) -> Response:
+	"""Stream every matching call as a download, newest first, straight from Vapi.
+
+	`columns=a,b.c` picks call fields by dotted path; `transcript`, `recordingUrl`,
+	`stereoRecordingUrl` and `videoRecordingUrl` come from the call's artifacts, fetched
+	EXPORT_CONCURRENCY at a time when the listing lacks them. Parquet needs pyarrow installed.
+	"""
+	token = get_request_token(request)
+	try:
+		selected = parse_columns(columns)
+		writer = await open_writer(format, selected)
+	except ExportError as e:
+		raise HTTPException(status_code=400, detail=str(e))
+	export = CallExport(
+		get_async_vapi_client_from_request(request),
+		lambda call_id: _call_artifacts(call_id, token),
+		selected,
+		assistant_id=assistant_id,
+		phone_number_id=phone_number_id,
+		status=status,
+		created_after=created_after,
+		created_before=created_before,
+		page_size=settings.EXPORT_PAGE_SIZE,
+		concurrency=settings.EXPORT_CONCURRENCY,
+		max_retries=settings.EXPORT_MAX_RETRIES,
+	)
+	filename = f"calls-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}.{format}"
+	return export_response(request, export, writer, filename, batch=settings.EXPORT_BATCH_ROWS)
 
 
 @router.get("/{call_id}")
-def get_call(call_id: str, request: Request) -> Dict[str, Any]:
-	client = get_vapi_client_from_request(request)
+async def get_call(call_id: str, request: Request) -> Dict[str, Any]:
+	client = get_async_vapi_client_from_request(request)
 	try:
-		call = client.calls.get(call_id)
-		return call.dict()
+		with timed_sdk("calls.get"):
+			model = await client.calls.get(call_id)
 	except Exception as e:
 		raise HTTPException(status_code=404, detail=str(e))
+	with timed_serialization("calls.get"):
+		call = model.dict()
+	index = call_indexes.peek(get_request_token(request))
+	if index is not None:
+		index.upsert(call)
+	return call
+
+
+async def _call_artifacts(call_id: str, token: str) -> Dict[str, Any]:
+	"""Artifacts from the local store; on a miss fetch the call, and keep the result once it has ended."""
+	org_id = await org_id_for(token)
+	stored = await asyncio.to_thread(artifact_store.get_call, org_id, call_id)
+	if stored is not None:
+		return stored
+	with timed_sdk("calls.get"):
+		call = await async_vapi_registry.get(token).calls.get(call_id)
+	with timed_serialization("calls.get"):
+		d = as_dict(call)
+	out = call_artifacts(d)
+	if d.get("status") == "ended" and d.get("orgId") == org_id:
+		await asyncio.to_thread(artifact_store.put_call, org_id, call_id, out)
+		await asyncio.to_thread(transcript_search.index_calls, org_id, [d])
+	return out
 
 
 @router.get("/{call_id}/artifacts")
-def get_call_artifacts(call_id: str, request: Request) -> Dict[str, Any]:
-	client = get_vapi_client_from_request(request)
-	call = client.calls.get(call_id)
-	artifact = (call.artifact or {}).dict() if hasattr(call, "artifact") and call.artifact is not None else {}
-	return {
-		"transcript": artifact.get("transcript"),
-		"recordingUrl": artifact.get("recordingUrl"),
-		"stereoRecordingUrl": artifact.get("stereoRecordingUrl"),
-		"videoRecordingUrl": artifact.get("videoRecordingUrl"),
-		"recording": artifact.get("recording"),
-	}
+async def get_call_artifacts(call_id: str, request: Request) -> Dict[str, Any]:
+	return await _call_artifacts(call_id, get_request_token(request))
+
+
+@router.get("/{call_id}/recording", response_model=None)
+async def get_call_recording(call_id: str, request: Request, stereo: bool = False, ticket: Optional[str] = None) -> Response:
+	"""Serve the call recording from the local artifact store, with Range support for seeking.
+
+	The first request downloads the recording once; later ones (and every seek) read the local
+	copy. Audio elements cannot set headers, so they pass a `recording` ticket from POST /api/tickets.
+	"""
+	if ticket:
+		try:
+			token = await tickets.redeem(ticket, "recording", call_id)
+		except TicketError as e:
+			raise HTTPException(status_code=401, detail=str(e))
+	else:
+		token = get_request_token(request)
+	org_id = await org_id_for(token)
+	kind = "stereoRecording" if stereo else "recording"
+	ref = await asyncio.to_thread(artifact_store.get_ref, org_id, call_id, kind)
+	url: Optional[str] = None
+	while True:
+		if ref is None:
+			if url is None:
+				try:
+					artifacts = await _call_artifacts(call_id, token)
+				except Exception as e:
+					raise HTTPException(status_code=404, detail=str(e))
+				url = artifacts.get(RECORDING_KINDS[kind])
+				if not url:
+					raise HTTPException(status_code=404, detail="No recording available")
+			try:
+				ref = await artifact_store.fetch_recording(org_id, call_id, kind, url)
+			except ArtifactTooLarge:
+				return RedirectResponse(url, status_code=307)
+			except UnsafeArtifactUrl as e:
+				raise HTTPException(status_code=502, detail=str(e))
+			except httpx.HTTPError as e:
+				raise HTTPException(status_code=502, detail=f"Recording download failed: {e}")
+			downloaded = True
+		else:
+			downloaded = False
+		sha, content_type = ref
+		await asyncio.to_thread(artifact_store.touch, sha)
+		try:
+			return RangeFileResponse(artifact_store.blob_path(sha), request, content_type, sha)
+		except FileNotFoundError:
+			# Evicted since it was looked up: download it again, or send the client to the provider
+			# if even a fresh download was evicted before it could be served.
+			if downloaded:
+				return RedirectResponse(url, status_code=307)
+			ref = None
 
 
 @router.post("/{call_id}/terminate")
-def terminate_call(call_id: str, request: Request) -> Dict[str, Any]:
+async def terminate_call(call_id: str, request: Request) -> Dict[str, Any]:
 	"""Terminate a call if possible by deleting it.
 
 	Depending on provider/state, this may end the active call or remove the record.
 	"""
-	client = get_vapi_client_from_request(request)
+	client = get_async_vapi_client_from_request(request)
 	try:
-		resp = client.calls.delete(call_id)
-		return resp.dict()
+		with upstream_priority(Priority.CONTROL):
+			resp = await client.calls.delete(call_id)
 	except Exception as e:
 		raise HTTPException(status_code=400, detail=str(e))
+	_forget_call(request, call_id)
+	return resp.dict()
 
 
 @router.post("/{call_id}/escalate")
-def escalate_call(call_id: str, destination: Optional[str] = None) -> Dict[str, Any]:
+async def escalate_call(call_id: str, destination: Optional[str] = None) -> Dict[str, Any]:
 	"""Escalate by POST-ing to org webhook if configured.
 
 	Set ESCALATE_WEBHOOK_URL in env to forward this request with callId and destination.
@@ -77,8 +234,7 @@ def escalate_call(call_id: str, destination: Optional[str] = None) -> Dict[str,
 	payload = {"callId": call_id, "destination": destination}
 	if settings.ESCALATE_WEBHOOK_URL:
 		try:
-			with httpx.Client(timeout=10) as client:
-				client.post(settings.ESCALATE_WEBHOOK_URL, json=payload)
+			await get_http_client().post(settings.ESCALATE_WEBHOOK_URL, json=payload, timeout=10)
 		except Exception as e:
 			raise HTTPException(status_code=502, detail=f"Escalate webhook failed: {e}")
 	return {"ok": True, **payload}
@@ -122,68 +278,34 @@ async def schedule_calls_from_excel(
 	assistant_id: str,
 	request: Request,
 	file: UploadFile = File(...),
+	chunk_size: Optional[int] = Query(None, ge=1, le=1000),
+	pacing: Optional[bool] = None,
+	phone_number_id: Optional[str] = None,
+	idempotency_key: Optional[str] = Header(None),
 ):
-	"""Upload Excel with headers: name, number, earliest_at, latest_at (ISO8601).
+	"""Upload Excel (.xlsx) or CSV with headers: name, number, earliest_at, latest_at (ISO8601).
 
-	Creates batch outbound calls via client.calls.create(customers=[...], schedule_plan=...).
+	Rows are streamed from the spooled upload, validated one at a time, grouped by their own
+	schedule window into chunks of `chunk_size` (default SCHEDULE_CHUNK_SIZE) and persisted as a
+	background job. With `pacing` (default SCHEDULE_PACING) customers are instead dialed one by
+	one by the pacer, within calling hours and live-call limits. Returns the job snapshot; a
+	repeated Idempotency-Key header returns the existing job instead of scheduling again.
 	"""
-	client = get_vapi_client_from_request(request)
-	content = await file.read()
-	wb = load_workbook(filename=(file.filename or "uploaded.xlsx"), data_only=True)
-	# openpyxl requires a file path or file-like object; since FastAPI gives bytes, reopen via BytesIO
-	# To avoid extra deps, write to temp file
-	import tempfile
-	with tempfile.NamedTemporaryFile(suffix=".xlsx", delete=True) as tmp:
-		tmp.write(content)
-		tmp.flush()
-		wb = load_workbook(filename=tmp.name, data_only=True)
-	ws = wb.active
-	rows = list(ws.iter_rows(values_only=True))
-	if not rows:
-		raise HTTPException(status_code=400, detail="Empty Excel file")
-	headers = [str(h).strip().lower() for h in rows[0]]
+	token = get_request_token(request)
+	rows = iter_schedule_rows(iter_sheet_rows(file.file, file.filename, file.content_type))
 	try:
-		name_idx = headers.index("name")
-		number_idx = headers.index("number")
-		earliest_idx = headers.index("earliest_at")
-		latest_idx = headers.index("latest_at") if "latest_at" in headers else None
-	except ValueError:
-		raise HTTPException(status_code=400, detail="Headers must include name, number, earliest_at, optional latest_at")
-
-	customers: List[CreateCustomerDto] = []
-	for row in rows[1:]:
-		if row is None:
-			continue
-		name = str(row[name_idx]) if row[name_idx] is not None else None
-		number = str(row[number_idx]) if row[number_idx] is not None else None
-		if not number:
-			continue
-		customers.append(CreateCustomerDto(name=name, number=number))
-
-	if not customers:
-		raise HTTPException(status_code=400, detail="No valid rows found")
-
-	# For batch scheduling, we set a broad schedule plan from the first row.
-	first = rows[1]
-	earliest_at_raw = first[earliest_idx]
-	latest_at_raw = first[latest_idx] if latest_idx is not None else None
-
-	def parse_dt(val: Any) -> datetime:
-		if isinstance(val, datetime):
-			return val
-		return datetime.fromisoformat(str(val))
-
-	schedule = SchedulePlan(
-		earliest_at=parse_dt(earliest_at_raw),
-		latest_at=parse_dt(latest_at_raw) if latest_at_raw else None,
-	)
-
-	resp = client.calls.create(
-		assistant_id=assistant_id,
-		customers=customers,
-		schedule_plan=schedule,
-	)
-	return resp.dict()
+		return await job_queue.submit_rows(
+			token,
+			assistant_id,
+			rows,
+			chunk_size=chunk_size or settings.SCHEDULE_CHUNK_SIZE,
+			max_open_windows=settings.SCHEDULE_MAX_OPEN_WINDOWS,
+			idempotency_key=idempotency_key,
+			paced=settings.SCHEDULE_PACING if pacing is None else pacing,
+			phone_number_id=phone_number_id,
+		)
+	except ScheduleFileError as e:
+		raise HTTPException(status_code=400, detail=str(e))
 
 
 class ScheduleSingleBody(BaseModel):
@@ -193,6 +315,8 @@ class ScheduleSingleBody(BaseModel):
 	earliest_at: datetime
 	latest_at: datetime | None = None
 	context: str | None = None
+	phone_number_id: str | None = None
+	pacing: bool | None = None
 
 
 class StartWebCallBody(BaseModel):
@@ -202,33 +326,60 @@ class StartWebCallBody(BaseModel):
 
 
 @router.post("/schedule/single")
-def schedule_single(body: ScheduleSingleBody, request: Request) -> Dict[str, Any]:
-	"""Schedule a single outbound call for a customer.
+async def schedule_single(body: ScheduleSingleBody, request: Request, idempotency_key: Optional[str] = Header(None)) -> Dict[str, Any]:
+	"""Schedule a single outbound call for a customer as a background job.
 
-	Body: { assistant_id, name?, number, earliest_at, latest_at? }
+	Body: { assistant_id, name?, number, earliest_at, latest_at?, context?, phone_number_id?, pacing? }
+	`number` is normalized like an uploaded cell; one that is not E.164 is rejected with 422.
 	"""
-	client = get_vapi_client_from_request(request)
-	schedule = SchedulePlan(
-		earliest_at=body.earliest_at,
-		latest_at=body.latest_at,
-	)
-	customer = CreateCustomerDto(name=body.name, number=body.number)
-	resp = client.calls.create(
-		assistant_id=body.assistant_id,
-		customers=[customer],
-		schedule_plan=schedule,
-		assistant_overrides=AssistantOverrides(variable_values={"context": body.context} if body.context else None),
+	try:
+		number = normalize_number(body.number)
+	except ValueError as e:
+		raise HTTPException(status_code=422, detail=str(e))
+	row = ScheduleRow(row=1, name=body.name, number=number, earliest_at=body.earliest_at, latest_at=body.latest_at)
+	return await job_queue.submit_rows(
+		get_request_token(request),
+		body.assistant_id,
+		iter([row]),
+		kind="single",
+		variable_values={"context": body.context} if body.context else None,
+		idempotency_key=idempotency_key,
+		paced=settings.SCHEDULE_PACING if body.pacing is None else body.pacing,
+		phone_number_id=body.phone_number_id,
 	)
-	return resp.dict()
+
+
+@router.get("/schedule/jobs")
+async def list_schedule_jobs(request: Request, limit: int = Query(50, ge=1, le=500)) -> List[Dict[str, Any]]:
+	return await job_queue.list_jobs(get_request_token(request), limit)
+
+
+@router.get("/schedule/jobs/{job_id}")
+async def get_schedule_job(job_id: str, request: Request) -> Dict[str, Any]:
+	"""Progress of a schedule job: created, failed and pending customer counts plus row errors."""
+	job = await job_queue.get(job_id, get_request_token(request))
+	if job is None:
+		raise HTTPException(status_code=404, detail="Job not found")
+	return job
+
+
+@router.post("/schedule/jobs/{job_id}/{action}")
+async def control_schedule_job(job_id: str, action: Literal["pause", "resume", "cancel"], request: Request) -> Dict[str, Any]:
+	"""Pause, resume or cancel a job. In-flight chunks finish; pending ones wait or are dropped."""
+	job = await job_queue.transition(job_id, get_request_token(request), action)
+	if job is None:
+		raise HTTPException(status_code=404, detail="Job not found")
+	return job
 
 
 @router.post("/web/start")
-def start_web_call(body: StartWebCallBody, request: Request) -> Dict[str, Any]:
+async def start_web_call(body: StartWebCallBody, request: Request) -> Dict[str, Any]:
 	"""Start a web call for coaching/training.
 
 	Creates a call with a special 'web' target if supported by SDK.
 	"""
-	client = get_vapi_client_from_request(request)
+	client = get_async_vapi_client_from_request(request)
+	CreateCustomerDto = await sdk_type("vapi.types.create_customer_dto", "CreateCustomerDto")
 	try:
 		create_kwargs = {
 			"assistant_id": body.assistant_id,
@@ -240,7 +391,7 @@ def start_web_call(body: StartWebCallBody, request: Request) -> Dict[str, Any]:
 			{"channel": "web"},
 		):
 			try:
-				resp = client.calls.create(**create_kwargs, **alt)
+				resp = await client.calls.create(**create_kwargs, **alt)
 				return resp.dict()
 			except Exception:
 				continue
@@ -250,11 +401,12 @@ def start_web_call(body: StartWebCallBody, request: Request) -> Dict[str, Any]:
 
 
 @router.post("/web/end/{call_id}")
-def end_web_call(call_id: str, request: Request) -> Dict[str, Any]:
-	client = get_vapi_client_from_request(request)
+async def end_web_call(call_id: str, request: Request) -> Dict[str, Any]:
+	client = get_async_vapi_client_from_request(request)
 	try:
-		resp = client.calls.delete(call_id)
-		return resp.dict()
+		resp = await client.calls.delete(call_id)
 	except Exception as e:
 		raise HTTPException(status_code=400, detail=str(e))
+	_forget_call(request, call_id)
+	return resp.dict()
 
@@ -1,44 +1,199 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+import asyncio
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional
 
-from fastapi import APIRouter, HTTPException
 import httpx
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 
 from ..config import settings
+from ..services.artifact_store import ArtifactTooLarge, UnsafeArtifactUrl
+from ..services.audio_analytics import NoRecording, audio_analyzer
+from ..services.audio_metrics import AudioDecodeError
+from ..services.call_index import call_indexes, to_epoch
+from ..services.governor import Priority, upstream_priority
+from ..services.responses import etag_json
+from ..services.retry import with_backoff
+from ..services.scoring import PROMPT_VERSION, azure_configured, pair_prompt, scorer, transcript_prompt
+from ..services.vapi_client import get_async_vapi_client_from_request, get_request_token
 
 
 router = APIRouter(prefix="/api/insights", tags=["insights"])
 
 
+def _require_azure() -> None:
+	if not azure_configured():
+		raise HTTPException(status_code=501, detail="Azure OpenAI not configured")
+
+
 @router.post("/compare")
-def compare_responses(human_response: str | None = None, ai_response: str | None = None, transcript: str | None = None) -> Dict[str, Any]:
+async def compare_responses(human_response: str | None = None, ai_response: str | None = None, transcript: str | None = None) -> Dict[str, Any]:
 	"""Compare human vs AI response using Azure OpenAI.
 
 	You can provide either (human_response and ai_response) or a full transcript.
 	Requires AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY, AZURE_OPENAI_DEPLOYMENT.
 	"""
-	if not (settings.AZURE_OPENAI_ENDPOINT and settings.AZURE_OPENAI_API_KEY and settings.AZURE_OPENAI_DEPLOYMENT):
-		raise HTTPException(status_code=501, detail="Azure OpenAI not configured")
-	url = f"{settings.AZURE_OPENAI_ENDPOINT}/openai/deployments/{settings.AZURE_OPENAI_DEPLOYMENT}/chat/completions?api-version=2024-08-01-preview"
-	if transcript:
-		user_content = f"Transcript:\n{transcript}\n\nExtract the human vs AI responses and produce a concise comparison with scores (helpfulness, clarity, tone, compliance) 0-10 each, and a short paragraph on improvement advice."
-	else:
-		user_content = f"Human: {human_response}\nAI: {ai_response}"
-	body = {
-		"messages": [
-			{"role": "system", "content": "You are an expert call QA coach."},
-			{"role": "user", "content": user_content},
-		],
-		"temperature": 0.2,
-	}
-	headers = {"api-key": settings.AZURE_OPENAI_API_KEY}
-	with httpx.Client(timeout=30) as c:
-		r = c.post(url, json=body, headers=headers)
-		if r.status_code >= 400:
-			raise HTTPException(status_code=r.status_code, detail=r.text)
-		data = r.json()
-		choice = (data.get("choices") or [{}])[0]
-		content = (choice.get("message") or {}).get("content") or ""
-		return {"analysis": content}
+	_require_azure()
+	user_content = transcript_prompt(transcript) if transcript else pair_prompt(human_response, ai_response)
+	try:
+		analysis, _ = await scorer.score(user_content)
+	except httpx.HTTPStatusError as e:
+		raise HTTPException(status_code=e.response.status_code, detail=e.response.text)
+	return {"analysis": analysis}
+
+
+class CompareBatchBody(BaseModel):
+	call_ids: List[str] = []
+	transcripts: List[str] = []
+
+
+@router.post("/compare/batch")
+async def compare_batch(body: CompareBatchBody, request: Request) -> StreamingResponse:
+	"""Score many calls or transcripts; one NDJSON line per item, in completion order.
+
+	Lines carry `index` (position in call_ids, then transcripts), `callId` when given,
+	`cached`, and either `analysis` or `error`. Scoring shares the INSIGHTS_CONCURRENCY cap.
+	"""
+	_require_azure()
+	items: List[Dict[str, Any]] = [{"callId": c} for c in body.call_ids] + [{"transcript": t} for t in body.transcripts]
+	if not items:
+		raise HTTPException(status_code=400, detail="Provide call_ids or transcripts")
+	if len(items) > settings.INSIGHTS_BATCH_MAX_ITEMS:
+		raise HTTPException(status_code=413, detail=f"At most {settings.INSIGHTS_BATCH_MAX_ITEMS} items per batch")
+	client = get_async_vapi_client_from_request(request) if body.call_ids else None
+	index = call_indexes.peek(get_request_token(request)) if body.call_ids else None
+	fetch_slots = asyncio.Semaphore(settings.INSIGHTS_CONCURRENCY)
+
+	async def transcript_for(call_id: str) -> Optional[str]:
+		known = index.calls.get(call_id) if index is not None else None
+		transcript = ((known or {}).get("artifact") or {}).get("transcript")
+		if transcript:
+			return transcript
+		async with fetch_slots:
+			with upstream_priority(Priority.BULK):
+				call = await with_backoff(lambda: client.calls.get(call_id))
+		return ((call.dict().get("artifact")) or {}).get("transcript")
+
+	async def run(i: int, item: Dict[str, Any]) -> Dict[str, Any]:
+		out: Dict[str, Any] = {"index": i}
+		if "callId" in item:
+			out["callId"] = item["callId"]
+		try:
+			transcript = item.get("transcript")
+			if transcript is None:
+				transcript = await transcript_for(item["callId"])
+				if not transcript:
+					out["error"] = "Call has no transcript"
+					return out
+			out["analysis"], out["cached"] = await scorer.score(transcript_prompt(transcript))
+		except httpx.HTTPStatusError as e:
+			out["error"] = f"Azure OpenAI {e.response.status_code}: {e.response.text[:500]}"
+		except Exception as e:
+			out["error"] = str(e) or type(e).__name__
+		return out
+
+	async def stream() -> AsyncIterator[bytes]:
+		tasks = [asyncio.create_task(run(i, item)) for i, item in enumerate(items)]
+		try:
+			for done in asyncio.as_completed(tasks):
+				yield (json.dumps(await done) + "\n").encode("utf-8")
+		finally:
+			for t in tasks:
+				t.cancel()
+
+	return StreamingResponse(stream(), media_type="application/x-ndjson", headers={"X-Prompt-Version": PROMPT_VERSION})
+
+
+@router.get("/rollups")
+async def call_rollups(
+	request: Request,
+	group_by: Literal["hour", "day", "assistant", "number", "total"] = "day",
+	start: Optional[datetime] = None,
+	end: Optional[datetime] = None,
+	assistant_id: Optional[str] = None,
+	phone_number_id: Optional[str] = None,
+	refresh: bool = False,
+) -> Response:
+	"""Call counts, status and endedReason mix, duration percentiles and cost per bucket.
+
+	Answered from hourly rollups maintained alongside the call index (synced like /api/calls),
+	so the cost depends on the number of buckets in range, not the number of calls. Hours and
+	days are UTC.
+	"""
+	token = get_request_token(request)
+	index = call_indexes.get(token)
+	await index.refresh(get_async_vapi_client_from_request(request), max_age=settings.CALL_INDEX_REFRESH_SECONDS, full=refresh)
+	payload = index.rollups.query(
+		group_by=group_by,
+		start=to_epoch(start),
+		end=to_epoch(end),
+		assistant_id=assistant_id,
+		phone_number_id=phone_number_id,
+	)
+	return etag_json(request, payload, {"X-Index-State": "syncing" if index.syncing else "ready"})
+
+
+def _audio_error(e: Exception) -> str:
+	if isinstance(e, httpx.HTTPError):
+		return f"Recording download failed: {e}"
+	return str(e) or type(e).__name__
+
+
+@router.get("/audio/{call_id}")
+async def call_audio_metrics(call_id: str, request: Request, refresh: bool = False) -> Dict[str, Any]:
+	"""Talk time and ratio, silence gaps, overlaps, interruptions and agent response latency
+	measured from the call's stereo recording.
+
+	Computed once per call in the audio process pool and stored; `refresh=true` recomputes.
+	"""
+	try:
+		metrics, cached = await audio_analyzer.analyze(get_request_token(request), call_id, refresh=refresh)
+	except NoRecording as e:
+		raise HTTPException(status_code=404, detail=str(e))
+	except (AudioDecodeError, ArtifactTooLarge) as e:
+		raise HTTPException(status_code=422, detail=str(e))
+	except (httpx.HTTPError, UnsafeArtifactUrl) as e:
+		raise HTTPException(status_code=502, detail=_audio_error(e))
+	return {"callId": call_id, **metrics, "cached": cached}
+
+
+class AudioBatchBody(BaseModel):
+	call_ids: List[str]
+	refresh: bool = False
+
+
+@router.post("/audio/batch")
+async def audio_metrics_batch(body: AudioBatchBody, request: Request) -> StreamingResponse:
+	"""Audio metrics for many calls; one NDJSON line per call, in completion order.
+
+	Lines carry `index`, `callId`, `cached`, and either `metrics` or `error`. Recordings are
+	downloaded AUDIO_DOWNLOAD_CONCURRENCY at a time and analysed by AUDIO_WORKERS processes.
+	"""
+	if not body.call_ids:
+		raise HTTPException(status_code=400, detail="Provide call_ids")
+	if len(body.call_ids) > settings.INSIGHTS_BATCH_MAX_ITEMS:
+		raise HTTPException(status_code=413, detail=f"At most {settings.INSIGHTS_BATCH_MAX_ITEMS} items per batch")
+	token = get_request_token(request)
+
+	async def run(i: int, call_id: str) -> Dict[str, Any]:
+		out: Dict[str, Any] = {"index": i, "callId": call_id}
+		try:
+			out["metrics"], out["cached"] = await audio_analyzer.analyze(token, call_id, refresh=body.refresh)
+		except Exception as e:
+			out["error"] = _audio_error(e)
+		return out
+
+	async def stream() -> AsyncIterator[bytes]:
+		tasks = [asyncio.create_task(run(i, call_id)) for i, call_id in enumerate(body.call_ids)]
+		try:
+			for done in asyncio.as_completed(tasks):
+				yield (json.dumps(await done) + "\n").encode("utf-8")
+		finally:
+			for t in tasks:
+				t.cancel()
 
+	return StreamingResponse(stream(), media_type="application/x-ndjson")
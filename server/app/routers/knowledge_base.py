@@ -1,11 +1,23 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+import asyncio
+import hashlib
+import json
+from typing import Any, AsyncIterator, BinaryIO, Dict, List, Literal, Optional, Tuple
 
 import httpx
-from fastapi import APIRouter, HTTPException, UploadFile, File, Request
+from fastapi import APIRouter, HTTPException, UploadFile, File, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.datastructures import UploadFile as StarletteUploadFile
 
-from ..services.vapi_client import get_vapi_client_from_request
+from ..services.cache import cache_key, read_cache
+from ..services.http import get_http_client
+from ..services.kb_uploads import UploadRejected, kb_uploader
+from ..services.metrics import timed_sdk, timed_serialization
+from ..services.orgs import org_id_for
+from ..services.projection import projection
+from ..services.responses import etag_json, ndjson_response, wants_ndjson
+from ..services.vapi_client import get_async_vapi_client_from_request, get_request_token
 from ..config import settings
 
 
@@ -13,30 +25,45 @@ router = APIRouter(prefix="/api/kb", tags=["knowledge-base"])
 
 
 @router.get("")
-def list_kb(request: Request) -> List[Dict[str, Any]]:
-	client = get_vapi_client_from_request(request)
-	items = client.knowledge_bases.list()
-	return [i.dict() for i in items]
+async def list_kb(
+	request: Request,
+	fields: Optional[str] = None,
+	view: Literal["summary", "full"] = "summary",
+	format: Optional[Literal["json", "ndjson"]] = None,
+) -> Response:
+	"""Knowledge bases in the summary view unless `view=full` or `fields=a,b.c`; `format=ndjson` streams them."""
+	project = projection("knowledge_bases", fields, view)
+	client = get_async_vapi_client_from_request(request)
+
+	async def load() -> List[Dict[str, Any]]:
+		with timed_sdk("knowledge_bases.list"):
+			items = await client.knowledge_bases.list()
+		with timed_serialization("knowledge_bases.list"):
+			return [i.dict() for i in items]
+
+	items = await read_cache.get_or_load(cache_key(request, "kbs"), load, settings.CACHE_TTL_KNOWLEDGE_BASES)
+	if wants_ndjson(request, format):
+		return ndjson_response(request, map(project, items))
+	return etag_json(request, project.many(items))
 
 
 @router.get("/{kb_id}/documents")
-def list_documents(kb_id: str, request: Request) -> Dict[str, Any]:
+async def list_documents(kb_id: str, request: Request) -> Dict[str, Any]:
 	if settings.KB_DOCS_WEBHOOK_URL:
-		with httpx.Client(timeout=20) as c:
-			r = c.post(settings.KB_DOCS_WEBHOOK_URL, json={"action": "list", "knowledgeBaseId": kb_id}, headers={"x-vapi-token": request.headers.get("x-vapi-token", "")})
-			if r.status_code >= 400:
-				raise HTTPException(status_code=r.status_code, detail=r.text)
-			return r.json()
+		r = await get_http_client().post(settings.KB_DOCS_WEBHOOK_URL, json={"action": "list", "knowledgeBaseId": kb_id}, headers={"x-vapi-token": request.headers.get("x-vapi-token", "")}, timeout=20)
+		if r.status_code >= 400:
+			raise HTTPException(status_code=r.status_code, detail=r.text)
+		return r.json()
 	# Fallback to SDK if webhook not configured
-	client = get_vapi_client_from_request(request)
+	client = get_async_vapi_client_from_request(request)
 	try:
 		# Try common SDK shapes
 		out_docs: List[Any] = []
 		try:
-			out_docs = client.knowledge_bases.documents.list(kb_id)  # type: ignore[attr-defined]
+			out_docs = await client.knowledge_bases.documents.list(kb_id)  # type: ignore[attr-defined]
 		except Exception:
 			try:
-				out_docs = client.documents.list(knowledge_base_id=kb_id)  # type: ignore[attr-defined]
+				out_docs = await client.documents.list(knowledge_base_id=kb_id)  # type: ignore[attr-defined]
 			except Exception:
 				out_docs = []
 		resp: List[Dict[str, Any]] = []
@@ -54,26 +81,171 @@ def list_documents(kb_id: str, request: Request) -> Dict[str, Any]:
 		raise HTTPException(status_code=500, detail=f"List documents failed: {e}")
 
 
-@router.post("/{kb_id}/documents")
-def upload_document(kb_id: str, request: Request, file: UploadFile = File(...)) -> Dict[str, Any]:
+def _require_webhook() -> None:
 	if not settings.KB_DOCS_WEBHOOK_URL:
 		raise HTTPException(status_code=501, detail="KB docs webhook not configured")
-	with httpx.Client(timeout=60) as c:
-		files = {"file": (file.filename or "upload.bin", file.file, file.content_type or "application/octet-stream")}
-		data = {"action": "upload", "knowledgeBaseId": kb_id}
-		r = c.post(settings.KB_DOCS_WEBHOOK_URL, data=data, files=files, headers={"x-vapi-token": request.headers.get("x-vapi-token", "")})
-		if r.status_code >= 400:
-			raise HTTPException(status_code=r.status_code, detail=r.text)
-		return r.json()
+
+
+def _hash_file(f: BinaryIO, chunk_bytes: int) -> Tuple[str, int]:
+	digest = hashlib.sha256()
+	size = 0
+	f.seek(0)
+	while chunk := f.read(chunk_bytes):
+		digest.update(chunk)
+		size += len(chunk)
+	f.seek(0)
+	return digest.hexdigest(), size
+
+
+async def _file_chunks(file: StarletteUploadFile, chunk_bytes: int) -> AsyncIterator[bytes]:
+	while chunk := await file.read(chunk_bytes):
+		yield chunk
+
+
+async def _upload_spooled(org_id: str, token: str, kb_id: str, file: StarletteUploadFile, progress=None) -> Dict[str, Any]:
+	"""Hash a spooled upload first, so a known document never reaches the webhook."""
+	sha, size = await asyncio.to_thread(_hash_file, file.file, kb_uploader.chunk_bytes)
+	return await kb_uploader.upload(
+		org_id,
+		token,
+		kb_id,
+		file.filename or "upload.bin",
+		file.content_type or "application/octet-stream",
+		_file_chunks(file, kb_uploader.chunk_bytes),
+		sha256=sha,
+		size=size,
+		progress=progress(size) if progress is not None else None,
+	)
+
+
+def _upload_error(e: Exception) -> HTTPException:
+	if isinstance(e, UploadRejected):
+		return HTTPException(status_code=400, detail=str(e))
+	if isinstance(e, httpx.HTTPStatusError):
+		return HTTPException(status_code=e.response.status_code, detail=e.response.text)
+	return HTTPException(status_code=502, detail=f"KB docs webhook failed: {e}")
+
+
+@router.post("/{kb_id}/documents")
+async def upload_document(kb_id: str, request: Request, file: UploadFile = File(...)) -> Dict[str, Any]:
+	"""Upload one document (multipart field `file`) to the KB docs webhook.
+
+	Returns {status: uploaded|duplicate, sha256, bytes, documentId}, plus the webhook `response`
+	when uploaded. A document already uploaded to this knowledge base is not sent again.
+	"""
+	_require_webhook()
+	token = get_request_token(request)
+	org_id = await org_id_for(token)
+	try:
+		return await _upload_spooled(org_id, token, kb_id, file)
+	except (UploadRejected, httpx.HTTPError) as e:
+		raise _upload_error(e)
+
+
+@router.post("/{kb_id}/documents/stream")
+async def stream_document(
+	kb_id: str,
+	request: Request,
+	filename: str = Query(..., min_length=1),
+	content_type: Optional[str] = Header(None),
+	content_length: Optional[int] = Header(None),
+	x_content_sha256: Optional[str] = Header(None),
+) -> Dict[str, Any]:
+	"""Pipe a raw request body (the document itself, not multipart) to the KB docs webhook.
+
+	Chunks are forwarded as they arrive, so nothing is spooled. With an X-Content-SHA256 header
+	a known document is answered without reading the body; otherwise the hash is computed on the
+	way through and a duplicate is abandoned before the webhook receives the end of it.
+	"""
+	_require_webhook()
+	token = get_request_token(request)
+	org_id = await org_id_for(token)
+	try:
+		return await kb_uploader.upload(
+			org_id,
+			token,
+			kb_id,
+			filename,
+			content_type or "application/octet-stream",
+			request.stream(),
+			sha256=x_content_sha256,
+			size=content_length,
+		)
+	except (UploadRejected, httpx.HTTPError) as e:
+		raise _upload_error(e)
+
+
+@router.post("/{kb_id}/documents/batch")
+async def upload_documents(kb_id: str, request: Request) -> StreamingResponse:
+	"""Upload several documents (multipart, any field names) concurrently; NDJSON progress per file.
+
+	Files are uploaded KB_UPLOAD_CONCURRENCY at a time. Each line carries `index` and `filename`
+	with a `status`: `uploading` lines report `bytesSent` of `bytes`, and every file ends with
+	one `uploaded`, `duplicate` or `failed` line (with `error`). Parts are spooled to temporary
+	files by the multipart parser, so memory stays flat however large the batch.
+	"""
+	_require_webhook()
+	token = get_request_token(request)
+	org_id = await org_id_for(token)
+	form = await request.form(max_files=settings.KB_UPLOAD_MAX_FILES)
+	files = [v for _, v in form.multi_items() if isinstance(v, StarletteUploadFile)]
+	if not files:
+		await form.close()
+		raise HTTPException(status_code=400, detail="No files in the upload")
+	queue: asyncio.Queue = asyncio.Queue()
+
+	async def run(i: int, file: StarletteUploadFile) -> None:
+		out: Dict[str, Any] = {"index": i, "filename": file.filename}
+
+		def progress(size: int):
+			step = max(size // 20, kb_uploader.chunk_bytes)
+			last = 0
+
+			def report(sent: int) -> None:
+				nonlocal last
+				if sent - last >= step or sent == size:
+					last = sent
+					queue.put_nowait({**out, "status": "uploading", "bytesSent": sent, "bytes": size})
+
+			return report
+
+		try:
+			result = await _upload_spooled(org_id, token, kb_id, file, progress)
+			out.update(result)
+		except (UploadRejected, httpx.HTTPError) as e:
+			out.update(status="failed", error=_upload_error(e).detail)
+		except Exception as e:
+			out.update(status="failed", error=str(e) or type(e).__name__)
+		queue.put_nowait(out)
+
+	async def stream() -> AsyncIterator[bytes]:
+		tasks = [asyncio.create_task(run(i, f)) for i, f in enumerate(files)]
+		remaining = len(tasks)
+		try:
+			while remaining:
+				event = await queue.get()
+				if event["status"] != "uploading":
+					remaining -= 1
+				yield (json.dumps(event) + "\n").encode("utf-8")
+		finally:
+			for t in tasks:
+				t.cancel()
+			await asyncio.gather(*tasks, return_exceptions=True)
+			await form.close()
+
+	return StreamingResponse(stream(), media_type="application/x-ndjson")
 
 
 @router.delete("/{kb_id}/documents/{doc_id}")
-def delete_document(kb_id: str, doc_id: str, request: Request) -> Dict[str, Any]:
-	if not settings.KB_DOCS_WEBHOOK_URL:
-		raise HTTPException(status_code=501, detail="KB docs webhook not configured")
-	with httpx.Client(timeout=20) as c:
-		r = c.post(settings.KB_DOCS_WEBHOOK_URL, json={"action": "delete", "knowledgeBaseId": kb_id, "documentId": doc_id}, headers={"x-vapi-token": request.headers.get("x-vapi-token", "")})
-		if r.status_code >= 400:
-			raise HTTPException(status_code=r.status_code, detail=r.text)
+async def delete_document(kb_id: str, doc_id: str, request: Request) -> Dict[str, Any]:
+	_require_webhook()
+	r = await get_http_client().post(settings.KB_DOCS_WEBHOOK_URL, json={"action": "delete", "knowledgeBaseId": kb_id, "documentId": doc_id}, headers={"x-vapi-token": request.headers.get("x-vapi-token", "")}, timeout=20)
+	if r.status_code >= 400:
+		raise HTTPException(status_code=r.status_code, detail=r.text)
+	try:
+		org_id = await org_id_for(get_request_token(request))
+	except HTTPException:
 		return r.json()
+	await asyncio.to_thread(kb_uploader.hashes.forget, org_id, kb_id, doc_id)
+	return r.json()
 
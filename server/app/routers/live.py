@@ -1,23 +1,31 @@
 from __future__ import annotations
 
-from typing import Any, Dict
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional
 
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket
+from fastapi.responses import StreamingResponse
 
-from ..services.vapi_client import get_vapi_client_from_request
+from ..services.event_hub import EventFilter, event_hub
+from ..services.governor import Priority, upstream_priority
+from ..services.monitor_relay import monitor_relays, parse_variant
+from ..services.orgs import org_id_for
+from ..services.tickets import TicketError, tickets
+from ..services.vapi_client import async_vapi_registry, get_async_vapi_client_from_request, get_request_token
 
 
 router = APIRouter(prefix="/api/live", tags=["live"])
 
 
 @router.get("/session/{call_id}")
-def get_live_session_info(call_id: str, request: Request) -> Dict[str, Any]:
+async def get_live_session_info(call_id: str, request: Request) -> Dict[str, Any]:
 	"""Return info useful for live monitoring and control.
 
 	Note: The SDK exposes monitor.listenUrl/controlUrl via call.monitor, when enabled in assistant.monitorPlan.
 	"""
-	client = get_vapi_client_from_request(request)
-	call = client.calls.get(call_id)
+	client = get_async_vapi_client_from_request(request)
+	call = await client.calls.get(call_id)
 	monitor = call.monitor.dict() if getattr(call, "monitor", None) is not None else {}
 	web = getattr(call, "web", None)
 	web_dict = web.dict() if web is not None and hasattr(web, "dict") else {}
@@ -27,49 +35,192 @@ def get_live_session_info(call_id: str, request: Request) -> Dict[str, Any]:
 	}
 
 
+def _sse(event: str, data: Any, seq: Optional[int] = None) -> str:
+	head = f"id: {event_hub.instance}-{seq}\n" if seq is not None else ""
+	return f"{head}event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.get("/events")
+async def live_events(
+	request: Request,
+	call_id: Optional[List[str]] = Query(None),
+	assistant_id: Optional[str] = None,
+	status: Optional[List[str]] = Query(None),
+	types: Optional[List[str]] = Query(None, description="status, transcript, ended"),
+	ticket: Optional[str] = None,
+) -> StreamingResponse:
+	"""Server-sent events for live calls fed by the Vapi webhook.
+
+	Starts with a `snapshot` of matching live calls (or a replay after a Last-Event-ID from the
+	same worker), then streams `status`, `transcript` and `ended` deltas. EventSource cannot set
+	headers, so it passes an `events` ticket as `?ticket=`. A `snapshot` may be re-sent if the client falls behind.
+	"""
+	if ticket:
+		try:
+			token = await tickets.redeem(ticket, "events")
+		except TicketError as e:
+			raise HTTPException(status_code=401, detail=str(e))
+	else:
+		token = get_request_token(request)
+	org_id = await org_id_for(token)
+	filters = EventFilter(
+		call_ids=set(call_id) if call_id else None,
+		assistant_id=assistant_id,
+		statuses=set(status) if status else None,
+		types=set(types) if types else None,
+	)
+	# Ids are "<worker instance>-<seq>"; after reconnecting to another worker there is nothing to replay.
+	instance, _, last_seq = request.headers.get("last-event-id", "").rpartition("-")
+	after_seq = int(last_seq) if last_seq.isdigit() and instance in ("", event_hub.instance) else None
+
+	async def stream() -> AsyncIterator[str]:
+		sub = event_hub.subscribe(org_id, filters)
+		try:
+			backlog = event_hub.replay(org_id, filters, after_seq) if after_seq is not None else None
+			if backlog is None:
+				yield _sse("snapshot", {"calls": event_hub.snapshot(org_id, filters)}, event_hub.seq)
+			else:
+				for delta in backlog:
+					yield _sse(delta["type"], delta, delta["seq"])
+			while True:
+				try:
+					delta = await asyncio.wait_for(sub.queue.get(), timeout=15)
+				except asyncio.TimeoutError:
+					yield ": keepalive\n\n"
+					continue
+				if delta is None:
+					yield _sse("snapshot", {"calls": event_hub.snapshot(org_id, filters)}, event_hub.seq)
+				else:
+					yield _sse(delta["type"], delta, delta["seq"])
+		finally:
+			event_hub.unsubscribe(sub)
+
+	return StreamingResponse(
+		stream(),
+		media_type="text/event-stream",
+		headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+	)
+
+
+@router.websocket("/monitor/{call_id}")
+async def monitor_stream(
+	websocket: WebSocket,
+	call_id: str,
+	format: str = "pcm16",
+	rate: Optional[int] = None,
+	ticket: Optional[str] = None,
+):
+	"""Relay the call's monitor audio through one shared upstream subscription.
+
+	Browsers cannot set headers on WebSockets, so they pass a `monitor` ticket as `?ticket=`.
+	`format` is pcm16 (s16le) or mulaw; `rate` must divide the source sample rate.
+	Slow listeners lose their oldest buffered frames rather than delaying anyone else.
+	"""
+	token = websocket.headers.get("x-vapi-token")
+	if ticket:
+		try:
+			token = await tickets.redeem(ticket, "monitor", call_id)
+		except TicketError as e:
+			await websocket.close(code=1008, reason=str(e))
+			return
+	if not token:
+		await websocket.close(code=1008, reason="Missing Vapi token")
+		return
+	try:
+		variant = parse_variant(format, rate, monitor_relays.source_rate)
+	except ValueError as e:
+		await websocket.close(code=1008, reason=str(e))
+		return
+	try:
+		call = await async_vapi_registry.get(token).calls.get(call_id)
+	except Exception:
+		await websocket.close(code=1008, reason="Call not found")
+		return
+	monitor = call.monitor.dict() if getattr(call, "monitor", None) is not None else {}
+	listen_url = monitor.get("listenUrl")
+	if not listen_url:
+		await websocket.close(code=1008, reason="Monitoring is not enabled for this call")
+		return
+
+	await websocket.accept()
+	relay, listener = monitor_relays.join(call_id, listen_url, variant)
+	disconnected = asyncio.create_task(_wait_disconnect(websocket))
+	try:
+		while True:
+			listener.ready.clear()
+			while listener.frames:
+				frame = listener.frames.popleft()
+				if isinstance(frame, str):
+					await websocket.send_text(frame)
+				else:
+					await websocket.send_bytes(frame)
+				listener.sent += 1
+			if relay.closed.is_set():
+				await websocket.close(code=1000, reason=(relay.close_reason or "")[:120])
+				break
+			ready = asyncio.create_task(listener.ready.wait())
+			await asyncio.wait({ready, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+			ready.cancel()
+			if disconnected.done():
+				break
+	except Exception:
+		pass  # client went away mid-send
+	finally:
+		disconnected.cancel()
+		monitor_relays.leave(relay, listener)
+
+
+async def _wait_disconnect(websocket: WebSocket) -> None:
+	while (await websocket.receive())["type"] != "websocket.disconnect":
+		pass
+
+
 @router.post("/session/{session_id}/terminate")
-def terminate_session(session_id: str, request: Request):
+async def terminate_session(session_id: str, request: Request):
 	"""Terminate a session by setting its status to completed.
 
 	SDK doesn't expose a specialized terminate action; we update status.
 	"""
-	client = get_vapi_client_from_request(request)
+	client = get_async_vapi_client_from_request(request)
 	try:
-		updated = client.sessions.update(session_id, status="completed")
+		with upstream_priority(Priority.CONTROL):
+			updated = await client.sessions.update(session_id, status="completed")
 		return updated.dict()
 	except Exception as e:
 		raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/session/{session_id}/escalate")
-def escalate_session(session_id: str, request: Request, destination: str | None = None):
+async def escalate_session(session_id: str, request: Request, destination: str | None = None):
 	"""Example placeholder to escalate a call by updating messages or metadata.
 
 	Depending on your Vapi configuration, escalation may be implemented via a Transfer tool or server webhook.
 	This endpoint triggers a server-side flag that your assistant can react to via tools or webhook.
 	"""
-	client = get_vapi_client_from_request(request)
+	client = get_async_vapi_client_from_request(request)
 	# We append a message to session to hint escalation via model/tooling
 	try:
-		updated = client.sessions.update(
-			session_id,
-			messages=[{"role": "system", "content": f"ESCALATE {destination or ''}"}],
-		)
+		with upstream_priority(Priority.CONTROL):
+			updated = await client.sessions.update(
+				session_id,
+				messages=[{"role": "system", "content": f"ESCALATE {destination or ''}"}],
+			)
 		return updated.dict()
 	except Exception as e:
 		raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/session/{session_id}/coach")
-def coach_session(session_id: str, request: Request, message: str) -> Dict[str, Any]:
+async def coach_session(session_id: str, request: Request, message: str) -> Dict[str, Any]:
 	"""Send a coaching/whisper message to the live session if supported.
 
 	If the SDK exposes a control API, use it; otherwise, store intent.
 	"""
-	client = get_vapi_client_from_request(request)
+	client = get_async_vapi_client_from_request(request)
 	try:
 		if hasattr(client, "sessions") and hasattr(client.sessions, "update"):
-			updated = client.sessions.update(session_id, messages=[{"role": "system", "content": f"COACH {message}"}])
+			with upstream_priority(Priority.CONTROL):
+				updated = await client.sessions.update(session_id, messages=[{"role": "system", "content": f"COACH {message}"}])
 			return updated.dict() if hasattr(updated, "dict") else {"ok": True}
 		raise HTTPException(status_code=501, detail="Coaching not supported by SDK")
 	except Exception as e:
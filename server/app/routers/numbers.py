@@ -1,74 +1,75 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Literal, Optional
 
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 
-from ..services.vapi_client import get_vapi_client_from_request
+from ..config import settings
+from ..services.number_index import BadCursor, number_indexes
+from ..services.responses import etag_json
+from ..services.vapi_client import as_dict, get_async_vapi_client_from_request, get_request_token
+from ..services.warmup import sdk_variant
 
 
 router = APIRouter(prefix="/api/numbers", tags=["numbers"])
 
 
-def _get_numbers_resource(client: Any):
-	for attr in ["phone_numbers", "numbers", "phoneNumbers", "telephony_numbers"]:
-		if hasattr(client, attr):
-			return getattr(client, attr)
-	raise HTTPException(status_code=501, detail="Numbers resource not available in SDK")
-
+@router.get("")
+async def list_numbers(
+	request: Request,
+	limit: int = Query(500, ge=1, le=5000),
+	cursor: Optional[str] = None,
+	sort: Literal["number", "name", "assistantName", "createdAt", "updatedAt"] = "number",
+	order: Literal["asc", "desc"] = "asc",
+	q: Optional[str] = None,
+	assistant_id: Optional[str] = None,
+	unassigned: bool = False,
+	provider: Optional[str] = None,
+	refresh: bool = False,
+) -> Response:
+	"""Phone numbers with their assistant's name, from the per-token number index.
 
-def _extract_assistant_id(number_obj: Any) -> Optional[str]:
-	# Support various shapes
-	for key in ["assistantId", "assistant_id", "assistant_id", "assistant"]:
-		if hasattr(number_obj, key):
-			val = getattr(number_obj, key)
-			if isinstance(val, dict):
-				return val.get("id") or val.get("assistantId")
-			return val
-	# Try dict() output
+	The index syncs incrementally at most every CACHE_TTL_NUMBERS seconds and fully every
+	NUMBER_INDEX_FULL_SYNC_SECONDS; `refresh=true` forces a full resync. `q` matches the number,
+	its name or the assistant name. X-Total-Count carries the number of matches and X-Next-Cursor,
+	when present, the `cursor` for the next page in the same sort and order.
+	"""
+	index = number_indexes.get(get_request_token(request))
+	await index.refresh(
+		get_async_vapi_client_from_request(request),
+		max_age=settings.CACHE_TTL_NUMBERS,
+		full=refresh,
+		full_every=settings.NUMBER_INDEX_FULL_SYNC_SECONDS,
+	)
 	try:
-		d = number_obj.dict()
-		return d.get("assistantId") or d.get("assistant_id") or (d.get("assistant") or {}).get("id")
-	except Exception:
-		return None
-
-
-@router.get("")
-def list_numbers(request: Request) -> List[Dict[str, Any]]:
-	client = get_vapi_client_from_request(request)
-	res = _get_numbers_resource(client)
-	items = res.list(limit=200) if hasattr(res, "list") else res.get()
-	out: List[Dict[str, Any]] = []
-	for n in items:
-		try:
-			d = n.dict()
-		except Exception:
-			d = dict(n) if isinstance(n, dict) else {}
-		assistant_id = _extract_assistant_id(n)
-		phone = d.get("phoneNumber") or d.get("number") or d.get("e164") or d.get("id")
-		out.append({
-			"id": d.get("id") or phone,
-			"phoneNumber": phone,
-			"assistantId": assistant_id,
-		})
-	return out
+		total, items, next_cursor = index.query(
+			sort=sort,
+			order=order,
+			cursor=cursor,
+			limit=limit,
+			q=q,
+			assistant_id=assistant_id,
+			unassigned=unassigned,
+			provider=provider,
+		)
+	except BadCursor as e:
+		raise HTTPException(status_code=400, detail=str(e))
+	headers = {"X-Total-Count": str(total)}
+	if next_cursor:
+		headers["X-Next-Cursor"] = next_cursor
+	return etag_json(request, items, headers)
 
 
 @router.put("/{number_id}/assistant")
-def update_number_assistant(number_id: str, request: Request, assistant_id: Optional[str] = None) -> Dict[str, Any]:
-	client = get_vapi_client_from_request(request)
-	res = _get_numbers_resource(client)
-	# Try common update signatures
-	last_error: Optional[Exception] = None
-	for kwargs in (
-		{"assistant_id": assistant_id},
-		{"assistantId": assistant_id},
-		{"model": {"assistantId": assistant_id}},
-	):
-		try:
-			updated = res.update(number_id, **kwargs)
-			return updated.dict() if hasattr(updated, "dict") else updated
-		except Exception as e:
-			last_error = e
-	raise HTTPException(status_code=400, detail=f"Failed to update number assistant: {last_error}")
-
+async def update_number_assistant(number_id: str, request: Request, assistant_id: Optional[str] = None) -> Dict[str, Any]:
+	"""Assign (or with no `assistant_id`, unassign) the number's assistant; only its index row is updated."""
+	client = get_async_vapi_client_from_request(request)
+	index = number_indexes.get(get_request_token(request))
+	known = index.numbers.get(number_id)
+	try:
+		provider = known["provider"] if known else as_dict(await client.phone_numbers.get(number_id)).get("provider")
+		body = await sdk_variant("vapi.phone_numbers.types.update_phone_numbers_request_body", "UpdatePhoneNumbersRequestBody", provider)
+		updated = await client.phone_numbers.update(number_id, request=body(assistant_id=assistant_id))
+	except Exception as e:
+		raise HTTPException(status_code=400, detail=f"Failed to update number assistant: {e}")
+	return index.upsert(as_dict(updated))
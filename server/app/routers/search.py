@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+
+from ..config import settings
+from ..services.call_index import call_indexes, to_epoch
+from ..services.orgs import org_id_for
+from ..services.transcript_search import SearchQueryError, transcript_search
+from ..services.vapi_client import get_async_vapi_client_from_request, get_request_token
+
+
+# Shares the /api/calls prefix; included before the calls router so /search is not taken for a call id.
+router = APIRouter(prefix="/api/calls", tags=["calls"])
+
+
+@router.get("/search")
+async def search_calls(
+	request: Request,
+	q: str = Query(..., min_length=1, description='Words are ANDed; "quoted phrase", prefix*, a OR b'),
+	assistant_id: Optional[str] = None,
+	status: Optional[str] = None,
+	created_after: Optional[datetime] = None,
+	created_before: Optional[datetime] = None,
+	limit: int = Query(20, ge=1, le=100),
+	offset: int = Query(0, ge=0, le=10000),
+) -> Dict[str, Any]:
+	"""Full-text search over indexed transcripts, best matches first, from the local index only."""
+	org_id = await org_id_for(get_request_token(request))
+	started = time.perf_counter()
+	try:
+		results, has_more = await asyncio.to_thread(
+			transcript_search.search,
+			org_id,
+			q,
+			assistant_id=assistant_id,
+			status=status,
+			created_after=to_epoch(created_after),
+			created_before=to_epoch(created_before),
+			offset=offset,
+			limit=limit,
+		)
+	except SearchQueryError as e:
+		raise HTTPException(status_code=400, detail=str(e))
+	return {"results": results, "hasMore": has_more, "tookMs": round((time.perf_counter() - started) * 1000, 2)}
+
+
+@router.post("/search/reindex")
+async def reindex_transcripts(request: Request, full: bool = False) -> Dict[str, Any]:
+	"""Backfill the search index from the caller's call index (synced first).
+
+	Ended calls already indexed are skipped unless `full=true`.
+	"""
+	token = get_request_token(request)
+	org_id = await org_id_for(token)
+	index = call_indexes.get(token)
+	await index.refresh(get_async_vapi_client_from_request(request), max_age=settings.CALL_INDEX_REFRESH_SECONDS, wait=True)
+	ended = [
+		c for c in index.calls.values()
+		if str(c.get("status") or "").lower() == "ended" and (c.get("artifact") or {}).get("transcript") and c.get("orgId", org_id) == org_id
+	]
+	if not full:
+		known = await asyncio.to_thread(transcript_search.indexed_ids, org_id, [c["id"] for c in ended])
+		ended = [c for c in ended if c["id"] not in known]
+	written = 0
+	for i in range(0, len(ended), 500):
+		written += await asyncio.to_thread(transcript_search.index_calls, org_id, ended[i : i + 500])
+	return {"indexed": written}
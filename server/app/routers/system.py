@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import asyncio
+import hmac
+from typing import Any, Dict
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+
+from ..config import settings
+
+from ..services.artifact_store import artifact_store
+from ..services.audio_analytics import audio_analyzer
+from ..services.cache import read_cache
+from ..services.call_index import call_indexes
+from ..services.event_hub import event_hub
+from ..services.governor import upstream_governor
+from ..services.kb_uploads import kb_uploader
+from ..services.monitor_relay import monitor_relays
+from ..services.number_index import number_indexes
+from ..services.pacing import pacer
+from ..services.profiler import ProfilerBusy, profiler
+from ..services.shared_state import shared_state
+from ..services.transcript_search import transcript_search
+from ..services.vapi_client import async_vapi_registry, get_request_token, token_key, vapi_registry
+from ..services.warmup import prewarmer
+
+
+router = APIRouter(prefix="/api/system", tags=["system"])
+
+
+@router.get("/vapi-pool")
+def vapi_pool_stats() -> Dict[str, Any]:
+	"""Client registry hit/miss and upstream connection reuse counters."""
+	return {"async": async_vapi_registry.stats(), "sync": vapi_registry.stats()}
+
+
+@router.get("/governor")
+def governor_stats(request: Request) -> Dict[str, Any]:
+	"""Upstream limits and queue depths: the caller's token governor plus totals across tokens."""
+	governor = upstream_governor.peek(token_key(get_request_token(request)))
+	return {"token": governor.stats() if governor is not None else None, "all": upstream_governor.stats()}
+
+
+@router.get("/call-index")
+def call_index_stats(request: Request) -> Dict[str, Any]:
+	"""Size, status breakdown and sync watermark of the caller's call index."""
+	index = call_indexes.peek(get_request_token(request))
+	return index.stats() if index is not None else {"calls": 0}
+
+
+@router.get("/number-index")
+def number_index_stats(request: Request) -> Dict[str, Any]:
+	"""Size, sync watermarks and upstream pages of the caller's number index."""
+	index = number_indexes.peek(get_request_token(request))
+	return index.stats() if index is not None else {"numbers": 0}
+
+
+@router.get("/cache")
+def read_cache_stats() -> Dict[str, Any]:
+	"""Entries, hit/miss and coalesced-request counters of the shared read cache."""
+	return read_cache.stats()
+
+
+@router.get("/pacing")
+def pacing_stats() -> Dict[str, Any]:
+	"""Whether this worker dials paced jobs, queued and parked customers, live calls per busiest resource and limits."""
+	return pacer.stats()
+
+
+@router.get("/shared-state")
+def shared_state_stats() -> Dict[str, Any]:
+	"""Cross-worker backend, single-flight loads and waits, and pub/sub message counters for this worker."""
+	return shared_state.stats() if shared_state is not None else {"backend": "off"}
+
+
+@router.get("/monitor-relays")
+def monitor_relay_stats() -> Dict[str, Any]:
+	"""Open monitor relays with listener counts, upstream frames and dropped frames."""
+	return monitor_relays.stats()
+
+
+@router.get("/live-events")
+def live_event_stats() -> Dict[str, Any]:
+	"""Live call state size, subscribers and webhook event counters."""
+	return event_hub.stats()
+
+
+@router.get("/artifacts")
+def artifact_store_stats() -> Dict[str, Any]:
+	"""Artifact store size, downloads and evictions."""
+	return artifact_store.stats()
+
+
+@router.get("/audio")
+def audio_analytics_stats() -> Dict[str, Any]:
+	"""Audio analysis workers, stored results, cache hits, failures and audio seconds processed."""
+	return audio_analyzer.stats()
+
+
+@router.get("/search")
+def transcript_search_stats() -> Dict[str, Any]:
+	"""Indexed transcript count and query counters."""
+	return transcript_search.stats()
+
+
+@router.get("/kb-uploads")
+def kb_upload_stats() -> Dict[str, Any]:
+	"""Known document hashes, uploads forwarded and duplicates skipped."""
+	return kb_uploader.stats()
+
+
+@router.get("/warmup")
+def warmup_stats() -> Dict[str, Any]:
+	"""Whether pre-warming finished, and import seconds per pre-warmed module."""
+	return prewarmer.stats()
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def capture_profile(
+	request: Request,
+	seconds: float = Query(10.0, gt=0),
+	interval_ms: float = Query(5.0, ge=1, le=1000),
+) -> PlainTextResponse:
+	"""Sample every thread's stack for `seconds` and return collapsed stacks for a flame graph.
+
+	Disabled unless PROFILER_ENABLED and ADMIN_SECRET are set; the secret goes in the
+	x-admin-secret header. Captures are capped at PROFILER_MAX_SECONDS and only one runs at a
+	time. Feed the output to flamegraph.pl or speedscope.app.
+	"""
+	if not settings.PROFILER_ENABLED or not settings.ADMIN_SECRET:
+		raise HTTPException(status_code=404, detail="Profiler disabled; set PROFILER_ENABLED=true and ADMIN_SECRET")
+	given = request.headers.get("x-admin-secret", "")
+	if not hmac.compare_digest(given.encode(), settings.ADMIN_SECRET.encode()):
+		raise HTTPException(status_code=401, detail="Invalid or missing x-admin-secret")
+	if profiler.busy:
+		raise HTTPException(status_code=409, detail="A profile is already being captured")
+	try:
+		stacks = await asyncio.to_thread(profiler.capture, min(seconds, settings.PROFILER_MAX_SECONDS), interval_ms / 1000)
+	except ProfilerBusy as e:
+		raise HTTPException(status_code=409, detail=str(e))
+	return PlainTextResponse(profiler.collapsed(stacks))
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import BaseModel
+
+from ..services.tickets import TicketError, tickets
+from ..services.vapi_client import get_request_token
+
+
+router = APIRouter(prefix="/api/tickets", tags=["tickets"])
+
+
+class TicketRequest(BaseModel):
+	scope: Literal["recording", "monitor", "events"]
+	call_id: Optional[str] = None
+
+
+@router.post("")
+async def create_ticket(body: TicketRequest, request: Request) -> Dict[str, Any]:
+	"""Issue a short-lived ticket for a URL that cannot carry the token header.
+
+	`recording` and `monitor` tickets are bound to one call; `events` covers the live event stream.
+	Pass it as `?ticket=` on /api/calls/{id}/recording, /api/live/monitor/{id} or /api/live/events.
+	"""
+	token = get_request_token(request)
+	try:
+		ticket, expires = await tickets.issue(token, body.scope, body.call_id)
+	except TicketError as e:
+		raise HTTPException(status_code=400, detail=str(e))
+	return {"ticket": ticket, "expiresAt": expires, "ttlSeconds": tickets.ttl}
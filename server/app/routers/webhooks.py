@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import hmac
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Request
+
+from ..config import settings
+from ..services.call_index import call_indexes
+from ..services.event_hub import event_hub
+
+
+router = APIRouter(prefix="/api/webhooks", tags=["webhooks"])
+
+
+@router.post("/vapi")
+async def vapi_server_webhook(request: Request, x_vapi_secret: Optional[str] = Header(None)) -> Dict[str, Any]:
+	"""Receive Vapi server messages (status-update, transcript, end-of-call-report).
+
+	Point the assistant's or org's server URL here, with a server URL secret matching
+	VAPI_WEBHOOK_SECRET; it must arrive in the x-vapi-secret header. Messages are refused
+	while no secret is configured, since anyone could otherwise post them.
+	"""
+	if not settings.VAPI_WEBHOOK_SECRET:
+		raise HTTPException(status_code=503, detail="Webhook secret is not configured")
+	if not hmac.compare_digest((x_vapi_secret or "").encode(), settings.VAPI_WEBHOOK_SECRET.encode()):
+		raise HTTPException(status_code=401, detail="Invalid webhook secret")
+	try:
+		payload = await request.json()
+	except ValueError:
+		raise HTTPException(status_code=400, detail="Body must be JSON")
+	message = payload.get("message") if isinstance(payload, dict) else None
+	if not isinstance(message, dict):
+		raise HTTPException(status_code=400, detail="Missing message")
+	delta = event_hub.ingest(message)
+	if delta is not None and isinstance(message.get("call"), dict):
+		fields = dict(message["call"])
+		if delta.get("status"):
+			fields["status"] = delta["status"]
+		if delta.get("endedReason"):
+			fields["endedReason"] = delta["endedReason"]
+		call_indexes.update_known(delta["callId"], fields)
+	return {}
@@ -0,0 +1,368 @@
+from __future__ import annotations
+
+import asyncio
+import fnmatch
+import hashlib
+import ipaddress
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import aiofiles
+import httpx
+
+from ..config import settings
+from .governor import Priority, upstream_priority
+from .http import get_http_client
+from .orgs import token_for_org
+from .vapi_client import as_dict, async_vapi_registry
+
+
+log = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+	sha256 TEXT PRIMARY KEY,
+	size INTEGER NOT NULL,
+	content_type TEXT,
+	last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS blobs_access ON blobs (last_access);
+CREATE TABLE IF NOT EXISTS calls (
+	org_id TEXT NOT NULL,
+	call_id TEXT NOT NULL,
+	meta TEXT NOT NULL,
+	transcript_sha256 TEXT,
+	fetched_at REAL NOT NULL,
+	PRIMARY KEY (org_id, call_id)
+);
+CREATE TABLE IF NOT EXISTS refs (
+	org_id TEXT NOT NULL,
+	call_id TEXT NOT NULL,
+	kind TEXT NOT NULL,
+	sha256 TEXT NOT NULL,
+	PRIMARY KEY (org_id, call_id, kind)
+);
+CREATE INDEX IF NOT EXISTS refs_blob ON refs (sha256);
+"""
+
+# Artifact URL fields that are downloaded into the store, by ref kind.
+RECORDING_KINDS = {"recording": "recordingUrl", "stereoRecording": "stereoRecordingUrl"}
+
+
+class ArtifactTooLarge(Exception):
+	pass
+
+
+class UnsafeArtifactUrl(Exception):
+	pass
+
+
+def call_artifacts(call: Dict[str, Any]) -> Dict[str, Any]:
+	"""The artifacts response for a call read from Vapi."""
+	artifact = call.get("artifact") or {}
+	return {
+		"transcript": artifact.get("transcript"),
+		"recordingUrl": artifact.get("recordingUrl"),
+		"stereoRecordingUrl": artifact.get("stereoRecordingUrl"),
+		"videoRecordingUrl": artifact.get("videoRecordingUrl"),
+		"recording": artifact.get("recording"),
+	}
+
+
+class ArtifactStore:
+	"""Content-addressed disk cache for finished calls' transcripts and recordings.
+
+	Blobs live under `root/blobs/<sha[:2]>/<sha>` and are shared by every call that references
+	the same bytes. Calls and refs are scoped by Vapi org, since artifacts are prefetched when
+	webhooks, which carry no token, report a call ended. Least recently served blobs are evicted
+	beyond `max_bytes`. Recordings are only downloaded from `allowed_hosts` (`*.` patterns match
+	subdomains), and never from private or loopback addresses unless `allow_private`.
+	"""
+
+	def __init__(
+		self,
+		root: str,
+		max_bytes: int,
+		max_file_bytes: int,
+		prefetch_concurrency: int = 2,
+		allowed_hosts: Optional[List[str]] = None,
+		allow_private: bool = False,
+	) -> None:
+		self.root = root
+		self.max_bytes = max_bytes
+		self.max_file_bytes = max_file_bytes
+		self.prefetch_concurrency = prefetch_concurrency
+		self.allowed_hosts = [h.lower() for h in allowed_hosts or []]
+		self.allow_private = allow_private
+		self._lock = threading.Lock()
+		self._conn: Optional[sqlite3.Connection] = None
+		self._downloads: Dict[str, asyncio.Future] = {}
+		self._prefetch_slots: Optional[asyncio.Semaphore] = None
+		self._listeners: List[Callable[[str, Dict[str, Any]], Any]] = []
+		self.downloads = 0
+		self.downloaded_bytes = 0
+		self.evictions = 0
+		self.prefetch_skipped = 0
+		self.rejected_urls = 0
+
+	# -- storage -------------------------------------------------------------------------------
+
+	def _db(self) -> sqlite3.Connection:
+		if self._conn is None:
+			os.makedirs(os.path.join(self.root, "tmp"), exist_ok=True)
+			conn = sqlite3.connect(os.path.join(self.root, "artifacts.sqlite3"), check_same_thread=False)
+			conn.row_factory = sqlite3.Row
+			conn.execute("PRAGMA journal_mode=WAL")
+			conn.execute("PRAGMA synchronous=NORMAL")
+			conn.executescript(_SCHEMA)
+			self._conn = conn
+		return self._conn
+
+	def close(self) -> None:
+		with self._lock:
+			if self._conn is not None:
+				self._conn.close()
+				self._conn = None
+
+	def _tmp_path(self) -> str:
+		tmp = os.path.join(self.root, "tmp")
+		os.makedirs(tmp, exist_ok=True)
+		return os.path.join(tmp, uuid.uuid4().hex)
+
+	def blob_path(self, sha: str) -> str:
+		return os.path.join(self.root, "blobs", sha[:2], sha)
+
+	def _adopt(self, tmp_path: str, sha: str, size: int, content_type: Optional[str]) -> None:
+		"""Move a fully written temp file into place and record it, then evict if over budget."""
+		path = self.blob_path(sha)
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		if os.path.exists(path):
+			os.unlink(tmp_path)
+		else:
+			os.replace(tmp_path, path)
+		with self._lock, self._db() as db:
+			db.execute(
+				"INSERT INTO blobs (sha256, size, content_type, last_access) VALUES (?, ?, ?, ?) "
+				"ON CONFLICT (sha256) DO UPDATE SET last_access = excluded.last_access",
+				(sha, size, content_type, time.time()),
+			)
+			self._evict(db, keep=sha)
+
+	def _evict(self, db: sqlite3.Connection, keep: str) -> None:
+		total = db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+		if total <= self.max_bytes:
+			return
+		for row in db.execute("SELECT sha256, size FROM blobs WHERE sha256 != ? ORDER BY last_access", (keep,)).fetchall():
+			if total <= self.max_bytes:
+				break
+			db.execute("DELETE FROM blobs WHERE sha256 = ?", (row["sha256"],))
+			db.execute("DELETE FROM refs WHERE sha256 = ?", (row["sha256"],))
+			db.execute("DELETE FROM calls WHERE transcript_sha256 = ?", (row["sha256"],))
+			try:
+				os.unlink(self.blob_path(row["sha256"]))
+			except FileNotFoundError:
+				pass
+			total -= row["size"]
+			self.evictions += 1
+
+	def _put_bytes(self, data: bytes, content_type: str) -> str:
+		sha = hashlib.sha256(data).hexdigest()
+		tmp_path = self._tmp_path()
+		with open(tmp_path, "wb") as f:
+			f.write(data)
+		self._adopt(tmp_path, sha, len(data), content_type)
+		return sha
+
+	def _read_blob(self, sha: Optional[str]) -> Optional[str]:
+		if not sha:
+			return None
+		try:
+			with open(self.blob_path(sha), "rb") as f:
+				return f.read().decode("utf-8")
+		except FileNotFoundError:
+			return None
+
+	def touch(self, sha: str) -> None:
+		"""Mark a blob as recently served; writes at most once a minute per blob."""
+		now = time.time()
+		with self._lock, self._db() as db:
+			db.execute("UPDATE blobs SET last_access = ? WHERE sha256 = ? AND last_access < ?", (now, sha, now - 60))
+
+	# -- calls ---------------------------------------------------------------------------------
+
+	def get_call(self, org_id: str, call_id: str) -> Optional[Dict[str, Any]]:
+		"""Stored artifacts response for a call (transcript included), if any."""
+		with self._lock:
+			row = self._db().execute("SELECT meta, transcript_sha256 FROM calls WHERE org_id = ? AND call_id = ?", (org_id, call_id)).fetchone()
+		if row is None:
+			return None
+		meta = json.loads(row["meta"])
+		meta["transcript"] = self._read_blob(row["transcript_sha256"])
+		if row["transcript_sha256"] and meta["transcript"] is None:
+			return None
+		return meta
+
+	def put_call(self, org_id: str, call_id: str, artifacts: Dict[str, Any]) -> None:
+		transcript = artifacts.get("transcript")
+		sha = self._put_bytes(transcript.encode("utf-8"), "text/plain; charset=utf-8") if transcript else None
+		meta = {k: v for k, v in artifacts.items() if k != "transcript"}
+		with self._lock, self._db() as db:
+			db.execute(
+				"INSERT OR REPLACE INTO calls (org_id, call_id, meta, transcript_sha256, fetched_at) VALUES (?, ?, ?, ?, ?)",
+				(org_id, call_id, json.dumps(meta, default=str), sha, time.time()),
+			)
+
+	def get_ref(self, org_id: str, call_id: str, kind: str) -> Optional[Tuple[str, Optional[str]]]:
+		"""(sha256, content type) of a stored recording whose blob is still on disk."""
+		with self._lock:
+			row = self._db().execute(
+				"SELECT r.sha256, b.content_type FROM refs r JOIN blobs b ON b.sha256 = r.sha256 WHERE r.org_id = ? AND r.call_id = ? AND r.kind = ?",
+				(org_id, call_id, kind),
+			).fetchone()
+		if row is None or not os.path.exists(self.blob_path(row["sha256"])):
+			return None
+		return row["sha256"], row["content_type"]
+
+	def _put_ref(self, org_id: str, call_id: str, kind: str, sha: str) -> None:
+		with self._lock, self._db() as db:
+			db.execute("INSERT OR REPLACE INTO refs (org_id, call_id, kind, sha256) VALUES (?, ?, ?, ?)", (org_id, call_id, kind, sha))
+
+	# -- downloads -----------------------------------------------------------------------------
+
+	async def _check_url(self, url: str) -> None:
+		"""Refuse URLs outside the allowed hosts or resolving to non-public addresses."""
+		try:
+			parsed = httpx.URL(url)
+		except httpx.InvalidURL:
+			parsed = None
+		host = (parsed.host if parsed is not None else "").lower()
+		if parsed is None or parsed.scheme not in ("http", "https") or not host:
+			self.rejected_urls += 1
+			raise UnsafeArtifactUrl("Recording URL is not an http(s) URL")
+		if not any(fnmatch.fnmatchcase(host, pattern) for pattern in self.allowed_hosts):
+			self.rejected_urls += 1
+			raise UnsafeArtifactUrl(f"Recording host {host} is not in ARTIFACT_ALLOWED_HOSTS")
+		if self.allow_private:
+			return
+		try:
+			infos = await asyncio.get_running_loop().getaddrinfo(host, parsed.port or (443 if parsed.scheme == "https" else 80))
+		except OSError as e:
+			raise UnsafeArtifactUrl(f"Recording host {host} does not resolve: {e}")
+		for info in infos:
+			if not ipaddress.ip_address(info[4][0].split("%", 1)[0]).is_global:
+				self.rejected_urls += 1
+				raise UnsafeArtifactUrl(f"Recording host {host} resolves to a non-public address")
+
+	async def _download(self, url: str) -> Tuple[str, Optional[str]]:
+		await self._check_url(url)
+		tmp_path = self._tmp_path()
+		digest = hashlib.sha256()
+		size = 0
+		try:
+			async with get_http_client().stream("GET", url, timeout=120) as r:
+				r.raise_for_status()
+				content_type = r.headers.get("content-type")
+				async with aiofiles.open(tmp_path, "wb") as f:
+					async for chunk in r.aiter_bytes(256 * 1024):
+						size += len(chunk)
+						if size > self.max_file_bytes:
+							raise ArtifactTooLarge(f"Artifact exceeds {self.max_file_bytes} bytes")
+						digest.update(chunk)
+						await f.write(chunk)
+			sha = digest.hexdigest()
+			await asyncio.to_thread(self._adopt, tmp_path, sha, size, content_type)
+		except BaseException:
+			try:
+				os.unlink(tmp_path)
+			except FileNotFoundError:
+				pass
+			raise
+		self.downloads += 1
+		self.downloaded_bytes += size
+		return sha, content_type
+
+	async def fetch_recording(self, org_id: str, call_id: str, kind: str, url: str) -> Tuple[str, Optional[str]]:
+		"""Return the stored recording, downloading it once; concurrent callers share the download."""
+		ref = await asyncio.to_thread(self.get_ref, org_id, call_id, kind)
+		if ref is not None:
+			return ref
+		pending = self._downloads.get(url)
+		if pending is None:
+			pending = self._downloads[url] = asyncio.ensure_future(self._download(url))
+			pending.add_done_callback(lambda _: self._downloads.pop(url, None))
+		sha, content_type = await asyncio.shield(pending)
+		await asyncio.to_thread(self._put_ref, org_id, call_id, kind, sha)
+		return sha, content_type
+
+	async def prefetch(self, org_id: str, call_id: str) -> None:
+		"""Store a finished call's transcript and download its recordings in the background.
+
+		The artifacts are read back from Vapi with a token seen for the org, never taken from the
+		webhook body; without such a token the call is left to be fetched on first request.
+		"""
+		token = token_for_org(org_id)
+		if token is None:
+			self.prefetch_skipped += 1
+			return
+		if self._prefetch_slots is None:
+			self._prefetch_slots = asyncio.Semaphore(self.prefetch_concurrency)
+		async with self._prefetch_slots:
+			try:
+				with upstream_priority(Priority.BULK):
+					call = as_dict(await async_vapi_registry.get(token).calls.get(call_id))
+				if call.get("orgId") != org_id or call.get("status") != "ended":
+					self.prefetch_skipped += 1
+					return
+				artifacts = call_artifacts(call)
+				await asyncio.to_thread(self.put_call, org_id, call_id, artifacts)
+				for fn in self._listeners:
+					await asyncio.to_thread(fn, org_id, call)
+				for kind, field in RECORDING_KINDS.items():
+					if artifacts.get(field):
+						await self.fetch_recording(org_id, call_id, kind, artifacts[field])
+			except Exception as e:
+				log.warning("artifact prefetch for call %s failed: %s", call_id, e)
+
+	def add_listener(self, fn: Callable[[str, Dict[str, Any]], Any]) -> None:
+		"""Call `fn(org_id, call)` in a thread for each ended call a prefetch read from Vapi."""
+		self._listeners.append(fn)
+
+	def on_call_event(self, kind: str, state: Dict[str, Any], message: Dict[str, Any]) -> Optional[Any]:
+		"""Event hub listener: prefetch artifacts when an end-of-call-report arrives."""
+		if kind != "end-of-call-report" or not state.get("orgId"):
+			return None
+		return self.prefetch(state["orgId"], state["id"])
+
+	def stats(self) -> Dict[str, Any]:
+		with self._lock:
+			db = self._db()
+			blobs, total = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+			calls = db.execute("SELECT COUNT(*) FROM calls").fetchone()[0]
+		return {
+			"calls": calls,
+			"blobs": blobs,
+			"bytes": total,
+			"maxBytes": self.max_bytes,
+			"downloads": self.downloads,
+			"downloadedBytes": self.downloaded_bytes,
+			"inflightDownloads": len(self._downloads),
+			"evictions": self.evictions,
+			"prefetchSkipped": self.prefetch_skipped,
+			"rejectedUrls": self.rejected_urls,
+		}
+
+
+artifact_store = ArtifactStore(
+	os.path.join(settings.DATA_DIR, "artifacts"),
+	max_bytes=settings.ARTIFACT_CACHE_MAX_BYTES,
+	max_file_bytes=settings.ARTIFACT_MAX_FILE_BYTES,
+	prefetch_concurrency=settings.ARTIFACT_PREFETCH_CONCURRENCY,
+	allowed_hosts=[h.strip() for h in settings.ARTIFACT_ALLOWED_HOSTS.split(",") if h.strip()],
+	allow_private=settings.ARTIFACT_ALLOW_PRIVATE_HOSTS,
+)
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import asyncio
+import fnmatch
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .call_index import to_epoch
+from .governor import Priority, upstream_priority
+from .retry import error_status, with_backoff
+from .vapi_client import as_dict
+from .warmup import sdk_variant
+
+
+# Patch keys and where they live on assistant.model.
+PATCH_FIELDS = ("systemPrompt", "knowledgeBaseId")
+
+
+def system_prompt_of(model: Dict[str, Any]) -> str:
+	for m in model.get("messages") or []:
+		if m.get("role") == "system":
+			return m.get("content") or ""
+	return ""
+
+
+def patched_model(model: Dict[str, Any], changes: Dict[str, Any]) -> Dict[str, Any]:
+	"""A copy of `model` with the patch applied; a system prompt replaces all messages, as the single-assistant endpoint does."""
+	out = dict(model)
+	if "systemPrompt" in changes:
+		out["messages"] = [{"role": "system", "content": changes["systemPrompt"]}]
+	if "knowledgeBaseId" in changes:
+		out["knowledgeBaseId"] = changes["knowledgeBaseId"]
+	return out
+
+
+def model_diff(model: Dict[str, Any], changes: Dict[str, Any]) -> List[Dict[str, Any]]:
+	"""[{field, before, after}] for the patch fields whose value would change."""
+	current = {"systemPrompt": system_prompt_of(model), "knowledgeBaseId": model.get("knowledgeBaseId")}
+	out = []
+	for field in PATCH_FIELDS:
+		if field not in changes:
+			continue
+		if field == "systemPrompt":
+			messages = model.get("messages") or []
+			unchanged = len(messages) == 1 and current[field] == changes[field]
+		else:
+			unchanged = current[field] == changes[field]
+		if not unchanged:
+			out.append({"field": field, "before": current[field], "after": changes[field]})
+	return out
+
+
+async def model_update(model: Dict[str, Any]) -> Any:
+	"""The SDK's UpdateAssistantDtoModel variant for a model dict."""
+	variant = await sdk_variant("vapi.assistants.types.update_assistant_dto_model", "UpdateAssistantDtoModel", model.get("provider"))
+	return variant.model_validate(model)
+
+
+def _failure(assistant_id: str, e: Exception) -> Dict[str, Any]:
+	return {"id": assistant_id, "status": "not-found" if error_status(e) == 404 else "failed", "error": str(e) or type(e).__name__}
+
+
+async def _bounded(items: Sequence[Any], fn: Callable[[Any], Awaitable[Dict[str, Any]]], concurrency: int) -> List[Dict[str, Any]]:
+	slots = asyncio.Semaphore(concurrency)
+
+	async def run(item: Any) -> Dict[str, Any]:
+		async with slots:
+			with upstream_priority(Priority.BULK):
+				return await fn(item)
+
+	return list(await asyncio.gather(*(run(item) for item in items)))
+
+
+async def select(
+	client: Any,
+	ids: Sequence[str],
+	name_pattern: Optional[str],
+	knowledge_base_id: Optional[str],
+	concurrency: int,
+	list_limit: int = 1000,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+	"""(matching assistant dicts, outcomes for ids that could not be fetched).
+
+	Explicit ids are fetched concurrently, otherwise the assistant list is read once; the name
+	pattern (shell-style, case-insensitive) and current knowledge base then narrow the set.
+	"""
+	missing: List[Dict[str, Any]] = []
+	if ids:
+		async def fetch(assistant_id: str) -> Dict[str, Any]:
+			try:
+				return as_dict(await with_backoff(lambda: client.assistants.get(assistant_id)))
+			except Exception as e:
+				return _failure(assistant_id, e)
+
+		fetched = await _bounded(list(dict.fromkeys(ids)), fetch, concurrency)
+		assistants = [a for a in fetched if "status" not in a]
+		missing = [a for a in fetched if "status" in a]
+	else:
+		with upstream_priority(Priority.BULK):
+			assistants = [as_dict(a) for a in await with_backoff(lambda: client.assistants.list(limit=list_limit))]
+	if name_pattern:
+		pattern = name_pattern.lower()
+		assistants = [a for a in assistants if fnmatch.fnmatchcase((a.get("name") or "").lower(), pattern)]
+	if knowledge_base_id:
+		assistants = [a for a in assistants if (a.get("model") or {}).get("knowledgeBaseId") == knowledge_base_id]
+	return assistants, missing
+
+
+def plan(assistant: Dict[str, Any], changes: Dict[str, Any]) -> Dict[str, Any]:
+	"""Dry-run outcome: would-update with a diff, unchanged, or skipped when there is no model."""
+	out: Dict[str, Any] = {"id": assistant.get("id"), "name": assistant.get("name"), "updatedAt": assistant.get("updatedAt")}
+	model = assistant.get("model")
+	if model is None:
+		out.update(status="skipped", error="Assistant has no model configured")
+		return out
+	diff = model_diff(model, changes)
+	out.update(status="would-update" if diff else "unchanged", diff=diff)
+	return out
+
+
+async def apply(
+	client: Any,
+	planned: List[Dict[str, Any]],
+	changes: Dict[str, Any],
+	expected: Dict[str, str],
+	concurrency: int,
+) -> List[Dict[str, Any]]:
+	"""Write the would-update outcomes, `concurrency` at a time, with an optimistic updatedAt check.
+
+	Vapi has no conditional update, so each assistant is re-read right before its write and
+	reported as a conflict, without writing, when its updatedAt differs from `expected` (from an
+	earlier dry run) or from the one seen at selection.
+	"""
+	async def write(outcome: Dict[str, Any]) -> Dict[str, Any]:
+		if outcome["status"] != "would-update":
+			return outcome
+		assistant_id = outcome["id"]
+		out = {**outcome}
+		try:
+			fresh = as_dict(await with_backoff(lambda: client.assistants.get(assistant_id)))
+			seen = to_epoch(expected.get(assistant_id)) or to_epoch(outcome.get("updatedAt"))
+			if seen is not None and to_epoch(fresh.get("updatedAt")) != seen:
+				out.update(status="conflict", error="Assistant changed since it was read", currentUpdatedAt=fresh.get("updatedAt"))
+				return out
+			model = fresh.get("model")
+			if model is None:
+				out.update(status="skipped", error="Assistant has no model configured")
+				return out
+			out["diff"] = model_diff(model, changes)
+			if not out["diff"]:
+				out["status"] = "unchanged"
+				return out
+			update = await model_update(patched_model(model, changes))
+			updated = await with_backoff(lambda: client.assistants.update(assistant_id, model=update))
+		except Exception as e:
+			return {**out, **_failure(assistant_id, e), "name": outcome.get("name")}
+		out.update(status="updated", previousUpdatedAt=outcome.get("updatedAt"), updatedAt=as_dict(updated).get("updatedAt"))
+		return out
+
+	return await _bounded(planned, write, concurrency)
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional, Tuple
+
+from ..config import settings
+from .artifact_store import artifact_store
+from .audio_metrics import AnalysisParams, analyze_recording
+from .metrics import timed_sdk, timed_serialization
+from .orgs import org_id_for
+from .vapi_client import as_dict, async_vapi_registry
+
+
+class NoRecording(Exception):
+	pass
+
+
+class AudioMetricsStore:
+	"""Conversation metrics per (org, call), with the analysis params they were computed with."""
+
+	def __init__(self, path: str) -> None:
+		self.path = path
+		self._lock = threading.Lock()
+		self._conn: Optional[sqlite3.Connection] = None
+
+	def _db(self) -> sqlite3.Connection:
+		if self._conn is None:
+			os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+			conn = sqlite3.connect(self.path, check_same_thread=False)
+			conn.execute("PRAGMA journal_mode=WAL")
+			conn.execute("PRAGMA synchronous=NORMAL")
+			conn.execute(
+				"CREATE TABLE IF NOT EXISTS call_audio (org_id TEXT NOT NULL, call_id TEXT NOT NULL, params TEXT NOT NULL, "
+				"sha256 TEXT NOT NULL, metrics TEXT NOT NULL, analyzed_at REAL NOT NULL, PRIMARY KEY (org_id, call_id))"
+			)
+			self._conn = conn
+		return self._conn
+
+	def get(self, org_id: str, call_id: str, params: str) -> Optional[Dict[str, Any]]:
+		with self._lock:
+			row = self._db().execute(
+				"SELECT metrics FROM call_audio WHERE org_id = ? AND call_id = ? AND params = ?", (org_id, call_id, params)
+			).fetchone()
+		return json.loads(row[0]) if row else None
+
+	def put(self, org_id: str, call_id: str, params: str, sha: str, metrics: Dict[str, Any]) -> None:
+		with self._lock, self._db() as db:
+			db.execute(
+				"INSERT OR REPLACE INTO call_audio (org_id, call_id, params, sha256, metrics, analyzed_at) VALUES (?, ?, ?, ?, ?, ?)",
+				(org_id, call_id, params, sha, json.dumps(metrics), time.time()),
+			)
+
+	def count(self) -> int:
+		with self._lock:
+			return self._db().execute("SELECT COUNT(*) FROM call_audio").fetchone()[0]
+
+	def close(self) -> None:
+		with self._lock:
+			if self._conn is not None:
+				self._conn.close()
+				self._conn = None
+
+
+class AudioAnalyzer:
+	"""Conversation metrics from calls' stereo recordings, computed in a process pool.
+
+	Recordings go through the artifact store, so each is downloaded once (at most `concurrency`
+	at a time), then decoded and measured by `workers` spawned processes while the event loop
+	stays free. Results are stored per call; concurrent requests for one call share its analysis.
+	"""
+
+	def __init__(self, store: AudioMetricsStore, params: AnalysisParams, workers: int = 0, concurrency: int = 8) -> None:
+		self.store = store
+		self.params = params
+		self.workers = workers or os.cpu_count() or 1
+		self.concurrency = concurrency
+		self._pool: Optional[ProcessPoolExecutor] = None
+		self._slots: Optional[asyncio.Semaphore] = None
+		self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+		self.analyzed = 0
+		self.cache_hits = 0
+		self.failures = 0
+		self.audio_seconds = 0.0
+		self.busy_seconds = 0.0
+
+	def _executor(self) -> ProcessPoolExecutor:
+		if self._pool is None:
+			# spawn, not fork: the server process holds threads and open connections.
+			self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+		return self._pool
+
+	async def _recording(self, token: str, org_id: str, call_id: str) -> str:
+		"""Path of the call's stereo recording in the artifact store, downloading it if needed."""
+		ref = await asyncio.to_thread(artifact_store.get_ref, org_id, call_id, "stereoRecording")
+		if ref is None:
+			stored = await asyncio.to_thread(artifact_store.get_call, org_id, call_id)
+			url = (stored or {}).get("stereoRecordingUrl")
+			if not url:
+				with timed_sdk("calls.get"):
+					call = await async_vapi_registry.get(token).calls.get(call_id)
+				with timed_serialization("calls.get"):
+					url = (as_dict(call).get("artifact") or {}).get("stereoRecordingUrl")
+			if not url:
+				raise NoRecording("Call has no stereo recording")
+			if self._slots is None:
+				self._slots = asyncio.Semaphore(self.concurrency)
+			async with self._slots:
+				ref = await artifact_store.fetch_recording(org_id, call_id, "stereoRecording", url)
+		sha = ref[0]
+		await asyncio.to_thread(artifact_store.touch, sha)
+		return sha
+
+	async def _analyze(self, token: str, org_id: str, call_id: str) -> Dict[str, Any]:
+		try:
+			sha = await self._recording(token, org_id, call_id)
+			started = time.perf_counter()
+			try:
+				metrics = await asyncio.get_running_loop().run_in_executor(
+					self._executor(), analyze_recording, artifact_store.blob_path(sha), self.params
+				)
+			except BrokenProcessPool:
+				self._pool = None
+				raise
+			self.busy_seconds += time.perf_counter() - started
+			await asyncio.to_thread(self.store.put, org_id, call_id, self.params.key(), sha, metrics)
+		except Exception:
+			self.failures += 1
+			raise
+		self.analyzed += 1
+		self.audio_seconds += metrics["durationSeconds"]
+		return metrics
+
+	async def analyze(self, token: str, call_id: str, refresh: bool = False) -> Tuple[Dict[str, Any], bool]:
+		"""Return (metrics, cached). Raises NoRecording, AudioDecodeError, or the download/SDK error."""
+		org_id = await org_id_for(token)
+		if not refresh:
+			stored = await asyncio.to_thread(self.store.get, org_id, call_id, self.params.key())
+			if stored is not None:
+				self.cache_hits += 1
+				return stored, True
+		key = (org_id, call_id)
+		pending = self._inflight.get(key)
+		if pending is None:
+			pending = self._inflight[key] = asyncio.ensure_future(self._analyze(token, org_id, call_id))
+			pending.add_done_callback(lambda _: self._inflight.pop(key, None))
+		return await asyncio.shield(pending), False
+
+	def close(self) -> None:
+		if self._pool is not None:
+			self._pool.shutdown(wait=True, cancel_futures=True)
+			self._pool = None
+		self.store.close()
+
+	def stats(self) -> Dict[str, Any]:
+		return {
+			"workers": self.workers,
+			"poolStarted": self._pool is not None,
+			"stored": self.store.count(),
+			"analyzed": self.analyzed,
+			"cacheHits": self.cache_hits,
+			"failures": self.failures,
+			"inflight": len(self._inflight),
+			"audioSeconds": round(self.audio_seconds, 1),
+			"analysisSeconds": round(self.busy_seconds, 3),
+			"params": self.params.key(),
+		}
+
+
+audio_analyzer = AudioAnalyzer(
+	AudioMetricsStore(os.path.join(settings.DATA_DIR, "audio_metrics.sqlite3")),
+	AnalysisParams(
+		customer_channel=0 if settings.AUDIO_CUSTOMER_CHANNEL == "left" else 1,
+		frame_ms=settings.AUDIO_FRAME_MS,
+		vad_margin_db=settings.AUDIO_VAD_MARGIN_DB,
+		vad_min_dbfs=settings.AUDIO_VAD_MIN_DBFS,
+		min_speech_ms=settings.AUDIO_MIN_SPEECH_MS,
+		min_pause_ms=settings.AUDIO_MIN_PAUSE_MS,
+		silence_gap_ms=settings.AUDIO_SILENCE_GAP_MS,
+	),
+	workers=settings.AUDIO_WORKERS,
+	concurrency=settings.AUDIO_DOWNLOAD_CONCURRENCY,
+)
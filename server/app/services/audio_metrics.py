@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import shutil
+import subprocess
+import wave
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+
+# Conversation metrics from two-channel recordings. This module imports only NumPy and the stdlib,
+# so process pool workers start quickly.
+
+# Bump when the metrics or their definitions change so stored results are recomputed.
+METRICS_VERSION = "audio-1"
+# Sample rate recordings that are not WAV are decoded to with ffmpeg.
+FFMPEG_RATE = 16000
+
+
+class AudioDecodeError(Exception):
+	pass
+
+
+@dataclass(frozen=True)
+class AnalysisParams:
+	customer_channel: int = 0
+	frame_ms: int = 20
+	vad_margin_db: float = 15.0
+	vad_min_dbfs: float = -50.0
+	min_speech_ms: int = 120
+	min_pause_ms: int = 300
+	silence_gap_ms: int = 2000
+	block_frames: int = 3000
+
+	def key(self) -> str:
+		return f"{METRICS_VERSION}:{self.customer_channel}:{self.frame_ms}:{self.vad_margin_db}:{self.vad_min_dbfs}:{self.min_speech_ms}:{self.min_pause_ms}:{self.silence_gap_ms}"
+
+
+def _samples(raw: bytes, width: int) -> np.ndarray:
+	"""Interleaved PCM bytes as float32 in [-1, 1)."""
+	if width == 1:
+		return (np.frombuffer(raw, np.uint8).astype(np.float32) - 128.0) / 128.0
+	if width == 2:
+		return np.frombuffer(raw, "<i2").astype(np.float32) / 32768.0
+	if width == 3:
+		b = np.frombuffer(raw, np.uint8).reshape(-1, 3).astype(np.int32)
+		value = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+		return (np.where(value >= 1 << 23, value - (1 << 24), value) / float(1 << 23)).astype(np.float32)
+	if width == 4:
+		return (np.frombuffer(raw, "<i4") / 2147483648.0).astype(np.float32)
+	raise AudioDecodeError(f"Unsupported sample width: {width} bytes")
+
+
+def _wav_blocks(path: str, frame_ms: int, block_frames: int) -> Tuple[int, int, Iterator[np.ndarray]]:
+	try:
+		w = wave.open(path, "rb")
+	except (wave.Error, EOFError) as e:
+		raise AudioDecodeError(f"Not a PCM WAV file: {e}")
+	channels, width, rate = w.getnchannels(), w.getsampwidth(), w.getframerate()
+	frame_len = max(1, rate * frame_ms // 1000)
+
+	def blocks() -> Iterator[np.ndarray]:
+		with w:
+			while True:
+				raw = w.readframes(frame_len * block_frames)
+				if not raw:
+					return
+				yield _samples(raw, width).reshape(-1, channels)
+
+	return channels, frame_len, blocks()
+
+
+def _ffmpeg_blocks(path: str, frame_ms: int, block_frames: int) -> Tuple[int, int, Iterator[np.ndarray]]:
+	frame_len = FFMPEG_RATE * frame_ms // 1000
+	cmd = ["ffmpeg", "-v", "error", "-i", path, "-f", "s16le", "-ac", "2", "-ar", str(FFMPEG_RATE), "-"]
+
+	def blocks() -> Iterator[np.ndarray]:
+		proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+		try:
+			while True:
+				raw = proc.stdout.read(frame_len * block_frames * 4)
+				if not raw:
+					break
+				yield _samples(raw[: len(raw) // 4 * 4], 2).reshape(-1, 2)
+		finally:
+			proc.stdout.close()
+			error = proc.stderr.read().decode("utf-8", "replace").strip()
+			if proc.wait() != 0:
+				raise AudioDecodeError(f"ffmpeg could not decode the recording: {error[:200]}")
+
+	return 2, frame_len, blocks()
+
+
+def frame_levels(path: str, params: AnalysisParams) -> np.ndarray:
+	"""Per-frame level in dBFS, shape (frames, 2), read `block_frames` frames at a time.
+
+	WAV is read with the stdlib; anything else is decoded by ffmpeg when it is on PATH.
+	"""
+	with open(path, "rb") as f:
+		header = f.read(12)
+	if header[:4] == b"RIFF" and header[8:12] == b"WAVE":
+		channels, frame_len, blocks = _wav_blocks(path, params.frame_ms, params.block_frames)
+	elif shutil.which("ffmpeg"):
+		channels, frame_len, blocks = _ffmpeg_blocks(path, params.frame_ms, params.block_frames)
+	else:
+		raise AudioDecodeError("Recording is not WAV and ffmpeg is not installed")
+	if channels < 2:
+		raise AudioDecodeError("Recording has one channel; a stereo recording is needed")
+	levels: List[np.ndarray] = []
+	carry = np.zeros((0, channels), np.float32)
+	for block in blocks:
+		block = np.concatenate((carry, block)) if len(carry) else block
+		whole = len(block) // frame_len * frame_len
+		carry = block[whole:]
+		frames = block[:whole, :2].reshape(-1, frame_len, 2)
+		levels.append(10.0 * np.log10(np.mean(np.square(frames, dtype=np.float64), axis=1) + 1e-10))
+	return np.concatenate(levels) if levels else np.zeros((0, 2))
+
+
+def _runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+	"""(starts, ends) frame indexes of the True runs of `mask`, ends exclusive."""
+	edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+	return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def _mask(starts: np.ndarray, ends: np.ndarray, n: int) -> np.ndarray:
+	delta = np.zeros(n + 1, np.int32)
+	np.add.at(delta, starts, 1)
+	np.add.at(delta, ends, -1)
+	return np.cumsum(delta[:n]) > 0
+
+
+def speech_segments(levels: np.ndarray, params: AnalysisParams) -> Tuple[np.ndarray, np.ndarray]:
+	"""Speech runs of one channel: frames above the noise floor plus a margin, with pauses
+	shorter than min_pause bridged and bursts shorter than min_speech dropped."""
+	if not len(levels):
+		return np.zeros(0, np.int64), np.zeros(0, np.int64)
+	floor = np.percentile(levels, 10)
+	starts, ends = _runs(levels > max(floor + params.vad_margin_db, params.vad_min_dbfs))
+	if len(starts) > 1:
+		keep = (starts[1:] - ends[:-1]) * params.frame_ms >= params.min_pause_ms
+		starts = starts[np.concatenate(([True], keep))]
+		ends = ends[np.concatenate((keep, [True]))]
+	long_enough = (ends - starts) * params.frame_ms >= params.min_speech_ms
+	return starts[long_enough], ends[long_enough]
+
+
+def _stats(seconds: np.ndarray) -> Dict[str, Any]:
+	if not len(seconds):
+		return {"count": 0, "meanSeconds": None, "p50Seconds": None, "p90Seconds": None, "maxSeconds": None}
+	p50, p90 = np.percentile(seconds, (50, 90))
+	return {
+		"count": int(len(seconds)),
+		"meanSeconds": round(float(seconds.mean()), 3),
+		"p50Seconds": round(float(p50), 3),
+		"p90Seconds": round(float(p90), 3),
+		"maxSeconds": round(float(seconds.max()), 3),
+	}
+
+
+def conversation_metrics(levels: np.ndarray, params: AnalysisParams) -> Dict[str, Any]:
+	"""Talk time and ratio, silence gaps, overlaps and interruptions, and agent response latency."""
+	n = len(levels)
+	step = params.frame_ms / 1000.0
+	customer_ch = params.customer_channel
+	segments = {
+		"customer": speech_segments(levels[:, customer_ch], params),
+		"agent": speech_segments(levels[:, 1 - customer_ch], params),
+	}
+	masks = {who: _mask(starts, ends, n) for who, (starts, ends) in segments.items()}
+	talk = {who: float(mask.sum()) * step for who, mask in masks.items()}
+	total_talk = sum(talk.values())
+	out: Dict[str, Any] = {"durationSeconds": round(n * step, 3), "frameMs": params.frame_ms}
+	for who, other in (("customer", "agent"), ("agent", "customer")):
+		starts, ends = segments[who]
+		before = np.maximum(starts - 1, 0)
+		out[who] = {
+			"talkSeconds": round(talk[who], 3),
+			"talkRatio": round(talk[who] / total_talk, 4) if total_talk else None,
+			"turns": int(len(starts)),
+			"longestTurnSeconds": round(float((ends - starts).max()) * step, 3) if len(starts) else 0.0,
+			# Turns started while the other side was already speaking.
+			"interruptions": int((masks[other][starts] & masks[other][before] & (starts > 0)).sum()),
+		}
+
+	both = masks["customer"] & masks["agent"]
+	overlap_starts, _ = _runs(both)
+	out["overlap"] = {"seconds": round(float(both.sum()) * step, 3), "count": int(len(overlap_starts))}
+
+	anyone = masks["customer"] | masks["agent"]
+	spoken = np.flatnonzero(anyone)
+	if len(spoken):
+		quiet = ~anyone[spoken[0]:spoken[-1] + 1]
+		gap_starts, gap_ends = _runs(quiet)
+		gaps = (gap_ends - gap_starts) * step
+		long_gaps = gaps[gaps * 1000 >= params.silence_gap_ms]
+		out["silence"] = {
+			"seconds": round(float(quiet.sum()) * step, 3),
+			"ratio": round(float(quiet.mean()), 4),
+			"gaps": int(len(long_gaps)),
+			"longestSeconds": round(float(gaps.max()), 3) if len(gaps) else 0.0,
+		}
+	else:
+		out["silence"] = {"seconds": round(n * step, 3), "ratio": 1.0 if n else None, "gaps": 0, "longestSeconds": round(n * step, 3)}
+
+	# Response latency: from the end of a customer turn to the agent's next start, when the agent
+	# was not already talking and starts before the customer's next turn.
+	c_starts, c_ends = segments["customer"]
+	a_starts, _ = segments["agent"]
+	latencies = np.zeros(0)
+	if len(c_ends) and len(a_starts):
+		nxt = np.searchsorted(a_starts, c_ends)
+		valid = nxt < len(a_starts)
+		ends, agent_next = c_ends[valid], a_starts[nxt[valid]]
+		following = np.searchsorted(c_starts, ends)
+		customer_next = np.where(following < len(c_starts), c_starts[np.minimum(following, len(c_starts) - 1)], n + 1)
+		quiet_agent = ~masks["agent"][ends - 1]
+		answered = (agent_next < customer_next) & quiet_agent
+		latencies = (agent_next[answered] - ends[answered]) * step
+	out["responseLatency"] = _stats(latencies)
+	return out
+
+
+def analyze_recording(path: str, params: AnalysisParams) -> Dict[str, Any]:
+	"""Entry point for process pool workers."""
+	return conversation_metrics(frame_levels(path, params), params)
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .retry import is_retryable_unsent, may_have_applied, with_backoff
+from .schedule_ingest import RowError, ScheduleRow
+from .warmup import sdk_type
+
+
+Window = Tuple[datetime, Optional[datetime]]
+Chunk = Tuple[Window, List[ScheduleRow]]
+
+
+class DialOutcomeUnknown(Exception):
+	"""calls.create failed after the request may have reached Vapi, so the calls may exist."""
+
+
+def iter_window_chunks(
+	rows: Iterable[Union[ScheduleRow, RowError]],
+	chunk_size: int,
+	max_open_windows: int = 1000,
+) -> Iterator[Union[RowError, Chunk]]:
+	"""Group validated rows by their own (earliest_at, latest_at) window.
+
+	A group is emitted when it reaches `chunk_size`, or (oldest first) when more than
+	`max_open_windows` groups are buffered, so memory stays bounded. Row errors pass through.
+	"""
+	groups: "OrderedDict[Window, List[ScheduleRow]]" = OrderedDict()
+	for item in rows:
+		if isinstance(item, RowError):
+			yield item
+			continue
+		window = (item.earliest_at, item.latest_at)
+		group = groups.setdefault(window, [])
+		group.append(item)
+		if len(group) >= chunk_size:
+			del groups[window]
+			yield window, group
+		elif len(groups) > max_open_windows:
+			yield groups.popitem(last=False)
+	while groups:
+		yield groups.popitem(last=False)
+
+
+async def create_chunk(
+	client: Any,
+	assistant_id: str,
+	window: Window,
+	customers: List[Dict[str, Any]],
+	variable_values: Optional[Dict[str, Any]] = None,
+	max_retries: int = 5,
+	phone_number_id: Optional[str] = None,
+) -> Any:
+	"""One calls.create for a chunk of customers sharing a schedule window (see `_create`)."""
+	earliest_at, latest_at = window
+	CreateCustomerDto = await sdk_type("vapi.types.create_customer_dto", "CreateCustomerDto")
+	SchedulePlan = await sdk_type("vapi.types.schedule_plan", "SchedulePlan")
+	kwargs: Dict[str, Any] = {
+		"assistant_id": assistant_id,
+		"customers": [CreateCustomerDto(name=c.get("name"), number=c["number"]) for c in customers],
+		"schedule_plan": SchedulePlan(earliest_at=earliest_at, latest_at=latest_at),
+	}
+	if phone_number_id:
+		kwargs["phone_number_id"] = phone_number_id
+	if variable_values:
+		AssistantOverrides = await sdk_type("vapi.types.assistant_overrides", "AssistantOverrides")
+		kwargs["assistant_overrides"] = AssistantOverrides(variable_values=variable_values)
+	return await _create(client, kwargs, max_retries)
+
+
+async def create_call(
+	client: Any,
+	assistant_id: str,
+	customer: Dict[str, Any],
+	phone_number_id: Optional[str] = None,
+	variable_values: Optional[Dict[str, Any]] = None,
+	max_retries: int = 5,
+) -> Any:
+	"""One immediate calls.create for a single customer (see `_create`)."""
+	CreateCustomerDto = await sdk_type("vapi.types.create_customer_dto", "CreateCustomerDto")
+	kwargs: Dict[str, Any] = {
+		"assistant_id": assistant_id,
+		"customer": CreateCustomerDto(name=customer.get("name"), number=customer["number"]),
+	}
+	if phone_number_id:
+		kwargs["phone_number_id"] = phone_number_id
+	if variable_values:
+		AssistantOverrides = await sdk_type("vapi.types.assistant_overrides", "AssistantOverrides")
+		kwargs["assistant_overrides"] = AssistantOverrides(variable_values=variable_values)
+	return await _create(client, kwargs, max_retries)
+
+
+async def _create(client: Any, kwargs: Dict[str, Any], max_retries: int) -> Any:
+	"""calls.create is not idempotent: it is retried (and the SDK's own retries are turned off)
+	only while Vapi cannot have placed the calls. Raises DialOutcomeUnknown when it may have."""
+	try:
+		return await with_backoff(
+			lambda: client.calls.create(**kwargs, request_options={"max_retries": 0}),
+			max_retries=max_retries,
+			retryable=is_retryable_unsent,
+		)
+	except Exception as e:
+		if may_have_applied(e):
+			raise DialOutcomeUnknown(f"{str(e) or e.__class__.__name__}; outcome unknown, not resent to avoid duplicate calls") from e
+		raise
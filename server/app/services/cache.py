@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from fastapi import Request
+
+from ..config import settings
+from .shared_state import SharedState, shared_state
+from .vapi_client import get_request_token, token_key
+
+
+log = logging.getLogger(__name__)
+
+Key = Tuple[Hashable, ...]
+
+INVALIDATE_CHANNEL = "cache.invalidate"
+
+
+def _shared_key(key: Key) -> str:
+	# Every part is terminated, so a prefix of parts is also a string prefix.
+	return "cache:" + "".join(f"{part}\x1f" for part in key)
+
+
+class AsyncTTLCache:
+	"""Size-bounded TTL cache with single-flight loading.
+
+	Concurrent misses for one key share a single loader call. Loader errors are not cached.
+	Invalidation bumps a generation counter so a load that was already in flight cannot
+	write back a value older than the invalidation.
+
+	With a `shared` backend, local misses go through its cross-process single flight, so one
+	worker loads a value and the others read it; invalidations are broadcast to every worker.
+	"""
+
+	def __init__(self, max_entries: int = 2048, shared: Optional[SharedState] = None) -> None:
+		self.max_entries = max_entries
+		self.shared = shared
+		if shared is not None:
+			shared.subscribe(INVALIDATE_CHANNEL, self._on_invalidate)
+		self._data: "OrderedDict[Key, Tuple[float, Any]]" = OrderedDict()
+		self._inflight: Dict[Key, "asyncio.Future[Any]"] = {}
+		self._generation = 0
+		self.hits = 0
+		self.misses = 0
+		self.coalesced = 0
+		self.evictions = 0
+
+	def get(self, key: Key) -> Optional[Any]:
+		entry = self._data.get(key)
+		if entry is None:
+			return None
+		expires_at, value = entry
+		if expires_at <= time.monotonic():
+			del self._data[key]
+			return None
+		self._data.move_to_end(key)
+		return value
+
+	def set(self, key: Key, value: Any, ttl: float) -> None:
+		self._data[key] = (time.monotonic() + ttl, value)
+		self._data.move_to_end(key)
+		while len(self._data) > self.max_entries:
+			self._data.popitem(last=False)
+			self.evictions += 1
+
+	async def get_or_load(self, key: Key, loader: Callable[[], Awaitable[Any]], ttl: float) -> Any:
+		value = self.get(key)
+		if value is not None:
+			self.hits += 1
+			return value
+		pending = self._inflight.get(key)
+		if pending is not None:
+			self.coalesced += 1
+			return await asyncio.shield(pending)
+		self.misses += 1
+		generation = self._generation
+		future: "asyncio.Future[Any]" = asyncio.get_running_loop().create_future()
+		self._inflight[key] = future
+		try:
+			if self.shared is not None:
+				value = await self.shared.single_flight(_shared_key(key), loader, ttl)
+			else:
+				value = await loader()
+		except BaseException as e:
+			future.set_exception(e)
+			# Mark retrieved so an error nobody else awaited is not logged as unhandled
+			future.exception()
+			raise
+		else:
+			future.set_result(value)
+			if generation == self._generation:
+				self.set(key, value, ttl)
+			return value
+		finally:
+			self._inflight.pop(key, None)
+
+	def invalidate(self, *prefixes: Key) -> int:
+		"""Drop every entry whose key starts with one of `prefixes`."""
+		self._generation += 1
+		doomed = [k for k in self._data if any(k[: len(p)] == p for p in prefixes)]
+		for k in doomed:
+			del self._data[k]
+		return len(doomed)
+
+	async def invalidate_everywhere(self, *prefixes: Key) -> int:
+		"""`invalidate` here, in the shared store and in every other worker."""
+		dropped = self.invalidate(*prefixes)
+		if self.shared is not None:
+			try:
+				for p in prefixes:
+					await self.shared.delete_prefix(_shared_key(p))
+				await self.shared.publish(INVALIDATE_CHANNEL, {"prefixes": [list(p) for p in prefixes]})
+			except Exception:
+				log.exception("shared cache invalidation failed")
+		return dropped
+
+	def _on_invalidate(self, message: Dict[str, Any]) -> None:
+		self.invalidate(*(tuple(p) for p in message.get("prefixes") or []))
+
+	def stats(self) -> Dict[str, Any]:
+		return {
+			"entries": len(self._data),
+			"maxEntries": self.max_entries,
+			"hits": self.hits,
+			"misses": self.misses,
+			"coalesced": self.coalesced,
+			"evictions": self.evictions,
+			"inflight": len(self._inflight),
+		}
+
+
+def cache_key(request: Request, *parts: Hashable) -> Key:
+	"""Cache key scoped to the caller's token (by hash), e.g. cache_key(request, "assistant", id)."""
+	return (token_key(get_request_token(request)),) + parts
+
+
+async def invalidate_for(request: Request, *prefixes: Key) -> int:
+	"""Invalidate the caller's entries under each resource prefix, e.g. ("assistant", id), in every worker."""
+	scope = token_key(get_request_token(request))
+	return await read_cache.invalidate_everywhere(*((scope,) + p for p in prefixes))
+
+
+read_cache = AsyncTTLCache(max_entries=settings.CACHE_MAX_ENTRIES, shared=shared_state)
@@ -0,0 +1,359 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from ..config import settings
+from .governor import Priority, upstream_priority
+from .metrics import timed_sdk, timed_serialization
+from .rollups import CallRollups
+from .vapi_client import as_dict, token_key
+
+
+log = logging.getLogger(__name__)
+
+
+def to_epoch(value: Any) -> Optional[float]:
+	if value is None:
+		return None
+	if isinstance(value, datetime):
+		dt = value
+	else:
+		try:
+			dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+		except ValueError:
+			return None
+	if dt.tzinfo is None:
+		dt = dt.replace(tzinfo=timezone.utc)
+	return dt.timestamp()
+
+
+def _from_epoch(ts: float) -> datetime:
+	return datetime.fromtimestamp(ts, tz=timezone.utc)
+
+
+def call_phone_keys(call: Dict[str, Any]) -> List[str]:
+	"""Values a phone-number filter can match: our phoneNumberId and the customer number."""
+	keys = []
+	if call.get("phoneNumberId"):
+		keys.append(call["phoneNumberId"])
+	number = (call.get("customer") or {}).get("number")
+	if number:
+		keys.append(number)
+	return keys
+
+
+def call_duration(call: Dict[str, Any]) -> Optional[float]:
+	"""Seconds between startedAt and endedAt, when the call has both."""
+	started, ended = to_epoch(call.get("startedAt")), to_epoch(call.get("endedAt"))
+	if started is None or ended is None or ended < started:
+		return None
+	return ended - started
+
+
+class CallIndex:
+	"""In-memory index of one token's calls, refreshed from Vapi by watermarks.
+
+	Full syncs page through the whole history with createdAt cursors in a background task, so
+	callers get the calls seen so far instead of waiting; they run first, every `full_every`
+	seconds to drop calls deleted upstream, and on request at most every `full_min_interval`.
+	In between, refreshes only fetch calls whose updatedAt moved past the last seen value.
+	Status, assistant and phone number are kept as id sets and createdAt as a sorted key list, so
+	filters and pagination are answered without touching the API. `rollups` follows every change
+	for /api/insights/rollups.
+	"""
+
+	def __init__(self, page_size: int = 1000, max_calls: int = 50000, full_every: float = 900.0, full_min_interval: float = 60.0) -> None:
+		self.page_size = page_size
+		self.max_calls = max_calls
+		self.full_every = full_every
+		self.full_min_interval = full_min_interval
+		self.calls: Dict[str, Dict[str, Any]] = {}
+		self._created: Dict[str, float] = {}
+		self._order: List[Tuple[float, str]] = []
+		self._order_dirty = False
+		self._by_status: Dict[str, Set[str]] = {}
+		self._by_assistant: Dict[str, Set[str]] = {}
+		self._by_phone: Dict[str, Set[str]] = {}
+		self.rollups = CallRollups()
+		self._watermark: Optional[float] = None
+		self.synced_at: Optional[float] = None
+		self.full_synced_at: Optional[float] = None
+		self.upstream_pages = 0
+		self.reconciled = 0
+		self._lock = asyncio.Lock()
+		self._full_task: Optional[asyncio.Task] = None
+		self._page_ready = asyncio.Event()
+		self._error: Optional[BaseException] = None
+
+	# -- maintenance ---------------------------------------------------------------------------
+
+	def _index_sets(self, call: Dict[str, Any]) -> Iterable[Tuple[Dict[str, Set[str]], str]]:
+		if call.get("status"):
+			yield self._by_status, str(call["status"]).lower()
+		if call.get("assistantId"):
+			yield self._by_assistant, call["assistantId"]
+		for key in call_phone_keys(call):
+			yield self._by_phone, key
+
+	def _unindex(self, call_id: str) -> None:
+		old = self.calls.pop(call_id, None)
+		if old is None:
+			return
+		for index, key in self._index_sets(old):
+			ids = index.get(key)
+			if ids is not None:
+				ids.discard(call_id)
+				if not ids:
+					del index[key]
+		self.rollups.add(old, self._created[call_id], call_duration(old), sign=-1)
+		del self._created[call_id]
+		self._order_dirty = True
+
+	def upsert(self, call: Dict[str, Any]) -> None:
+		call_id = call.get("id")
+		if not call_id:
+			return
+		self._unindex(call_id)
+		created = to_epoch(call.get("createdAt")) or 0.0
+		self.calls[call_id] = call
+		self._created[call_id] = created
+		self._order_dirty = True
+		self.rollups.add(call, created, call_duration(call))
+		for index, key in self._index_sets(call):
+			index.setdefault(key, set()).add(call_id)
+
+	def _sorted(self) -> List[Tuple[float, str]]:
+		"""createdAt-ordered keys, rebuilt once after a batch of changes rather than per upsert."""
+		if self._order_dirty:
+			self._order = sorted((created, call_id) for call_id, created in self._created.items())
+			self._order_dirty = False
+		return self._order
+
+	def _trim(self) -> None:
+		excess = len(self.calls) - self.max_calls
+		if excess > 0:
+			for _, call_id in self._sorted()[:excess]:
+				self._unindex(call_id)
+
+	def remove(self, call_id: str) -> None:
+		self._unindex(call_id)
+
+	async def _fetch(self, client: Any, seen: Optional[Set[str]] = None, **filters: Any) -> int:
+		"""Page newest-first with a createdAt cursor; ties at page edges are de-duplicated by id.
+
+		The first pages are small and double up to `page_size`, so the newest calls are indexed
+		before a full page has been parsed.
+		"""
+		cursor: Optional[datetime] = None
+		seen = set() if seen is None else seen
+		fetched = 0
+		limit = min(self.page_size, 50)
+		newest: Optional[float] = None
+		while fetched < self.max_calls:
+			kwargs = dict(filters)
+			if cursor is not None:
+				kwargs["created_at_le"] = cursor
+			with timed_sdk("calls.list"):
+				page = await client.calls.list(limit=limit, **kwargs)
+			self.upstream_pages += 1
+			fresh = 0
+			oldest: Optional[float] = None
+			with timed_serialization("calls.list"):
+				rows = [as_dict(c) if hasattr(c, "model_dump") else dict(c) for c in page]
+			for d in rows:
+				if d.get("id") in seen:
+					continue
+				seen.add(d.get("id"))
+				self.upsert(d)
+				fresh += 1
+				created = to_epoch(d.get("createdAt"))
+				if created is not None and (oldest is None or created < oldest):
+					oldest = created
+				updated = to_epoch(d.get("updatedAt"))
+				if updated is not None and (newest is None or updated > newest):
+					newest = updated
+			fetched += fresh
+			self._page_ready.set()
+			if len(page) < limit or not fresh or oldest is None:
+				break
+			cursor = _from_epoch(oldest)
+			limit = min(self.page_size, limit * 2)
+		# The watermark only moves once a listing completes: upserts from get_call or webhooks,
+		# or a listing cut short by an error, must not make the next sync skip older changes.
+		if newest is not None and (self._watermark is None or newest > self._watermark):
+			self._watermark = newest
+		self._trim()
+		return fetched
+
+	def _fresh(self, max_age: float) -> bool:
+		return self.synced_at is not None and time.monotonic() - self.synced_at < max_age
+
+	@property
+	def syncing(self) -> bool:
+		return self._full_task is not None and not self._full_task.done()
+
+	def _full_due(self, interval: float) -> bool:
+		return self.full_synced_at is None or time.monotonic() - self.full_synced_at >= interval
+
+	def _reconcile(self, seen: Set[str], started: float, capped: bool) -> None:
+		"""Drop calls a full listing should have returned but did not: they were deleted upstream.
+
+		Calls created after the listing began may be missing from it, and a listing cut off at
+		max_calls says nothing about calls older than the oldest one it returned.
+		"""
+		oldest = min((self._created[i] for i in seen if i in self._created), default=None)
+		if capped and oldest is None:
+			return
+		gone = [
+			call_id for call_id, created in self._created.items()
+			if call_id not in seen and created < started and (not capped or created >= oldest)
+		]
+		for call_id in gone:
+			self._unindex(call_id)
+		self.reconciled += len(gone)
+
+	async def _full_sync(self, client: Any) -> None:
+		started = time.time()
+		seen: Set[str] = set()
+		try:
+			async with self._lock:
+				with upstream_priority(Priority.BULK):
+					fetched = await self._fetch(client, seen)
+				self._reconcile(seen, started, fetched >= self.max_calls)
+				self.full_synced_at = self.synced_at = time.monotonic()
+				self._error = None
+		except Exception as e:
+			self._error = e
+			log.warning("Full call sync failed: %s", e)
+		finally:
+			self._page_ready.set()
+
+	async def refresh(self, client: Any, max_age: float = 0.0, full: bool = False, wait: bool = False) -> None:
+		"""Sync if the last sync is older than `max_age` seconds; concurrent callers share one sync.
+
+		Full syncs run in the background. Until the first one finishes, callers wait only for its
+		first page (all of it with `wait=True`); later ones serve the index as it is meanwhile.
+		`full=True` starts one only if the last finished `full_min_interval` ago, and otherwise
+		syncs incrementally now. Raises the error of a failed first sync.
+		"""
+		if not self.syncing and (self._full_due(self.full_every) or (full and self._full_due(self.full_min_interval))):
+			self._page_ready.clear()
+			self._full_task = asyncio.create_task(self._full_sync(client))
+		if self.full_synced_at is None or (wait and self.syncing):
+			if wait:
+				await asyncio.shield(self._full_task)
+			else:
+				await self._page_ready.wait()
+			if self.full_synced_at is None and self._error is not None:
+				raise self._error
+			return
+		if self.syncing:
+			return
+		if not full and self._fresh(max_age):
+			return
+		async with self._lock:
+			if not full and self._fresh(max_age):
+				return
+			# _ge rather than _gt: several calls can share the watermark timestamp.
+			filters = {"updated_at_ge": _from_epoch(self._watermark)} if self._watermark is not None else {}
+			await self._fetch(client, **filters)
+			self.synced_at = time.monotonic()
+
+	# -- queries -------------------------------------------------------------------------------
+
+	def query(
+		self,
+		status: Optional[str] = None,
+		assistant_id: Optional[str] = None,
+		phone_number: Optional[str] = None,
+		created_after: Optional[datetime] = None,
+		created_before: Optional[datetime] = None,
+		offset: int = 0,
+		limit: int = 100,
+	) -> Tuple[int, List[Dict[str, Any]]]:
+		"""Return (total matches, page) newest first."""
+		candidates: Optional[Set[str]] = None
+		for index, key in (
+			(self._by_status, status.lower() if status else None),
+			(self._by_assistant, assistant_id),
+			(self._by_phone, phone_number),
+		):
+			if key is None:
+				continue
+			ids = index.get(key, set())
+			candidates = ids if candidates is None else candidates & ids
+			if not candidates:
+				return 0, []
+		order = self._sorted()
+		lo = bisect_left(order, (to_epoch(created_after), "")) if created_after else 0
+		hi = bisect_right(order, (to_epoch(created_before), "\uffff")) if created_before else len(order)
+		total = 0
+		page: List[Dict[str, Any]] = []
+		for i in range(hi - 1, lo - 1, -1):
+			call_id = order[i][1]
+			if candidates is not None and call_id not in candidates:
+				continue
+			if offset <= total < offset + limit:
+				page.append(self.calls[call_id])
+			total += 1
+		return total, page
+
+	def stats(self) -> Dict[str, Any]:
+		return {
+			"calls": len(self.calls),
+			"statuses": {k: len(v) for k, v in self._by_status.items()},
+			"rollups": self.rollups.stats(),
+			"upstreamPages": self.upstream_pages,
+			"syncing": self.syncing,
+			"reconciledDeletes": self.reconciled,
+			"fullSyncedSecondsAgo": round(time.monotonic() - self.full_synced_at, 3) if self.full_synced_at else None,
+			"watermark": _from_epoch(self._watermark).isoformat() if self._watermark else None,
+			"syncedSecondsAgo": round(time.monotonic() - self.synced_at, 3) if self.synced_at else None,
+		}
+
+
+class CallIndexRegistry:
+	"""One CallIndex per token (keyed by token hash), least recently used evicted."""
+
+	def __init__(self, max_tokens: int = 32) -> None:
+		self.max_tokens = max_tokens
+		self._indexes: "OrderedDict[str, CallIndex]" = OrderedDict()
+
+	def get(self, token: str) -> CallIndex:
+		key = token_key(token)
+		index = self._indexes.get(key)
+		if index is None:
+			index = CallIndex(
+				page_size=settings.CALL_INDEX_PAGE_SIZE,
+				max_calls=settings.CALL_INDEX_MAX_CALLS,
+				full_every=settings.CALL_INDEX_FULL_SYNC_SECONDS,
+				full_min_interval=settings.CALL_INDEX_FULL_REFRESH_MIN_SECONDS,
+			)
+			self._indexes[key] = index
+			while len(self._indexes) > self.max_tokens:
+				self._indexes.popitem(last=False)
+		else:
+			self._indexes.move_to_end(key)
+		return index
+
+	def peek(self, token: str) -> Optional[CallIndex]:
+		return self._indexes.get(token_key(token))
+
+	def update_known(self, call_id: str, fields: Dict[str, Any]) -> int:
+		"""Merge pushed fields into every index already holding `call_id` (webhooks carry no token)."""
+		updated = 0
+		for index in self._indexes.values():
+			existing = index.calls.get(call_id)
+			if existing is not None:
+				index.upsert({**existing, **fields})
+				updated += 1
+		return updated
+
+
+call_indexes = CallIndexRegistry(max_tokens=settings.CALL_INDEX_MAX_TOKENS)
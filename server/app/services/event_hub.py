@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import asyncio
+import inspect
+import logging
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from ..config import settings
+from .shared_state import SharedState, shared_state
+
+
+log = logging.getLogger(__name__)
+
+EVENTS_CHANNEL = "live.events"
+
+CallListener = Callable[[str, Dict[str, Any], Dict[str, Any]], Any]
+
+
+@dataclass
+class EventFilter:
+	"""Subscriber-side filter; None means "any"."""
+
+	call_ids: Optional[Set[str]] = None
+	assistant_id: Optional[str] = None
+	statuses: Optional[Set[str]] = None
+	types: Optional[Set[str]] = None
+
+	def matches_call(self, state: Dict[str, Any]) -> bool:
+		if self.call_ids is not None and state.get("id") not in self.call_ids:
+			return False
+		if self.assistant_id is not None and state.get("assistantId") != self.assistant_id:
+			return False
+		if self.statuses is not None and state.get("status") not in self.statuses:
+			return False
+		return True
+
+	def matches(self, delta: Dict[str, Any], state: Dict[str, Any]) -> bool:
+		if self.types is not None and delta["type"] not in self.types:
+			return False
+		return self.matches_call(state)
+
+
+class Subscriber:
+	"""Bounded delta queue. On overflow the backlog is discarded and a resync marker (None) queued."""
+
+	def __init__(self, org_id: str, filters: EventFilter, max_queue: int) -> None:
+		self.org_id = org_id
+		self.filters = filters
+		self.queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(maxsize=max_queue)
+		self.resyncs = 0
+
+	def offer(self, delta: Dict[str, Any]) -> None:
+		try:
+			self.queue.put_nowait(delta)
+		except asyncio.QueueFull:
+			while not self.queue.empty():
+				self.queue.get_nowait()
+			self.queue.put_nowait(None)
+			self.resyncs += 1
+
+
+class EventHub:
+	"""Live call state built from Vapi server webhooks, pushed to subscribers as deltas.
+
+	Every delta gets a sequence number; the last `history` deltas are kept so a reconnecting
+	client can resume from Last-Event-ID instead of taking a full snapshot. Ended calls stay in
+	the live state for `ended_retention` seconds.
+
+	With a `shared` backend, webhook messages received by one worker are re-ingested by the
+	others, so SSE clients see every call whichever worker they hold. Listeners run only in the
+	receiving worker. Sequence numbers are per worker; `instance` tells their streams apart.
+	"""
+
+	def __init__(
+		self,
+		max_queue: int = 256,
+		history: int = 1000,
+		transcript_lines: int = 20,
+		ended_retention: float = 300.0,
+		shared: Optional[SharedState] = None,
+	) -> None:
+		self.instance = uuid.uuid4().hex[:8]
+		self.shared = shared
+		if shared is not None:
+			shared.subscribe(EVENTS_CHANNEL, lambda message: self.ingest(message, local=False))
+		self.max_queue = max_queue
+		self.transcript_lines = transcript_lines
+		self.ended_retention = ended_retention
+		self.calls: Dict[str, Dict[str, Any]] = {}
+		self._ended: Dict[str, float] = {}
+		self._subscribers: Set[Subscriber] = set()
+		self._history: Deque[Tuple[int, Dict[str, Any]]] = deque(maxlen=history)
+		self._listeners: List[CallListener] = []
+		self._everywhere: List[CallListener] = []
+		self._tasks: Set[asyncio.Future] = set()
+		self.seq = 0
+		self.received = 0
+		self.ignored = 0
+
+	# -- ingest --------------------------------------------------------------------------------
+
+	def add_listener(self, fn: CallListener, everywhere: bool = False) -> None:
+		"""Call `fn(kind, state, message)` for every ingested event; coroutines are scheduled.
+
+		Listeners run in the worker that received the webhook, or with `everywhere` in every
+		worker, for state one worker keeps on behalf of all of them.
+		"""
+		(self._everywhere if everywhere else self._listeners).append(fn)
+
+	def _state(self, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+		call = message.get("call") or {}
+		call_id = call.get("id") or message.get("callId")
+		if not call_id:
+			return None
+		state = self.calls.get(call_id)
+		if state is None:
+			state = self.calls[call_id] = {"id": call_id, "status": call.get("status"), "transcript": []}
+		for key in ("orgId", "assistantId", "phoneNumberId", "customer", "type", "createdAt", "startedAt"):
+			if call.get(key) is not None:
+				state[key] = call[key]
+		return state
+
+	def ingest(self, message: Dict[str, Any], local: bool = True) -> Optional[Dict[str, Any]]:
+		"""Apply one server message to the live state and publish the resulting delta, if any.
+
+		`local` messages came in through this worker's webhook: listeners run and the message is
+		forwarded to the other workers.
+		"""
+		self.received += 1
+		kind = message.get("type")
+		state = self._state(message)
+		if state is None or kind not in ("status-update", "transcript", "end-of-call-report"):
+			self.ignored += 1
+			return None
+		delta: Dict[str, Any] = {"callId": state["id"], "at": message.get("timestamp") or int(time.time() * 1000)}
+		if kind == "status-update":
+			state["status"] = message.get("status") or state.get("status")
+			if message.get("endedReason"):
+				state["endedReason"] = message["endedReason"]
+			delta.update(type="status", status=state["status"], endedReason=state.get("endedReason"))
+		elif kind == "transcript":
+			line = {"role": message.get("role"), "transcript": message.get("transcript") or ""}
+			if message.get("transcriptType", "final") == "final":
+				state["transcript"] = (state["transcript"] + [line])[-self.transcript_lines :]
+			delta.update(type="transcript", transcriptType=message.get("transcriptType", "final"), **line)
+		else:
+			artifact = message.get("artifact") or {}
+			state["status"] = "ended"
+			state["endedReason"] = message.get("endedReason") or state.get("endedReason")
+			state["endedAt"] = message.get("endedAt") or (message.get("call") or {}).get("endedAt")
+			state["summary"] = message.get("summary") or (message.get("analysis") or {}).get("summary")
+			state["recordingUrl"] = message.get("recordingUrl") or artifact.get("recordingUrl")
+			delta.update(
+				type="ended",
+				status="ended",
+				endedReason=state["endedReason"],
+				endedAt=state["endedAt"],
+				summary=state["summary"],
+				recordingUrl=state["recordingUrl"],
+				cost=message.get("cost"),
+			)
+		if state.get("status") == "ended":
+			self._ended.setdefault(state["id"], time.monotonic())
+		self._publish(delta, state)
+		self._notify(self._everywhere, kind, state, message)
+		if local:
+			self._notify(self._listeners, kind, state, message)
+			if self.shared is not None:
+				self._spawn(self.shared.publish(EVENTS_CHANNEL, message))
+		self._prune()
+		return delta
+
+	def _publish(self, delta: Dict[str, Any], state: Dict[str, Any]) -> None:
+		self.seq += 1
+		delta["seq"] = self.seq
+		delta["assistantId"] = state.get("assistantId")
+		org_id = state.get("orgId")
+		self._history.append((self.seq, dict(delta, orgId=org_id)))
+		for sub in list(self._subscribers):
+			if sub.org_id == org_id and sub.filters.matches(delta, state):
+				sub.offer(delta)
+
+	def _spawn(self, awaitable: Any) -> None:
+		task = asyncio.ensure_future(awaitable)
+		self._tasks.add(task)
+		task.add_done_callback(self._done)
+
+	def _done(self, task: asyncio.Future) -> None:
+		self._tasks.discard(task)
+		if not task.cancelled() and task.exception() is not None:
+			log.error("event hub task failed", exc_info=task.exception())
+
+	def _notify(self, listeners: List[CallListener], kind: str, state: Dict[str, Any], message: Dict[str, Any]) -> None:
+		for fn in listeners:
+			try:
+				result = fn(kind, state, message)
+				if inspect.isawaitable(result):
+					self._spawn(result)
+			except Exception:
+				log.exception("event hub listener failed")
+
+	def _prune(self) -> None:
+		cutoff = time.monotonic() - self.ended_retention
+		for call_id in [c for c, ended in self._ended.items() if ended < cutoff]:
+			del self._ended[call_id]
+			self.calls.pop(call_id, None)
+
+	# -- subscribe -----------------------------------------------------------------------------
+
+	def subscribe(self, org_id: str, filters: EventFilter) -> Subscriber:
+		sub = Subscriber(org_id, filters, self.max_queue)
+		self._subscribers.add(sub)
+		return sub
+
+	def unsubscribe(self, sub: Subscriber) -> None:
+		self._subscribers.discard(sub)
+
+	def snapshot(self, org_id: str, filters: EventFilter) -> List[Dict[str, Any]]:
+		return [s for s in self.calls.values() if s.get("orgId") == org_id and filters.matches_call(s)]
+
+	def replay(self, org_id: str, filters: EventFilter, after_seq: int) -> Optional[List[Dict[str, Any]]]:
+		"""Deltas after `after_seq`, or None when history no longer reaches back that far."""
+		if after_seq > self.seq or (self._history and self._history[0][0] > after_seq + 1):
+			return None
+		out = []
+		for seq, delta in self._history:
+			if seq <= after_seq or delta.get("orgId") != org_id:
+				continue
+			state = self.calls.get(delta["callId"]) or {"id": delta["callId"], "assistantId": delta.get("assistantId")}
+			if filters.matches(delta, state):
+				out.append({k: v for k, v in delta.items() if k != "orgId"})
+		return out
+
+	def stats(self) -> Dict[str, Any]:
+		return {
+			"instance": self.instance,
+			"liveCalls": len(self.calls) - len(self._ended),
+			"endedCalls": len(self._ended),
+			"subscribers": len(self._subscribers),
+			"seq": self.seq,
+			"received": self.received,
+			"ignored": self.ignored,
+			"resyncs": sum(s.resyncs for s in self._subscribers),
+		}
+
+
+event_hub = EventHub(
+	max_queue=settings.LIVE_EVENTS_QUEUE_SIZE,
+	history=settings.LIVE_EVENTS_HISTORY,
+	ended_retention=settings.LIVE_ENDED_RETENTION_SECONDS,
+	shared=shared_state,
+)
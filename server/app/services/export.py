@@ -0,0 +1,444 @@
+from __future__ import annotations
+
+import asyncio
+import csv
+import io
+import os
+import tempfile
+import time
+from collections import deque
+from contextlib import aclosing
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Sequence, Set, Union
+
+import anyio
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
+
+from .call_index import to_epoch
+from .governor import Priority, upstream_priority
+from .metrics import timed_sdk, timed_serialization
+from .responses import StreamCompressor, dumps, negotiate_encoding
+from .retry import with_backoff
+from .vapi_client import as_dict
+from .warmup import load
+
+
+# Columns when none are given; dotted paths select nested call fields.
+DEFAULT_COLUMNS = (
+	"id", "status", "type", "assistantId", "phoneNumberId", "customer.name", "customer.number",
+	"createdAt", "startedAt", "endedAt", "endedReason", "cost", "transcript",
+)
+# Columns read from the call's artifacts (the local artifact store, or Vapi on a miss).
+ARTIFACT_COLUMNS = ("transcript", "recordingUrl", "stereoRecordingUrl", "videoRecordingUrl")
+MAX_COLUMNS = 64
+# Excel rejects longer cell values.
+XLSX_MAX_CELL = 32767
+
+Row = List[Any]
+
+
+class ExportError(ValueError):
+	pass
+
+
+def parse_columns(columns: Optional[str]) -> List[str]:
+	if not columns:
+		return list(DEFAULT_COLUMNS)
+	paths = list(dict.fromkeys(c.strip() for c in columns.split(",") if c.strip()))
+	if not paths or len(paths) > MAX_COLUMNS or any(not all(p.split(".")) for p in paths):
+		raise ExportError(f"columns takes up to {MAX_COLUMNS} comma-separated names or dotted paths")
+	return paths
+
+
+def _from_epoch(ts: float) -> datetime:
+	return datetime.fromtimestamp(ts, tz=timezone.utc)
+
+
+def _lookup(value: Any, path: str) -> Any:
+	for part in path.split("."):
+		if not isinstance(value, dict):
+			return None
+		value = value.get(part)
+	return value
+
+
+def listed_artifacts(call: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+	"""Artifacts already present on a listed call, so no per-call fetch is needed."""
+	artifact = call.get("artifact")
+	if isinstance(artifact, dict) and artifact.get("transcript") is not None:
+		return artifact
+	return None
+
+
+def cells(call: Dict[str, Any], artifacts: Optional[Dict[str, Any]], columns: Sequence[str]) -> Row:
+	return [(artifacts or {}).get(c) if c in ARTIFACT_COLUMNS else _lookup(call, c) for c in columns]
+
+
+class CallExport:
+	"""Calls matching the filters as rows, newest first, with bounded memory.
+
+	Pages are listed from Vapi with createdAt cursors, growing to `page_size`, the next page
+	requested while the current one is written. Ended calls whose listing lacks artifacts are
+	fetched through `fetch_artifacts`, up to `concurrency` at a time within a window of twice that
+	many rows; rows still leave in order. Only the ids sharing a page's oldest createdAt are
+	remembered, to drop ties at the edge.
+	"""
+
+	def __init__(
+		self,
+		client: Any,
+		fetch_artifacts: Callable[[str], Awaitable[Dict[str, Any]]],
+		columns: Sequence[str],
+		assistant_id: Optional[str] = None,
+		phone_number_id: Optional[str] = None,
+		status: Optional[str] = None,
+		created_after: Optional[datetime] = None,
+		created_before: Optional[datetime] = None,
+		page_size: int = 500,
+		concurrency: int = 8,
+		max_retries: int = 5,
+	) -> None:
+		self.client = client
+		self.fetch_artifacts = fetch_artifacts
+		self.columns = list(columns)
+		self.assistant_id = assistant_id
+		self.phone_number_id = phone_number_id
+		self.status = status.lower() if status else None
+		self.created_after = created_after
+		self.created_before = created_before
+		self.page_size = page_size
+		self.concurrency = max(1, concurrency)
+		self.max_retries = max_retries
+		self._needs_artifacts = any(c in ARTIFACT_COLUMNS for c in self.columns)
+		self._slots = asyncio.Semaphore(self.concurrency)
+		self.pages = 0
+		self.artifact_fetches = 0
+
+	async def _list(self, cursor: Optional[datetime], limit: int) -> List[Dict[str, Any]]:
+		kwargs: Dict[str, Any] = {}
+		for key, value in (
+			("assistant_id", self.assistant_id),
+			("phone_number_id", self.phone_number_id),
+			("created_at_ge", self.created_after),
+			("created_at_le", cursor),
+		):
+			if value is not None:
+				kwargs[key] = value
+		with upstream_priority(Priority.BULK):
+			with timed_sdk("calls.list"):
+				page = await with_backoff(lambda: self.client.calls.list(limit=limit, **kwargs), max_retries=self.max_retries)
+		self.pages += 1
+		with timed_serialization("calls.list"):
+			return [as_dict(c) for c in page]
+
+	async def _pages(self) -> AsyncIterator[List[Dict[str, Any]]]:
+		# The first pages are small, so rows start flowing before a full page has been parsed.
+		limit = min(self.page_size, 50)
+		edge: Set[str] = set()
+		pending = asyncio.ensure_future(self._list(self.created_before, limit))
+		try:
+			while True:
+				page = await pending
+				fresh = [c for c in page if c.get("id") not in edge]
+				created = [c for c in (to_epoch(c.get("createdAt")) for c in fresh) if c is not None]
+				oldest = min(created) if created else None
+				more = len(page) >= limit and bool(fresh) and oldest is not None
+				if more:
+					limit = min(self.page_size, limit * 2)
+					pending = asyncio.ensure_future(self._list(_from_epoch(oldest), limit))
+					edge = {c.get("id") for c in fresh if to_epoch(c.get("createdAt")) == oldest}
+				if self.status:
+					fresh = [c for c in fresh if str(c.get("status") or "").lower() == self.status]
+				if fresh:
+					yield fresh
+				if not more:
+					return
+		finally:
+			pending.cancel()
+
+	async def _fetched_row(self, call: Dict[str, Any]) -> Row:
+		async with self._slots:
+			with upstream_priority(Priority.BULK):
+				artifacts = await with_backoff(lambda: self.fetch_artifacts(call["id"]), max_retries=self.max_retries)
+		self.artifact_fetches += 1
+		return cells(call, artifacts, self.columns)
+
+	async def rows(self) -> AsyncIterator[Row]:
+		window: Deque[Union[Row, "asyncio.Future[Row]"]] = deque()
+		try:
+			async with aclosing(self._pages()) as pages:
+				async for page in pages:
+					for call in page:
+						artifacts = listed_artifacts(call)
+						if artifacts is None and self._needs_artifacts and call.get("status") == "ended" and call.get("id"):
+							window.append(asyncio.ensure_future(self._fetched_row(call)))
+						else:
+							window.append(cells(call, artifacts, self.columns))
+						while len(window) > 2 * self.concurrency or (window and isinstance(window[0], list)):
+							head = window.popleft()
+							yield head if isinstance(head, list) else await head
+			while window:
+				head = window.popleft()
+				yield head if isinstance(head, list) else await head
+		finally:
+			for item in window:
+				if isinstance(item, asyncio.Future):
+					item.cancel()
+
+
+# -- writers -----------------------------------------------------------------------------------
+
+
+def _flat(value: Any) -> Any:
+	"""Nested values as JSON text and datetimes as ISO 8601, so every format gets one scalar per cell."""
+	if isinstance(value, (dict, list)):
+		return dumps(value).decode("utf-8")
+	if isinstance(value, datetime):
+		return value.isoformat()
+	return value
+
+
+class _CsvWriter:
+	media_type = "text/csv; charset=utf-8"
+	compressible = True
+	blocking = False
+
+	def __init__(self, columns: Sequence[str]) -> None:
+		self.columns = columns
+		self._buffer = io.StringIO()
+		self._csv = csv.writer(self._buffer)
+
+	def _drain(self) -> bytes:
+		out = self._buffer.getvalue().encode("utf-8")
+		self._buffer.seek(0)
+		self._buffer.truncate()
+		return out
+
+	def header(self) -> bytes:
+		self._csv.writerow(self.columns)
+		return self._drain()
+
+	def write(self, rows: List[Row]) -> bytes:
+		self._csv.writerows([["" if v is None else _flat(v) for v in row] for row in rows])
+		return self._drain()
+
+	def finish(self) -> Iterator[bytes]:
+		return iter(())
+
+	def close(self) -> None:
+		pass
+
+
+class _NdjsonWriter:
+	media_type = "application/x-ndjson"
+	compressible = True
+	blocking = False
+
+	def __init__(self, columns: Sequence[str]) -> None:
+		self.columns = columns
+
+	def header(self) -> bytes:
+		return b""
+
+	def write(self, rows: List[Row]) -> bytes:
+		return b"".join(dumps(dict(zip(self.columns, row))) + b"\n" for row in rows)
+
+	def finish(self) -> Iterator[bytes]:
+		return iter(())
+
+	def close(self) -> None:
+		pass
+
+
+class _XlsxWriter:
+	"""openpyxl write-only workbook: rows spool to a temporary file, and the zipped workbook is
+	streamed from disk once the last row is in, since the archive cannot be finished earlier."""
+
+	media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+	compressible = False
+	blocking = True
+	chunk_size = 256 * 1024
+
+	def __init__(self, columns: Sequence[str], openpyxl: Any, illegal: Any) -> None:
+		self.columns = columns
+		self._illegal = illegal
+		self._wb = openpyxl.Workbook(write_only=True)
+		self._ws = self._wb.create_sheet("calls")
+		self._path: Optional[str] = None
+
+	def _cell(self, value: Any) -> Any:
+		if isinstance(value, datetime):
+			# Excel has no time zones; cells hold UTC.
+			return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+		value = _flat(value)
+		if isinstance(value, str):
+			return self._illegal.sub("", value)[:XLSX_MAX_CELL]
+		return value
+
+	def header(self) -> bytes:
+		self._ws.append(list(self.columns))
+		return b""
+
+	def write(self, rows: List[Row]) -> bytes:
+		for row in rows:
+			self._ws.append([self._cell(v) for v in row])
+		return b""
+
+	def finish(self) -> Iterator[bytes]:
+		fd, self._path = tempfile.mkstemp(prefix="export-", suffix=".xlsx")
+		os.close(fd)
+		self._wb.save(self._path)
+		with open(self._path, "rb") as f:
+			while True:
+				chunk = f.read(self.chunk_size)
+				if not chunk:
+					return
+				yield chunk
+
+	def close(self) -> None:
+		if self._path is not None:
+			try:
+				os.remove(self._path)
+			except OSError:
+				pass
+
+
+class _Sink(io.RawIOBase):
+	"""Write-only stream whose bytes are handed on as soon as they are written."""
+
+	def __init__(self) -> None:
+		self._chunks: List[bytes] = []
+		self._position = 0
+
+	def writable(self) -> bool:
+		return True
+
+	def write(self, data: Any) -> int:
+		chunk = bytes(data)
+		self._chunks.append(chunk)
+		self._position += len(chunk)
+		return len(chunk)
+
+	def tell(self) -> int:
+		return self._position
+
+	def drain(self) -> bytes:
+		out = b"".join(self._chunks)
+		self._chunks = []
+		return out
+
+
+class _ParquetWriter:
+	"""One row group per batch, written straight to the response; `cost` columns are float64, the rest text."""
+
+	media_type = "application/vnd.apache.parquet"
+	compressible = False
+	blocking = True
+
+	def __init__(self, columns: Sequence[str], pa: Any, pq: Any) -> None:
+		self.columns = columns
+		self._pa = pa
+		self._float = [c == "cost" or c.startswith("costBreakdown.") for c in columns]
+		self._schema = pa.schema([(c, pa.float64() if f else pa.string()) for c, f in zip(columns, self._float)])
+		self._sink = _Sink()
+		self._writer = pq.ParquetWriter(self._sink, self._schema)
+
+	def _column(self, values: List[Any], is_float: bool) -> List[Any]:
+		if is_float:
+			return [float(v) if isinstance(v, (int, float)) and not isinstance(v, bool) else None for v in values]
+		return [None if v is None else v if isinstance(v, str) else str(_flat(v)) for v in values]
+
+	def header(self) -> bytes:
+		return self._sink.drain()
+
+	def write(self, rows: List[Row]) -> bytes:
+		arrays = [self._column([row[i] for row in rows], f) for i, f in enumerate(self._float)]
+		self._writer.write_table(self._pa.Table.from_pydict(dict(zip(self.columns, arrays)), schema=self._schema))
+		return self._sink.drain()
+
+	def finish(self) -> Iterator[bytes]:
+		self._writer.close()
+		yield self._sink.drain()
+
+	def close(self) -> None:
+		pass
+
+
+Writer = Union[_CsvWriter, _NdjsonWriter, _XlsxWriter, _ParquetWriter]
+FORMATS = ("csv", "ndjson", "xlsx", "parquet")
+
+
+async def open_writer(fmt: str, columns: Sequence[str]) -> Writer:
+	"""A writer for `fmt`; openpyxl and pyarrow are imported off the event loop on first use."""
+	if fmt == "csv":
+		return _CsvWriter(columns)
+	if fmt == "ndjson":
+		return _NdjsonWriter(columns)
+	if fmt == "xlsx":
+		openpyxl = await load("openpyxl")
+		cell = await load("openpyxl.cell.cell")
+		return _XlsxWriter(columns, openpyxl, cell.ILLEGAL_CHARACTERS_RE)
+	if fmt == "parquet":
+		try:
+			pa = await load("pyarrow")
+			pq = await load("pyarrow.parquet")
+		except ImportError:
+			raise ExportError("Parquet export needs pyarrow (pip install pyarrow)")
+		return _ParquetWriter(columns, pa, pq)
+	raise ExportError(f"format must be one of {', '.join(FORMATS)}")
+
+
+def export_response(
+	request: Request,
+	export: CallExport,
+	writer: Writer,
+	filename: str,
+	batch: int = 500,
+	flush_every: float = 0.5,
+) -> StreamingResponse:
+	"""Stream `export` through `writer` in batches of `batch` rows, or whatever arrived within
+	`flush_every` seconds; the CSV header goes out before the first page is listed."""
+	encoding = negotiate_encoding(request) if writer.compressible else None
+	headers = {
+		"Content-Disposition": f'attachment; filename="{filename}"',
+		"Cache-Control": "private, no-cache",
+		"Vary": "Authorization, x-vapi-token, Accept-Encoding",
+	}
+	if encoding:
+		headers["Content-Encoding"] = encoding
+
+	async def encode(fn: Callable[..., bytes], *args: Any) -> bytes:
+		return await anyio.to_thread.run_sync(fn, *args) if writer.blocking else fn(*args)
+
+	async def stream() -> AsyncIterator[bytes]:
+		compressor = StreamCompressor(encoding)
+		try:
+			head = await encode(writer.header)
+			if head:
+				yield compressor.chunk(head)
+			rows: List[Row] = []
+			flushed = time.monotonic()
+			async with aclosing(export.rows()) as source:
+				async for row in source:
+					rows.append(row)
+					if len(rows) >= batch or time.monotonic() - flushed >= flush_every:
+						data = await encode(writer.write, rows)
+						rows = []
+						flushed = time.monotonic()
+						if data:
+							yield compressor.chunk(data)
+			if rows:
+				data = await encode(writer.write, rows)
+				if data:
+					yield compressor.chunk(data)
+			async for chunk in iterate_in_threadpool(writer.finish()):
+				yield compressor.chunk(chunk)
+			tail = compressor.finish()
+			if tail:
+				yield tail
+		finally:
+			writer.close()
+
+	return StreamingResponse(stream(), media_type=writer.media_type, headers=headers)
@@ -0,0 +1,310 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import math
+import time
+from collections import OrderedDict
+from enum import IntEnum
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from ..config import settings
+
+
+class Priority(IntEnum):
+	"""Upstream request classes; lower values are dispatched first."""
+
+	CONTROL = 0
+	INTERACTIVE = 1
+	BULK = 2
+
+
+_priority: contextvars.ContextVar[Priority] = contextvars.ContextVar("upstream_priority", default=Priority.INTERACTIVE)
+
+
+@contextlib.contextmanager
+def upstream_priority(priority: Priority) -> Iterator[None]:
+	"""Run Vapi calls made inside the block (in this task) at `priority`."""
+	reset = _priority.set(priority)
+	try:
+		yield
+	finally:
+		_priority.reset(reset)
+
+
+class TokenGovernor:
+	"""Admission control for one token's Vapi requests.
+
+	Requests wait in a priority queue and are admitted while in-flight requests stay under an
+	AIMD concurrency limit and the token bucket has credit. The limit grows by about one per
+	limit's worth of fast responses and shrinks when responses get slower than `latency_tolerance`
+	times the best recent latency (x0.9) or Vapi answers 429/503 (x0.5, and non-control traffic
+	pauses for Retry-After). CONTROL requests skip the bucket and the pause and may use
+	`control_reserve` slots above the limit, so live-call actions never queue behind bulk work.
+	"""
+
+	def __init__(
+		self,
+		rate: float = 10.0,
+		burst: int = 20,
+		initial_limit: float = 8.0,
+		min_limit: float = 1.0,
+		max_limit: float = 32.0,
+		latency_tolerance: float = 2.0,
+		control_reserve: int = 2,
+	) -> None:
+		self.rate = rate
+		self.burst = burst
+		self.limit = initial_limit
+		self.min_limit = min_limit
+		self.max_limit = max_limit
+		self.latency_tolerance = latency_tolerance
+		self.control_reserve = control_reserve
+		self.inflight = 0
+		self._tokens = float(burst)
+		self._refilled = time.monotonic()
+		self._paused_until = 0.0
+		self._decrease_after = 0.0
+		self._baseline: Optional[float] = None
+		self._latency: Optional[float] = None
+		self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+		self._seq = itertools.count()
+		self._timer: Optional[asyncio.TimerHandle] = None
+		self.last_used = time.monotonic()
+		self.admitted = [0, 0, 0]
+		self.throttled = 0
+		self.slowdowns = 0
+
+	def _refill(self, now: float) -> None:
+		self._tokens = min(float(self.burst), self._tokens + (now - self._refilled) * self.rate)
+		self._refilled = now
+
+	def _wait_time(self, priority: int, now: float) -> float:
+		"""Seconds until `priority` may be admitted; inf when it must wait for a release."""
+		if priority == Priority.CONTROL:
+			return 0.0 if self.inflight < int(self.limit) + self.control_reserve else math.inf
+		if self.inflight >= int(self.limit):
+			return math.inf
+		if self._paused_until > now:
+			return self._paused_until - now
+		if self._tokens < 1.0:
+			return (1.0 - self._tokens) / self.rate
+		return 0.0
+
+	def _admit(self, priority: int) -> None:
+		self.inflight += 1
+		self._tokens -= 1.0
+		self.admitted[priority] += 1
+		self.last_used = time.monotonic()
+
+	def _pump(self) -> None:
+		if self._timer is not None:
+			self._timer.cancel()
+			self._timer = None
+		now = time.monotonic()
+		self._refill(now)
+		while self._waiters:
+			priority, _, fut = self._waiters[0]
+			if fut.done():
+				heapq.heappop(self._waiters)
+				continue
+			wait = self._wait_time(priority, now)
+			if wait > 0:
+				if wait != math.inf:
+					self._timer = asyncio.get_running_loop().call_later(wait, self._pump)
+				return
+			heapq.heappop(self._waiters)
+			self._admit(priority)
+			fut.set_result(None)
+
+	async def acquire(self, priority: Priority) -> None:
+		now = time.monotonic()
+		self._refill(now)
+		if not self._waiters and self._wait_time(priority, now) <= 0:
+			self._admit(priority)
+			return
+		fut = asyncio.get_running_loop().create_future()
+		heapq.heappush(self._waiters, (int(priority), next(self._seq), fut))
+		self._pump()
+		try:
+			await fut
+		except asyncio.CancelledError:
+			if fut.done() and not fut.cancelled():
+				self.release()
+			raise
+
+	def release(self) -> None:
+		self.inflight -= 1
+		self.last_used = time.monotonic()
+		self._pump()
+
+	def observe(self, latency: float, status: Optional[int], retry_after: Optional[float]) -> None:
+		"""Feed one response (time to headers, status) into the AIMD limit."""
+		now = time.monotonic()
+		if status in (429, 503):
+			self.throttled += 1
+			self._paused_until = max(self._paused_until, now + (retry_after if retry_after is not None else 1.0))
+			self._tokens = min(self._tokens, 0.0)
+			self._decrease(0.5, now)
+			return
+		if status is None or status >= 500:
+			return
+		# Rejections come back fast, so only served requests feed the latency estimates.
+		self._latency = latency if self._latency is None else 0.8 * self._latency + 0.2 * latency
+		# Best recent latency; creeps up 1% per sample so it follows a lasting shift.
+		self._baseline = latency if self._baseline is None else min(latency, self._baseline * 1.01)
+		if latency > self._baseline * self.latency_tolerance:
+			if self._decrease(0.9, now):
+				self.slowdowns += 1
+		else:
+			self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+	def _decrease(self, factor: float, now: float) -> bool:
+		"""Multiplicative decrease, at most once per round trip so one burst is not counted twice."""
+		if now < self._decrease_after:
+			return False
+		self.limit = max(self.min_limit, self.limit * factor)
+		self._decrease_after = now + max(self._latency or 0.0, 0.1)
+		return True
+
+	@property
+	def idle(self) -> bool:
+		return self.inflight == 0 and not self._waiters
+
+	def stats(self) -> Dict[str, Any]:
+		now = time.monotonic()
+		tokens = min(float(self.burst), self._tokens + (now - self._refilled) * self.rate)
+		queued = [0, 0, 0]
+		for priority, _, fut in self._waiters:
+			if not fut.done():
+				queued[priority] += 1
+		return {
+			"limit": round(self.limit, 2),
+			"inflight": self.inflight,
+			"queued": {p.name.lower(): queued[p] for p in Priority},
+			"admitted": {p.name.lower(): self.admitted[p] for p in Priority},
+			"tokens": round(tokens, 2),
+			"ratePerSecond": self.rate,
+			"burst": self.burst,
+			"pausedSeconds": round(max(self._paused_until - now, 0.0), 3),
+			"latencyMs": round(self._latency * 1000, 1) if self._latency is not None else None,
+			"baselineLatencyMs": round(self._baseline * 1000, 1) if self._baseline is not None else None,
+			"throttled": self.throttled,
+			"slowdowns": self.slowdowns,
+		}
+
+
+class UpstreamGovernor:
+	"""One TokenGovernor per token key; idle governors are dropped after `idle_ttl` seconds."""
+
+	def __init__(self, max_tokens: int = 256, idle_ttl: float = 600.0) -> None:
+		self.max_tokens = max_tokens
+		self.idle_ttl = idle_ttl
+		self._governors: "OrderedDict[str, TokenGovernor]" = OrderedDict()
+
+	def get(self, key: str) -> TokenGovernor:
+		governor = self._governors.get(key)
+		if governor is not None:
+			self._governors.move_to_end(key)
+			return governor
+		now = time.monotonic()
+		for old_key, old in list(self._governors.items()):
+			if len(self._governors) < self.max_tokens and now - old.last_used < self.idle_ttl:
+				break
+			if old.idle:
+				del self._governors[old_key]
+		governor = self._governors[key] = TokenGovernor(
+			rate=settings.VAPI_RATE_PER_SECOND,
+			burst=settings.VAPI_RATE_BURST,
+			initial_limit=settings.VAPI_CONCURRENCY_INITIAL,
+			min_limit=settings.VAPI_CONCURRENCY_MIN,
+			max_limit=settings.VAPI_CONCURRENCY_MAX,
+			latency_tolerance=settings.VAPI_LATENCY_TOLERANCE,
+			control_reserve=settings.VAPI_CONTROL_RESERVE,
+		)
+		return governor
+
+	def peek(self, key: str) -> Optional[TokenGovernor]:
+		return self._governors.get(key)
+
+	def stats(self) -> Dict[str, Any]:
+		governors = list(self._governors.values())
+		return {
+			"tokens": len(governors),
+			"inflight": sum(g.inflight for g in governors),
+			"queued": sum(len(g._waiters) for g in governors),
+			"throttled": sum(g.throttled for g in governors),
+		}
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+	def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], None]) -> None:
+		self._stream = stream
+		self._release: Optional[Callable[[], None]] = release
+
+	async def __aiter__(self) -> AsyncIterator[bytes]:
+		async for chunk in self._stream:
+			yield chunk
+
+	async def aclose(self) -> None:
+		try:
+			await self._stream.aclose()
+		finally:
+			if self._release is not None:
+				self._release()
+				self._release = None
+
+
+def _bearer(value: Optional[str]) -> Optional[str]:
+	if value and value[:7].lower() == "bearer ":
+		return value[7:].strip() or None
+	return None
+
+
+class GovernedTransport(httpx.AsyncBaseTransport):
+	"""httpx transport that admits each token's requests through its TokenGovernor.
+
+	The slot is held until the response body is closed; the caller's priority comes from
+	`upstream_priority`. Requests without a bearer token pass straight through.
+	"""
+
+	def __init__(self, transport: httpx.AsyncBaseTransport, governor: UpstreamGovernor, key: Callable[[str], str]) -> None:
+		self._transport = transport
+		self._governor = governor
+		self._key = key
+
+	async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+		token = _bearer(request.headers.get("authorization"))
+		if token is None:
+			return await self._transport.handle_async_request(request)
+		governor = self._governor.get(self._key(token))
+		await governor.acquire(_priority.get())
+		started = time.monotonic()
+		try:
+			response = await self._transport.handle_async_request(request)
+		except BaseException:
+			governor.release()
+			raise
+		retry_after: Optional[float] = None
+		try:
+			retry_after = float(response.headers.get("retry-after", ""))
+		except ValueError:
+			pass
+		governor.observe(time.monotonic() - started, response.status_code, retry_after)
+		return httpx.Response(
+			status_code=response.status_code,
+			headers=response.headers,
+			stream=_ReleasingStream(response.stream, governor.release),
+			extensions=response.extensions,
+		)
+
+	async def aclose(self) -> None:
+		await self._transport.aclose()
+
+
+upstream_governor = UpstreamGovernor(max_tokens=settings.VAPI_POOL_MAX_CLIENTS, idle_ttl=settings.VAPI_POOL_IDLE_TTL)
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from typing import Optional
+
+import httpx
+
+from ..config import settings
+
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+	"""Shared AsyncClient for non-SDK upstreams (webhooks, Azure OpenAI).
+
+	Callers pass per-request timeouts; the pool is closed from the app lifespan.
+	"""
+	global _client
+	if _client is None:
+		_client = httpx.AsyncClient(
+			timeout=settings.VAPI_HTTP_TIMEOUT,
+			limits=httpx.Limits(max_connections=settings.VAPI_HTTP_MAX_CONNECTIONS, max_keepalive_connections=settings.VAPI_HTTP_MAX_KEEPALIVE),
+		)
+	return _client
+
+
+async def close_http_client() -> None:
+	global _client
+	if _client is not None:
+		await _client.aclose()
+		_client = None
@@ -0,0 +1,601 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from ..config import settings
+from .batch_dispatch import DialOutcomeUnknown, create_chunk, iter_window_chunks
+from .governor import Priority, upstream_priority
+from .orgs import org_id_for
+from .schedule_ingest import RowError, ScheduleFileError, ScheduleRow, take
+from .shared_state import connect_private
+from .vapi_client import async_vapi_registry, token_key
+
+
+log = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+	id TEXT PRIMARY KEY,
+	owner TEXT NOT NULL,
+	kind TEXT NOT NULL,
+	idempotency_key TEXT,
+	token TEXT,
+	assistant_id TEXT NOT NULL,
+	status TEXT NOT NULL,
+	rows INTEGER NOT NULL DEFAULT 0,
+	invalid INTEGER NOT NULL DEFAULT 0,
+	errors_logged INTEGER NOT NULL DEFAULT 0,
+	error TEXT,
+	created_at REAL NOT NULL,
+	updated_at REAL NOT NULL,
+	finished_at REAL,
+	paced INTEGER NOT NULL DEFAULT 0,
+	phone_number_id TEXT,
+	worker TEXT,
+	org_id TEXT,
+	UNIQUE (owner, idempotency_key)
+);
+CREATE TABLE IF NOT EXISTS job_chunks (
+	job_id TEXT NOT NULL,
+	seq INTEGER NOT NULL,
+	status TEXT NOT NULL,
+	size INTEGER NOT NULL,
+	payload TEXT NOT NULL,
+	attempts INTEGER NOT NULL DEFAULT 0,
+	error TEXT,
+	eligible_at REAL,
+	call_id TEXT,
+	dialed_at REAL,
+	ended_at REAL,
+	worker TEXT,
+	PRIMARY KEY (job_id, seq)
+);
+CREATE INDEX IF NOT EXISTS job_chunks_status ON job_chunks (status, job_id);
+CREATE TABLE IF NOT EXISTS job_errors (
+	job_id TEXT NOT NULL,
+	row INTEGER,
+	error TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS job_errors_job ON job_errors (job_id);
+CREATE TABLE IF NOT EXISTS job_workers (
+	id TEXT PRIMARY KEY,
+	pid INTEGER NOT NULL,
+	heartbeat REAL NOT NULL
+);
+"""
+
+# Columns added after the first release, for databases created before them.
+_ADDED_COLUMNS = (
+	("jobs", "paced", "INTEGER NOT NULL DEFAULT 0"),
+	("jobs", "phone_number_id", "TEXT"),
+	("job_chunks", "eligible_at", "REAL"),
+	("job_chunks", "call_id", "TEXT"),
+	("job_chunks", "dialed_at", "REAL"),
+	("job_chunks", "ended_at", "REAL"),
+	("jobs", "worker", "TEXT"),
+	("job_chunks", "worker", "TEXT"),
+	("jobs", "org_id", "TEXT"),
+)
+
+# Job statuses: ingesting -> queued -> running -> completed | failed | cancelled, with paused in between.
+# Chunk statuses: pending -> sending -> done | failed; pending -> cancelled; sending -> interrupted when its worker dies or the send's outcome is unknown.
+# Paced jobs hold one customer per chunk, dialed by the pacer instead of the chunk workers; a
+# done chunk keeps its call_id, and ended_at once the call has ended.
+Claim = Tuple[str, int, Dict[str, Any], str, str, Optional[str]]
+
+
+class JobQueue:
+	"""SQLite-backed queue of call-creation chunks drained by asyncio workers.
+
+	Submissions are written to the database before the request returns, so work survives a
+	restart. Several processes may share the database: each registers in `job_workers` and
+	heartbeats there, and stamps the jobs it ingests and the chunks it sends. Once a process has
+	missed heartbeats for `worker_timeout` seconds, its mid-send chunks are marked `interrupted`
+	and never resent, because Vapi may already have created those calls, and its half-ingested
+	jobs fail; everything still pending resumes in the remaining processes. The database holds
+	job tokens until a job finishes, so it is created with 0600 permissions.
+	"""
+
+	def __init__(self, path: str, workers: int = 4, max_retries: int = 5, max_row_errors: int = 1000, worker_timeout: float = 30.0) -> None:
+		self.path = path
+		self.workers = workers
+		self.max_retries = max_retries
+		self.max_row_errors = max_row_errors
+		self.worker_timeout = worker_timeout
+		self.instance = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+		self._lock = threading.Lock()
+		self._conn: Optional[sqlite3.Connection] = None
+		self._wakeup: Optional[asyncio.Event] = None
+		self._tasks: List[asyncio.Task] = []
+		self._keepalive_task: Optional[asyncio.Task] = None
+		self._watchers: List[Callable[[], None]] = []
+		self._stopping = False
+
+	# -- storage -----------------------------------------------------------------------------
+
+	def open(self) -> None:
+		if self._conn is not None:
+			return
+		conn = connect_private(self.path, check_same_thread=False)
+		conn.row_factory = sqlite3.Row
+		conn.execute("PRAGMA journal_mode=WAL")
+		conn.execute("PRAGMA synchronous=NORMAL")
+		conn.executescript(_SCHEMA)
+		for table, column, decl in _ADDED_COLUMNS:
+			if column not in {r["name"] for r in conn.execute(f"PRAGMA table_info({table})")}:
+				conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+		conn.execute("CREATE INDEX IF NOT EXISTS job_chunks_call ON job_chunks (call_id)")
+		with conn:
+			conn.execute("INSERT OR REPLACE INTO job_workers (id, pid, heartbeat) VALUES (?, ?, ?)", (self.instance, os.getpid(), time.time()))
+		self._conn = conn
+
+	def _heartbeat(self) -> None:
+		with self._lock, self._db() as db:
+			db.execute("INSERT OR REPLACE INTO job_workers (id, pid, heartbeat) VALUES (?, ?, ?)", (self.instance, os.getpid(), time.time()))
+
+	def _recover(self) -> None:
+		"""Settle the work of processes that stopped heartbeating (or never registered)."""
+		now = time.time()
+		dead = "worker IS NULL OR worker NOT IN (SELECT id FROM job_workers WHERE heartbeat >= ?)"
+		cutoff = now - self.worker_timeout
+		with self._lock, self._db() as db:
+			db.execute(
+				f"UPDATE job_chunks SET status = 'interrupted', error = 'Interrupted by restart; not resent to avoid duplicate calls' WHERE status = 'sending' AND ({dead})",
+				(cutoff,),
+			)
+			ingesting = [r["id"] for r in db.execute(f"SELECT id FROM jobs WHERE status = 'ingesting' AND ({dead})", (cutoff,))]
+			for job_id in ingesting:
+				db.execute("UPDATE job_chunks SET status = 'cancelled' WHERE job_id = ? AND status = 'pending'", (job_id,))
+				db.execute("UPDATE jobs SET status = 'failed', error = 'Ingest interrupted by restart', token = NULL, finished_at = ?, updated_at = ? WHERE id = ?", (now, now, job_id))
+			db.execute(
+				"UPDATE jobs SET status = 'completed', token = NULL, finished_at = ?, updated_at = ? WHERE status IN ('queued', 'running') "
+				"AND NOT EXISTS (SELECT 1 FROM job_chunks c WHERE c.job_id = jobs.id AND c.status IN ('pending', 'sending'))",
+				(now, now),
+			)
+			db.execute("DELETE FROM job_workers WHERE heartbeat < ?", (cutoff,))
+
+	def close(self) -> None:
+		with self._lock:
+			if self._conn is not None:
+				with self._conn:
+					self._conn.execute("DELETE FROM job_workers WHERE id = ?", (self.instance,))
+				self._conn.close()
+				self._conn = None
+
+	def _db(self) -> sqlite3.Connection:
+		if self._conn is None:
+			raise RuntimeError("Job queue is not started")
+		return self._conn
+
+	def _create_job(
+		self,
+		owner: str,
+		token: str,
+		kind: str,
+		assistant_id: str,
+		idempotency_key: Optional[str],
+		paced: bool = False,
+		phone_number_id: Optional[str] = None,
+		org_id: Optional[str] = None,
+	) -> Tuple[str, bool]:
+		"""Insert a job row; returns (job_id, created). An existing idempotency key wins."""
+		now = time.time()
+		job_id = uuid.uuid4().hex
+		with self._lock, self._db() as db:
+			if idempotency_key:
+				row = db.execute("SELECT id FROM jobs WHERE owner = ? AND idempotency_key = ?", (owner, idempotency_key)).fetchone()
+				if row is not None:
+					return row["id"], False
+			db.execute(
+				"INSERT INTO jobs (id, owner, kind, idempotency_key, token, assistant_id, status, created_at, updated_at, paced, phone_number_id, worker, org_id) "
+				"VALUES (?, ?, ?, ?, ?, ?, 'ingesting', ?, ?, ?, ?, ?, ?)",
+				(job_id, owner, kind, idempotency_key, token, assistant_id, now, now, int(paced), phone_number_id, self.instance, org_id),
+			)
+		return job_id, True
+
+	def _log_errors(self, db: sqlite3.Connection, job_id: str, errors: List[RowError]) -> None:
+		logged = db.execute("SELECT errors_logged FROM jobs WHERE id = ?", (job_id,)).fetchone()["errors_logged"]
+		room = max(self.max_row_errors - logged, 0)
+		if room:
+			db.executemany("INSERT INTO job_errors (job_id, row, error) VALUES (?, ?, ?)", [(job_id, e.row, e.error) for e in errors[:room]])
+		db.execute("UPDATE jobs SET errors_logged = errors_logged + ? WHERE id = ?", (len(errors), job_id))
+
+	def _ingest(self, job_id: str, items: Iterator[Union[RowError, Tuple[Any, List[ScheduleRow]]]], variable_values: Optional[Dict[str, Any]]) -> None:
+		seq = 0
+		items = iter(items)
+		# Several chunks per transaction: paced jobs write one chunk per customer.
+		while True:
+			batch = take(items, 64)
+			if not batch:
+				return
+			with self._lock, self._db() as db:
+				for item in batch:
+					if isinstance(item, RowError):
+						db.execute("UPDATE jobs SET rows = rows + 1, invalid = invalid + 1 WHERE id = ?", (job_id,))
+						self._log_errors(db, job_id, [item])
+						continue
+					(earliest_at, latest_at), rows = item
+					payload = {
+						"earliest_at": earliest_at.isoformat(),
+						"latest_at": latest_at.isoformat() if latest_at else None,
+						"customers": [{"row": r.row, "name": r.name, "number": r.number} for r in rows],
+						"variable_values": variable_values,
+					}
+					db.execute(
+						"INSERT INTO job_chunks (job_id, seq, status, size, payload, eligible_at) VALUES (?, ?, 'pending', ?, ?, ?)",
+						(job_id, seq, len(rows), json.dumps(payload), earliest_at.timestamp()),
+					)
+					db.execute("UPDATE jobs SET rows = rows + ? WHERE id = ?", (len(rows), job_id))
+					seq += 1
+
+	def _finish_ingest(self, job_id: str, error: Optional[str]) -> None:
+		now = time.time()
+		with self._lock, self._db() as db:
+			if error:
+				db.execute("UPDATE job_chunks SET status = 'cancelled' WHERE job_id = ? AND status = 'pending'", (job_id,))
+				db.execute("UPDATE jobs SET status = 'failed', error = ?, token = NULL, finished_at = ?, updated_at = ? WHERE id = ?", (error, now, now, job_id))
+			else:
+				db.execute("UPDATE jobs SET status = 'queued', updated_at = ? WHERE id = ?", (now, job_id))
+		self._maybe_finish(job_id)
+
+	def _delete_job(self, job_id: str) -> None:
+		with self._lock, self._db() as db:
+			for table, col in (("job_chunks", "job_id"), ("job_errors", "job_id"), ("jobs", "id")):
+				db.execute(f"DELETE FROM {table} WHERE {col} = ?", (job_id,))
+
+	def _maybe_finish(self, job_id: str) -> None:
+		now = time.time()
+		with self._lock, self._db() as db:
+			left = db.execute("SELECT COUNT(*) FROM job_chunks WHERE job_id = ? AND status IN ('pending', 'sending')", (job_id,)).fetchone()[0]
+			if not left:
+				db.execute(
+					"UPDATE jobs SET status = 'completed', token = NULL, finished_at = ?, updated_at = ? WHERE id = ? AND status IN ('queued', 'running')",
+					(now, now, job_id),
+				)
+
+	def _claim(self) -> Optional[Claim]:
+		"""Mark the next pending chunk as sending. Other processes may share the database, so the
+		update only wins while the chunk is still pending; on a lost race the next one is tried."""
+		with self._lock, self._db() as db:
+			while True:
+				row = db.execute(
+					"SELECT c.job_id, c.seq, c.payload, j.token, j.assistant_id, j.phone_number_id FROM job_chunks c JOIN jobs j ON j.id = c.job_id "
+					"WHERE c.status = 'pending' AND j.status IN ('queued', 'running') AND j.paced = 0 ORDER BY j.created_at, c.seq LIMIT 1"
+				).fetchone()
+				if row is None:
+					return None
+				cur = db.execute(
+					"UPDATE job_chunks SET status = 'sending', attempts = attempts + 1, worker = ? WHERE job_id = ? AND seq = ? AND status = 'pending'",
+					(self.instance, row["job_id"], row["seq"]),
+				)
+				if cur.rowcount == 1:
+					break
+			db.execute("UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ? AND status = 'queued'", (time.time(), row["job_id"]))
+			return row["job_id"], row["seq"], json.loads(row["payload"]), row["token"], row["assistant_id"], row["phone_number_id"]
+
+	def _complete_chunk(self, job_id: str, seq: int, customers: List[Dict[str, Any]], error: Optional[str], unknown: bool = False) -> None:
+		"""Record a sent chunk; one whose outcome is `unknown` is reported as interrupted."""
+		status = "interrupted" if unknown else "failed" if error else "done"
+		with self._lock, self._db() as db:
+			db.execute("UPDATE job_chunks SET status = ?, error = ? WHERE job_id = ? AND seq = ?", (status, error, job_id, seq))
+			if error:
+				self._log_errors(db, job_id, [RowError(row=c["row"], error=f"Batch create failed: {error}") for c in customers])
+			db.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (time.time(), job_id))
+		self._maybe_finish(job_id)
+
+	# -- paced dials -------------------------------------------------------------------------
+
+	def _paced_jobs(self) -> List[Dict[str, Any]]:
+		"""Paced jobs whose dials may be sent now."""
+		with self._lock:
+			rows = self._db().execute(
+				"SELECT id, owner, org_id, assistant_id, phone_number_id FROM jobs WHERE paced = 1 AND status IN ('queued', 'running')"
+			).fetchall()
+		return [dict(r) for r in rows]
+
+	def _pending_dials(self, job_id: str) -> List[Tuple[int, float, str, Optional[float]]]:
+		"""(seq, earliest epoch, number, latest epoch) of a paced job's undialed customers."""
+		with self._lock:
+			rows = self._db().execute("SELECT seq, eligible_at, payload FROM job_chunks WHERE job_id = ? AND status = 'pending'", (job_id,)).fetchall()
+		out = []
+		for row in rows:
+			payload = json.loads(row["payload"])
+			latest = datetime.fromisoformat(payload["latest_at"]).timestamp() if payload.get("latest_at") else None
+			out.append((row["seq"], row["eligible_at"], payload["customers"][0]["number"], latest))
+		return out
+
+	def _claim_dial(self, job_id: str, seq: int) -> Optional[Claim]:
+		"""Mark one paced customer as sending, unless it was cancelled or its job paused meanwhile."""
+		now = time.time()
+		with self._lock, self._db() as db:
+			row = db.execute(
+				"SELECT c.payload, j.token, j.assistant_id, j.phone_number_id FROM job_chunks c JOIN jobs j ON j.id = c.job_id "
+				"WHERE c.job_id = ? AND c.seq = ? AND c.status = 'pending' AND j.status IN ('queued', 'running')",
+				(job_id, seq),
+			).fetchone()
+			if row is None:
+				return None
+			cur = db.execute(
+				"UPDATE job_chunks SET status = 'sending', attempts = attempts + 1, dialed_at = ?, worker = ? WHERE job_id = ? AND seq = ? AND status = 'pending'",
+				(now, self.instance, job_id, seq),
+			)
+			if cur.rowcount != 1:
+				return None
+			db.execute("UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ? AND status = 'queued'", (now, job_id))
+			return job_id, seq, json.loads(row["payload"]), row["token"], row["assistant_id"], row["phone_number_id"]
+
+	def _dialed(self, job_id: str, seq: int, call_id: Optional[str], ended: bool) -> None:
+		with self._lock, self._db() as db:
+			db.execute(
+				"UPDATE job_chunks SET status = 'done', call_id = ?, ended_at = ? WHERE job_id = ? AND seq = ?",
+				(call_id, time.time() if ended else None, job_id, seq),
+			)
+			db.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (time.time(), job_id))
+		self._maybe_finish(job_id)
+
+	def _dial_failed(self, job_id: str, seq: int, row: Optional[int], error: str, unknown: bool = False) -> None:
+		"""Record a paced customer that could not be dialed, or whose window passed first; one
+		whose dial may have gone through (`unknown`) is reported as interrupted."""
+		with self._lock, self._db() as db:
+			if row is None:
+				payload = db.execute("SELECT payload FROM job_chunks WHERE job_id = ? AND seq = ?", (job_id, seq)).fetchone()["payload"]
+				row = json.loads(payload)["customers"][0]["row"]
+			db.execute(
+				"UPDATE job_chunks SET status = ?, error = ? WHERE job_id = ? AND seq = ? AND status IN ('pending', 'sending')",
+				("interrupted" if unknown else "failed", error, job_id, seq),
+			)
+			self._log_errors(db, job_id, [RowError(row=row, error=error)])
+			db.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (time.time(), job_id))
+		self._maybe_finish(job_id)
+
+	def _calls_ended(self, call_ids: List[str]) -> None:
+		now = time.time()
+		with self._lock, self._db() as db:
+			db.executemany("UPDATE job_chunks SET ended_at = ? WHERE call_id = ? AND ended_at IS NULL", [(now, c) for c in call_ids])
+
+	def _live_dials(self, since: float) -> List[Dict[str, Any]]:
+		"""Calls dialed by the pacer after `since` that have not been seen ending."""
+		with self._lock:
+			rows = self._db().execute(
+				"SELECT c.call_id, c.dialed_at, j.owner, j.org_id, j.token, j.assistant_id, j.phone_number_id FROM job_chunks c JOIN jobs j ON j.id = c.job_id "
+				"WHERE j.paced = 1 AND c.call_id IS NOT NULL AND c.ended_at IS NULL AND c.dialed_at > ?",
+				(since,),
+			).fetchall()
+		return [dict(r) for r in rows]
+
+	def _snapshot(self, job_id: str, owner: str) -> Optional[Dict[str, Any]]:
+		with self._lock:
+			db = self._db()
+			job = db.execute("SELECT * FROM jobs WHERE id = ? AND owner = ?", (job_id, owner)).fetchone()
+			if job is None:
+				return None
+			counts = {r["status"]: r["n"] for r in db.execute("SELECT status, SUM(size) AS n FROM job_chunks WHERE job_id = ? GROUP BY status", (job_id,))}
+			chunks = db.execute("SELECT COUNT(*) FROM job_chunks WHERE job_id = ?", (job_id,)).fetchone()[0]
+			errors = [{"row": r["row"], "error": r["error"]} for r in db.execute("SELECT row, error FROM job_errors WHERE job_id = ? ORDER BY rowid", (job_id,))]
+			live = db.execute(
+				"SELECT COUNT(*) FROM job_chunks WHERE job_id = ? AND call_id IS NOT NULL AND ended_at IS NULL", (job_id,)
+			).fetchone()[0] if job["paced"] else 0
+		return {
+			"jobId": job["id"],
+			"kind": job["kind"],
+			"status": job["status"],
+			"assistantId": job["assistant_id"],
+			"phoneNumberId": job["phone_number_id"],
+			"paced": bool(job["paced"]),
+			"idempotencyKey": job["idempotency_key"],
+			"rows": job["rows"],
+			"created": counts.get("done", 0),
+			"failed": counts.get("failed", 0) + job["invalid"],
+			"invalid": job["invalid"],
+			"pending": counts.get("pending", 0) + counts.get("sending", 0),
+			"interrupted": counts.get("interrupted", 0),
+			"live": live,
+			"cancelled": counts.get("cancelled", 0),
+			"batches": chunks,
+			"errors": errors,
+			"errorsTruncated": job["errors_logged"] > len(errors),
+			"error": job["error"],
+			"createdAt": job["created_at"],
+			"updatedAt": job["updated_at"],
+			"finishedAt": job["finished_at"],
+		}
+
+	def _list(self, owner: str, limit: int) -> List[str]:
+		with self._lock:
+			rows = self._db().execute("SELECT id FROM jobs WHERE owner = ? ORDER BY created_at DESC LIMIT ?", (owner, limit)).fetchall()
+		return [r["id"] for r in rows]
+
+	def _transition(self, job_id: str, owner: str, action: str) -> bool:
+		now = time.time()
+		with self._lock, self._db() as db:
+			if action == "pause":
+				cur = db.execute("UPDATE jobs SET status = 'paused', updated_at = ? WHERE id = ? AND owner = ? AND status IN ('queued', 'running')", (now, job_id, owner))
+			elif action == "resume":
+				cur = db.execute("UPDATE jobs SET status = 'queued', updated_at = ? WHERE id = ? AND owner = ? AND status = 'paused'", (now, job_id, owner))
+			else:
+				cur = db.execute(
+					"UPDATE jobs SET status = 'cancelled', token = NULL, finished_at = ?, updated_at = ? WHERE id = ? AND owner = ? AND status IN ('queued', 'running', 'paused')",
+					(now, now, job_id, owner),
+				)
+				if cur.rowcount:
+					db.execute("UPDATE job_chunks SET status = 'cancelled' WHERE job_id = ? AND status = 'pending'", (job_id,))
+			changed = cur.rowcount > 0
+		if changed and action == "resume":
+			self._maybe_finish(job_id)
+		return changed
+
+	# -- async API ---------------------------------------------------------------------------
+
+	def add_watcher(self, fn: Callable[[], None]) -> None:
+		"""Call `fn()` whenever jobs are submitted or change state."""
+		self._watchers.append(fn)
+
+	def _notify(self) -> None:
+		if self._wakeup is not None:
+			self._wakeup.set()
+		for fn in self._watchers:
+			fn()
+
+	async def submit_rows(
+		self,
+		token: str,
+		assistant_id: str,
+		rows: Iterator[Union[ScheduleRow, RowError]],
+		kind: str = "upload",
+		chunk_size: int = 500,
+		max_open_windows: int = 1000,
+		variable_values: Optional[Dict[str, Any]] = None,
+		idempotency_key: Optional[str] = None,
+		paced: bool = False,
+		phone_number_id: Optional[str] = None,
+	) -> Dict[str, Any]:
+		"""Persist a submission as chunks and return its snapshot.
+
+		Chunks are sent to Vapi with their schedule window, unless the job is `paced`: then each
+		customer is its own chunk, dialed by the pacer within calling hours and concurrency limits.
+		A repeated idempotency key returns the existing job without reading `rows`.
+		Raises ScheduleFileError for unusable input; nothing is stored in that case.
+		"""
+		owner = token_key(token)
+		# Paced limits are per Vapi org, which several tokens may share.
+		org_id = await org_id_for(token) if paced else None
+		job_id, created = await asyncio.to_thread(self._create_job, owner, token, kind, assistant_id, idempotency_key, paced, phone_number_id, org_id)
+		if created:
+			items = iter_window_chunks(rows, 1 if paced else chunk_size, max_open_windows)
+			try:
+				await asyncio.to_thread(self._ingest, job_id, items, variable_values)
+			except ScheduleFileError:
+				await asyncio.to_thread(self._delete_job, job_id)
+				raise
+			except Exception as e:
+				await asyncio.to_thread(self._finish_ingest, job_id, f"Ingest failed: {e}")
+			else:
+				snapshot = await self.get(job_id, token)
+				if snapshot is not None and not snapshot["rows"]:
+					await asyncio.to_thread(self._delete_job, job_id)
+					raise ScheduleFileError("No valid rows found")
+				await asyncio.to_thread(self._finish_ingest, job_id, None)
+			self._notify()
+		snapshot = await self.get(job_id, token)
+		assert snapshot is not None
+		return snapshot
+
+	async def get(self, job_id: str, token: str) -> Optional[Dict[str, Any]]:
+		return await asyncio.to_thread(self._snapshot, job_id, token_key(token))
+
+	async def list_jobs(self, token: str, limit: int = 50) -> List[Dict[str, Any]]:
+		owner = token_key(token)
+		ids = await asyncio.to_thread(self._list, owner, limit)
+		out = [await asyncio.to_thread(self._snapshot, job_id, owner) for job_id in ids]
+		return [s for s in out if s is not None]
+
+	async def transition(self, job_id: str, token: str, action: str) -> Optional[Dict[str, Any]]:
+		"""Apply pause/resume/cancel; returns None if the job is unknown, else its snapshot."""
+		if await asyncio.to_thread(self._transition, job_id, token_key(token), action):
+			self._notify()
+		return await self.get(job_id, token)
+
+	async def _send(self, claim: Claim) -> None:
+		job_id, seq, payload, token, assistant_id, phone_number_id = claim
+		customers = payload["customers"]
+		error: Optional[str] = None
+		unknown = False
+		try:
+			window = (
+				datetime.fromisoformat(payload["earliest_at"]),
+				datetime.fromisoformat(payload["latest_at"]) if payload.get("latest_at") else None,
+			)
+			client = async_vapi_registry.get(token)
+			with upstream_priority(Priority.BULK):
+				await create_chunk(client, assistant_id, window, customers, payload.get("variable_values"), self.max_retries, phone_number_id)
+		except asyncio.CancelledError:
+			raise
+		except DialOutcomeUnknown as e:
+			error, unknown = str(e), True
+		except Exception as e:
+			error = str(e) or e.__class__.__name__
+		# The chunk was sent, so its outcome must be recorded rather than the chunk resent; a
+		# chunk left 'sending' by a live worker is never recovered.
+		delay = 0.5
+		while True:
+			try:
+				await asyncio.to_thread(self._complete_chunk, job_id, seq, customers, error, unknown)
+				return
+			except sqlite3.Error as e:
+				log.warning("recording chunk %s/%s failed, retrying in %.1fs: %s", job_id, seq, delay, e)
+			await asyncio.sleep(delay)
+			delay = min(delay * 2, 30.0)
+
+	async def _worker(self) -> None:
+		assert self._wakeup is not None
+		delay = 0.5
+		while not self._stopping:
+			try:
+				claim = await asyncio.to_thread(self._claim)
+				if claim is None:
+					self._wakeup.clear()
+					try:
+						await asyncio.wait_for(self._wakeup.wait(), timeout=2.0)
+					except asyncio.TimeoutError:
+						pass
+					continue
+				await self._send(claim)
+				delay = 0.5
+			except asyncio.CancelledError:
+				raise
+			except Exception:
+				log.exception("job worker failed, retrying in %.1fs", delay)
+				await asyncio.sleep(delay)
+				delay = min(delay * 2, 30.0)
+
+	async def _keepalive(self) -> None:
+		"""Heartbeat, and recover after processes that stopped, every sixth of `worker_timeout`."""
+		while True:
+			await asyncio.sleep(self.worker_timeout / 6)
+			try:
+				await asyncio.to_thread(self._heartbeat)
+				await asyncio.to_thread(self._recover)
+			except sqlite3.Error as e:
+				log.warning("job queue heartbeat failed: %s", e)
+
+	async def start(self) -> None:
+		await asyncio.to_thread(self.open)
+		await asyncio.to_thread(self._recover)
+		self._stopping = False
+		self._wakeup = asyncio.Event()
+		self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+		self._keepalive_task = asyncio.create_task(self._keepalive())
+
+	async def stop(self, grace: float = 10.0) -> None:
+		"""Stop claiming, give in-flight chunks `grace` seconds, then cancel. Cancelled chunks are
+		interrupted by the next recovery pass, here or in another process."""
+		self._stopping = True
+		self._notify()
+		if self._tasks:
+			await asyncio.wait(self._tasks, timeout=grace)
+		for task in self._tasks:
+			task.cancel()
+		await asyncio.gather(*self._tasks, return_exceptions=True)
+		self._tasks = []
+		if self._keepalive_task is not None:
+			self._keepalive_task.cancel()
+			await asyncio.gather(self._keepalive_task, return_exceptions=True)
+			self._keepalive_task = None
+		self.close()
+
+
+job_queue = JobQueue(
+	os.path.join(settings.DATA_DIR, "jobs.sqlite3"),
+	workers=settings.SCHEDULE_CONCURRENCY,
+	max_retries=settings.SCHEDULE_MAX_RETRIES,
+	worker_timeout=settings.SCHEDULE_WORKER_TIMEOUT_SECONDS,
+)
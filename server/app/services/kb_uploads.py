@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+
+import httpx
+
+from ..config import settings
+from .http import get_http_client
+from .metrics import track_upstream
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+	org_id TEXT NOT NULL,
+	kb_id TEXT NOT NULL,
+	sha256 TEXT NOT NULL,
+	document_id TEXT,
+	filename TEXT,
+	size INTEGER NOT NULL,
+	uploaded_at REAL NOT NULL,
+	PRIMARY KEY (org_id, kb_id, sha256)
+);
+CREATE INDEX IF NOT EXISTS documents_id ON documents (org_id, kb_id, document_id);
+"""
+
+
+class UploadRejected(Exception):
+	"""The body did not match the client's declared hash or size; nothing was forwarded complete."""
+
+
+class _Duplicate(Exception):
+	def __init__(self, existing: Dict[str, Any]) -> None:
+		self.existing = existing
+
+
+class DocumentHashes:
+	"""(org, knowledge base, sha256) -> uploaded document, so identical re-uploads are skipped."""
+
+	def __init__(self, path: str) -> None:
+		self.path = path
+		self._lock = threading.Lock()
+		self._conn: Optional[sqlite3.Connection] = None
+
+	def _db(self) -> sqlite3.Connection:
+		if self._conn is None:
+			os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+			conn = sqlite3.connect(self.path, check_same_thread=False)
+			conn.row_factory = sqlite3.Row
+			conn.execute("PRAGMA journal_mode=WAL")
+			conn.execute("PRAGMA synchronous=NORMAL")
+			conn.executescript(_SCHEMA)
+			self._conn = conn
+		return self._conn
+
+	def get(self, org_id: str, kb_id: str, sha: str) -> Optional[Dict[str, Any]]:
+		with self._lock:
+			row = self._db().execute(
+				"SELECT document_id, filename, size, uploaded_at FROM documents WHERE org_id = ? AND kb_id = ? AND sha256 = ?",
+				(org_id, kb_id, sha),
+			).fetchone()
+		if row is None:
+			return None
+		return {"documentId": row["document_id"], "filename": row["filename"], "bytes": row["size"], "uploadedAt": row["uploaded_at"]}
+
+	def put(self, org_id: str, kb_id: str, sha: str, document_id: Optional[str], filename: Optional[str], size: int) -> None:
+		with self._lock, self._db() as db:
+			db.execute(
+				"INSERT OR REPLACE INTO documents (org_id, kb_id, sha256, document_id, filename, size, uploaded_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+				(org_id, kb_id, sha, document_id, filename, size, time.time()),
+			)
+
+	def forget(self, org_id: str, kb_id: str, document_id: str) -> None:
+		with self._lock, self._db() as db:
+			db.execute("DELETE FROM documents WHERE org_id = ? AND kb_id = ? AND document_id = ?", (org_id, kb_id, document_id))
+
+	def count(self) -> int:
+		with self._lock:
+			return self._db().execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+	def close(self) -> None:
+		with self._lock:
+			if self._conn is not None:
+				self._conn.close()
+				self._conn = None
+
+
+def _document_id(payload: Any) -> Optional[str]:
+	if not isinstance(payload, dict):
+		return None
+	for key in ("documentId", "id", "fileId"):
+		if payload.get(key):
+			return str(payload[key])
+	for key in ("document", "file"):
+		if isinstance(payload.get(key), dict):
+			return _document_id(payload[key])
+	return None
+
+
+def _quote(value: str) -> str:
+	return value.replace("\\", "\\\\").replace('"', '\\"').replace("\r", " ").replace("\n", " ")
+
+
+class KnowledgeBaseUploader:
+	"""Streams documents to the KB docs webhook as multipart, without holding them in memory.
+
+	The multipart envelope is written around the caller's chunks as they are read, so only one
+	chunk per upload is resident. Documents are deduplicated by SHA-256 per org and knowledge
+	base: when the hash is known up front the webhook is not contacted at all, otherwise it is
+	computed while streaming and a duplicate is abandoned before the closing boundary, so the
+	webhook never receives a complete upload. Identical uploads in flight share one request.
+	"""
+
+	def __init__(self, hashes: DocumentHashes, concurrency: int = 4, chunk_bytes: int = 256 * 1024, timeout: float = 300.0) -> None:
+		self.hashes = hashes
+		self.concurrency = concurrency
+		self.chunk_bytes = chunk_bytes
+		self.timeout = timeout
+		self._semaphore: Optional[asyncio.Semaphore] = None
+		self._inflight: Dict[Tuple[str, str, str], asyncio.Future] = {}
+		self.uploads = 0
+		self.uploaded_bytes = 0
+		self.duplicates = 0
+
+	def _slots(self) -> asyncio.Semaphore:
+		if self._semaphore is None:
+			self._semaphore = asyncio.Semaphore(self.concurrency)
+		return self._semaphore
+
+	async def _duplicate_of(self, org_id: str, kb_id: str, sha: str) -> Optional[Dict[str, Any]]:
+		pending = self._inflight.get((org_id, kb_id, sha))
+		if pending is not None:
+			await asyncio.shield(pending)
+		return await asyncio.to_thread(self.hashes.get, org_id, kb_id, sha)
+
+	async def upload(
+		self,
+		org_id: str,
+		token: str,
+		kb_id: str,
+		filename: str,
+		content_type: str,
+		chunks: AsyncIterator[bytes],
+		sha256: Optional[str] = None,
+		size: Optional[int] = None,
+		progress: Optional[Callable[[int], None]] = None,
+	) -> Dict[str, Any]:
+		"""Forward one document; returns {status: uploaded|duplicate, sha256, bytes, documentId, response?}.
+
+		`sha256` and `size`, when given, are checked against the streamed bytes (UploadRejected on
+		mismatch); a known `sha256` short-circuits the upload without reading `chunks`.
+		"""
+		if not sha256:
+			async with self._slots():
+				return await self._send(org_id, token, kb_id, filename, content_type, chunks, None, size, progress)
+		sha256 = sha256.lower()
+		key = (org_id, kb_id, sha256)
+		while True:
+			existing = await self._duplicate_of(org_id, kb_id, sha256)
+			if existing is not None:
+				self.duplicates += 1
+				return {"status": "duplicate", "sha256": sha256, **existing}
+			if key not in self._inflight:
+				break
+		done = self._inflight[key] = asyncio.get_running_loop().create_future()
+		try:
+			async with self._slots():
+				return await self._send(org_id, token, kb_id, filename, content_type, chunks, sha256, size, progress)
+		finally:
+			self._inflight.pop(key, None)
+			done.set_result(None)
+
+	async def _send(
+		self,
+		org_id: str,
+		token: str,
+		kb_id: str,
+		filename: str,
+		content_type: str,
+		chunks: AsyncIterator[bytes],
+		sha256: Optional[str],
+		size: Optional[int],
+		progress: Optional[Callable[[int], None]],
+	) -> Dict[str, Any]:
+		boundary = uuid.uuid4().hex
+		head = (
+			f"--{boundary}\r\nContent-Disposition: form-data; name=\"action\"\r\n\r\nupload\r\n"
+			f"--{boundary}\r\nContent-Disposition: form-data; name=\"knowledgeBaseId\"\r\n\r\n{kb_id}\r\n"
+			f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{_quote(filename)}\"\r\n"
+			f"Content-Type: {content_type}\r\n\r\n"
+		).encode("utf-8")
+		tail = f"\r\n--{boundary}--\r\n".encode("ascii")
+		digest = hashlib.sha256()
+		sent = 0
+
+		async def body() -> AsyncIterator[bytes]:
+			nonlocal sent
+			yield head
+			async for chunk in chunks:
+				if not chunk:
+					continue
+				digest.update(chunk)
+				sent += len(chunk)
+				if size is not None and sent > size:
+					raise UploadRejected(f"Body is larger than the declared {size} bytes")
+				yield chunk
+				if progress is not None:
+					progress(sent)
+			if size is not None and sent != size:
+				raise UploadRejected(f"Body is {sent} bytes, declared {size}")
+			actual = digest.hexdigest()
+			if sha256 and actual != sha256:
+				raise UploadRejected(f"Body SHA-256 {actual} does not match the declared {sha256}")
+			if not sha256:
+				existing = await asyncio.to_thread(self.hashes.get, org_id, kb_id, actual)
+				if existing is not None:
+					raise _Duplicate(existing)
+			yield tail
+
+		headers = {"content-type": f"multipart/form-data; boundary={boundary}", "x-vapi-token": token}
+		if size is not None:
+			headers["content-length"] = str(len(head) + size + len(tail))
+		try:
+			with track_upstream("kb_webhook", "documents.upload"):
+				r = await get_http_client().post(
+					settings.KB_DOCS_WEBHOOK_URL,
+					content=body(),
+					headers=headers,
+					timeout=httpx.Timeout(self.timeout, connect=10.0),
+				)
+				r.raise_for_status()
+		except _Duplicate as dup:
+			self.duplicates += 1
+			return {"status": "duplicate", "sha256": digest.hexdigest(), **dup.existing}
+		payload = r.json()
+		sha = digest.hexdigest()
+		document_id = _document_id(payload)
+		await asyncio.to_thread(self.hashes.put, org_id, kb_id, sha, document_id, filename, sent)
+		self.uploads += 1
+		self.uploaded_bytes += sent
+		return {"status": "uploaded", "sha256": sha, "bytes": sent, "documentId": document_id, "response": payload}
+
+	def stats(self) -> Dict[str, Any]:
+		return {
+			"documents": self.hashes.count(),
+			"uploads": self.uploads,
+			"uploadedBytes": self.uploaded_bytes,
+			"duplicates": self.duplicates,
+			"inflight": len(self._inflight),
+		}
+
+
+kb_uploader = KnowledgeBaseUploader(
+	DocumentHashes(os.path.join(settings.DATA_DIR, "kb_documents.sqlite3")),
+	concurrency=settings.KB_UPLOAD_CONCURRENCY,
+	chunk_bytes=settings.KB_UPLOAD_CHUNK_BYTES,
+	timeout=settings.KB_UPLOAD_TIMEOUT,
+)
@@ -0,0 +1,339 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import anyio.to_thread
+import httpx
+
+from .governor import upstream_governor
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+	return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+	parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+	if extra:
+		parts.append(extra)
+	return "{%s}" % ",".join(parts) if parts else ""
+
+
+def _format_value(value: float) -> str:
+	if value == float("inf"):
+		return "+Inf"
+	return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+	kind = ""
+
+	def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+		self.name = name
+		self.help = help
+		self.labels = tuple(labels)
+		self._lock = threading.Lock()
+
+	def render(self) -> List[str]:
+		return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+	def _samples(self) -> Iterable[str]:
+		raise NotImplementedError
+
+
+class Counter(_Metric):
+	kind = "counter"
+
+	def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+		super().__init__(name, help, labels)
+		self._values: Dict[Labels, float] = {}
+
+	def inc(self, labels: Labels = (), amount: float = 1.0) -> None:
+		with self._lock:
+			self._values[labels] = self._values.get(labels, 0.0) + amount
+
+	def _samples(self) -> Iterable[str]:
+		with self._lock:
+			items = list(self._values.items())
+		for labels, value in items:
+			yield f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+	"""Gauge set directly, or computed at scrape time by `collect` returning (labels, value) pairs."""
+
+	kind = "gauge"
+
+	def __init__(self, name: str, help: str, labels: Sequence[str] = (), collect: Optional[Callable[[], Iterable[Tuple[Labels, float]]]] = None) -> None:
+		super().__init__(name, help, labels)
+		self._values: Dict[Labels, float] = {}
+		self._collect = collect
+
+	def inc(self, labels: Labels = (), amount: float = 1.0) -> None:
+		with self._lock:
+			self._values[labels] = self._values.get(labels, 0.0) + amount
+
+	def dec(self, labels: Labels = (), amount: float = 1.0) -> None:
+		self.inc(labels, -amount)
+
+	def _samples(self) -> Iterable[str]:
+		if self._collect is not None:
+			items = list(self._collect())
+		else:
+			with self._lock:
+				items = list(self._values.items())
+		for labels, value in items:
+			yield f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+	kind = "histogram"
+
+	def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+		super().__init__(name, help, labels)
+		self.buckets = tuple(buckets)
+		# Per label set: [count per bucket..., count above the last bucket, sum]
+		self._values: Dict[Labels, List[float]] = {}
+
+	def observe(self, value: float, labels: Labels = ()) -> None:
+		i = bisect_left(self.buckets, value)
+		with self._lock:
+			row = self._values.get(labels)
+			if row is None:
+				row = self._values[labels] = [0.0] * (len(self.buckets) + 2)
+			row[i] += 1
+			row[-1] += value
+
+	@contextlib.contextmanager
+	def time(self, labels: Labels = ()) -> Iterator[None]:
+		started = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.observe(time.perf_counter() - started, labels)
+
+	def _samples(self) -> Iterable[str]:
+		with self._lock:
+			items = [(labels, list(row)) for labels, row in self._values.items()]
+		for labels, row in items:
+			cumulative = 0.0
+			for bound, count in zip(self.buckets + (float("inf"),), row[:-1]):
+				cumulative += count
+				le = 'le="%s"' % _format_value(bound)
+				yield f"{self.name}_bucket{_format_labels(self.labels, labels, le)} {_format_value(cumulative)}"
+			yield f"{self.name}_sum{_format_labels(self.labels, labels)} {_format_value(row[-1])}"
+			yield f"{self.name}_count{_format_labels(self.labels, labels)} {_format_value(cumulative)}"
+
+
+class MetricsRegistry:
+	def __init__(self) -> None:
+		self._metrics: List[_Metric] = []
+
+	def register(self, metric: _Metric) -> Any:
+		self._metrics.append(metric)
+		return metric
+
+	def render(self) -> str:
+		lines: List[str] = []
+		for metric in self._metrics:
+			try:
+				lines.extend(metric.render())
+			except Exception as e:
+				lines.append(f"# {metric.name} collection failed: {_escape(str(e))}")
+		return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.register(Counter("http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status")))
+http_duration = registry.register(Histogram("http_request_duration_seconds", "HTTP request latency until the last body byte.", ("method", "route")))
+http_in_flight = registry.register(Gauge("http_requests_in_flight", "HTTP requests being served."))
+http_request_size = registry.register(Histogram("http_request_size_bytes", "Request body size from Content-Length.", ("method", "route"), SIZE_BUCKETS))
+http_response_size = registry.register(Histogram("http_response_size_bytes", "Response body bytes sent.", ("method", "route"), SIZE_BUCKETS))
+upstream_duration = registry.register(Histogram("upstream_request_duration_seconds", "Upstream latency until response headers, excluding governor queueing.", ("upstream", "operation")))
+upstream_in_flight = registry.register(Gauge("upstream_requests_in_flight", "Upstream requests awaiting a response.", ("upstream",)))
+upstream_errors = registry.register(Counter("upstream_errors_total", "Upstream error responses (by status) and transport failures (by exception).", ("upstream", "operation", "reason")))
+upstream_response_size = registry.register(Histogram("upstream_response_size_bytes", "Upstream response body bytes.", ("upstream", "operation"), SIZE_BUCKETS))
+sdk_duration = registry.register(Histogram("vapi_sdk_call_duration_seconds", "Wall time of Vapi SDK calls: governor queueing, request and model parsing.", ("operation",)))
+serialization_duration = registry.register(Histogram("serialization_duration_seconds", "Time converting SDK models to dicts (.dict()), per operation.", ("operation",)))
+
+
+# -- ASGI middleware ---------------------------------------------------------------------------
+
+
+class MetricsMiddleware:
+	"""Record latency, status, in-flight and payload sizes per FastAPI route template.
+
+	Unrouted paths share one `unmatched` label so URLs cannot blow up label cardinality.
+	Streaming responses (SSE, NDJSON) are timed until their last byte.
+	"""
+
+	def __init__(self, app: Any) -> None:
+		self.app = app
+
+	async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+		if scope["type"] != "http":
+			await self.app(scope, receive, send)
+			return
+		started = time.perf_counter()
+		status = 500
+		sent = 0
+
+		async def send_wrapper(message: Dict[str, Any]) -> None:
+			nonlocal status, sent
+			if message["type"] == "http.response.start":
+				status = message["status"]
+			elif message["type"] == "http.response.body":
+				sent += len(message.get("body", b""))
+			elif message["type"] == "http.response.zerocopysend":
+				sent += message.get("count") or 0
+			await send(message)
+
+		http_in_flight.inc()
+		try:
+			await self.app(scope, receive, send_wrapper)
+		finally:
+			http_in_flight.dec()
+			method = scope["method"]
+			route = getattr(scope.get("route"), "path", None) or "unmatched"
+			http_requests.inc((method, route, str(status)))
+			http_duration.observe(time.perf_counter() - started, (method, route))
+			http_response_size.observe(sent, (method, route))
+			for name, value in scope.get("headers") or ():
+				if name == b"content-length":
+					try:
+						http_request_size.observe(int(value), (method, route))
+					except ValueError:
+						pass
+					break
+
+
+# -- upstream instrumentation ------------------------------------------------------------------
+
+
+def vapi_operation(method: str, path: str) -> str:
+	"""SDK-style operation name for a Vapi REST call, e.g. GET /call -> calls.list."""
+	parts = [p for p in path.split("/") if p]
+	if not parts:
+		return "other"
+	resource = parts[0].replace("-", "_")
+	if not resource.endswith("s"):
+		resource += "s"
+	if len(parts) == 1:
+		verb = {"GET": "list", "POST": "create"}.get(method, method.lower())
+	elif len(parts) == 2:
+		verb = {"GET": "get", "PATCH": "update", "PUT": "update", "DELETE": "delete"}.get(method, method.lower())
+	else:
+		verb = method.lower()
+	return f"{resource}.{verb}"
+
+
+@contextlib.contextmanager
+def track_upstream(upstream: str, operation: str) -> Iterator[None]:
+	"""Time one upstream call and count it as an error if it raises."""
+	started = time.perf_counter()
+	upstream_in_flight.inc((upstream,))
+	try:
+		yield
+	except BaseException as e:
+		status = e.response.status_code if isinstance(e, httpx.HTTPStatusError) else None
+		upstream_errors.inc((upstream, operation, str(status) if status else type(e).__name__))
+		raise
+	finally:
+		upstream_in_flight.dec((upstream,))
+		upstream_duration.observe(time.perf_counter() - started, (upstream, operation))
+
+
+class _CountingStream(httpx.AsyncByteStream):
+	def __init__(self, stream: httpx.AsyncByteStream, labels: Labels) -> None:
+		self._stream = stream
+		self._labels = labels
+		self._size = 0
+
+	async def __aiter__(self) -> AsyncIterator[bytes]:
+		async for chunk in self._stream:
+			self._size += len(chunk)
+			yield chunk
+
+	async def aclose(self) -> None:
+		try:
+			await self._stream.aclose()
+		finally:
+			upstream_response_size.observe(self._size, self._labels)
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+	"""httpx transport recording per-operation upstream latency, errors and response sizes."""
+
+	def __init__(self, transport: httpx.AsyncBaseTransport, upstream: str = "vapi") -> None:
+		self._transport = transport
+		self.upstream = upstream
+
+	async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+		operation = vapi_operation(request.method, request.url.path)
+		with track_upstream(self.upstream, operation):
+			response = await self._transport.handle_async_request(request)
+		if response.status_code >= 400:
+			upstream_errors.inc((self.upstream, operation, str(response.status_code)))
+		return httpx.Response(
+			status_code=response.status_code,
+			headers=response.headers,
+			stream=_CountingStream(response.stream, (self.upstream, operation)),
+			extensions=response.extensions,
+		)
+
+	async def aclose(self) -> None:
+		await self._transport.aclose()
+
+
+def timed_sdk(operation: str) -> contextlib.AbstractContextManager:
+	"""Time an awaited SDK call; compare with upstream_request_duration_seconds for SDK overhead."""
+	return sdk_duration.time((operation,))
+
+
+def timed_serialization(operation: str) -> contextlib.AbstractContextManager:
+	"""Time our own model-to-dict conversion, separately from the SDK request."""
+	return serialization_duration.time((operation,))
+
+
+# -- scrape-time gauges ------------------------------------------------------------------------
+
+
+def _threadpool_samples() -> Iterable[Tuple[Labels, float]]:
+	try:
+		loop = asyncio.get_running_loop()
+	except RuntimeError:
+		return
+	limiter = anyio.to_thread.current_default_thread_limiter()
+	yield ("anyio", "limit"), limiter.total_tokens
+	yield ("anyio", "busy"), limiter.borrowed_tokens
+	yield ("anyio", "waiting"), limiter.statistics().tasks_waiting
+	# asyncio.to_thread (SQLite stores) runs on the loop's default executor.
+	executor = getattr(loop, "_default_executor", None)
+	if executor is not None:
+		yield ("asyncio", "limit"), getattr(executor, "_max_workers", 0)
+		yield ("asyncio", "threads"), len(getattr(executor, "_threads", ()))
+		queue = getattr(executor, "_work_queue", None)
+		if queue is not None:
+			yield ("asyncio", "waiting"), queue.qsize()
+
+
+def _governor_samples() -> Iterable[Tuple[Labels, float]]:
+	stats = upstream_governor.stats()
+	for key in ("tokens", "inflight", "queued", "throttled"):
+		yield (key,), stats[key]
+
+
+registry.register(Gauge("threadpool_workers", "Worker threads by pool and state (limit, busy/threads, waiting).", ("pool", "state"), collect=_threadpool_samples))
+registry.register(Gauge("vapi_governor", "Upstream governor totals across tokens.", ("field",), collect=_governor_samples))
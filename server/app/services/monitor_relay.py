@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import sys
+from array import array
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Set, Tuple, Union
+
+import websockets
+
+from ..config import settings
+
+
+log = logging.getLogger(__name__)
+
+Frame = Union[bytes, str]
+Variant = Tuple[str, int]  # (format, sample rate)
+
+FORMATS = ("pcm16", "mulaw")
+
+_ULAW: Optional[bytes] = None
+
+
+def _ulaw_table() -> bytes:
+	"""G.711 mu-law byte for every 16-bit sample, indexed by the sample as unsigned."""
+	global _ULAW
+	if _ULAW is None:
+		table = bytearray(65536)
+		for u in range(65536):
+			s = u - 65536 if u >= 32768 else u
+			sign = 0x80 if s < 0 else 0
+			magnitude = min(abs(s), 32635) + 0x84
+			exponent = max((magnitude >> 7).bit_length() - 1, 0)
+			mantissa = (magnitude >> (exponent + 3)) & 0x0F
+			table[u] = ~(sign | (exponent << 4) | mantissa) & 0xFF
+		_ULAW = bytes(table)
+	return _ULAW
+
+
+def encode_frame(pcm: bytes, source_rate: int, variant: Variant) -> bytes:
+	"""Convert one s16le mono frame to `variant`: box-filter decimation, then optional mu-law."""
+	fmt, rate = variant
+	if fmt == "pcm16" and rate == source_rate:
+		return pcm
+	samples = array("h")
+	samples.frombytes(pcm[: len(pcm) - len(pcm) % 2])
+	if sys.byteorder == "big":
+		samples.byteswap()
+	factor = source_rate // rate
+	if factor > 1:
+		samples = array("h", [sum(group) // factor for group in zip(*(samples[k::factor] for k in range(factor)))])
+	if fmt == "mulaw":
+		table = _ulaw_table()
+		return bytes(table[s & 0xFFFF] for s in samples)
+	if sys.byteorder == "big":
+		samples.byteswap()
+	return samples.tobytes()
+
+
+def parse_variant(fmt: str, rate: Optional[int], source_rate: int) -> Variant:
+	if fmt not in FORMATS:
+		raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+	rate = rate or (8000 if fmt == "mulaw" else source_rate)
+	if rate <= 0 or rate > source_rate or source_rate % rate:
+		raise ValueError(f"rate must divide the source rate of {source_rate} Hz")
+	return fmt, rate
+
+
+class Listener:
+	"""One supervisor's socket: a bounded frame queue that drops the oldest frame when full."""
+
+	def __init__(self, variant: Variant, max_frames: int) -> None:
+		self.variant = variant
+		self.frames: Deque[Frame] = deque(maxlen=max_frames)
+		self.ready = asyncio.Event()
+		self.dropped = 0
+		self.sent = 0
+
+	def push(self, frame: Frame) -> None:
+		if len(self.frames) == self.frames.maxlen:
+			self.dropped += 1
+		self.frames.append(frame)
+		self.ready.set()
+
+
+class MonitorRelay:
+	"""Single upstream subscription to one call's monitor listenUrl, fanned out to listeners.
+
+	Each binary frame is converted once per distinct listener variant, so per-listener work is
+	a deque append. Text frames are forwarded unchanged.
+	"""
+
+	def __init__(self, call_id: str, listen_url: str, source_rate: int, max_frames: int) -> None:
+		self.call_id = call_id
+		self.listen_url = listen_url
+		self.source_rate = source_rate
+		self.max_frames = max_frames
+		self.listeners: Set[Listener] = set()
+		self.closed = asyncio.Event()
+		self.close_reason: Optional[str] = None
+		self.frames_in = 0
+		self.bytes_in = 0
+		self._task: Optional[asyncio.Task] = None
+
+	def start(self) -> None:
+		self._task = asyncio.create_task(self._pump())
+
+	def add(self, variant: Variant) -> Listener:
+		listener = Listener(variant, self.max_frames)
+		self.listeners.add(listener)
+		return listener
+
+	def discard(self, listener: Listener) -> None:
+		self.listeners.discard(listener)
+
+	async def _pump(self) -> None:
+		try:
+			async with websockets.connect(self.listen_url, max_size=None) as upstream:
+				async for message in upstream:
+					self.frames_in += 1
+					if isinstance(message, str):
+						for listener in list(self.listeners):
+							listener.push(message)
+						continue
+					self.bytes_in += len(message)
+					encoded: Dict[Variant, bytes] = {}
+					for listener in list(self.listeners):
+						frame = encoded.get(listener.variant)
+						if frame is None:
+							frame = encoded[listener.variant] = encode_frame(message, self.source_rate, listener.variant)
+						listener.push(frame)
+			self.close_reason = "call ended"
+		except asyncio.CancelledError:
+			self.close_reason = "relay stopped"
+			raise
+		except Exception as e:
+			log.warning("monitor relay for call %s failed: %s", self.call_id, e)
+			self.close_reason = f"upstream error: {e}"
+		finally:
+			self.closed.set()
+			for listener in list(self.listeners):
+				listener.ready.set()
+
+	async def stop(self) -> None:
+		if self._task is not None and not self._task.done():
+			self._task.cancel()
+			try:
+				await self._task
+			except asyncio.CancelledError:
+				pass
+
+	def stats(self) -> Dict[str, Any]:
+		return {
+			"callId": self.call_id,
+			"listeners": len(self.listeners),
+			"variants": sorted({f"{fmt}@{rate}" for fmt, rate in (l.variant for l in self.listeners)}),
+			"framesIn": self.frames_in,
+			"bytesIn": self.bytes_in,
+			"dropped": sum(l.dropped for l in self.listeners),
+			"closed": self.closed.is_set(),
+		}
+
+
+class MonitorRelayRegistry:
+	"""Relays by call id; a relay outlives its last listener by `idle_grace` seconds for reconnects."""
+
+	def __init__(self, source_rate: int = 16000, max_frames: int = 50, idle_grace: float = 5.0) -> None:
+		self.source_rate = source_rate
+		self.max_frames = max_frames
+		self.idle_grace = idle_grace
+		self._relays: Dict[str, MonitorRelay] = {}
+		self._reapers: Dict[str, asyncio.Task] = {}
+
+	def join(self, call_id: str, listen_url: str, variant: Variant) -> Tuple[MonitorRelay, Listener]:
+		reaper = self._reapers.pop(call_id, None)
+		if reaper is not None:
+			reaper.cancel()
+		relay = self._relays.get(call_id)
+		if relay is None or relay.closed.is_set() or relay.listen_url != listen_url:
+			relay = MonitorRelay(call_id, listen_url, self.source_rate, self.max_frames)
+			self._relays[call_id] = relay
+			relay.start()
+		return relay, relay.add(variant)
+
+	def leave(self, relay: MonitorRelay, listener: Listener) -> None:
+		relay.discard(listener)
+		if not relay.listeners and self._relays.get(relay.call_id) is relay and relay.call_id not in self._reapers:
+			self._reapers[relay.call_id] = asyncio.create_task(self._reap(relay))
+
+	async def _reap(self, relay: MonitorRelay) -> None:
+		try:
+			await asyncio.sleep(self.idle_grace)
+		except asyncio.CancelledError:
+			return
+		self._reapers.pop(relay.call_id, None)
+		if not relay.listeners and self._relays.get(relay.call_id) is relay:
+			del self._relays[relay.call_id]
+			await relay.stop()
+
+	async def close(self) -> None:
+		for reaper in self._reapers.values():
+			reaper.cancel()
+		self._reapers.clear()
+		relays, self._relays = list(self._relays.values()), {}
+		for relay in relays:
+			await relay.stop()
+
+	def stats(self) -> Dict[str, Any]:
+		relays = [r.stats() for r in self._relays.values()]
+		return {
+			"relays": len(relays),
+			"listeners": sum(r["listeners"] for r in relays),
+			"calls": relays,
+		}
+
+
+monitor_relays = MonitorRelayRegistry(
+	source_rate=settings.MONITOR_SOURCE_SAMPLE_RATE,
+	max_frames=settings.MONITOR_LISTENER_BUFFER_FRAMES,
+	idle_grace=settings.MONITOR_IDLE_GRACE_SECONDS,
+)
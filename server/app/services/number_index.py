@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from ..config import settings
+from .call_index import to_epoch
+from .governor import Priority, upstream_priority
+from .metrics import timed_sdk, timed_serialization
+from .vapi_client import as_dict, token_key
+
+
+SORTS = ("number", "name", "assistantName", "createdAt", "updatedAt")
+
+Key = Tuple[Any, str]
+
+
+class BadCursor(ValueError):
+	pass
+
+
+def _from_epoch(ts: float) -> datetime:
+	return datetime.fromtimestamp(ts, tz=timezone.utc)
+
+
+def compact(number: Dict[str, Any]) -> Dict[str, Any]:
+	"""The fields the numbers page needs from an SDK phone number dict."""
+	return {
+		"id": number.get("id"),
+		"phoneNumber": number.get("number") or number.get("sipUri") or number.get("id"),
+		"name": number.get("name"),
+		"provider": number.get("provider"),
+		"status": number.get("status"),
+		"assistantId": number.get("assistantId"),
+		"squadId": number.get("squadId"),
+		"createdAt": number.get("createdAt"),
+		"updatedAt": number.get("updatedAt"),
+	}
+
+
+def encode_cursor(sort: str, order: str, key: Key) -> str:
+	raw = json.dumps([sort, order, key[0], key[1]], separators=(",", ":")).encode("utf-8")
+	return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, order: str) -> Key:
+	try:
+		raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+		c_sort, c_order, value, number_id = json.loads(raw)
+	except Exception:
+		raise BadCursor("Malformed cursor")
+	if (c_sort, c_order) != (sort, order):
+		raise BadCursor("Cursor was issued for a different sort or order")
+	numeric = sort in ("createdAt", "updatedAt")
+	if not isinstance(number_id, str) or not isinstance(value, (int, float) if numeric else str) or isinstance(value, bool):
+		raise BadCursor("Malformed cursor")
+	return (float(value) if numeric else value, number_id)
+
+
+class NumberIndex:
+	"""One token's phone numbers joined to assistant names, kept in memory and synced by watermarks.
+
+	Numbers and assistants are each paged newest-first with createdAt cursors on a full sync, and
+	later refreshes only fetch rows whose updatedAt moved past the last one seen. Full syncs repeat
+	every NUMBER_INDEX_FULL_SYNC_SECONDS to drop numbers deleted upstream. Sort orders are built
+	lazily per sort key and reused until a row changes.
+	"""
+
+	def __init__(self, page_size: int = 500) -> None:
+		self.page_size = page_size
+		self.numbers: Dict[str, Dict[str, Any]] = {}
+		self.assistant_names: Dict[str, Optional[str]] = {}
+		self._orders: Dict[str, List[Key]] = {}
+		self._watermarks: Dict[str, Optional[float]] = {"numbers": None, "assistants": None}
+		self.synced_at: Optional[float] = None
+		self.full_synced_at: Optional[float] = None
+		self.upstream_pages = 0
+		self._lock = asyncio.Lock()
+
+	# -- maintenance ---------------------------------------------------------------------------
+
+	def _advance(self, kind: str, row: Dict[str, Any]) -> None:
+		updated = to_epoch(row.get("updatedAt"))
+		if updated is not None and (self._watermarks[kind] is None or updated > self._watermarks[kind]):
+			self._watermarks[kind] = updated
+
+	def upsert(self, number: Dict[str, Any]) -> Dict[str, Any]:
+		row = compact(number)
+		if not row["id"]:
+			return row
+		self.numbers[row["id"]] = row
+		self._orders.clear()
+		return self._joined(row)
+
+	def set_assistant_name(self, assistant: Dict[str, Any]) -> None:
+		if not assistant.get("id"):
+			return
+		if self.assistant_names.get(assistant["id"]) != assistant.get("name"):
+			self._orders.pop("assistantName", None)
+		self.assistant_names[assistant["id"]] = assistant.get("name")
+
+	async def _pages(self, list_page: Callable[..., Any], op: str, **filters: Any) -> List[Dict[str, Any]]:
+		"""All rows of a newest-first listing, paged with createdAt cursors; ties at page edges are de-duplicated by id."""
+		cursor: Optional[datetime] = None
+		seen: Set[str] = set()
+		rows: List[Dict[str, Any]] = []
+		while True:
+			kwargs = dict(filters)
+			if cursor is not None:
+				kwargs["created_at_le"] = cursor
+			with timed_sdk(op):
+				page = await list_page(limit=self.page_size, **kwargs)
+			self.upstream_pages += 1
+			with timed_serialization(op):
+				dicts = [as_dict(item) for item in page]
+			fresh = [d for d in dicts if d.get("id") not in seen]
+			seen.update(d.get("id") for d in fresh)
+			rows += fresh
+			created = [c for c in (to_epoch(d.get("createdAt")) for d in fresh) if c is not None]
+			if len(page) < self.page_size or not fresh or not created:
+				return rows
+			cursor = _from_epoch(min(created))
+
+	async def _sync(self, client: Any, full: bool) -> None:
+		def since(kind: str) -> Dict[str, Any]:
+			mark = self._watermarks[kind]
+			# _ge rather than _gt: several rows can share the watermark timestamp.
+			return {} if full or mark is None else {"updated_at_ge": _from_epoch(mark)}
+
+		numbers, assistants = await asyncio.gather(
+			self._pages(client.phone_numbers.list, "phone_numbers.list", **since("numbers")),
+			self._pages(client.assistants.list, "assistants.list", **since("assistants")),
+		)
+		if full:
+			self.numbers.clear()
+			self.assistant_names.clear()
+			self._orders.clear()
+		# Watermarks only move with syncs, so a write through this server cannot skip other changes.
+		for assistant in assistants:
+			self.set_assistant_name(assistant)
+			self._advance("assistants", assistant)
+		for number in numbers:
+			self.upsert(number)
+			self._advance("numbers", number)
+
+	def _fresh(self, max_age: float) -> bool:
+		return self.synced_at is not None and time.monotonic() - self.synced_at < max_age
+
+	async def refresh(self, client: Any, max_age: float = 0.0, full: bool = False, full_every: float = 600.0) -> None:
+		"""Sync if the last sync is older than `max_age` seconds; concurrent callers share one sync."""
+		if not full and self._fresh(max_age):
+			return
+		async with self._lock:
+			if not full and self._fresh(max_age):
+				return
+			full = full or self.full_synced_at is None or time.monotonic() - self.full_synced_at >= full_every
+			if full:
+				with upstream_priority(Priority.BULK):
+					await self._sync(client, full=True)
+				self.full_synced_at = time.monotonic()
+			else:
+				await self._sync(client, full=False)
+			self.synced_at = time.monotonic()
+
+	# -- queries -------------------------------------------------------------------------------
+
+	def _joined(self, row: Dict[str, Any]) -> Dict[str, Any]:
+		return {**row, "assistantName": self.assistant_names.get(row["assistantId"]) if row.get("assistantId") else None}
+
+	def _sort_value(self, row: Dict[str, Any], sort: str) -> Any:
+		if sort in ("createdAt", "updatedAt"):
+			return to_epoch(row.get(sort)) or 0.0
+		if sort == "number":
+			return (row.get("phoneNumber") or "").lower()
+		if sort == "assistantName":
+			return (self.assistant_names.get(row.get("assistantId") or "") or "").lower()
+		return (row.get(sort) or "").lower()
+
+	def _sorted(self, sort: str) -> List[Key]:
+		order = self._orders.get(sort)
+		if order is None:
+			order = self._orders[sort] = sorted((self._sort_value(row, sort), number_id) for number_id, row in self.numbers.items())
+		return order
+
+	def query(
+		self,
+		sort: str = "number",
+		order: str = "asc",
+		cursor: Optional[str] = None,
+		limit: int = 500,
+		q: Optional[str] = None,
+		assistant_id: Optional[str] = None,
+		unassigned: bool = False,
+		provider: Optional[str] = None,
+	) -> Tuple[int, List[Dict[str, Any]], Optional[str]]:
+		"""Return (total matches, page, next cursor); `q` matches the number, name or assistant name."""
+		after = decode_cursor(cursor, sort, order) if cursor else None
+		needle = q.lower() if q else None
+
+		def matches(row: Dict[str, Any]) -> bool:
+			if assistant_id is not None and row.get("assistantId") != assistant_id:
+				return False
+			if unassigned and (row.get("assistantId") or row.get("squadId")):
+				return False
+			if provider is not None and row.get("provider") != provider:
+				return False
+			if needle:
+				name = self.assistant_names.get(row.get("assistantId") or "") or ""
+				return any(needle in (v or "").lower() for v in (row.get("phoneNumber"), row.get("name"), name))
+			return True
+
+		keys = [k for k in self._sorted(sort) if matches(self.numbers[k[1]])]
+		if order == "desc":
+			end = bisect_left(keys, after) if after else len(keys)
+			start = max(0, end - limit)
+			page_keys = keys[start:end][::-1]
+			more = start > 0
+		else:
+			start = bisect_right(keys, after) if after else 0
+			page_keys = keys[start:start + limit]
+			more = start + limit < len(keys)
+		page = [self._joined(self.numbers[k[1]]) for k in page_keys]
+		next_cursor = encode_cursor(sort, order, page_keys[-1]) if more and page_keys else None
+		return len(keys), page, next_cursor
+
+	def stats(self) -> Dict[str, Any]:
+		marks = self._watermarks
+		return {
+			"numbers": len(self.numbers),
+			"assistants": len(self.assistant_names),
+			"unassigned": sum(1 for row in self.numbers.values() if not row.get("assistantId")),
+			"upstreamPages": self.upstream_pages,
+			"watermarks": {kind: _from_epoch(mark).isoformat() if mark else None for kind, mark in marks.items()},
+			"syncedSecondsAgo": round(time.monotonic() - self.synced_at, 3) if self.synced_at else None,
+			"fullSyncedSecondsAgo": round(time.monotonic() - self.full_synced_at, 3) if self.full_synced_at else None,
+		}
+
+
+class NumberIndexRegistry:
+	"""One NumberIndex per token (keyed by token hash), least recently used evicted."""
+
+	def __init__(self, max_tokens: int = 32) -> None:
+		self.max_tokens = max_tokens
+		self._indexes: "OrderedDict[str, NumberIndex]" = OrderedDict()
+
+	def get(self, token: str) -> NumberIndex:
+		key = token_key(token)
+		index = self._indexes.get(key)
+		if index is None:
+			index = NumberIndex(page_size=settings.NUMBER_INDEX_PAGE_SIZE)
+			self._indexes[key] = index
+			while len(self._indexes) > self.max_tokens:
+				self._indexes.popitem(last=False)
+		else:
+			self._indexes.move_to_end(key)
+		return index
+
+	def peek(self, token: str) -> Optional[NumberIndex]:
+		return self._indexes.get(token_key(token))
+
+
+number_indexes = NumberIndexRegistry(max_tokens=settings.CALL_INDEX_MAX_TOKENS)
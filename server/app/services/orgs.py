@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+
+from .cache import read_cache
+from .vapi_client import async_vapi_registry, token_key
+
+
+# Last token seen for each org, held in memory only, so work a webhook starts can read from Vapi.
+_org_tokens: Dict[str, str] = {}
+
+
+async def org_id_for(token: str) -> str:
+	"""Vapi org of a token, read off any call or assistant it can list.
+
+	Webhook payloads carry an orgId but no token, so state built from them is scoped by org.
+	"""
+	client = async_vapi_registry.get(token)
+
+	async def load() -> str:
+		for resource in (client.calls, client.assistants):
+			try:
+				items = await resource.list(limit=1)
+			except Exception:
+				continue
+			for item in items:
+				org_id = item.dict().get("orgId")
+				if org_id:
+					return org_id
+		raise HTTPException(status_code=403, detail="Could not determine the organization for this token")
+
+	org_id = await read_cache.get_or_load((token_key(token), "org"), load, 3600.0)
+	_org_tokens[org_id] = token
+	return org_id
+
+
+def token_for_org(org_id: str) -> Optional[str]:
+	"""A token this worker has seen for the org, or None."""
+	return _org_tokens.get(org_id)
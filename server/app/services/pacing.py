@@ -0,0 +1,474 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, time as clock, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from ..config import settings
+from .batch_dispatch import DialOutcomeUnknown, create_call
+from .governor import Priority, upstream_priority
+from .jobs import JobQueue, job_queue
+from .shared_state import SharedState, shared_state
+from .vapi_client import async_vapi_registry
+
+try:
+	from phonenumbers import parse as parse_number
+	from phonenumbers.timezone import time_zones_for_number
+except ImportError:  # optional: exact per-area time zones
+	parse_number = None
+
+
+log = logging.getLogger(__name__)
+
+# Calling-code prefixes to the zones their numbers may be in, used without phonenumbers.
+# Countries spanning several zones list them all; calling hours must hold in every one.
+_PREFIX_ZONES: Dict[str, Tuple[str, ...]] = {
+	"1": ("America/New_York", "America/Chicago", "America/Denver", "America/Los_Angeles"),
+	"1808": ("Pacific/Honolulu",),
+	"1907": ("America/Anchorage",),
+	"7": ("Europe/Moscow",),
+	"20": ("Africa/Cairo",),
+	"27": ("Africa/Johannesburg",),
+	"30": ("Europe/Athens",),
+	"31": ("Europe/Amsterdam",),
+	"32": ("Europe/Brussels",),
+	"33": ("Europe/Paris",),
+	"34": ("Europe/Madrid",),
+	"39": ("Europe/Rome",),
+	"41": ("Europe/Zurich",),
+	"43": ("Europe/Vienna",),
+	"44": ("Europe/London",),
+	"45": ("Europe/Copenhagen",),
+	"46": ("Europe/Stockholm",),
+	"47": ("Europe/Oslo",),
+	"48": ("Europe/Warsaw",),
+	"49": ("Europe/Berlin",),
+	"52": ("America/Mexico_City", "America/Tijuana"),
+	"55": ("America/Sao_Paulo", "America/Manaus"),
+	"60": ("Asia/Kuala_Lumpur",),
+	"61": ("Australia/Perth", "Australia/Adelaide", "Australia/Sydney"),
+	"62": ("Asia/Jakarta",),
+	"63": ("Asia/Manila",),
+	"64": ("Pacific/Auckland",),
+	"65": ("Asia/Singapore",),
+	"81": ("Asia/Tokyo",),
+	"82": ("Asia/Seoul",),
+	"86": ("Asia/Shanghai",),
+	"90": ("Europe/Istanbul",),
+	"91": ("Asia/Kolkata",),
+	"92": ("Asia/Karachi",),
+	"234": ("Africa/Lagos",),
+	"254": ("Africa/Nairobi",),
+	"351": ("Europe/Lisbon",),
+	"353": ("Europe/Dublin",),
+	"358": ("Europe/Helsinki",),
+	"852": ("Asia/Hong_Kong",),
+	"966": ("Asia/Riyadh",),
+	"971": ("Asia/Dubai",),
+}
+
+
+def parse_hours(spec: str) -> Tuple[clock, clock]:
+	"""'09:00-20:00' -> (start, end) local wall-clock times; the end is exclusive, 24:00 means midnight."""
+	try:
+		start, end = (clock.max if part.strip() == "24:00" else clock.fromisoformat(part.strip()) for part in spec.split("-"))
+	except ValueError:
+		raise ValueError(f"Calling hours must look like 09:00-20:00, got {spec!r}")
+	if start >= end:
+		raise ValueError(f"Calling hours must start before they end, got {spec!r}")
+	return start, end
+
+
+@lru_cache(maxsize=4096)
+def number_zones(number: str) -> Tuple[ZoneInfo, ...]:
+	"""Time zones an E.164 number may ring in, from phonenumbers when installed, else by calling-code prefix."""
+	names: Tuple[str, ...] = ()
+	if parse_number is not None:
+		try:
+			names = tuple(z for z in time_zones_for_number(parse_number(number)) if z != "Etc/Unknown")
+		except Exception:
+			names = ()
+	if not names:
+		digits = number.lstrip("+")
+		for n in range(4, 0, -1):
+			if digits[:n] in _PREFIX_ZONES:
+				names = _PREFIX_ZONES[digits[:n]]
+				break
+	return tuple(_zone(name) for name in names) or (_zone(settings.PACING_DEFAULT_TIMEZONE),)
+
+
+@lru_cache(maxsize=None)
+def _zone(name: str) -> ZoneInfo:
+	return ZoneInfo(name)
+
+
+def _opens_at(zone: ZoneInfo, at: float, start: clock, end: clock) -> float:
+	local = datetime.fromtimestamp(at, zone)
+	if start <= local.time() < end:
+		return at
+	day = local.date() if local.time() < start else local.date() + timedelta(days=1)
+	return datetime.combine(day, start, tzinfo=zone).timestamp()
+
+
+def next_open(number: str, at: float, hours: Tuple[clock, clock]) -> Optional[float]:
+	"""Earliest epoch >= `at` inside calling hours in every zone of `number`; None if they never overlap."""
+	zones = number_zones(number)
+	t = at
+	for _ in range(8 * len(zones)):
+		later = max(_opens_at(zone, t, *hours) for zone in zones)
+		if later == t:
+			return t
+		t = later
+	return None
+
+
+# Heap entries: (eligible epoch, tie-break, job id, seq, number, latest epoch, job generation).
+Entry = Tuple[float, int, str, int, str, Optional[float], int]
+
+
+@dataclass
+class PacedJob:
+	org: str
+	assistant_id: str
+	phone_number_id: Optional[str]
+	generation: int
+
+	def resources(self) -> List[Tuple[str, str]]:
+		out = [("org", self.org), ("assistant", self.assistant_id)]
+		if self.phone_number_id:
+			out.append(("number", self.phone_number_id))
+		return out
+
+
+@dataclass
+class LiveCall:
+	resources: List[Tuple[str, str]]
+	token: Optional[str]
+	dialed_at: float
+	checked_at: float = field(default_factory=time.time)
+
+
+class Pacer:
+	"""Dials paced schedule jobs one customer at a time, keeping every resource under its limit.
+
+	Undialed customers sit in a heap keyed by when they may next be called: their earliest_at,
+	pushed to the next opening of calling hours in the destination number's time zone. A popped
+	customer whose org, assistant or phone number is at its live-call limit is parked on that
+	resource and re-queued as soon as one of its calls ends; starts per org are spaced to
+	`rate` per second. Call-ended webhooks free slots, calls not heard from are polled every
+	`poll_every` seconds, and a slot is given up after `call_timeout`.
+
+	With several workers, only the holder of a shared-state lease dials; the others only keep
+	job state. Customers whose latest_at passes before a slot opens are failed, not called.
+	"""
+
+	lease_name = "pacer:leader"
+
+	def __init__(
+		self,
+		queue: JobQueue,
+		shared: Optional[SharedState] = None,
+		limits: Optional[Dict[str, int]] = None,
+		rate: float = 1.0,
+		hours: str = "09:00-20:00",
+		call_timeout: float = 1800.0,
+		poll_every: float = 60.0,
+		refresh_every: float = 2.0,
+	) -> None:
+		self.queue = queue
+		self.shared = shared
+		self.limits = limits or {"org": 10, "assistant": 10, "number": 2}
+		self.rate = rate
+		self.hours = parse_hours(hours)
+		self.hours_spec = hours
+		self.call_timeout = call_timeout
+		self.poll_every = poll_every
+		self.refresh_every = refresh_every
+		self._heap: List[Entry] = []
+		self._order = 0
+		self._jobs: Dict[str, PacedJob] = {}
+		self._generation = 0
+		self._busy: Dict[Tuple[str, str], int] = {}
+		self._parked: Dict[Tuple[str, str], Deque[Entry]] = {}
+		self._next_start: Dict[str, float] = {}
+		self._live: Dict[str, LiveCall] = {}
+		self._ended_unknown: Deque[str] = deque(maxlen=1024)
+		self._tasks: set = set()
+		self._task: Optional[asyncio.Task] = None
+		self._wakeup: Optional[asyncio.Event] = None
+		self._lease: Optional[str] = None
+		self._refreshed_at = 0.0
+		self.leading = False
+		self.dialed = 0
+		self.failed = 0
+		self.expired = 0
+		self.released = {"event": 0, "poll": 0, "timeout": 0}
+
+	# -- lifecycle -----------------------------------------------------------------------------
+
+	async def start(self) -> None:
+		if self._task is None:
+			self._wakeup = asyncio.Event()
+			self.queue.add_watcher(self.wake)
+			self._task = asyncio.create_task(self._run())
+
+	async def stop(self) -> None:
+		if self._task is not None:
+			self._task.cancel()
+			await asyncio.gather(self._task, *self._tasks, return_exceptions=True)
+			self._task = None
+		if self._lease is not None and self.shared is not None:
+			await self.shared.unlock(self.lease_name, self._lease)
+			self._lease = None
+
+	def wake(self) -> None:
+		"""Re-read jobs now, e.g. after a submission, pause or resume."""
+		self._refreshed_at = 0.0
+		if self._wakeup is not None:
+			self._wakeup.set()
+
+	async def _run(self) -> None:
+		assert self._wakeup is not None
+		while True:
+			delay = self.refresh_every
+			try:
+				if time.time() - self._refreshed_at >= self.refresh_every:
+					await self._housekeeping()
+				if self.leading:
+					delay = min(delay, self._dispatch(time.time()))
+			except asyncio.CancelledError:
+				raise
+			except Exception:
+				log.exception("pacer loop failed")
+			self._wakeup.clear()
+			try:
+				await asyncio.wait_for(self._wakeup.wait(), timeout=max(delay, 0.01))
+			except asyncio.TimeoutError:
+				pass
+
+	# -- leadership and job state --------------------------------------------------------------
+
+	async def _lead(self) -> bool:
+		if self.shared is None:
+			return True
+		ttl = max(self.shared.lock_ttl, 3 * self.refresh_every)
+		if self._lease is not None and await self.shared.renew(self.lease_name, self._lease, ttl):
+			return True
+		self._lease = await self.shared.try_lock(self.lease_name, ttl)
+		return self._lease is not None
+
+	async def _housekeeping(self) -> None:
+		self._refreshed_at = time.time()
+		leading = await self._lead()
+		if leading and not self.leading:
+			await self._adopt_live_calls()
+		elif not leading and self.leading:
+			self._forget()
+		self.leading = leading
+		if leading:
+			await self._refresh_jobs()
+			await self._check_live()
+
+	def _forget(self) -> None:
+		self._heap.clear()
+		self._jobs.clear()
+		self._parked.clear()
+		self._busy.clear()
+		self._live.clear()
+
+	async def _adopt_live_calls(self) -> None:
+		"""Count calls a previous leader (or this process before a restart) left running."""
+		for row in await asyncio.to_thread(self.queue._live_dials, time.time() - self.call_timeout):
+			job = PacedJob(row["org_id"] or row["owner"], row["assistant_id"], row["phone_number_id"], 0)
+			self._occupy(job.resources())
+			self._live[row["call_id"]] = LiveCall(job.resources(), row["token"], row["dialed_at"])
+
+	async def _refresh_jobs(self) -> None:
+		active = {row["id"]: row for row in await asyncio.to_thread(self.queue._paced_jobs)}
+		for job_id in [j for j in self._jobs if j not in active]:
+			# Paused or finished: its entries go stale and are dropped as they surface.
+			del self._jobs[job_id]
+		for job_id, row in active.items():
+			if job_id in self._jobs:
+				continue
+			self._generation += 1
+			# Jobs stored before org ids were recorded fall back to their token.
+			job = self._jobs[job_id] = PacedJob(row["org_id"] or row["owner"], row["assistant_id"], row["phone_number_id"], self._generation)
+			for seq, earliest, number, latest in await asyncio.to_thread(self.queue._pending_dials, job_id):
+				self._push(earliest or 0.0, job_id, seq, number, latest, job.generation)
+
+	def _push(self, at: float, job_id: str, seq: int, number: str, latest: Optional[float], generation: int) -> None:
+		self._order += 1
+		heapq.heappush(self._heap, (at, self._order, job_id, seq, number, latest, generation))
+
+	# -- dispatch ------------------------------------------------------------------------------
+
+	def _saturated(self, resources: List[Tuple[str, str]]) -> Optional[Tuple[str, str]]:
+		for resource in resources:
+			if self._busy.get(resource, 0) >= self.limits.get(resource[0], 1):
+				return resource
+		return None
+
+	def _occupy(self, resources: List[Tuple[str, str]]) -> None:
+		for resource in resources:
+			self._busy[resource] = self._busy.get(resource, 0) + 1
+
+	def _release(self, resources: List[Tuple[str, str]]) -> None:
+		now = time.time()
+		for resource in resources:
+			left = self._busy.get(resource, 0) - 1
+			if left > 0:
+				self._busy[resource] = left
+			else:
+				self._busy.pop(resource, None)
+			parked = self._parked.get(resource)
+			if parked:
+				at, _, job_id, seq, number, latest, generation = parked.popleft()
+				self._push(now, job_id, seq, number, latest, generation)
+				if not parked:
+					del self._parked[resource]
+		if self._wakeup is not None:
+			self._wakeup.set()
+
+	def _dispatch(self, now: float) -> float:
+		"""Start every customer that may be called now; returns seconds until the next is due."""
+		while self._heap and self._heap[0][0] <= now:
+			entry = heapq.heappop(self._heap)
+			_, _, job_id, seq, number, latest, generation = entry
+			job = self._jobs.get(job_id)
+			if job is None or job.generation != generation:
+				continue
+			opens = next_open(number, now, self.hours)
+			if opens is None or (latest is not None and opens >= latest):
+				self.expired += 1
+				error = "No calling hours before latest_at" if opens is not None else "Calling hours never overlap in this number's time zones"
+				self._spawn(asyncio.to_thread(self.queue._dial_failed, job_id, seq, None, error))
+				continue
+			if opens > now:
+				self._push(opens, job_id, seq, number, latest, generation)
+				continue
+			resources = job.resources()
+			full = self._saturated(resources)
+			if full is not None:
+				self._parked.setdefault(full, deque()).append(entry)
+				continue
+			start = self._next_start.get(job.org, 0.0)
+			if start > now:
+				self._push(start, job_id, seq, number, latest, generation)
+				continue
+			self._next_start[job.org] = max(start, now) + 1.0 / self.rate
+			self._occupy(resources)
+			self._spawn(self._dial(job_id, seq, resources))
+		return self._heap[0][0] - now if self._heap else self.refresh_every
+
+	def _spawn(self, awaitable: Any) -> None:
+		task = asyncio.ensure_future(awaitable)
+		self._tasks.add(task)
+		task.add_done_callback(self._tasks.discard)
+
+	async def _dial(self, job_id: str, seq: int, resources: List[Tuple[str, str]]) -> None:
+		claim = await asyncio.to_thread(self.queue._claim_dial, job_id, seq)
+		if claim is None:
+			self._release(resources)
+			return
+		_, _, payload, token, assistant_id, phone_number_id = claim
+		customer = payload["customers"][0]
+		try:
+			client = async_vapi_registry.get(token)
+			with upstream_priority(Priority.BULK):
+				call = await create_call(client, assistant_id, customer, phone_number_id, payload.get("variable_values"), self.queue.max_retries)
+		except asyncio.CancelledError:
+			raise
+		except Exception as e:
+			self.failed += 1
+			self._release(resources)
+			await asyncio.to_thread(
+				self.queue._dial_failed, job_id, seq, customer.get("row"), f"Call create failed: {str(e) or e.__class__.__name__}", isinstance(e, DialOutcomeUnknown)
+			)
+			return
+		self.dialed += 1
+		call_id = getattr(call, "id", None)
+		ended = getattr(call, "status", None) == "ended" or call_id is None or call_id in self._ended_unknown
+		if ended:
+			self._release(resources)
+		else:
+			self._live[call_id] = LiveCall(resources, token, time.time())
+		await asyncio.to_thread(self.queue._dialed, job_id, seq, call_id, ended)
+
+	# -- feedback ------------------------------------------------------------------------------
+
+	def _ended(self, call_id: str, how: str) -> bool:
+		live = self._live.pop(call_id, None)
+		if live is None:
+			return False
+		self.released[how] += 1
+		self._release(live.resources)
+		self._spawn(asyncio.to_thread(self.queue._calls_ended, [call_id]))
+		return True
+
+	def on_call_event(self, kind: str, state: Dict[str, Any], message: Dict[str, Any]) -> None:
+		"""Event hub listener: free the call's slots as soon as Vapi reports it ended."""
+		if state.get("status") != "ended":
+			return
+		if not self._ended(state["id"], "event"):
+			self._ended_unknown.append(state["id"])
+
+	async def _check_live(self) -> None:
+		"""Poll calls not heard from in `poll_every` seconds, and give up on those past `call_timeout`."""
+		now = time.time()
+		for call_id, live in list(self._live.items()):
+			if now - live.dialed_at > self.call_timeout:
+				self._ended(call_id, "timeout")
+			elif now - live.checked_at > self.poll_every and live.token:
+				live.checked_at = now
+				self._spawn(self._poll(call_id, live.token))
+
+	async def _poll(self, call_id: str, token: str) -> None:
+		try:
+			with upstream_priority(Priority.BULK):
+				call = await async_vapi_registry.get(token).calls.get(call_id)
+		except Exception:
+			return
+		if getattr(call, "status", None) == "ended":
+			self._ended(call_id, "poll")
+
+	def stats(self) -> Dict[str, Any]:
+		busiest = sorted(self._busy.items(), key=lambda kv: -kv[1])[:10]
+		return {
+			"leading": self.leading,
+			"jobs": len(self._jobs),
+			"queued": len(self._heap),
+			"parked": sum(len(q) for q in self._parked.values()),
+			"live": len(self._live),
+			"nextDueAt": datetime.fromtimestamp(self._heap[0][0], timezone.utc).isoformat() if self._heap else None,
+			"limits": self.limits,
+			"ratePerSecond": self.rate,
+			"callingHours": self.hours_spec,
+			"busiest": [{"kind": kind, "id": key, "live": n} for (kind, key), n in busiest],
+			"dialed": self.dialed,
+			"failed": self.failed,
+			"expired": self.expired,
+			"released": self.released,
+		}
+
+
+pacer = Pacer(
+	job_queue,
+	shared=shared_state,
+	limits={
+		"org": settings.PACING_MAX_LIVE_PER_ORG,
+		"assistant": settings.PACING_MAX_LIVE_PER_ASSISTANT,
+		"number": settings.PACING_MAX_LIVE_PER_NUMBER,
+	},
+	rate=settings.PACING_RATE_PER_SECOND,
+	hours=settings.PACING_CALLING_HOURS,
+	call_timeout=settings.PACING_CALL_TIMEOUT_SECONDS,
+	poll_every=settings.PACING_STATUS_POLL_SECONDS,
+)
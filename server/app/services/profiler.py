@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List
+
+
+class ProfilerBusy(Exception):
+	pass
+
+
+class SamplingProfiler:
+	"""Wall-clock sampler over every Python thread, for flame graphs of a running server.
+
+	Each sample walks `sys._current_frames()`; stacks are aggregated in the collapsed format
+	(`thread;outer;...;inner count`) read by flamegraph.pl and speedscope. Only one capture
+	runs at a time, and nothing is sampled outside a capture.
+	"""
+
+	def __init__(self) -> None:
+		self._lock = threading.Lock()
+		self.captures = 0
+
+	@property
+	def busy(self) -> bool:
+		return self._lock.locked()
+
+	@staticmethod
+	def _frame_name(code: object) -> str:
+		filename = getattr(code, "co_filename", "?")
+		return f"{getattr(code, 'co_name', '?')} ({os.path.basename(filename)})"
+
+	def capture(self, seconds: float, interval: float = 0.005) -> Dict[str, int]:
+		"""Sample for `seconds` (blocking); returns collapsed stack -> sample count."""
+		if not self._lock.acquire(blocking=False):
+			raise ProfilerBusy("A profile is already being captured")
+		try:
+			me = threading.get_ident()
+			stacks: Counter = Counter()
+			deadline = time.monotonic() + seconds
+			while time.monotonic() < deadline:
+				names = {t.ident: t.name for t in threading.enumerate()}
+				for ident, frame in sys._current_frames().items():
+					if ident == me:
+						continue
+					parts: List[str] = []
+					f = frame
+					while f is not None:
+						parts.append(self._frame_name(f.f_code))
+						f = f.f_back
+					parts.append(names.get(ident, str(ident)))
+					stacks[";".join(reversed(parts))] += 1
+				time.sleep(interval)
+			self.captures += 1
+			return dict(stacks)
+		finally:
+			self._lock.release()
+
+	@staticmethod
+	def collapsed(stacks: Dict[str, int]) -> str:
+		return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from fastapi import HTTPException
+
+
+# Default `view=summary` fields per list endpoint; dotted paths select nested keys.
+SUMMARY_FIELDS: Dict[str, Sequence[str]] = {
+	"calls": (
+		"id", "orgId", "type", "status", "assistantId", "phoneNumberId", "customer.name", "customer.number",
+		"createdAt", "updatedAt", "startedAt", "endedAt", "endedReason", "cost",
+	),
+	"assistants": ("id", "orgId", "name", "createdAt", "updatedAt", "model.provider", "model.model", "voice.provider", "voice.voiceId"),
+	"knowledge_bases": ("id", "orgId", "name", "provider", "createdAt", "updatedAt"),
+}
+
+MAX_FIELDS = 64
+
+
+def _tree(paths: Iterable[str]) -> Dict[str, Any]:
+	"""{"a": {}, "b": {"c": {}}} from ["a", "b.c"]; an empty dict means the whole value."""
+	root: Dict[str, Any] = {}
+	for path in paths:
+		node = root
+		parts = path.split(".")
+		for i, part in enumerate(parts):
+			if part in node and not node[part]:
+				break  # an ancestor is already selected whole
+			child = node.setdefault(part, {})
+			if i == len(parts) - 1:
+				child.clear()
+			node = child
+	return root
+
+
+def _compile(tree: Dict[str, Any]) -> Optional[Callable[[Any], Any]]:
+	"""A picker for a field tree, built once per request rather than walked per row."""
+	if not tree:
+		return None
+	items = [(key, _compile(sub)) for key, sub in tree.items()]
+
+	def pick(value: Any) -> Any:
+		if not isinstance(value, dict):
+			return value
+		out = {}
+		for key, sub in items:
+			if key in value:
+				out[key] = value[key] if sub is None else sub(value[key])
+		return out
+
+	return pick
+
+
+class Projection:
+	"""Selects fields from list rows; `None` keeps rows untouched (`view=full`)."""
+
+	def __init__(self, paths: Optional[Sequence[str]]) -> None:
+		self.paths = list(paths) if paths is not None else None
+		self._pick = _compile(_tree(self.paths)) if self.paths is not None else None
+
+	def __call__(self, row: Dict[str, Any]) -> Dict[str, Any]:
+		return row if self._pick is None else self._pick(row)
+
+	def many(self, rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+		if self._pick is None:
+			return list(rows)
+		return [self._pick(r) for r in rows]
+
+
+def projection(resource: str, fields: Optional[str], view: str) -> Projection:
+	"""`fields=a,b.c` wins over `view`; otherwise summary fields for `view=summary`, everything for `full`."""
+	if fields:
+		paths = [f.strip() for f in fields.split(",") if f.strip()]
+		if len(paths) > MAX_FIELDS or any(not all(p.split(".")) for p in paths):
+			raise HTTPException(status_code=400, detail=f"fields takes up to {MAX_FIELDS} comma-separated names or dotted paths")
+		return Projection(paths)
+	return Projection(SUMMARY_FIELDS[resource] if view == "summary" else None)
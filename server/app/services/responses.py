@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import dataclasses
+import enum
+import gzip
+import hashlib
+import json
+import os
+import zlib
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, Tuple
+
+import anyio
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+
+from ..config import settings
+
+try:
+	import orjson
+except ImportError:  # stdlib fallback, same output apart from float formatting
+	orjson = None
+
+try:
+	import brotli
+except ImportError:
+	brotli = None
+
+
+def _default(obj: Any) -> Any:
+	if isinstance(obj, (datetime, date, time)):
+		return obj.isoformat()
+	if isinstance(obj, enum.Enum):
+		return obj.value
+	if isinstance(obj, (set, frozenset, tuple)):
+		return list(obj)
+	if isinstance(obj, Decimal):
+		return float(obj)
+	if isinstance(obj, bytes):
+		return obj.decode("utf-8", "replace")
+	if hasattr(obj, "model_dump"):
+		return obj.model_dump()
+	if dataclasses.is_dataclass(obj):
+		return dataclasses.asdict(obj)
+	return str(obj)
+
+
+def dumps(payload: Any) -> bytes:
+	"""Compact JSON straight from `.dict()` output (datetimes, enums, ...), without jsonable_encoder."""
+	if orjson is not None:
+		return orjson.dumps(payload, default=_default, option=orjson.OPT_NON_STR_KEYS)
+	return json.dumps(payload, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def loads(data: bytes) -> Any:
+	return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def negotiate_encoding(request: Request) -> Optional[str]:
+	"""`br` or `gzip` from Accept-Encoding (brotli only when installed); None for identity."""
+	offered: Dict[str, float] = {}
+	for part in request.headers.get("accept-encoding", "").split(","):
+		name, _, params = part.strip().partition(";")
+		q = 1.0
+		if params.strip().startswith("q="):
+			try:
+				q = float(params.strip()[2:])
+			except ValueError:
+				q = 0.0
+		if name:
+			offered[name.strip().lower()] = q
+	for name in ("br", "gzip"):
+		if name == "br" and brotli is None:
+			continue
+		if offered.get(name, offered.get("*", 0.0)) > 0:
+			return name
+	return None
+
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+	if encoding == "br":
+		return brotli.compress(body, quality=settings.RESPONSE_BROTLI_QUALITY)
+	if encoding == "gzip":
+		return gzip.compress(body, compresslevel=settings.RESPONSE_GZIP_LEVEL, mtime=0)
+	return body
+
+
+def etag_json(request: Request, payload: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+	"""JSON response with a strong ETag; answers 304 when If-None-Match already holds it.
+
+	`no-cache` lets the browser keep the body but revalidate on every use, so a write through
+	this API is visible on the next read while unchanged config costs only a 304. Bodies over
+	RESPONSE_COMPRESSION_MIN_BYTES are compressed as negotiated; the ETag then carries the
+	encoding, and any encoding of the same body satisfies If-None-Match.
+	"""
+	body = dumps(payload)
+	digest = hashlib.sha256(body).hexdigest()[:32]
+	encoding = negotiate_encoding(request) if len(body) >= settings.RESPONSE_COMPRESSION_MIN_BYTES else None
+	out = {
+		**(headers or {}),
+		"ETag": f'"{digest}-{encoding}"' if encoding else f'"{digest}"',
+		"Cache-Control": "private, no-cache",
+		"Vary": "Authorization, x-vapi-token, Accept-Encoding",
+	}
+	candidates = {t.strip().removeprefix("W/").strip('"').split("-")[0] for t in request.headers.get("if-none-match", "").split(",")}
+	if digest in candidates or "*" in candidates:
+		return Response(status_code=304, headers=out)
+	if encoding:
+		body = compress(body, encoding)
+		out["Content-Encoding"] = encoding
+	return Response(content=body, media_type="application/json", headers=out)
+
+
+def wants_ndjson(request: Request, fmt: Optional[str] = None) -> bool:
+	if fmt:
+		return fmt == "ndjson"
+	return "application/x-ndjson" in request.headers.get("accept", "")
+
+
+class StreamCompressor:
+	"""Incremental gzip/brotli that flushes after every batch, so rows reach the client promptly."""
+
+	def __init__(self, encoding: Optional[str]) -> None:
+		self.encoding = encoding
+		if encoding == "br":
+			self._br = brotli.Compressor(quality=settings.RESPONSE_BROTLI_QUALITY)
+		elif encoding == "gzip":
+			self._z = zlib.compressobj(settings.RESPONSE_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+	def chunk(self, data: bytes) -> bytes:
+		if self.encoding == "br":
+			return self._br.process(data) + self._br.flush()
+		if self.encoding == "gzip":
+			return self._z.compress(data) + self._z.flush(zlib.Z_SYNC_FLUSH)
+		return data
+
+	def finish(self) -> bytes:
+		if self.encoding == "br":
+			return self._br.finish()
+		if self.encoding == "gzip":
+			return self._z.flush()
+		return b""
+
+
+def ndjson_response(request: Request, rows: Iterable[Any], headers: Optional[Dict[str, str]] = None, batch: int = 100) -> StreamingResponse:
+	"""One JSON document per line, encoded and sent `batch` rows at a time."""
+	encoding = negotiate_encoding(request)
+	out = {**(headers or {}), "Cache-Control": "private, no-cache", "Vary": "Authorization, x-vapi-token, Accept, Accept-Encoding"}
+	if encoding:
+		out["Content-Encoding"] = encoding
+
+	async def stream() -> AsyncIterator[bytes]:
+		compressor = StreamCompressor(encoding)
+		lines = []
+		for row in rows:
+			lines.append(dumps(row))
+			if len(lines) >= batch:
+				yield compressor.chunk(b"\n".join(lines) + b"\n")
+				lines = []
+				await anyio.sleep(0)
+		if lines:
+			yield compressor.chunk(b"\n".join(lines) + b"\n")
+		tail = compressor.finish()
+		if tail:
+			yield tail
+
+	return StreamingResponse(stream(), media_type="application/x-ndjson", headers=out)
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+	"""Inclusive (start, end) of a single `bytes=` range; None when unsatisfiable.
+
+	Multi-range requests are answered with their first range.
+	"""
+	unit, _, spec = header.partition("=")
+	if unit.strip().lower() != "bytes" or not spec:
+		return None
+	first, _, last = spec.split(",")[0].strip().partition("-")
+	try:
+		if not first:
+			suffix = int(last)
+			if suffix <= 0:
+				return None
+			return max(size - suffix, 0), size - 1
+		start = int(first)
+		end = int(last) if last else size - 1
+	except ValueError:
+		return None
+	if start >= size or end < start:
+		return None
+	return start, min(end, size - 1)
+
+
+class RangeFileResponse(Response):
+	"""File response honouring Range/If-Range, for seeking in cached recordings.
+
+	Uses the ASGI `http.response.zerocopysend` extension when the server offers it; otherwise
+	the requested span is read with os.pread in worker threads, so only that span is read.
+	"""
+
+	chunk_size = 256 * 1024
+
+	def __init__(self, path: str, request: Request, media_type: Optional[str], etag: str) -> None:
+		# Opened now, so eviction unlinking the file later cannot break a response already promised;
+		# raises FileNotFoundError if it is already gone.
+		self._file = open(path, "rb")
+		size = os.fstat(self._file.fileno()).st_size
+		self.path = path
+		self.start, self.end = 0, size - 1
+		status = 200
+		tag = f'"{etag}"'
+		headers = {"Accept-Ranges": "bytes", "ETag": tag, "Cache-Control": "private, max-age=86400"}
+		range_header = request.headers.get("range")
+		if_range = request.headers.get("if-range")
+		if range_header and (not if_range or if_range == tag):
+			span = parse_range(range_header, size)
+			if span is None:
+				super().__init__(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+				self.start, self.end = 0, -1
+				return
+			self.start, self.end = span
+			status = 206
+			headers["Content-Range"] = f"bytes {self.start}-{self.end}/{size}"
+		headers["Content-Length"] = str(self.end - self.start + 1)
+		super().__init__(status_code=status, headers=headers, media_type=media_type or "application/octet-stream")
+
+	async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+		with self._file as f:
+			await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+			count = self.end - self.start + 1
+			if scope.get("method") == "HEAD" or count <= 0:
+				await send({"type": "http.response.body", "body": b"", "more_body": False})
+				return
+			if "http.response.zerocopysend" in scope.get("extensions", {}):
+				await send({"type": "http.response.zerocopysend", "file": f, "offset": self.start, "count": count, "more_body": False})
+				return
+			offset = self.start
+			while count > 0:
+				chunk = await anyio.to_thread.run_sync(os.pread, f.fileno(), min(self.chunk_size, count), offset)
+				if not chunk:
+					break
+				offset += len(chunk)
+				count -= len(chunk)
+				await send({"type": "http.response.body", "body": chunk, "more_body": count > 0})
+			if count > 0:
+				await send({"type": "http.response.body", "body": b"", "more_body": False})
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import asyncio
+import random
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+import httpx
+
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+# Raised before the request left this process, so Vapi cannot have acted on it.
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def error_status(exc: BaseException) -> Optional[int]:
+	"""HTTP status of an SDK ApiError or httpx.HTTPStatusError, if any."""
+	status = getattr(exc, "status_code", None)
+	if status is None and isinstance(exc, httpx.HTTPStatusError):
+		status = exc.response.status_code
+	return status if isinstance(status, int) else None
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+	headers: Any = getattr(exc, "headers", None)
+	if headers is None and isinstance(exc, httpx.HTTPStatusError):
+		headers = exc.response.headers
+	try:
+		value = headers.get("retry-after") or headers.get("Retry-After")
+		return max(float(value), 0.0)
+	except Exception:
+		return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+	if isinstance(exc, httpx.TransportError):
+		return True
+	return error_status(exc) in RETRYABLE_STATUS
+
+
+def is_retryable_unsent(exc: BaseException) -> bool:
+	"""Retry test for requests that must not be repeated: only when nothing reached Vapi, or it
+	refused the request outright (429, or 503 with Retry-After)."""
+	if isinstance(exc, NOT_SENT_ERRORS):
+		return True
+	status = error_status(exc)
+	return status == 429 or (status == 503 and retry_after(exc) is not None)
+
+
+def may_have_applied(exc: BaseException) -> bool:
+	"""Whether a failed request may still have taken effect upstream."""
+	if is_retryable_unsent(exc):
+		return False
+	status = error_status(exc)
+	return status is None or status >= 500
+
+
+async def with_backoff(
+	fn: Callable[[], Awaitable[T]],
+	max_retries: int = 5,
+	base_delay: float = 0.5,
+	max_delay: float = 30.0,
+	retryable: Callable[[BaseException], bool] = is_retryable,
+) -> T:
+	"""Await `fn()`, retrying 429/5xx/transport errors with full-jitter exponential backoff.
+
+	A Retry-After header, when present, sets the minimum wait. Pass `retryable` to narrow which
+	errors are retried.
+	"""
+	attempt = 0
+	while True:
+		try:
+			return await fn()
+		except Exception as e:
+			if attempt >= max_retries or not retryable(e):
+				raise
+			delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+			hinted = retry_after(e)
+			if hinted is not None:
+				delay = max(delay, min(hinted, max_delay))
+			attempt += 1
+			await asyncio.sleep(delay)
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import math
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+# Duration histogram: [0, 1s) then log-spaced bins up to 6h (about 17% wide), the last bin open.
+DURATION_EDGES = np.concatenate(([0.0], np.geomspace(1.0, 6 * 3600.0, 63)))
+DURATION_BINS = len(DURATION_EDGES)
+# Value reported for a percentile falling in each bin: its geometric midpoint.
+_BIN_VALUES = np.concatenate(([0.5], np.sqrt(DURATION_EDGES[1:-1] * DURATION_EDGES[2:]), [DURATION_EDGES[-1]]))
+PERCENTILES = (50, 90, 95, 99)
+GROUPS = ("hour", "day", "assistant", "number", "total")
+
+
+class _Interner:
+	def __init__(self) -> None:
+		self.codes: Dict[str, int] = {}
+		self.names: List[str] = []
+
+	def code(self, name: str) -> int:
+		code = self.codes.get(name)
+		if code is None:
+			code = self.codes[name] = len(self.names)
+			self.names.append(name)
+		return code
+
+
+class CallRollups:
+	"""Hourly aggregates of one call index, kept as growable NumPy columns.
+
+	A row is one (hour, assistant, phone number) bucket holding call count, cost, duration sum and
+	histogram, and per-status and per-endedReason counts. Calls are added and retracted as the
+	index changes; the deltas are applied in one vectorised pass before the next query, so a query
+	costs O(buckets in range) rather than O(calls).
+	"""
+
+	def __init__(self, capacity: int = 1024) -> None:
+		self._rows: Dict[Tuple[int, int, int], int] = {}
+		self._assistants = _Interner()
+		self._numbers = _Interner()
+		self._statuses = _Interner()
+		self._reasons = _Interner()
+		self._pending: List[Tuple[int, int, int, int, float, float]] = []
+		self.size = 0
+		self.hour = np.zeros(capacity, np.int64)
+		self.assistant = np.zeros(capacity, np.int32)
+		self.number = np.zeros(capacity, np.int32)
+		self.calls = np.zeros(capacity, np.int64)
+		self.cost = np.zeros(capacity, np.float64)
+		self.duration_sum = np.zeros(capacity, np.float64)
+		self.histogram = np.zeros((capacity, DURATION_BINS), np.int32)
+		self.status = np.zeros((capacity, 8), np.int32)
+		self.reason = np.zeros((capacity, 16), np.int32)
+
+	# -- maintenance ---------------------------------------------------------------------------
+
+	def _row(self, hour: int, assistant: int, number: int) -> int:
+		key = (hour, assistant, number)
+		row = self._rows.get(key)
+		if row is not None:
+			return row
+		if self.size == len(self.hour):
+			grow = len(self.hour)
+			for name in ("hour", "assistant", "number", "calls", "cost", "duration_sum", "histogram", "status", "reason"):
+				col = getattr(self, name)
+				setattr(self, name, np.concatenate((col, np.zeros((grow,) + col.shape[1:], col.dtype))))
+		row = self._rows[key] = self.size
+		self.hour[row], self.assistant[row], self.number[row] = key
+		self.size += 1
+		return row
+
+	def add(self, call: Dict[str, Any], created: Optional[float], duration: Optional[float], sign: int = 1) -> None:
+		"""Queue a call's contribution (`sign=-1` retracts a previously added version of it)."""
+		if created is None:
+			return
+		row = self._row(
+			int(created // 3600),
+			self._assistants.code(call.get("assistantId") or ""),
+			self._numbers.code(call.get("phoneNumberId") or ""),
+		)
+		status = self._statuses.code(str(call.get("status") or "unknown").lower())
+		reason = self._reasons.code(call["endedReason"]) if call.get("endedReason") else -1
+		cost = float(call.get("cost") or 0.0)
+		self._pending.append((row, sign, status, reason, cost, -1.0 if duration is None else duration))
+
+	def _widen(self, name: str, width: int) -> None:
+		col = getattr(self, name)
+		if width > col.shape[1]:
+			setattr(self, name, np.concatenate((col, np.zeros((col.shape[0], max(width, col.shape[1] * 2) - col.shape[1]), col.dtype)), axis=1))
+
+	def flush(self) -> None:
+		"""Apply queued deltas in one vectorised pass."""
+		if not self._pending:
+			return
+		batch = np.array(self._pending, dtype=np.float64)
+		self._pending = []
+		rows = batch[:, 0].astype(np.int64)
+		signs = batch[:, 1].astype(np.int64)
+		small_signs = signs.astype(np.int32)
+		statuses = batch[:, 2].astype(np.int64)
+		reasons = batch[:, 3].astype(np.int64)
+		durations = batch[:, 5]
+		self._widen("status", len(self._statuses.names))
+		self._widen("reason", len(self._reasons.names))
+		np.add.at(self.calls, rows, signs)
+		np.add.at(self.cost, rows, signs * batch[:, 4])
+		np.add.at(self.status, (rows, statuses), small_signs)
+		ended = reasons >= 0
+		np.add.at(self.reason, (rows[ended], reasons[ended]), small_signs[ended])
+		timed = durations >= 0
+		bins = np.clip(np.searchsorted(DURATION_EDGES, durations[timed], side="right") - 1, 0, DURATION_BINS - 1)
+		np.add.at(self.histogram, (rows[timed], bins), small_signs[timed])
+		np.add.at(self.duration_sum, rows[timed], signs[timed] * durations[timed])
+
+	# -- queries -------------------------------------------------------------------------------
+
+	def query(
+		self,
+		group_by: str = "day",
+		start: Optional[float] = None,
+		end: Optional[float] = None,
+		assistant_id: Optional[str] = None,
+		phone_number_id: Optional[str] = None,
+	) -> Dict[str, Any]:
+		"""Aggregate buckets whose hour starts in [start, end), grouped by `group_by` (see GROUPS).
+
+		Times are UTC epoch seconds and are widened to whole hours. Duration percentiles are read
+		from the merged histograms, so they are accurate to about 9%.
+		"""
+		if group_by not in GROUPS:
+			raise ValueError(f"group_by must be one of {', '.join(GROUPS)}")
+		self.flush()
+		n = self.size
+		mask = self.calls[:n] > 0
+		if start is not None:
+			mask &= self.hour[:n] >= math.floor(start / 3600)
+		if end is not None:
+			mask &= self.hour[:n] < math.ceil(end / 3600)
+		for interner, col, value in ((self._assistants, self.assistant, assistant_id), (self._numbers, self.number, phone_number_id)):
+			if value is not None:
+				code = interner.codes.get(value)
+				mask &= col[:n] == (-1 if code is None else code)
+		rows = np.nonzero(mask)[0]
+		if group_by == "hour":
+			keys = self.hour[rows]
+		elif group_by == "day":
+			keys = self.hour[rows] // 24
+		elif group_by == "assistant":
+			keys = self.assistant[rows]
+		elif group_by == "number":
+			keys = self.number[rows]
+		else:
+			keys = np.zeros(len(rows), np.int64)
+		groups, inverse = np.unique(keys, return_inverse=True)
+		buckets = [
+			{"key": self._label(group_by, key), **summary}
+			for key, summary in zip(groups.tolist(), self._summarise(rows, inverse.reshape(-1), len(groups)))
+		]
+		totals = self._summarise(rows, np.zeros(len(rows), np.int64), 1)[0]
+		return {"groupBy": group_by, "buckets": buckets, "totals": totals, "bucketsScanned": int(len(rows))}
+
+	def _summarise(self, rows: np.ndarray, inverse: np.ndarray, groups: int) -> List[Dict[str, Any]]:
+		order = np.argsort(inverse, kind="stable")
+		starts = np.searchsorted(inverse[order], np.arange(groups))
+		rows = rows[order]
+
+		def total(col: np.ndarray) -> np.ndarray:
+			if not len(rows):
+				return np.zeros((groups,) + col.shape[1:], col.dtype)
+			return np.add.reduceat(col[rows], starts, axis=0)
+
+		calls = total(self.calls)
+		cost = total(self.cost)
+		duration_sum = total(self.duration_sum)
+		histogram = total(self.histogram)
+		status = total(self.status)
+		reason = total(self.reason)
+		timed = histogram.sum(axis=1)
+		cumulative = histogram.cumsum(axis=1)
+		percentiles = {
+			f"p{p}": _BIN_VALUES[np.argmax(cumulative >= np.maximum(timed * p / 100.0, 1)[:, None], axis=1)]
+			for p in PERCENTILES
+		}
+		out = []
+		for g in range(groups):
+			duration: Dict[str, Any] = {"count": int(timed[g])}
+			if timed[g]:
+				duration["mean"] = round(float(duration_sum[g] / timed[g]), 1)
+				duration.update({k: round(float(v[g]), 1) for k, v in percentiles.items()})
+			out.append({
+				"calls": int(calls[g]),
+				"cost": round(float(cost[g]), 4),
+				"statuses": {self._statuses.names[i]: int(c) for i, c in enumerate(status[g][: len(self._statuses.names)]) if c},
+				"endedReasons": {self._reasons.names[i]: int(c) for i, c in enumerate(reason[g][: len(self._reasons.names)]) if c},
+				"durationSeconds": duration,
+			})
+		return out
+
+	def _label(self, group_by: str, key: int) -> Optional[str]:
+		if group_by == "hour":
+			return datetime.fromtimestamp(key * 3600, tz=timezone.utc).strftime("%Y-%m-%dT%H:00:00Z")
+		if group_by == "day":
+			return datetime.fromtimestamp(key * 86400, tz=timezone.utc).strftime("%Y-%m-%d")
+		if group_by == "assistant":
+			return self._assistants.names[key] or None
+		if group_by == "number":
+			return self._numbers.names[key] or None
+		return None
+
+	def stats(self) -> Dict[str, Any]:
+		return {
+			"buckets": self.size,
+			"pending": len(self._pending),
+			"bytes": sum(getattr(self, name).nbytes for name in ("hour", "assistant", "number", "calls", "cost", "duration_sum", "histogram", "status", "reason")),
+		}
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import codecs
+import csv
+import re
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence, TypeVar, Union
+
+
+REQUIRED_HEADERS = ("name", "number", "earliest_at")
+_E164 = re.compile(r"^\+[1-9]\d{6,14}$")
+_NUMBER_PUNCTUATION = re.compile(r"[\s().\-]")
+
+T = TypeVar("T")
+
+
+class ScheduleFileError(ValueError):
+	"""The upload as a whole is unusable (unknown format, missing headers)."""
+
+
+@dataclass
+class ScheduleRow:
+	row: int
+	name: Optional[str]
+	number: str
+	earliest_at: datetime
+	latest_at: Optional[datetime] = None
+
+
+@dataclass
+class RowError:
+	row: int
+	error: str
+
+	def dict(self) -> Dict[str, Any]:
+		return {"row": self.row, "error": self.error}
+
+
+def _is_csv(filename: Optional[str], content_type: Optional[str]) -> bool:
+	if filename and filename.lower().endswith(".csv"):
+		return True
+	return (content_type or "").split(";")[0].strip() in ("text/csv", "application/csv")
+
+
+def iter_sheet_rows(fileobj: BinaryIO, filename: Optional[str] = None, content_type: Optional[str] = None) -> Iterator[Sequence[Any]]:
+	"""Yield raw rows (header first) from an .xlsx or .csv file object without loading it whole."""
+	fileobj.seek(0)
+	if _is_csv(filename, content_type):
+		# StreamReader (unlike TextIOWrapper) never closes the upload's file when collected
+		yield from csv.reader(codecs.getreader("utf-8-sig")(fileobj))
+		return
+	from openpyxl import load_workbook
+
+	try:
+		wb = load_workbook(fileobj, read_only=True, data_only=True)
+	except Exception as e:
+		raise ScheduleFileError(f"Unreadable Excel file: {e}")
+	try:
+		yield from wb.active.iter_rows(values_only=True)
+	finally:
+		wb.close()
+
+
+def normalize_number(val: Any) -> str:
+	if isinstance(val, bool) or val is None:
+		raise ValueError("number is required")
+	if isinstance(val, float):
+		if not val.is_integer():
+			raise ValueError(f"number {val!r} is not a phone number")
+		val = int(val)
+	if isinstance(val, int):
+		# Excel drops the leading '+' of numeric cells, so the digits must start with a country code
+		if val <= 0:
+			raise ValueError(f"number {val!r} is not a phone number")
+		if len(str(val)) <= 10:
+			raise ValueError(f"number {val!r} has no country code; format the cell as text +<country><number>")
+		val = str(val)
+	raw = _NUMBER_PUNCTUATION.sub("", str(val))
+	if raw.startswith("00"):
+		raw = "+" + raw[2:]
+	elif raw.isdigit() and len(raw) > 10:
+		raw = "+" + raw
+	if not _E164.match(raw):
+		raise ValueError(f"number {val!r} is not E.164 (+<country><number>)")
+	return raw
+
+
+def parse_datetime(val: Any) -> datetime:
+	if isinstance(val, datetime):
+		dt = val
+	else:
+		dt = datetime.fromisoformat(str(val).strip())
+	return dt if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc)
+
+
+def _blank(val: Any) -> bool:
+	return val is None or (isinstance(val, str) and not val.strip())
+
+
+def iter_schedule_rows(raw_rows: Iterable[Sequence[Any]]) -> Iterator[Union[ScheduleRow, RowError]]:
+	"""Validate and normalise sheet rows one at a time.
+
+	Row numbers are 1-based sheet rows (the header is row 1). Fully blank rows are skipped.
+	"""
+	rows = iter(raw_rows)
+	header = next(rows, None)
+	if header is None:
+		raise ScheduleFileError("Empty file")
+	headers = [str(h).strip().lower() if h is not None else "" for h in header]
+	if any(h not in headers for h in REQUIRED_HEADERS):
+		raise ScheduleFileError("Headers must include name, number, earliest_at, optional latest_at")
+	name_idx = headers.index("name")
+	number_idx = headers.index("number")
+	earliest_idx = headers.index("earliest_at")
+	latest_idx = headers.index("latest_at") if "latest_at" in headers else None
+
+	for row_no, row in enumerate(rows, start=2):
+		if not row or all(_blank(v) for v in row):
+			continue
+		cells = list(row) + [None] * (len(headers) - len(row))
+		try:
+			number = normalize_number(None if _blank(cells[number_idx]) else cells[number_idx])
+			if _blank(cells[earliest_idx]):
+				raise ValueError("earliest_at is required")
+			earliest_at = parse_datetime(cells[earliest_idx])
+			latest_at = None
+			if latest_idx is not None and not _blank(cells[latest_idx]):
+				latest_at = parse_datetime(cells[latest_idx])
+				if latest_at <= earliest_at:
+					raise ValueError("latest_at must be after earliest_at")
+		except ValueError as e:
+			yield RowError(row=row_no, error=str(e))
+			continue
+		name = None if _blank(cells[name_idx]) else str(cells[name_idx]).strip()
+		yield ScheduleRow(row=row_no, name=name, number=number, earliest_at=earliest_at, latest_at=latest_at)
+
+
+def take(it: Iterator[T], size: int) -> List[T]:
+	return list(islice(it, size))
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+
+import httpx
+
+from ..config import settings
+from .cache import AsyncTTLCache
+from .http import get_http_client
+from .metrics import track_upstream
+from .retry import with_backoff
+
+
+# Bump whenever the prompt or scoring rubric changes so cached analyses are not reused.
+PROMPT_VERSION = "qa-2024-08-1"
+
+SYSTEM_PROMPT = "You are an expert call QA coach."
+
+
+def transcript_prompt(transcript: str) -> str:
+	return f"Transcript:\n{transcript}\n\nExtract the human vs AI responses and produce a concise comparison with scores (helpfulness, clarity, tone, compliance) 0-10 each, and a short paragraph on improvement advice."
+
+
+def pair_prompt(human_response: Optional[str], ai_response: Optional[str]) -> str:
+	return f"Human: {human_response}\nAI: {ai_response}"
+
+
+def azure_configured() -> bool:
+	return bool(settings.AZURE_OPENAI_ENDPOINT and settings.AZURE_OPENAI_API_KEY and settings.AZURE_OPENAI_DEPLOYMENT)
+
+
+class ScoreStore:
+	"""Persistent analysis cache keyed by sha256(prompt version, deployment, prompt)."""
+
+	def __init__(self, path: str) -> None:
+		self.path = path
+		self._lock = threading.Lock()
+		self._conn: Optional[sqlite3.Connection] = None
+
+	def _db(self) -> sqlite3.Connection:
+		if self._conn is None:
+			os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+			conn = sqlite3.connect(self.path, check_same_thread=False)
+			conn.execute("PRAGMA journal_mode=WAL")
+			conn.execute("PRAGMA synchronous=NORMAL")
+			conn.execute("CREATE TABLE IF NOT EXISTS scores (key TEXT PRIMARY KEY, prompt_version TEXT NOT NULL, analysis TEXT NOT NULL, created_at REAL NOT NULL)")
+			self._conn = conn
+		return self._conn
+
+	def get(self, key: str) -> Optional[str]:
+		with self._lock:
+			row = self._db().execute("SELECT analysis FROM scores WHERE key = ?", (key,)).fetchone()
+		return row[0] if row else None
+
+	def put(self, key: str, analysis: str) -> None:
+		with self._lock, self._db() as db:
+			db.execute("INSERT OR REPLACE INTO scores (key, prompt_version, analysis, created_at) VALUES (?, ?, ?, ?)", (key, PROMPT_VERSION, analysis, time.time()))
+
+	def close(self) -> None:
+		with self._lock:
+			if self._conn is not None:
+				self._conn.close()
+				self._conn = None
+
+
+class Scorer:
+	"""Azure OpenAI QA scoring with a global concurrency cap, 429/5xx backoff and result caching.
+
+	Identical prompts in flight at the same time share one completion.
+	"""
+
+	def __init__(self, store: ScoreStore, concurrency: int = 8, max_retries: int = 5, timeout: float = 30.0) -> None:
+		self.store = store
+		self.concurrency = concurrency
+		self.max_retries = max_retries
+		self.timeout = timeout
+		self._memo = AsyncTTLCache(max_entries=4096)
+		self._semaphore: Optional[asyncio.Semaphore] = None
+		self.completions = 0
+		self.cache_hits = 0
+
+	@staticmethod
+	def key(user_content: str) -> str:
+		raw = "\0".join((PROMPT_VERSION, settings.AZURE_OPENAI_DEPLOYMENT, user_content))
+		return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+	async def _complete(self, user_content: str) -> str:
+		if self._semaphore is None:
+			self._semaphore = asyncio.Semaphore(self.concurrency)
+		url = f"{settings.AZURE_OPENAI_ENDPOINT}/openai/deployments/{settings.AZURE_OPENAI_DEPLOYMENT}/chat/completions?api-version=2024-08-01-preview"
+		body = {
+			"messages": [
+				{"role": "system", "content": SYSTEM_PROMPT},
+				{"role": "user", "content": user_content},
+			],
+			"temperature": 0.2,
+		}
+		headers = {"api-key": settings.AZURE_OPENAI_API_KEY}
+
+		async def post() -> httpx.Response:
+			async with self._semaphore:
+				with track_upstream("azure_openai", "chat.completions"):
+					r = await get_http_client().post(url, json=body, headers=headers, timeout=self.timeout)
+					r.raise_for_status()
+			return r
+
+		r = await with_backoff(post, max_retries=self.max_retries)
+		self.completions += 1
+		choice = (r.json().get("choices") or [{}])[0]
+		return (choice.get("message") or {}).get("content") or ""
+
+	async def score(self, user_content: str) -> Tuple[str, bool]:
+		"""Return (analysis, cached). Raises httpx.HTTPStatusError on a non-retryable upstream error."""
+		key = self.key(user_content)
+		cached = True
+
+		async def load() -> str:
+			nonlocal cached
+			analysis = await asyncio.to_thread(self.store.get, key)
+			if analysis is None:
+				cached = False
+				analysis = await self._complete(user_content)
+				await asyncio.to_thread(self.store.put, key, analysis)
+			return analysis
+
+		analysis = await self._memo.get_or_load((key,), load, 3600.0)
+		if cached:
+			self.cache_hits += 1
+		return analysis, cached
+
+
+scorer = Scorer(
+	ScoreStore(os.path.join(settings.DATA_DIR, "insights.sqlite3")),
+	concurrency=settings.INSIGHTS_CONCURRENCY,
+	max_retries=settings.INSIGHTS_MAX_RETRIES,
+)
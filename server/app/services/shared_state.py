@@ -0,0 +1,462 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from ..config import settings
+from .responses import dumps, loads
+
+
+log = logging.getLogger(__name__)
+
+Handler = Callable[[Dict[str, Any]], Any]
+
+
+class SharedState:
+	"""State shared by the uvicorn workers of one deployment: a TTL cache, leased locks and pub/sub.
+
+	Backends implement the byte-level primitives; `single_flight` and JSON messages are built on
+	them here. Messages carry the publishing process's `origin` and are not delivered back to it,
+	since publishers apply their own changes locally.
+	"""
+
+	backend = "abstract"
+
+	def __init__(self, poll_interval: float = 0.05, lock_ttl: float = 30.0) -> None:
+		self.poll_interval = poll_interval
+		self.lock_ttl = lock_ttl
+		self.origin = uuid.uuid4().hex
+		self._handlers: Dict[str, List[Handler]] = {}
+		self.shared_hits = 0
+		self.loaded = 0
+		self.waits = 0
+		self.wait_timeouts = 0
+		self.published = 0
+		self.received = 0
+
+	# -- primitives ------------------------------------------------------------------------------
+
+	async def start(self) -> None:
+		pass
+
+	async def close(self) -> None:
+		pass
+
+	async def get(self, key: str) -> Optional[bytes]:
+		raise NotImplementedError
+
+	async def set(self, key: str, value: bytes, ttl: float) -> None:
+		raise NotImplementedError
+
+	async def delete_prefix(self, prefix: str) -> int:
+		raise NotImplementedError
+
+	async def try_lock(self, name: str, ttl: float) -> Optional[str]:
+		"""A lease token if `name` was free (or its lease expired), else None."""
+		raise NotImplementedError
+
+	async def renew(self, name: str, token: str, ttl: float) -> bool:
+		"""Extend a lease still held with `token`; False once it expired or changed hands."""
+		raise NotImplementedError
+
+	async def unlock(self, name: str, token: str) -> None:
+		raise NotImplementedError
+
+	async def _publish(self, channel: str, payload: bytes) -> None:
+		raise NotImplementedError
+
+	# -- built on the primitives -----------------------------------------------------------------
+
+	def subscribe(self, channel: str, handler: Handler) -> None:
+		"""Call `handler(message)` for messages other processes publish on `channel`."""
+		self._handlers.setdefault(channel, []).append(handler)
+
+	async def publish(self, channel: str, message: Dict[str, Any]) -> None:
+		self.published += 1
+		await self._publish(channel, dumps({"origin": self.origin, "message": message}))
+
+	def _deliver(self, channel: str, payload: bytes) -> None:
+		try:
+			envelope = loads(payload)
+		except ValueError:
+			return
+		if envelope.get("origin") == self.origin:
+			return
+		self.received += 1
+		for handler in self._handlers.get(channel, ()):
+			try:
+				handler(envelope["message"])
+			except Exception:
+				log.exception("shared state handler for %s failed", channel)
+
+	async def single_flight(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: float) -> Any:
+		"""The shared value of `key`, loaded by at most one process at a time.
+
+		Other processes poll for the value while the lease holder loads it, and load it themselves
+		if it takes longer than the lease. Values are stored as JSON and returned decoded, so every
+		process sees the same representation. Loader errors are not cached.
+		"""
+		lock = f"lock:{key}"
+		deadline = time.monotonic() + self.lock_ttl
+		while True:
+			raw = await self.get(key)
+			if raw is not None:
+				self.shared_hits += 1
+				return loads(raw)
+			token = await self.try_lock(lock, self.lock_ttl)
+			if token is not None:
+				try:
+					raw = await self.get(key)
+					if raw is None:
+						self.loaded += 1
+						raw = dumps(await loader())
+						await self.set(key, raw, ttl)
+					return loads(raw)
+				finally:
+					await self.unlock(lock, token)
+			if time.monotonic() > deadline:
+				self.wait_timeouts += 1
+				return loads(dumps(await loader()))
+			self.waits += 1
+			await asyncio.sleep(self.poll_interval)
+
+	def stats(self) -> Dict[str, Any]:
+		return {
+			"backend": self.backend,
+			"origin": self.origin,
+			"channels": sorted(self._handlers),
+			"sharedHits": self.shared_hits,
+			"loaded": self.loaded,
+			"waits": self.waits,
+			"waitTimeouts": self.wait_timeouts,
+			"published": self.published,
+			"received": self.received,
+		}
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+	key TEXT PRIMARY KEY,
+	value BLOB NOT NULL,
+	expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS locks (
+	name TEXT PRIMARY KEY,
+	token TEXT NOT NULL,
+	expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+	id INTEGER PRIMARY KEY AUTOINCREMENT,
+	channel TEXT NOT NULL,
+	payload BLOB NOT NULL,
+	at REAL NOT NULL
+);
+"""
+
+
+def connect_private(path: str, **kwargs: Any) -> sqlite3.Connection:
+	"""sqlite3.connect for files holding Vapi tokens or signing keys: owner-only (0600).
+
+	The file is created 0600 before SQLite opens it; SQLite gives new -wal and -shm files the
+	database's mode, and files left by older versions are tightened here.
+	"""
+	os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+	os.close(os.open(path, os.O_CREAT | os.O_RDWR, 0o600))
+	for name in (path, f"{path}-wal", f"{path}-shm"):
+		if os.path.exists(name):
+			os.chmod(name, 0o600)
+	return sqlite3.connect(path, **kwargs)
+
+
+class SqliteSharedState(SharedState):
+	"""On-host backend: one SQLite file in WAL mode, opened by every worker.
+
+	Locks are rows with an expiry taken inside a write transaction, so only one process wins.
+	Pub/sub is a message table each worker polls every `poll_interval`; messages are kept for
+	`retention` seconds. Times are wall-clock, since they are compared across processes.
+	"""
+
+	backend = "sqlite"
+
+	def __init__(self, path: str, poll_interval: float = 0.05, lock_ttl: float = 30.0, retention: float = 60.0) -> None:
+		super().__init__(poll_interval=poll_interval, lock_ttl=lock_ttl)
+		self.path = path
+		self.retention = retention
+		self._lock = threading.Lock()
+		self._conn: Optional[sqlite3.Connection] = None
+		self._task: Optional[asyncio.Task] = None
+		self._cursor = 0
+
+	def _db(self) -> sqlite3.Connection:
+		if self._conn is None:
+			conn = connect_private(self.path, check_same_thread=False, timeout=10.0)
+			conn.execute("PRAGMA journal_mode=WAL")
+			conn.execute("PRAGMA synchronous=NORMAL")
+			conn.executescript(_SCHEMA)
+			self._conn = conn
+		return self._conn
+
+	def _run(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+		with self._lock:
+			return fn(self._db())
+
+	async def _call(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+		return await asyncio.to_thread(self._run, fn)
+
+	async def start(self) -> None:
+		if self._task is None:
+			self._cursor = await self._call(lambda db: db.execute("SELECT COALESCE(MAX(id), 0) FROM messages").fetchone()[0])
+			self._task = asyncio.create_task(self._poll())
+
+	async def close(self) -> None:
+		if self._task is not None:
+			self._task.cancel()
+			try:
+				await self._task
+			except asyncio.CancelledError:
+				pass
+			self._task = None
+		with self._lock:
+			if self._conn is not None:
+				self._conn.close()
+				self._conn = None
+
+	async def get(self, key: str) -> Optional[bytes]:
+		row = await self._call(lambda db: db.execute("SELECT value, expires_at FROM kv WHERE key = ?", (key,)).fetchone())
+		if row is None or row[1] <= time.time():
+			return None
+		return row[0]
+
+	async def set(self, key: str, value: bytes, ttl: float) -> None:
+		def write(db: sqlite3.Connection) -> None:
+			with db:
+				db.execute("INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)", (key, value, time.time() + ttl))
+
+		await self._call(write)
+
+	async def delete_prefix(self, prefix: str) -> int:
+		def delete(db: sqlite3.Connection) -> int:
+			with db:
+				return db.execute("DELETE FROM kv WHERE key >= ? AND key < ?", (prefix, prefix + "\uffff")).rowcount
+
+		return await self._call(delete)
+
+	async def try_lock(self, name: str, ttl: float) -> Optional[str]:
+		token = uuid.uuid4().hex
+
+		def acquire(db: sqlite3.Connection) -> bool:
+			now = time.time()
+			with db:
+				db.execute("DELETE FROM locks WHERE name = ? AND expires_at <= ?", (name, now))
+				return db.execute("INSERT OR IGNORE INTO locks (name, token, expires_at) VALUES (?, ?, ?)", (name, token, now + ttl)).rowcount == 1
+
+		return token if await self._call(acquire) else None
+
+	async def renew(self, name: str, token: str, ttl: float) -> bool:
+		def extend(db: sqlite3.Connection) -> bool:
+			now = time.time()
+			with db:
+				return db.execute(
+					"UPDATE locks SET expires_at = ? WHERE name = ? AND token = ? AND expires_at > ?", (now + ttl, name, token, now)
+				).rowcount == 1
+
+		return await self._call(extend)
+
+	async def unlock(self, name: str, token: str) -> None:
+		def release(db: sqlite3.Connection) -> None:
+			with db:
+				db.execute("DELETE FROM locks WHERE name = ? AND token = ?", (name, token))
+
+		await self._call(release)
+
+	async def _publish(self, channel: str, payload: bytes) -> None:
+		def insert(db: sqlite3.Connection) -> None:
+			with db:
+				db.execute("INSERT INTO messages (channel, payload, at) VALUES (?, ?, ?)", (channel, payload, time.time()))
+
+		await self._call(insert)
+
+	def _sweep(self, db: sqlite3.Connection) -> None:
+		now = time.time()
+		with db:
+			db.execute("DELETE FROM messages WHERE at < ?", (now - self.retention,))
+			db.execute("DELETE FROM kv WHERE expires_at <= ?", (now,))
+			db.execute("DELETE FROM locks WHERE expires_at <= ?", (now,))
+
+	async def _poll(self) -> None:
+		swept = time.monotonic()
+		while True:
+			try:
+				cursor = self._cursor
+				rows = await self._call(lambda db: db.execute(
+					"SELECT id, channel, payload FROM messages WHERE id > ? ORDER BY id LIMIT 1000", (cursor,)
+				).fetchall())
+				for message_id, channel, payload in rows:
+					self._cursor = message_id
+					if channel in self._handlers:
+						self._deliver(channel, payload)
+				if time.monotonic() - swept > self.retention:
+					await self._call(self._sweep)
+					swept = time.monotonic()
+			except asyncio.CancelledError:
+				raise
+			except Exception:
+				log.exception("shared state poll failed")
+			await asyncio.sleep(self.poll_interval)
+
+	def stats(self) -> Dict[str, Any]:
+		out = super().stats()
+		out["path"] = self.path
+		out["cursor"] = self._cursor
+		return out
+
+
+def _glob_escape(value: str) -> str:
+	return "".join("\\" + c if c in "*?[]\\" else c for c in value)
+
+
+class RedisSharedState(SharedState):
+	"""Backend for workers on several hosts, over the Redis protocol (`pip install redis`).
+
+	`client` may be any redis.asyncio-compatible client, e.g. fakeredis in tests; otherwise one
+	is created from `url`. Keys and channels are namespaced by `prefix`.
+	"""
+
+	backend = "redis"
+
+	def __init__(self, url: str, prefix: str = "aicalling:", client: Any = None, poll_interval: float = 0.05, lock_ttl: float = 30.0) -> None:
+		super().__init__(poll_interval=poll_interval, lock_ttl=lock_ttl)
+		self.url = url
+		self.prefix = prefix
+		self._client = client
+		self._pubsub: Any = None
+		self._task: Optional[asyncio.Task] = None
+		self._subscribed: Set[str] = set()
+
+	@property
+	def client(self) -> Any:
+		if self._client is None:
+			try:
+				import redis.asyncio as redis
+			except ImportError:
+				raise RuntimeError("SHARED_STATE=redis needs the redis package: pip install redis")
+			self._client = redis.from_url(self.url)
+		return self._client
+
+	async def start(self) -> None:
+		if self._task is None:
+			self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+			await self._pubsub.subscribe(*(self.prefix + c for c in self._handlers))
+			self._subscribed = set(self._handlers)
+			self._task = asyncio.create_task(self._listen())
+
+	async def close(self) -> None:
+		if self._task is not None:
+			self._task.cancel()
+			try:
+				await self._task
+			except asyncio.CancelledError:
+				pass
+			self._task = None
+		if self._pubsub is not None:
+			await self._pubsub.aclose()
+			self._pubsub = None
+		if self._client is not None:
+			await self._client.aclose()
+
+	def subscribe(self, channel: str, handler: Handler) -> None:
+		super().subscribe(channel, handler)
+		if self._pubsub is not None and channel not in self._subscribed:
+			self._subscribed.add(channel)
+			asyncio.get_running_loop().create_task(self._pubsub.subscribe(self.prefix + channel))
+
+	async def get(self, key: str) -> Optional[bytes]:
+		return await self.client.get(self.prefix + key)
+
+	async def set(self, key: str, value: bytes, ttl: float) -> None:
+		await self.client.set(self.prefix + key, value, px=max(1, int(ttl * 1000)))
+
+	async def delete_prefix(self, prefix: str) -> int:
+		keys = [k async for k in self.client.scan_iter(match=_glob_escape(self.prefix + prefix) + "*", count=500)]
+		return await self.client.delete(*keys) if keys else 0
+
+	async def try_lock(self, name: str, ttl: float) -> Optional[str]:
+		token = uuid.uuid4().hex
+		acquired = await self.client.set(self.prefix + name, token, nx=True, px=max(1, int(ttl * 1000)))
+		return token if acquired else None
+
+	async def renew(self, name: str, token: str, ttl: float) -> bool:
+		key = self.prefix + name
+		async with self.client.pipeline(transaction=True) as pipe:
+			try:
+				await pipe.watch(key)
+				current = await pipe.get(key)
+				if current is None or (current.decode() if isinstance(current, bytes) else current) != token:
+					await pipe.unwatch()
+					return False
+				pipe.multi()
+				pipe.pexpire(key, max(1, int(ttl * 1000)))
+				await pipe.execute()
+				return True
+			except Exception:
+				return False
+
+	async def unlock(self, name: str, token: str) -> None:
+		key = self.prefix + name
+		async with self.client.pipeline(transaction=True) as pipe:
+			try:
+				await pipe.watch(key)
+				current = await pipe.get(key)
+				if current is not None and (current.decode() if isinstance(current, bytes) else current) == token:
+					pipe.multi()
+					pipe.delete(key)
+					await pipe.execute()
+				else:
+					await pipe.unwatch()
+			except Exception:
+				# Lost the race to expiry or another holder; the lease frees itself.
+				pass
+
+	async def _publish(self, channel: str, payload: bytes) -> None:
+		await self.client.publish(self.prefix + channel, payload)
+
+	async def _listen(self) -> None:
+		while True:
+			try:
+				message = await self._pubsub.get_message(timeout=1.0)
+				if message is None:
+					continue
+				channel = message["channel"]
+				channel = channel.decode() if isinstance(channel, bytes) else channel
+				self._deliver(channel[len(self.prefix):], message["data"])
+			except asyncio.CancelledError:
+				raise
+			except Exception:
+				log.exception("shared state listener failed")
+				await asyncio.sleep(1.0)
+
+	def stats(self) -> Dict[str, Any]:
+		out = super().stats()
+		out["prefix"] = self.prefix
+		return out
+
+
+def create_shared_state() -> Optional[SharedState]:
+	"""The backend named by SHARED_STATE: `sqlite` (default, workers on one host), `redis`, or `off`."""
+	poll = settings.SHARED_STATE_POLL_MS / 1000.0
+	if settings.SHARED_STATE == "off":
+		return None
+	if settings.SHARED_STATE == "redis":
+		return RedisSharedState(settings.SHARED_STATE_REDIS_URL, prefix=settings.SHARED_STATE_PREFIX, poll_interval=poll, lock_ttl=settings.SHARED_STATE_LOCK_TTL)
+	if settings.SHARED_STATE == "sqlite":
+		return SqliteSharedState(os.path.join(settings.DATA_DIR, "shared_state.sqlite3"), poll_interval=poll, lock_ttl=settings.SHARED_STATE_LOCK_TTL)
+	raise ValueError(f"Unknown SHARED_STATE {settings.SHARED_STATE!r}; use sqlite, redis or off")
+
+
+shared_state = create_shared_state()
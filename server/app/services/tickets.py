@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from ..config import settings
+from .shared_state import SharedState, shared_state
+
+
+SCOPES = ("recording", "monitor", "events")
+_KEY = "tickets:key"
+
+
+class TicketError(Exception):
+	"""The ticket is malformed, forged, expired, or for another scope or call."""
+
+
+def _b64(raw: bytes) -> str:
+	return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _unb64(text: str) -> bytes:
+	return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class Tickets:
+	"""Short-lived signed tickets for URLs that cannot carry headers (audio src, EventSource, WebSocket).
+
+	A ticket names its scope, call and expiry and is HMAC-signed; the Vapi token it stands for stays
+	server side, in shared state when workers share it, so no token ever appears in a URL or access log.
+	"""
+
+	def __init__(self, secret: str = "", ttl: float = 300.0, shared: Optional[SharedState] = None) -> None:
+		self.ttl = ttl
+		self._shared = shared
+		self._configured = bool(secret)
+		self._key = secret.encode() if secret else secrets.token_bytes(32)
+		self._tokens: Dict[str, Tuple[str, float]] = {}
+		self.issued = 0
+		self.rejected = 0
+
+	async def start(self) -> None:
+		"""Without TICKET_SECRET, agree on one random signing key across workers through shared state."""
+		if self._configured or self._shared is None:
+			return
+		while True:
+			key = await self._shared.get(_KEY)
+			if key:
+				self._key = key
+				return
+			lock = await self._shared.try_lock(_KEY, 5.0)
+			if lock is None:
+				await asyncio.sleep(0.05)
+				continue
+			try:
+				if await self._shared.get(_KEY) is None:
+					await self._shared.set(_KEY, self._key, 10 * 365 * 86400.0)
+			finally:
+				await self._shared.unlock(_KEY, lock)
+
+	def _sign(self, body: str) -> str:
+		return _b64(hmac.new(self._key, body.encode(), hashlib.sha256).digest())
+
+	async def issue(self, token: str, scope: str, call_id: Optional[str] = None) -> Tuple[str, float]:
+		"""A ticket for `scope` (and `call_id`, for recording and monitor) and its expiry time."""
+		if scope not in SCOPES:
+			raise TicketError(f"Unknown ticket scope {scope!r}; use {', '.join(SCOPES)}")
+		if scope != "events" and not call_id:
+			raise TicketError(f"A {scope} ticket needs a call_id")
+		nonce = secrets.token_urlsafe(16)
+		expires = time.time() + self.ttl
+		body = _b64(json.dumps({"s": scope, "c": call_id if scope != "events" else None, "e": expires, "n": nonce}).encode())
+		if self._shared is not None:
+			await self._shared.set(f"ticket:{nonce}", token.encode(), self.ttl)
+		else:
+			now = time.time()
+			for stale in [n for n, (_, exp) in self._tokens.items() if exp <= now]:
+				del self._tokens[stale]
+			self._tokens[nonce] = (token, expires)
+		self.issued += 1
+		return f"{body}.{self._sign(body)}", expires
+
+	async def redeem(self, ticket: str, scope: str, call_id: Optional[str] = None) -> str:
+		"""The Vapi token behind a valid ticket for `scope`/`call_id`; TicketError otherwise."""
+		try:
+			token = await self._redeem(ticket, scope, call_id)
+		except TicketError:
+			self.rejected += 1
+			raise
+		return token
+
+	async def _redeem(self, ticket: str, scope: str, call_id: Optional[str]) -> str:
+		body, _, signature = ticket.partition(".")
+		if not hmac.compare_digest(signature.encode(), self._sign(body).encode()):
+			raise TicketError("Invalid ticket")
+		try:
+			claims = json.loads(_unb64(body))
+		except ValueError:
+			raise TicketError("Invalid ticket")
+		if claims.get("s") != scope or (scope != "events" and claims.get("c") != call_id):
+			raise TicketError("Ticket is not valid for this resource")
+		if claims["e"] <= time.time():
+			raise TicketError("Ticket expired")
+		if self._shared is not None:
+			raw = await self._shared.get(f"ticket:{claims['n']}")
+			token = raw.decode() if raw else None
+		else:
+			token = self._tokens.get(claims["n"], (None, 0.0))[0]
+		if not token:
+			raise TicketError("Ticket expired")
+		return token
+
+	def stats(self) -> Dict[str, Any]:
+		return {"ttl_seconds": self.ttl, "issued": self.issued, "rejected": self.rejected, "shared": self._shared is not None}
+
+
+tickets = Tickets(settings.TICKET_SECRET, settings.TICKET_TTL_SECONDS, shared_state)
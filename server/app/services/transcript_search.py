@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ..config import settings
+from .call_index import to_epoch
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+	id INTEGER PRIMARY KEY,
+	org_id TEXT NOT NULL,
+	call_id TEXT NOT NULL,
+	assistant_id TEXT,
+	status TEXT,
+	created_at REAL,
+	ended_at REAL,
+	UNIQUE (org_id, call_id)
+);
+CREATE INDEX IF NOT EXISTS calls_org_created ON calls (org_id, created_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS transcripts USING fts5(transcript, tokenize = 'unicode61 remove_diacritics 2');
+"""
+
+# Private-use code points mark matches inside snippets; they never occur in transcripts.
+_HL_START, _HL_END = "\ue000", "\ue001"
+_TOKEN = re.compile(r'"([^"]*)"|(\S+)')
+
+
+class SearchQueryError(ValueError):
+	pass
+
+
+def to_fts_query(q: str) -> str:
+	"""Translate a user query into FTS5 syntax.
+
+	"quoted text" is a phrase, a trailing * is a prefix match, OR between terms is kept, and
+	every other term is quoted so punctuation cannot break the FTS5 parser. Terms are ANDed.
+	"""
+	parts: List[str] = []
+	for phrase, word in _TOKEN.findall(q):
+		if phrase:
+			parts.append('"%s"' % phrase.replace('"', '""'))
+		elif word == "OR" and parts and parts[-1] != "OR":
+			parts.append("OR")
+		else:
+			prefix = word.endswith("*")
+			word = word.rstrip("*").replace('"', '""')
+			if word:
+				parts.append('"%s"%s' % (word, "*" if prefix else ""))
+	while parts and parts[-1] == "OR":
+		parts.pop()
+	if not parts:
+		raise SearchQueryError("Empty search query")
+	return " ".join(parts)
+
+
+def _segments(snippet: str) -> List[Dict[str, Any]]:
+	"""Split a marked snippet into [{text, match}] so clients never render transcript text as HTML."""
+	out: List[Dict[str, Any]] = []
+	for i, chunk in enumerate(re.split(f"[{_HL_START}{_HL_END}]", snippet)):
+		if chunk:
+			out.append({"text": chunk, "match": i % 2 == 1})
+	return out
+
+
+class TranscriptSearch:
+	"""SQLite FTS5 index of call transcripts, scoped by Vapi org.
+
+	Writes go through one connection and reads through another, so WAL lets searches run
+	while a backfill is writing.
+	"""
+
+	def __init__(self, path: str, rank_window: int = 10000) -> None:
+		self.path = path
+		self.rank_window = rank_window
+		self._write_lock = threading.Lock()
+		self._read_lock = threading.Lock()
+		self._writer: Optional[sqlite3.Connection] = None
+		self._reader: Optional[sqlite3.Connection] = None
+		self.indexed = 0
+		self.queries = 0
+
+	def _connect(self) -> sqlite3.Connection:
+		conn = sqlite3.connect(self.path, check_same_thread=False)
+		conn.execute("PRAGMA journal_mode=WAL")
+		conn.execute("PRAGMA synchronous=NORMAL")
+		return conn
+
+	def _write_db(self) -> sqlite3.Connection:
+		if self._writer is None:
+			os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+			conn = self._connect()
+			conn.executescript(_SCHEMA)
+			self._writer = conn
+		return self._writer
+
+	def _read_db(self) -> sqlite3.Connection:
+		if self._reader is None:
+			with self._write_lock:
+				self._write_db()
+			self._reader = self._connect()
+			self._reader.row_factory = sqlite3.Row
+		return self._reader
+
+	def close(self) -> None:
+		with self._write_lock, self._read_lock:
+			for conn in (self._writer, self._reader):
+				if conn is not None:
+					conn.close()
+			self._writer = self._reader = None
+
+	def index_calls(self, org_id: str, calls: Iterable[Dict[str, Any]]) -> int:
+		"""Insert or replace calls (Vapi call dicts with artifact.transcript); returns rows written."""
+		written = 0
+		with self._write_lock, self._write_db() as db:
+			for call in calls:
+				transcript = (call.get("artifact") or {}).get("transcript") or call.get("transcript")
+				if not call.get("id") or not transcript:
+					continue
+				row_id = db.execute(
+					"INSERT INTO calls (org_id, call_id, assistant_id, status, created_at, ended_at) VALUES (?, ?, ?, ?, ?, ?) "
+					"ON CONFLICT (org_id, call_id) DO UPDATE SET assistant_id = excluded.assistant_id, status = excluded.status, "
+					"created_at = excluded.created_at, ended_at = excluded.ended_at RETURNING id",
+					(
+						org_id,
+						call["id"],
+						call.get("assistantId"),
+						str(call["status"]).lower() if call.get("status") else None,
+						to_epoch(call.get("createdAt")),
+						to_epoch(call.get("endedAt")),
+					),
+				).fetchone()[0]
+				db.execute("DELETE FROM transcripts WHERE rowid = ?", (row_id,))
+				db.execute("INSERT INTO transcripts (rowid, transcript) VALUES (?, ?)", (row_id, transcript))
+				written += 1
+		self.indexed += written
+		return written
+
+	def indexed_ids(self, org_id: str, call_ids: List[str]) -> set:
+		with self._read_lock:
+			db = self._read_db()
+			found = set()
+			for i in range(0, len(call_ids), 500):
+				batch = call_ids[i : i + 500]
+				rows = db.execute(f"SELECT call_id FROM calls WHERE org_id = ? AND call_id IN ({','.join('?' * len(batch))})", (org_id, *batch))
+				found.update(r[0] for r in rows)
+		return found
+
+	def search(
+		self,
+		org_id: str,
+		q: str,
+		assistant_id: Optional[str] = None,
+		status: Optional[str] = None,
+		created_after: Optional[float] = None,
+		created_before: Optional[float] = None,
+		offset: int = 0,
+		limit: int = 20,
+	) -> Tuple[List[Dict[str, Any]], bool]:
+		"""Best-first (bm25) matches with highlighted snippets; returns (results, has_more).
+
+		bm25 has to score every match, so for very broad queries only the newest `rank_window`
+		matching calls (by insertion order) are ranked; finding that cutoff only walks rowids.
+		"""
+		match = to_fts_query(q)
+		where = ["transcripts MATCH ?", "c.org_id = ?"]
+		params: List[Any] = [match, org_id]
+		for clause, value in (
+			("c.assistant_id = ?", assistant_id),
+			("c.status = ?", status.lower() if status else None),
+			("c.created_at >= ?", created_after),
+			("c.created_at <= ?", created_before),
+		):
+			if value is not None:
+				where.append(clause)
+				params.append(value)
+		with self._read_lock:
+			try:
+				cutoff = self._read_db().execute(
+					f"SELECT transcripts.rowid FROM transcripts JOIN calls c ON c.id = transcripts.rowid WHERE {' AND '.join(where)} "
+					f"ORDER BY transcripts.rowid DESC LIMIT 1 OFFSET ?",
+					(*params, self.rank_window - 1),
+				).fetchone()
+			except sqlite3.OperationalError as e:
+				raise SearchQueryError(str(e))
+		if cutoff is not None:
+			where.append("transcripts.rowid >= ?")
+			params.append(cutoff[0])
+		sql = (
+			f"SELECT c.call_id, c.assistant_id, c.status, c.created_at, c.ended_at, "
+			f"snippet(transcripts, 0, ?, ?, '…', 16) AS snippet, transcripts.rank AS score "
+			f"FROM transcripts JOIN calls c ON c.id = transcripts.rowid WHERE {' AND '.join(where)} "
+			f"ORDER BY transcripts.rank LIMIT ? OFFSET ?"
+		)
+		params = [_HL_START, _HL_END, *params, limit + 1, offset]
+		with self._read_lock:
+			try:
+				rows = self._read_db().execute(sql, params).fetchall()
+			except sqlite3.OperationalError as e:
+				raise SearchQueryError(str(e))
+		self.queries += 1
+		results = [
+			{
+				"callId": r["call_id"],
+				"assistantId": r["assistant_id"],
+				"status": r["status"],
+				"createdAt": _iso(r["created_at"]),
+				"endedAt": _iso(r["ended_at"]),
+				"score": round(-r["score"], 4),
+				"snippet": _segments(r["snippet"]),
+			}
+			for r in rows[:limit]
+		]
+		return results, len(rows) > limit
+
+	def stats(self) -> Dict[str, Any]:
+		with self._read_lock:
+			count = self._read_db().execute("SELECT COUNT(*) FROM calls").fetchone()[0]
+		return {"transcripts": count, "indexedSinceStart": self.indexed, "queries": self.queries}
+
+
+def _iso(ts: Optional[float]) -> Optional[str]:
+	if ts is None:
+		return None
+	return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ts))
+
+
+transcript_search = TranscriptSearch(os.path.join(settings.DATA_DIR, "search.sqlite3"), rank_window=settings.SEARCH_RANK_WINDOW)
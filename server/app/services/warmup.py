@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+import importlib
+import logging
+import sys
+import time
+import typing
+from types import ModuleType
+from typing import Any, Dict, Optional, Sequence
+
+
+log = logging.getLogger(__name__)
+
+# The SDK creates resource clients on first attribute access (`client.calls`), importing their
+# generated type modules then; together with the types we build requests from, these are the
+# bulk of a cold start, so they are loaded on first use and optionally pre-warmed.
+SDK_RESOURCE_MODULES = (
+	"vapi.calls.client",
+	"vapi.assistants.client",
+	"vapi.phone_numbers.client",
+	"vapi.sessions.client",
+)
+LAZY_MODULES = (
+	"vapi.types.create_customer_dto",
+	"vapi.types.schedule_plan",
+	"vapi.types.assistant_overrides",
+	"vapi.types.open_ai_message",
+	"vapi.types.open_ai_message_role",
+	"vapi.assistants.types.update_assistant_dto_model",
+	"openpyxl",
+)
+
+
+async def load(module: str) -> ModuleType:
+	"""Import `module` in a worker thread unless it is already loaded, so the event loop never stalls on it."""
+	loaded = sys.modules.get(module)
+	# A module another thread is still importing is in sys.modules half-initialised; import_module waits for it.
+	if loaded is not None and not getattr(getattr(loaded, "__spec__", None), "_initializing", False):
+		return loaded
+	return await asyncio.to_thread(importlib.import_module, module)
+
+
+async def sdk_type(module: str, name: str) -> Any:
+	return getattr(await load(module), name)
+
+
+_variants: Dict[typing.Tuple[str, str], Dict[str, Any]] = {}
+
+
+async def sdk_variant(module: str, name: str, provider: Any) -> Any:
+	"""The member of an SDK union type (e.g. UpdateAssistantDtoModel) whose `provider` literal matches.
+
+	Validating against the whole annotated union builds a validator for every member on each call
+	(~0.4s for assistant models), so members are looked up by their discriminator instead.
+	"""
+	key = (module, name)
+	variants = _variants.get(key)
+	if variants is None:
+		union = await sdk_type(module, name)
+		variants = {}
+		for member in typing.get_args(typing.get_args(union)[0]):
+			for literal in typing.get_args(member.model_fields["provider"].annotation):
+				variants[literal] = member
+		_variants[key] = variants
+	variant = variants.get(provider)
+	if variant is None:
+		raise ValueError(f"Unsupported provider {provider!r} for {name}")
+	return variant
+
+
+class Prewarmer:
+	"""Imports the lazily loaded modules in a worker thread after startup (or before it, when blocking)."""
+
+	def __init__(self, modules: Sequence[str]) -> None:
+		self.modules = list(modules)
+		self.timings: Dict[str, float] = {}
+		self.errors: Dict[str, str] = {}
+		self._task: Optional[asyncio.Task] = None
+		self.started_at: Optional[float] = None
+		self.finished_at: Optional[float] = None
+
+	def _run(self) -> None:
+		for module in self.modules:
+			started = time.perf_counter()
+			try:
+				importlib.import_module(module)
+			except Exception as e:
+				self.errors[module] = f"{type(e).__name__}: {e}"
+				log.warning("prewarm of %s failed: %s", module, e)
+			self.timings[module] = round(time.perf_counter() - started, 4)
+
+	async def _warm(self) -> None:
+		self.started_at = time.time()
+		await asyncio.to_thread(self._run)
+		self.finished_at = time.time()
+
+	async def start(self, mode: str) -> None:
+		"""`background` warms while serving, `blocking` before the app accepts requests, `off` never."""
+		if mode == "off" or self._task is not None:
+			return
+		self._task = asyncio.create_task(self._warm())
+		if mode == "blocking":
+			await self._task
+
+	async def stop(self) -> None:
+		# The import thread cannot be interrupted; just stop waiting for it.
+		if self._task is not None and not self._task.done():
+			self._task.cancel()
+
+	@property
+	def done(self) -> bool:
+		return self._task is not None and self._task.done()
+
+	def stats(self) -> Dict[str, Any]:
+		return {
+			"done": self.done,
+			"seconds": round(self.finished_at - self.started_at, 3) if self.finished_at and self.started_at else None,
+			"modules": self.timings,
+			"errors": self.errors,
+		}
+
+
+prewarmer = Prewarmer(SDK_RESOURCE_MODULES + LAZY_MODULES)
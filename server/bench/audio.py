@@ -0,0 +1,129 @@
+"""Batch audio analytics against the stub: recordings analysed per second and metric accuracy.
+
+The stub serves a synthetic stereo WAV per ended call, scripted by bench.vapi_stub.conversation_script,
+so the measured response latency and turn counts can be checked against the script:
+
+	python -m bench.audio --calls 300 --workers 4
+	python -m bench.audio --min-per-second 20   # exit 1 below 20 recordings/s or on a wrong metric
+
+The batch runs cold (download, decode and analyse) and then again from stored results.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from .harness import free_port, peak_rss_mb, spawn, wait_ready
+from .vapi_stub import conversation_script, response_latency
+
+
+def check(call_id: str, metrics: Dict[str, Any], seconds: float) -> List[str]:
+	i = int(call_id.rsplit("-", 1)[-1])
+	script = conversation_script(i, seconds)
+	problems = []
+	latency = metrics["responseLatency"]["p50Seconds"]
+	if latency is None or abs(latency - response_latency(i)) > 0.05:
+		problems.append(f"{call_id}: latency p50 {latency} != {response_latency(i)}")
+	for who in ("customer", "agent"):
+		turns = sum(1 for speaker, _, _ in script if speaker == who)
+		if metrics[who]["turns"] != turns:
+			problems.append(f"{call_id}: {who} turns {metrics[who]['turns']} != {turns}")
+	return problems
+
+
+async def run_batch(client: httpx.AsyncClient, call_ids: List[str]) -> Dict[str, Any]:
+	started = time.monotonic()
+	lines = []
+	async with client.stream("POST", "/api/insights/audio/batch", json={"call_ids": call_ids}) as r:
+		r.raise_for_status()
+		async for line in r.aiter_lines():
+			if line:
+				lines.append(json.loads(line))
+	return {"seconds": time.monotonic() - started, "lines": lines}
+
+
+async def main() -> int:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--calls", type=int, default=200, help="ended calls to analyse")
+	parser.add_argument("--workers", type=int, default=0, help="AUDIO_WORKERS (0: one per CPU)")
+	parser.add_argument("--recording-seconds", type=float, default=120)
+	parser.add_argument("--latency-ms", type=float, default=20)
+	parser.add_argument("--min-per-second", type=float, help="fail below this many cold recordings per second")
+	parser.add_argument("--json", help="write the report here")
+	args = parser.parse_args()
+
+	stub_port, app_port = free_port(), free_port()
+	stub_url, app_url = f"http://127.0.0.1:{stub_port}", f"http://127.0.0.1:{app_port}"
+	stub = spawn("bench.vapi_stub:app", stub_port, {
+		"STUB_LATENCY_MS": str(args.latency_ms),
+		"STUB_CALLS": str(args.calls * 2),
+		"STUB_PUBLIC_URL": stub_url,
+		"STUB_RECORDING_SECONDS": str(args.recording_seconds),
+	})
+	api = spawn("app.main:app", app_port, {
+		"VAPI_BASE_URL": stub_url,
+		"DATA_DIR": tempfile.mkdtemp(prefix="bench-audio-"),
+		"AUDIO_WORKERS": str(args.workers),
+		"ARTIFACT_ALLOWED_HOSTS": "127.0.0.1",
+		"ARTIFACT_ALLOW_PRIVATE_HOSTS": "1",
+		"VAPI_RATE_PER_SECOND": "1000",
+		"VAPI_RATE_BURST": "1000",
+		"PREWARM": "blocking",
+	})
+	# Every fifth stub call is still in progress and has no recording.
+	call_ids = [f"call-{i}" for i in range(args.calls * 2) if i % 5 != 0][: args.calls]
+	try:
+		await wait_ready(f"{stub_url}/__stub/stats")
+		await wait_ready(f"{app_url}/docs")
+		async with httpx.AsyncClient(base_url=app_url, headers={"x-vapi-token": "bench"}, timeout=None) as client:
+			cold = await run_batch(client, call_ids)
+			warm = await run_batch(client, call_ids)
+			system = (await client.get("/api/system/audio")).json()
+		rss = peak_rss_mb(api.pid)
+	finally:
+		for p in (api, stub):
+			p.terminate()
+		for p in (api, stub):
+			p.wait()
+
+	errors = [line for line in cold["lines"] if "error" in line]
+	problems = [p for line in cold["lines"] if "metrics" in line for p in check(line["callId"], line["metrics"], args.recording_seconds)]
+	per_second = len(call_ids) / cold["seconds"]
+	report = {
+		"recordings": len(call_ids),
+		"workers": system["workers"],
+		"coldSeconds": round(cold["seconds"], 2),
+		"recordingsPerSecond": round(per_second, 1),
+		"audioHoursPerMinute": round(len(call_ids) * args.recording_seconds / 3600 / cold["seconds"] * 60, 2),
+		"cachedSeconds": round(warm["seconds"], 3),
+		"cached": sum(1 for line in warm["lines"] if line.get("cached")),
+		"errors": len(errors),
+		"wrongMetrics": len(problems),
+		"apiPeakRssMb": rss,
+	}
+	print(json.dumps(report))
+	if args.json:
+		with open(args.json, "w") as f:
+			json.dump({"args": vars(args), **report, "system": system, "problems": problems[:20], "errorLines": errors[:20]}, f, indent=2)
+	failed = False
+	for line in errors[:5]:
+		print(f"ERROR: {line['callId']}: {line['error']}")
+	for problem in problems[:5]:
+		print(f"WRONG: {problem}")
+	if errors or problems:
+		failed = True
+	if args.min_per_second is not None and per_second < args.min_per_second:
+		print(f"SLOW: {per_second:.1f} recordings/s < {args.min_per_second}")
+		failed = True
+	return 1 if failed else 0
+
+
+if __name__ == "__main__":
+	sys.exit(asyncio.run(main()))
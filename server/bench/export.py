@@ -0,0 +1,120 @@
+"""Bulk call export against the stub: time to first byte, throughput and API memory per format.
+
+Serves --calls calls from the stub with artifacts left out of the listing, so every ended call's
+transcript is fetched separately, and downloads /api/calls/export once per format:
+
+	python -m bench.export --calls 20000 --formats csv,ndjson,xlsx
+	python -m bench.export --max-ttfb-ms 500 --max-rss-mb 300   # exit 1 when either is exceeded
+
+Peak RSS is the API's high-water mark after each download, so memory that grows with the export
+size shows up as a rising figure across larger --calls runs.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import io
+import json
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from .harness import free_port, peak_rss_mb, spawn, wait_ready
+
+
+def count_rows(fmt: str, body: bytes) -> int:
+	if fmt == "csv":
+		return sum(1 for _ in csv.reader(io.StringIO(body.decode("utf-8")))) - 1
+	if fmt == "ndjson":
+		return body.count(b"\n")
+	return -1
+
+
+async def download(client: httpx.AsyncClient, fmt: str, keep: bool) -> Dict[str, Any]:
+	started = time.monotonic()
+	ttfb = None
+	parts: List[bytes] = []
+	async with client.stream("GET", "/api/calls/export", params={"format": fmt}) as r:
+		r.raise_for_status()
+		async for chunk in r.aiter_bytes():
+			if ttfb is None:
+				ttfb = time.monotonic() - started
+			if keep:
+				parts.append(chunk)
+		size = r.num_bytes_downloaded
+	seconds = time.monotonic() - started
+	return {
+		"format": fmt,
+		"ttfbMs": round((ttfb or seconds) * 1000, 1),
+		"seconds": round(seconds, 2),
+		"megabytes": round(size / 1024 ** 2, 2),
+		"rows": count_rows(fmt, b"".join(parts)) if keep else None,
+	}
+
+
+async def main() -> int:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--calls", type=int, default=5000)
+	parser.add_argument("--formats", default="csv,ndjson,xlsx")
+	parser.add_argument("--latency-ms", type=float, default=50)
+	parser.add_argument("--concurrency", type=int, default=8, help="EXPORT_CONCURRENCY")
+	parser.add_argument("--max-ttfb-ms", type=float, help="fail when the first byte of any format takes longer")
+	parser.add_argument("--max-rss-mb", type=float, help="fail when the API's peak RSS goes above this")
+	parser.add_argument("--json", help="write the report here")
+	args = parser.parse_args()
+
+	stub_port, app_port = free_port(), free_port()
+	stub_url, app_url = f"http://127.0.0.1:{stub_port}", f"http://127.0.0.1:{app_port}"
+	stub = spawn("bench.vapi_stub:app", stub_port, {
+		"STUB_LATENCY_MS": str(args.latency_ms),
+		"STUB_CALLS": str(args.calls),
+		"STUB_LIST_ARTIFACTS": "0",
+	})
+	api = spawn("app.main:app", app_port, {
+		"VAPI_BASE_URL": stub_url,
+		"DATA_DIR": tempfile.mkdtemp(prefix="bench-export-"),
+		"EXPORT_CONCURRENCY": str(args.concurrency),
+		"VAPI_RATE_PER_SECOND": "1000",
+		"VAPI_RATE_BURST": "1000",
+		"VAPI_CONCURRENCY_MAX": str(max(32, args.concurrency * 2)),
+		"PREWARM": "blocking",
+	})
+	results: List[Dict[str, Any]] = []
+	try:
+		await wait_ready(f"{stub_url}/__stub/stats")
+		await wait_ready(f"{app_url}/docs")
+		async with httpx.AsyncClient(base_url=app_url, headers={"x-vapi-token": "bench"}, timeout=None) as client:
+			for fmt in args.formats.split(","):
+				result = await download(client, fmt.strip(), keep=fmt.strip() in ("csv", "ndjson"))
+				result["peakRssMb"] = peak_rss_mb(api.pid)
+				results.append(result)
+				print(json.dumps(result))
+	finally:
+		for p in (api, stub):
+			p.terminate()
+		for p in (api, stub):
+			p.wait()
+
+	if args.json:
+		with open(args.json, "w") as f:
+			json.dump({"args": vars(args), "results": results}, f, indent=2)
+	failed = False
+	for r in results:
+		if r["rows"] is not None and r["rows"] != args.calls:
+			print(f"ROWS: {r['format']} exported {r['rows']} of {args.calls} calls")
+			failed = True
+		if args.max_ttfb_ms is not None and r["ttfbMs"] > args.max_ttfb_ms:
+			print(f"SLOW START: {r['format']} first byte after {r['ttfbMs']}ms > {args.max_ttfb_ms}ms")
+			failed = True
+		if args.max_rss_mb is not None and (r["peakRssMb"] or 0) > args.max_rss_mb:
+			print(f"MEMORY: peak RSS {r['peakRssMb']}MB > {args.max_rss_mb}MB after {r['format']}")
+			failed = True
+	return 1 if failed else 0
+
+
+if __name__ == "__main__":
+	sys.exit(asyncio.run(main()))
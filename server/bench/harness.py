@@ -0,0 +1,129 @@
+"""Process control, latency recording and reporting shared by the benchmark scripts."""
+from __future__ import annotations
+
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+
+SERVER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def free_port() -> int:
+	with socket.socket() as s:
+		s.bind(("127.0.0.1", 0))
+		return s.getsockname()[1]
+
+
+def spawn(target: str, port: int, env: Dict[str, str], factory: bool = False) -> subprocess.Popen:
+	cmd = [sys.executable, "-m", "uvicorn", target, "--port", str(port), "--log-level", "warning", "--no-access-log"]
+	if factory:
+		cmd.append("--factory")
+	return subprocess.Popen(cmd, cwd=SERVER_DIR, env={**os.environ, **env})
+
+
+async def wait_ready(url: str, timeout: float = 120.0) -> None:
+	deadline = time.monotonic() + timeout
+	async with httpx.AsyncClient() as c:
+		while time.monotonic() < deadline:
+			try:
+				await c.get(url)
+				return
+			except httpx.TransportError:
+				await asyncio.sleep(0.1)
+	raise RuntimeError(f"{url} did not come up")
+
+
+def peak_rss_mb(pid: int) -> Optional[float]:
+	"""High-water resident set size of a live process (Linux VmHWM), in MiB."""
+	try:
+		with open(f"/proc/{pid}/status") as f:
+			for line in f:
+				if line.startswith("VmHWM:"):
+					return int(line.split()[1]) / 1024.0
+	except OSError:
+		return None
+	return None
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+	if not sorted_values:
+		return 0.0
+	k = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values))) - 1))
+	return sorted_values[k]
+
+
+class Recorder:
+	"""Latencies per endpoint label; errors are responses >= 400 or transport failures."""
+
+	def __init__(self) -> None:
+		self.latencies: Dict[str, List[float]] = defaultdict(list)
+		self.errors: Dict[str, int] = defaultdict(int)
+		self.elapsed: Dict[str, float] = {}
+
+	def add(self, label: str, seconds: float, ok: bool = True) -> None:
+		self.latencies[label].append(seconds)
+		if not ok:
+			self.errors[label] += 1
+
+	async def request(self, client: httpx.AsyncClient, label: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+		t0 = time.perf_counter()
+		try:
+			r = await client.request(method, url, **kwargs)
+		except httpx.HTTPError:
+			self.add(label, time.perf_counter() - t0, ok=False)
+			return None
+		self.add(label, time.perf_counter() - t0, ok=r.status_code < 400)
+		return r
+
+	def window(self, labels: List[str], seconds: float) -> None:
+		"""Wall-clock span the labels were exercised over, for requests per second."""
+		for label in labels:
+			self.elapsed[label] = seconds
+
+	def summary(self) -> Dict[str, Dict[str, float]]:
+		out: Dict[str, Dict[str, float]] = {}
+		for label, values in self.latencies.items():
+			ordered = sorted(values)
+			elapsed = self.elapsed.get(label) or sum(values) or 1.0
+			out[label] = {
+				"count": len(values),
+				"rps": round(len(values) / elapsed, 2),
+				"p50_ms": round(percentile(ordered, 50) * 1000, 2),
+				"p95_ms": round(percentile(ordered, 95) * 1000, 2),
+				"p99_ms": round(percentile(ordered, 99) * 1000, 2),
+				"errors": self.errors.get(label, 0),
+			}
+		return out
+
+
+def format_table(endpoints: Dict[str, Dict[str, float]]) -> str:
+	width = max([len(k) for k in endpoints] + [8])
+	lines = [f"{'endpoint':<{width}}  {'count':>7}  {'req/s':>8}  {'p50 ms':>8}  {'p95 ms':>8}  {'p99 ms':>8}  {'errors':>6}"]
+	for label in sorted(endpoints):
+		s = endpoints[label]
+		lines.append(
+			f"{label:<{width}}  {s['count']:>7}  {s['rps']:>8.1f}  {s['p50_ms']:>8.1f}  {s['p95_ms']:>8.1f}  {s['p99_ms']:>8.1f}  {s['errors']:>6}"
+		)
+	return "\n".join(lines)
+
+
+def compare(current: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+	"""Endpoints whose p95 grew or throughput fell by more than `tolerance` against a baseline run."""
+	regressions = []
+	for label, base in baseline.items():
+		now = current.get(label)
+		if now is None:
+			continue
+		if base["p95_ms"] > 0 and now["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+			regressions.append(f"{label}: p95 {base['p95_ms']:.1f}ms -> {now['p95_ms']:.1f}ms")
+		if base["rps"] > 0 and now["rps"] < base["rps"] * (1 - tolerance):
+			regressions.append(f"{label}: {base['rps']:.1f} -> {now['rps']:.1f} req/s")
+	return regressions
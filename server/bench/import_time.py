@@ -0,0 +1,86 @@
+"""Cold-start import time of the API, per module, with an optional budget gate.
+
+Imports the target in fresh interpreters under `python -X importtime`, keeps the fastest run
+and reports the total plus the slowest modules (cumulative and self time):
+
+	python -m bench.import_time --runs 3 --top 25
+	python -m bench.import_time --budget-ms 2000   # exit 1 when the cold import is slower
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+from .harness import SERVER_DIR
+
+
+def import_times(target: str) -> Tuple[float, Dict[str, Tuple[int, int]]]:
+	"""(wall seconds, module -> (self us, cumulative us)) for one cold import of `target`."""
+	code = f"import time; t = time.perf_counter(); import {target}; print(time.perf_counter() - t)"
+	proc = subprocess.run(
+		[sys.executable, "-X", "importtime", "-c", code],
+		cwd=SERVER_DIR,
+		capture_output=True,
+		text=True,
+		check=True,
+	)
+	modules: Dict[str, Tuple[int, int]] = {}
+	for line in proc.stderr.splitlines():
+		if not line.startswith("import time:") or "|" not in line:
+			continue
+		self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|", 2))
+		if self_us.isdigit():
+			modules[name] = (int(self_us), int(cumulative_us))
+	return float(proc.stdout.strip().splitlines()[-1]), modules
+
+
+def by_package(modules: Dict[str, Tuple[int, int]]) -> List[Tuple[str, int, int]]:
+	"""Self time summed per top-level package, with its module count."""
+	totals: Dict[str, List[int]] = {}
+	for name, (self_us, _) in modules.items():
+		entry = totals.setdefault(name.split(".")[0], [0, 0])
+		entry[0] += self_us
+		entry[1] += 1
+	return sorted(((pkg, us, n) for pkg, (us, n) in totals.items()), key=lambda t: -t[1])
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--target", default="app.main")
+	parser.add_argument("--runs", type=int, default=3, help="cold imports to run; the fastest is reported")
+	parser.add_argument("--top", type=int, default=20)
+	parser.add_argument("--budget-ms", type=float, help="fail when the fastest cold import exceeds this")
+	parser.add_argument("--json", help="write the report here")
+	args = parser.parse_args()
+
+	runs = [import_times(args.target) for _ in range(max(1, args.runs))]
+	seconds, modules = min(runs, key=lambda r: r[0])
+	slowest = sorted(modules.items(), key=lambda kv: -kv[1][1])[: args.top]
+	packages = by_package(modules)
+
+	print(f"import {args.target}: {seconds * 1000:.0f}ms over {len(modules)} modules (best of {len(runs)})")
+	print(f"\n{'cumulative ms':>13}  {'self ms':>8}  module")
+	for name, (self_us, cumulative_us) in slowest:
+		print(f"{cumulative_us / 1000:>13.1f}  {self_us / 1000:>8.1f}  {name}")
+	print(f"\n{'self ms':>13}  {'modules':>8}  package")
+	for pkg, us, n in packages[: args.top]:
+		print(f"{us / 1000:>13.1f}  {n:>8}  {pkg}")
+
+	if args.json:
+		with open(args.json, "w") as f:
+			json.dump({
+				"target": args.target,
+				"seconds": seconds,
+				"modules": {name: {"self_us": s, "cumulative_us": c} for name, (s, c) in modules.items()},
+			}, f, indent=2)
+	if args.budget_ms is not None and seconds * 1000 > args.budget_ms:
+		print(f"\nOVER BUDGET: {seconds * 1000:.0f}ms > {args.budget_ms:.0f}ms")
+		return 1
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
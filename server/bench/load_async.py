@@ -0,0 +1,98 @@
+"""Compare threadpool-bound sync routes against the async request path.
+
+Starts the Vapi stub and the API (current async routers, plus a legacy variant
+that calls the sync SDK from `def` routes) and fires concurrent requests:
+
+	python -m bench.load_async --concurrency 200 --requests 2000 --latency-ms 100
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from typing import Any, Dict, List
+
+import httpx
+from fastapi import FastAPI, Request
+
+from .harness import free_port, percentile, spawn, wait_ready
+
+
+def build_legacy_app() -> FastAPI:
+	"""Sync `def` routes using the sync SDK, i.e. the pre-async request path."""
+	from app.services.vapi_client import get_vapi_client_from_request
+
+	legacy = FastAPI()
+
+	@legacy.get("/api/calls")
+	def list_calls(limit: int = 100, request: Request = None) -> List[Dict[str, Any]]:
+		client = get_vapi_client_from_request(request)
+		return [c.dict() for c in client.calls.list(limit=limit)]
+
+	@legacy.get("/api/agents/{agent_id}")
+	def get_agent(agent_id: str, request: Request) -> Dict[str, Any]:
+		client = get_vapi_client_from_request(request)
+		return client.assistants.get(agent_id).dict()
+
+	return legacy
+
+
+async def _drive(base: str, path: str, concurrency: int, total: int) -> Dict[str, float]:
+	latencies: List[float] = []
+	errors = 0
+	remaining = iter(range(total))
+	limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+	async with httpx.AsyncClient(base_url=base, limits=limits, timeout=120, headers={"x-vapi-token": "bench"}) as c:
+		async def worker() -> None:
+			nonlocal errors
+			for _ in remaining:
+				t0 = time.perf_counter()
+				r = await c.get(path)
+				latencies.append(time.perf_counter() - t0)
+				if r.status_code >= 400:
+					errors += 1
+
+		started = time.perf_counter()
+		await asyncio.gather(*(worker() for _ in range(concurrency)))
+		elapsed = time.perf_counter() - started
+	latencies.sort()
+	return {
+		"rps": total / elapsed,
+		"p50_ms": percentile(latencies, 50) * 1000,
+		"p99_ms": percentile(latencies, 99) * 1000,
+		"errors": errors,
+	}
+
+
+async def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument("--concurrency", type=int, default=200)
+	parser.add_argument("--requests", type=int, default=2000)
+	parser.add_argument("--latency-ms", type=float, default=100)
+	parser.add_argument("--path", default="/api/agents/asst-1")
+	args = parser.parse_args()
+
+	stub_port = free_port()
+	procs = [spawn("bench.vapi_stub:app", stub_port, {"STUB_LATENCY_MS": str(args.latency_ms)})]
+	app_env = {"VAPI_BASE_URL": f"http://127.0.0.1:{stub_port}", "VAPI_HTTP_MAX_CONNECTIONS": str(max(args.concurrency, 100))}
+	targets = {"legacy-sync": "bench.load_async:build_legacy_app", "async": "app.main:app"}
+	ports = {name: free_port() for name in targets}
+	for name, target in targets.items():
+		procs.append(spawn(target, ports[name], app_env, factory=name == "legacy-sync"))
+	try:
+		await wait_ready(f"http://127.0.0.1:{stub_port}/assistant")
+		print(f"stub latency {args.latency_ms:.0f}ms, concurrency {args.concurrency}, {args.requests} requests to {args.path}")
+		for name in targets:
+			base = f"http://127.0.0.1:{ports[name]}"
+			await wait_ready(f"{base}/docs")
+			res = await _drive(base, args.path, args.concurrency, args.requests)
+			print(f"{name:>12}: {res['rps']:8.1f} req/s  p50 {res['p50_ms']:7.1f}ms  p99 {res['p99_ms']:7.1f}ms  errors {res['errors']}")
+	finally:
+		for p in procs:
+			p.terminate()
+		for p in procs:
+			p.wait()
+
+
+if __name__ == "__main__":
+	asyncio.run(main())
@@ -0,0 +1,165 @@
+"""Paced campaign against the stub: how close live calls stay to the concurrency limit.
+
+Uploads --rows customers as a paced job, lets the stub keep each call up for --call-seconds and
+report its end to the webhook, and samples the stub's live calls until the job has drained:
+
+	python -m bench.pacing --rows 300 --max-live 10 --call-seconds 2
+	python -m bench.pacing --min-utilization 0.8   # exit 1 below 80% of the limit, or above it
+	python -m bench.pacing --tokens 3              # split the campaign across three tokens of one org
+
+Utilization is the mean number of live calls over the steady phase (from the first time the
+limit is reached to the last dial) divided by the limit.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import secrets
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+from .harness import free_port, spawn, wait_ready
+
+
+def write_campaign_csv(path: str, rows: range) -> None:
+	now = datetime.now(timezone.utc)
+	with open(path, "w", newline="") as f:
+		w = csv.writer(f)
+		w.writerow(["name", "number", "earliest_at", "latest_at"])
+		for i in rows:
+			w.writerow([f"Customer {i}", f"+1415{i:07d}", (now - timedelta(minutes=1)).isoformat(), (now + timedelta(hours=1)).isoformat()])
+
+
+def steady_utilization(samples: List[Tuple[float, int]], limit: int, last_dial: float) -> float:
+	steady = [live for at, live in samples if at <= last_dial]
+	first = next((i for i, live in enumerate(steady) if live >= limit), None)
+	if first is None:
+		return max(steady, default=0) / limit
+	window = steady[first:]
+	return sum(window) / len(window) / limit
+
+
+async def job_states(client: httpx.AsyncClient, jobs: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+	return [(await client.get(f"/api/calls/schedule/jobs/{job_id}", headers={"x-vapi-token": token})).json() for token, job_id in jobs]
+
+
+async def main() -> int:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--rows", type=int, default=300)
+	parser.add_argument("--max-live", type=int, default=10, help="PACING_MAX_LIVE_PER_ORG (assistant limit is set to match)")
+	parser.add_argument("--tokens", type=int, default=1, help="tokens of the stub's one org the campaign is split across")
+	parser.add_argument("--rate", type=float, default=20.0, help="PACING_RATE_PER_SECOND")
+	parser.add_argument("--call-seconds", type=float, default=2.0)
+	parser.add_argument("--call-jitter-seconds", type=float, default=1.0)
+	parser.add_argument("--latency-ms", type=float, default=50)
+	parser.add_argument("--sample-ms", type=float, default=50)
+	parser.add_argument("--min-utilization", type=float, help="fail below this fraction of the limit")
+	parser.add_argument("--json", help="write the report here")
+	args = parser.parse_args()
+
+	stub_port, app_port = free_port(), free_port()
+	stub_url, app_url = f"http://127.0.0.1:{stub_port}", f"http://127.0.0.1:{app_port}"
+	secret = secrets.token_hex(16)
+	stub = spawn("bench.vapi_stub:app", stub_port, {
+		"STUB_LATENCY_MS": str(args.latency_ms),
+		"STUB_CALL_SECONDS": str(args.call_seconds),
+		"STUB_CALL_JITTER_SECONDS": str(args.call_jitter_seconds),
+		"STUB_WEBHOOK_URL": f"{app_url}/api/webhooks/vapi",
+		"STUB_WEBHOOK_SECRET": secret,
+	})
+	api = spawn("app.main:app", app_port, {
+		"VAPI_BASE_URL": stub_url,
+		"DATA_DIR": tempfile.mkdtemp(prefix="bench-pacing-"),
+		"PACING_MAX_LIVE_PER_ORG": str(args.max_live),
+		# With several tokens only the org limit, which they share, may hold calls back.
+		"PACING_MAX_LIVE_PER_ASSISTANT": str(args.max_live * args.tokens),
+		"PACING_RATE_PER_SECOND": str(args.rate),
+		"PACING_CALLING_HOURS": "00:00-24:00",
+		"PREWARM": "blocking",
+		"VAPI_WEBHOOK_SECRET": secret,
+		"VAPI_RATE_PER_SECOND": str(max(10.0, args.rate * 2)),
+	})
+	samples: List[Tuple[float, int]] = []
+	report: Dict[str, Any] = {"args": vars(args)}
+	try:
+		await wait_ready(f"{stub_url}/__stub/stats")
+		await wait_ready(f"{app_url}/docs")
+		async with httpx.AsyncClient(base_url=app_url, headers={"x-vapi-token": "bench"}, timeout=60) as client:
+			jobs: List[Tuple[str, str]] = []
+			with tempfile.TemporaryDirectory() as tmp:
+				started = time.monotonic()
+				for t in range(args.tokens):
+					token = "bench" if t == 0 else f"bench-{t}"
+					path = os.path.join(tmp, f"campaign-{t}.csv")
+					write_campaign_csv(path, range(t, args.rows, args.tokens))
+					with open(path, "rb") as f:
+						r = await client.post(
+							"/api/calls/schedule/upload",
+							params={"assistant_id": "asst-1", "pacing": "true"},
+							files={"file": ("campaign.csv", f, "text/csv")},
+							headers={"x-vapi-token": token},
+						)
+					r.raise_for_status()
+					jobs.append((token, r.json()["jobId"]))
+			last_dial = None
+			while True:
+				stats = (await client.get(f"{stub_url}/__stub/stats")).json()
+				now = time.monotonic() - started
+				samples.append((now, stats["liveCalls"]))
+				if last_dial is None and stats["customersScheduled"] >= args.rows:
+					last_dial = now
+				if stats["callsEnded"] >= args.rows:
+					break
+				if len(samples) % 20 == 0:
+					states = await job_states(client, jobs)
+					if all(j["status"] not in ("queued", "running") for j in states) and stats["liveCalls"] == 0:
+						break
+				await asyncio.sleep(args.sample_ms / 1000.0)
+			seconds = time.monotonic() - started
+			states = await job_states(client, jobs)
+			report["pacer"] = (await client.get("/api/system/pacing")).json()
+	finally:
+		for p in (api, stub):
+			p.terminate()
+		for p in (api, stub):
+			p.wait()
+
+	peak = stats["peakLiveCalls"]
+	utilization = steady_utilization(samples, args.max_live, last_dial or seconds)
+	ideal = args.rows * (args.call_seconds + args.call_jitter_seconds / 2) / args.max_live
+	report.update(
+		job={
+			"status": ",".join(sorted({j["status"] for j in states})),
+			**{k: sum(j.get(k) or 0 for j in states) for k in ("created", "failed", "pending", "live")},
+			"errors": [e for j in states for e in j.get("errors") or []][:5],
+		},
+		seconds=round(seconds, 2),
+		idealSeconds=round(ideal, 2),
+		peakLive=peak,
+		utilization=round(utilization, 3),
+		callsPerSecond=round(args.rows / seconds, 2),
+	)
+	print(json.dumps({k: v for k, v in report.items() if k not in ("args", "pacer")}))
+	if args.json:
+		with open(args.json, "w") as f:
+			json.dump({**report, "samples": samples}, f, indent=2)
+	failed = False
+	if peak > args.max_live:
+		print(f"OVER LIMIT: {peak} live calls > {args.max_live}")
+		failed = True
+	if args.min_utilization is not None and utilization < args.min_utilization:
+		print(f"UNDER-UTILIZED: {utilization:.2f} < {args.min_utilization:.2f}")
+		failed = True
+	return 1 if failed else 0
+
+
+if __name__ == "__main__":
+	sys.exit(asyncio.run(main()))
@@ -0,0 +1,241 @@
+"""Offline load and latency scenarios against the API backed by the local Vapi stub.
+
+Starts bench.vapi_stub (standing in for Vapi and Azure OpenAI) and app.main, then runs:
+
+	dashboard  users polling calls, agents, numbers and rollups with If-None-Match
+	live       operators reading sessions and sending coach/terminate control, alongside dashboard
+	schedule   one CSV upload of --rows customers, polled until the job finishes
+	qa         /api/insights/compare/batch over --qa-items calls, cold then cached
+
+and prints throughput and p50/p95/p99 per endpoint plus peak RSS of both processes:
+
+	python -m bench.scenarios --duration 30 --users 50 --rows 100000 --json run.json
+	python -m bench.scenarios --baseline run.json --tolerance 0.2   # exit 1 on regression
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from .harness import Recorder, compare, format_table, free_port, peak_rss_mb, spawn, wait_ready
+
+
+TOKEN = "bench-token"
+DASHBOARD = ("GET /api/calls", "GET /api/agents", "GET /api/numbers", "GET /api/insights/rollups")
+LIVE = ("GET /api/live/session", "POST /api/live/session/coach", "POST /api/live/session/terminate", "POST /api/calls/terminate")
+
+
+async def dashboard_user(client: httpx.AsyncClient, rec: Recorder, deadline: float, interval: float) -> None:
+	etags: Dict[str, str] = {}
+	paths = {
+		"GET /api/calls": "/api/calls?limit=50",
+		"GET /api/agents": "/api/agents",
+		"GET /api/numbers": "/api/numbers",
+		"GET /api/insights/rollups": "/api/insights/rollups?group_by=day",
+	}
+	await asyncio.sleep(random.uniform(0, interval))
+	while time.monotonic() < deadline:
+		for label, path in paths.items():
+			headers = {"If-None-Match": etags[path]} if path in etags else {}
+			r = await rec.request(client, label, "GET", path, headers=headers)
+			if r is not None and r.headers.get("etag"):
+				etags[path] = r.headers["etag"]
+		await asyncio.sleep(interval)
+
+
+async def live_operator(client: httpx.AsyncClient, rec: Recorder, deadline: float, interval: float, calls: int) -> None:
+	while time.monotonic() < deadline:
+		call_id = f"call-{random.randrange(calls)}"
+		session_id = f"session-{random.randrange(1000)}"
+		await rec.request(client, "GET /api/live/session", "GET", f"/api/live/session/{call_id}")
+		await rec.request(client, "POST /api/live/session/coach", "POST", f"/api/live/session/{session_id}/coach", params={"message": "Confirm the order number"})
+		await rec.request(client, "POST /api/live/session/terminate", "POST", f"/api/live/session/{session_id}/terminate")
+		await rec.request(client, "POST /api/calls/terminate", "POST", f"/api/calls/{call_id}/terminate")
+		await asyncio.sleep(interval)
+
+
+def write_schedule_csv(path: str, rows: int) -> None:
+	start = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+	with open(path, "w", newline="") as f:
+		w = csv.writer(f)
+		w.writerow(["name", "number", "earliest_at", "latest_at"])
+		for i in range(rows):
+			earliest = start + timedelta(hours=i % 48)
+			w.writerow([f"Customer {i}", f"+1415{i % 10_000_000:07d}", earliest.isoformat(), (earliest + timedelta(hours=2)).isoformat()])
+
+
+async def schedule_upload(client: httpx.AsyncClient, rec: Recorder, rows: int, timeout: float) -> Dict[str, Any]:
+	with tempfile.TemporaryDirectory() as tmp:
+		path = os.path.join(tmp, "schedule.csv")
+		write_schedule_csv(path, rows)
+		started = time.perf_counter()
+		with open(path, "rb") as f:
+			r = await rec.request(
+				client, "POST /api/calls/schedule/upload", "POST", "/api/calls/schedule/upload",
+				params={"assistant_id": "asst-1"}, files={"file": ("schedule.csv", f, "text/csv")},
+			)
+	if r is None or r.status_code >= 400:
+		return {"rows": rows, "status": "upload-failed", "detail": r.text[:500] if r is not None else None}
+	job = r.json()
+	deadline = time.monotonic() + timeout
+	while job.get("status") in ("ingesting", "queued", "running") and time.monotonic() < deadline:
+		await asyncio.sleep(0.5)
+		r = await rec.request(client, "GET /api/calls/schedule/jobs", "GET", f"/api/calls/schedule/jobs/{job['jobId']}")
+		if r is not None and r.status_code == 200:
+			job = r.json()
+	seconds = time.perf_counter() - started
+	return {
+		"rows": rows,
+		"status": job.get("status"),
+		"created": job.get("created"),
+		"failed": job.get("failed"),
+		"seconds": round(seconds, 2),
+		"rowsPerSecond": round((job.get("created") or 0) / seconds, 1),
+	}
+
+
+async def qa_batch(client: httpx.AsyncClient, rec: Recorder, items: int, calls: int, label: str) -> Dict[str, Any]:
+	ended = [f"call-{i}" for i in range(calls) if i % 5][:items]
+	started = time.perf_counter()
+	scored = errors = cached = 0
+	async with client.stream("POST", "/api/insights/compare/batch", json={"call_ids": ended}) as r:
+		if r.status_code >= 400:
+			await r.aread()
+			rec.add(label, time.perf_counter() - started, ok=False)
+			return {"items": len(ended), "status": r.status_code, "detail": r.text[:500]}
+		async for line in r.aiter_lines():
+			if not line:
+				continue
+			out = json.loads(line)
+			rec.add(label, time.perf_counter() - started, ok="error" not in out)
+			if "error" in out:
+				errors += 1
+			else:
+				scored += 1
+				cached += bool(out.get("cached"))
+	seconds = time.perf_counter() - started
+	rec.window([label], seconds)
+	return {"items": len(ended), "scored": scored, "cached": cached, "errors": errors, "seconds": round(seconds, 2), "itemsPerSecond": round(scored / seconds, 1)}
+
+
+def parse_env(pairs: List[str]) -> Dict[str, str]:
+	out = {}
+	for pair in pairs:
+		key, _, value = pair.partition("=")
+		out[key] = value
+	return out
+
+
+async def main() -> int:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--scenarios", default="dashboard,live,schedule,qa")
+	parser.add_argument("--duration", type=float, default=30, help="seconds of dashboard/live load")
+	parser.add_argument("--users", type=int, default=50, help="concurrent dashboard users")
+	parser.add_argument("--operators", type=int, default=5, help="concurrent live-session operators")
+	parser.add_argument("--poll-interval", type=float, default=2.0)
+	parser.add_argument("--rows", type=int, default=100_000, help="schedule upload size")
+	parser.add_argument("--qa-items", type=int, default=500)
+	parser.add_argument("--calls", type=int, default=5000, help="calls in the stub dataset")
+	parser.add_argument("--latency-ms", type=float, default=50)
+	parser.add_argument("--jitter-ms", type=float, default=20)
+	parser.add_argument("--azure-latency-ms", type=float, default=400)
+	parser.add_argument("--error-rate", type=float, default=0.0)
+	parser.add_argument("--throttle-rate", type=float, default=0.0)
+	parser.add_argument("--seed", type=int, default=1)
+	parser.add_argument("--app-env", action="append", default=[], metavar="KEY=VALUE", help="extra settings for the API process")
+	parser.add_argument("--json", help="write the report here")
+	parser.add_argument("--baseline", help="earlier --json report to compare against")
+	parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95/throughput regression")
+	args = parser.parse_args()
+	scenarios = set(args.scenarios.split(","))
+	random.seed(args.seed)
+
+	stub_port, app_port = free_port(), free_port()
+	stub_url = f"http://127.0.0.1:{stub_port}"
+	stub_env = {
+		"STUB_LATENCY_MS": str(args.latency_ms),
+		"STUB_JITTER_MS": str(args.jitter_ms),
+		"STUB_AZURE_LATENCY_MS": str(args.azure_latency_ms),
+		"STUB_ERROR_RATE": str(args.error_rate),
+		"STUB_THROTTLE_RATE": str(args.throttle_rate),
+		"STUB_CALLS": str(args.calls),
+		"STUB_SEED": str(args.seed),
+	}
+	data_dir = tempfile.mkdtemp(prefix="bench-data-")
+	app_env = {
+		"VAPI_BASE_URL": stub_url,
+		"AZURE_OPENAI_ENDPOINT": stub_url,
+		"AZURE_OPENAI_API_KEY": "bench",
+		"AZURE_OPENAI_DEPLOYMENT": "bench",
+		"DATA_DIR": data_dir,
+		**parse_env(args.app_env),
+	}
+	stub = spawn("bench.vapi_stub:app", stub_port, stub_env)
+	api = spawn("app.main:app", app_port, app_env)
+	rec = Recorder()
+	report: Dict[str, Any] = {"args": vars(args), "scenarios": {}}
+	try:
+		await wait_ready(f"{stub_url}/__stub/stats")
+		await wait_ready(f"http://127.0.0.1:{app_port}/docs")
+		limits = httpx.Limits(max_connections=args.users + args.operators + 10)
+		async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{app_port}", headers={"x-vapi-token": TOKEN}, limits=limits, timeout=600) as client:
+			# The first call list starts the index sync and waits for its first page; time it separately from steady-state polling.
+			await rec.request(client, "warm-up GET /api/calls", "GET", "/api/calls?limit=50")
+			loops = []
+			deadline = time.monotonic() + args.duration
+			if "dashboard" in scenarios:
+				loops += [dashboard_user(client, rec, deadline, args.poll_interval) for _ in range(args.users)]
+			if "live" in scenarios:
+				loops += [live_operator(client, rec, deadline, args.poll_interval, args.calls) for _ in range(args.operators)]
+			if loops:
+				print(f"dashboard/live: {args.users} users, {args.operators} operators for {args.duration:.0f}s", file=sys.stderr)
+				started = time.monotonic()
+				await asyncio.gather(*loops)
+				rec.window(list(DASHBOARD + LIVE), time.monotonic() - started)
+			if "schedule" in scenarios:
+				print(f"schedule: uploading {args.rows} rows", file=sys.stderr)
+				report["scenarios"]["schedule"] = await schedule_upload(client, rec, args.rows, timeout=max(600.0, args.rows / 50))
+			if "qa" in scenarios:
+				print(f"qa: scoring {args.qa_items} calls twice", file=sys.stderr)
+				report["scenarios"]["qa"] = await qa_batch(client, rec, args.qa_items, args.calls, "QA item (cold)")
+				report["scenarios"]["qaCached"] = await qa_batch(client, rec, args.qa_items, args.calls, "QA item (cached)")
+			report["stub"] = (await client.get(f"{stub_url}/__stub/stats")).json()
+		report["peakRssMb"] = {"api": peak_rss_mb(api.pid), "stub": peak_rss_mb(stub.pid)}
+	finally:
+		for p in (api, stub):
+			p.terminate()
+		for p in (api, stub):
+			p.wait()
+	report["endpoints"] = rec.summary()
+
+	print(format_table(report["endpoints"]))
+	for name, result in report["scenarios"].items():
+		print(f"{name}: {json.dumps(result)}")
+	rss = report["peakRssMb"]
+	print(f"peak RSS: api {rss['api'] or 0:.1f} MiB, stub {rss['stub'] or 0:.1f} MiB")
+	if args.json:
+		with open(args.json, "w") as f:
+			json.dump(report, f, indent=2)
+	if args.baseline:
+		with open(args.baseline) as f:
+			regressions = compare(report["endpoints"], json.load(f)["endpoints"], args.tolerance)
+		for line in regressions:
+			print(f"REGRESSION {line}")
+		if regressions:
+			return 1
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(asyncio.run(main()))
@@ -0,0 +1,435 @@
+"""Local stand-in for the Vapi REST API (and Azure OpenAI chat completions) used by the benchmarks.
+
+Run standalone: STUB_LATENCY_MS=50 uvicorn bench.vapi_stub:app --port 8900
+
+Environment:
+	STUB_LATENCY_MS / STUB_JITTER_MS    per-request latency and uniform jitter
+	STUB_ERROR_RATE / STUB_THROTTLE_RATE fraction of requests answered 500 / 429 (Retry-After: 1)
+	STUB_CALLS / STUB_ASSISTANTS / STUB_NUMBERS / STUB_KNOWLEDGE_BASES  dataset size
+	STUB_AZURE_LATENCY_MS               latency of the chat completions endpoint
+	STUB_CALL_SECONDS / STUB_CALL_JITTER_SECONDS  how long immediate (unscheduled) calls last; 0 leaves them queued
+	STUB_WEBHOOK_URL                    server URL sent a status-update when such a call ends
+	STUB_WEBHOOK_SECRET                 server URL secret sent with it as x-vapi-secret
+	STUB_LIST_ARTIFACTS                 0 leaves artifacts out of GET /call, so they need GET /call/{id}
+	STUB_PUBLIC_URL                     base URL of this stub; ended calls then get a stereoRecordingUrl served by it
+	STUB_RECORDING_SECONDS              length of those synthetic recordings (customer left, assistant right)
+	STUB_SEED                           seed for jitter and error injection
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import random
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import Body, FastAPI, HTTPException, Request, Response
+
+
+LATENCY_MS = float(os.environ.get("STUB_LATENCY_MS", "50"))
+JITTER_MS = float(os.environ.get("STUB_JITTER_MS", "0"))
+ERROR_RATE = float(os.environ.get("STUB_ERROR_RATE", "0"))
+THROTTLE_RATE = float(os.environ.get("STUB_THROTTLE_RATE", "0"))
+AZURE_LATENCY_MS = float(os.environ.get("STUB_AZURE_LATENCY_MS", "400"))
+DATASET_CALLS = int(os.environ.get("STUB_CALLS", "500"))
+DATASET_ASSISTANTS = int(os.environ.get("STUB_ASSISTANTS", "20"))
+DATASET_NUMBERS = int(os.environ.get("STUB_NUMBERS", "10"))
+DATASET_KNOWLEDGE_BASES = int(os.environ.get("STUB_KNOWLEDGE_BASES", "5"))
+CALL_SECONDS = float(os.environ.get("STUB_CALL_SECONDS", "0"))
+CALL_JITTER_SECONDS = float(os.environ.get("STUB_CALL_JITTER_SECONDS", "0"))
+WEBHOOK_URL = os.environ.get("STUB_WEBHOOK_URL", "")
+WEBHOOK_SECRET = os.environ.get("STUB_WEBHOOK_SECRET", "")
+LIST_ARTIFACTS = os.environ.get("STUB_LIST_ARTIFACTS", "1") != "0"
+PUBLIC_URL = os.environ.get("STUB_PUBLIC_URL", "").rstrip("/")
+RECORDING_SECONDS = float(os.environ.get("STUB_RECORDING_SECONDS", "60"))
+RECORDING_RATE = 8000
+
+app = FastAPI(title="Vapi stub")
+
+_BASE_TIME = datetime(2025, 1, 1, tzinfo=timezone.utc)
+_BASE_EPOCH = _BASE_TIME.timestamp()
+_random = random.Random(int(os.environ.get("STUB_SEED", "1")))
+_requests: Counter = Counter()
+_created_calls: Dict[str, Dict[str, Any]] = {}
+_customers_scheduled = 0
+_live_calls = 0
+_peak_live_calls = 0
+_calls_ended = 0
+_call_tasks: set = set()
+
+
+def _ts(minutes: float) -> str:
+	return (_BASE_TIME + timedelta(minutes=minutes)).isoformat().replace("+00:00", "Z")
+
+
+def _now() -> str:
+	return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _assistant(i: int) -> Dict[str, Any]:
+	return {
+		"id": f"asst-{i}",
+		"orgId": "org-1",
+		"name": f"Assistant {i}",
+		"createdAt": _ts(i),
+		"updatedAt": _ts(i),
+		"model": {"provider": "openai", "model": "gpt-4o", "messages": [{"role": "system", "content": f"You are assistant {i}."}]},
+	}
+
+
+def _call(i: int) -> Dict[str, Any]:
+	ended = i % 5 != 0
+	call: Dict[str, Any] = {
+		"id": f"call-{i}",
+		"orgId": "org-1",
+		"assistantId": f"asst-{i % DATASET_ASSISTANTS}",
+		"phoneNumberId": f"pn-{i % DATASET_NUMBERS}",
+		"status": "ended" if ended else "in-progress",
+		"type": "outboundPhoneCall",
+		"createdAt": _ts(i),
+		"startedAt": _ts(i),
+		"updatedAt": _ts(i + 5),
+		"customer": {"number": f"+1415555{i % 10000:04d}"},
+	}
+	if ended:
+		duration = 30 + (i * 37) % 600
+		call.update({
+			"endedAt": _ts(i + duration / 60),
+			"endedReason": ("customer-ended-call", "assistant-ended-call", "silence-timed-out")[i % 3],
+			"cost": round(duration * 0.0012, 4),
+			"artifact": {"transcript": f"AI: Hello, this is assistant {i % DATASET_ASSISTANTS}.\nUser: I am calling about order {i}, I need a refund.\nAI: I can help with that."},
+		})
+		if PUBLIC_URL:
+			call["artifact"]["stereoRecordingUrl"] = f"{PUBLIC_URL}/recordings/call-{i}-stereo.wav"
+	return call
+
+
+def response_latency(i: int) -> float:
+	"""Seconds the assistant waits after each customer turn in call i's recording."""
+	return 0.4 + (i % 5) * 0.2
+
+
+def conversation_script(i: int, seconds: float = RECORDING_SECONDS) -> List[Tuple[str, float, float]]:
+	"""(speaker, start, end) turns of call i's recording: the assistant opens, the customer
+	replies 0.8s later (every fourth reply cuts in 0.6s before the assistant finishes), and the
+	assistant answers after response_latency(i)."""
+	turns: List[Tuple[str, float, float]] = []
+	t, k = 0.5, 0
+	while True:
+		agent_end = t + 2.0 + (k % 3) * 0.5
+		customer_start = agent_end - 0.6 if k % 4 == 3 else agent_end + 0.8
+		customer_end = customer_start + 1.5 + (k % 4) * 0.5
+		if customer_end > seconds - 0.5:
+			return turns
+		turns += [("agent", t, agent_end), ("customer", customer_start, customer_end)]
+		t, k = customer_end + response_latency(i), k + 1
+
+
+def _recording_wav(i: int) -> bytes:
+	import io
+	import wave
+
+	import numpy as np
+
+	rng = np.random.default_rng(i)
+	n = int(RECORDING_SECONDS * RECORDING_RATE)
+	audio = rng.normal(0, 0.001, (n, 2))
+	t = np.arange(n) / RECORDING_RATE
+	# Speech stand-in: noise with a syllable-rate envelope that never drops to silence mid-turn.
+	envelope = 0.3 * (0.4 + 0.6 * np.abs(np.sin(2 * np.pi * 3 * t)))
+	for speaker, start, end in conversation_script(i):
+		lo, hi = int(start * RECORDING_RATE), int(end * RECORDING_RATE)
+		channel = 0 if speaker == "customer" else 1
+		audio[lo:hi, channel] += rng.normal(0, 1, hi - lo) * envelope[lo:hi]
+	pcm = (np.clip(audio, -1, 1) * 32767).astype("<i2")
+	out = io.BytesIO()
+	with wave.open(out, "wb") as w:
+		w.setnchannels(2)
+		w.setsampwidth(2)
+		w.setframerate(RECORDING_RATE)
+		w.writeframes(pcm.tobytes())
+	return out.getvalue()
+
+
+def _number(i: int) -> Dict[str, Any]:
+	return {"id": f"pn-{i}", "orgId": "org-1", "provider": "vapi", "number": f"+1415000{i:04d}", "name": f"Line {i}", "assistantId": f"asst-{i % DATASET_ASSISTANTS}", "createdAt": _ts(i), "updatedAt": _ts(i)}
+
+
+def _knowledge_base(i: int) -> Dict[str, Any]:
+	return {"id": f"kb-{i}", "orgId": "org-1", "name": f"Knowledge base {i}", "provider": "trieve", "createdAt": _ts(i), "updatedAt": _ts(i)}
+
+
+def _index(resource_id: str, size: int) -> int:
+	try:
+		i = int(resource_id.rsplit("-", 1)[-1])
+	except ValueError:
+		i = -1
+	if not 0 <= i < size:
+		raise HTTPException(status_code=404, detail="Not found")
+	return i
+
+
+async def _upstream(request: Request, latency_ms: Optional[float] = None) -> None:
+	"""Count the request, wait the configured latency and inject throttling or server errors."""
+	route = getattr(request.scope.get("route"), "path", request.url.path)
+	_requests[f"{request.method} {route}"] += 1
+	delay = LATENCY_MS if latency_ms is None else latency_ms
+	if JITTER_MS > 0:
+		delay += _random.uniform(0, JITTER_MS)
+	if delay > 0:
+		await asyncio.sleep(delay / 1000.0)
+	roll = _random.random()
+	if roll < THROTTLE_RATE:
+		raise HTTPException(status_code=429, detail="Too many requests", headers={"Retry-After": "1"})
+	if roll < THROTTLE_RATE + ERROR_RATE:
+		raise HTTPException(status_code=500, detail="Injected error")
+
+
+def _epoch(value: Optional[str]) -> Optional[float]:
+	return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() if value else None
+
+
+def _minutes(value: Optional[str]) -> Optional[float]:
+	epoch = _epoch(value)
+	return None if epoch is None else (epoch - _BASE_EPOCH) / 60.0
+
+
+@app.get("/call")
+async def list_calls(
+	request: Request,
+	limit: Optional[float] = None,
+	assistantId: Optional[str] = None,
+	phoneNumberId: Optional[str] = None,
+	createdAtGt: Optional[str] = None,
+	createdAtGe: Optional[str] = None,
+	createdAtLt: Optional[str] = None,
+	createdAtLe: Optional[str] = None,
+	updatedAtGt: Optional[str] = None,
+	updatedAtGe: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+	"""Newest first, honouring the createdAt/updatedAt filters the server pages with.
+
+	Call i is created at minute i and updated at minute i + 5, so filters map to an index range.
+	"""
+	await _upstream(request)
+	n = int(limit or 100)
+	hi, lo = DATASET_CALLS - 1, 0
+	if createdAtLe:
+		hi = min(hi, math.floor(_minutes(createdAtLe)))
+	if createdAtLt:
+		hi = min(hi, math.ceil(_minutes(createdAtLt)) - 1)
+	if createdAtGe:
+		lo = max(lo, math.ceil(_minutes(createdAtGe)))
+	if createdAtGt:
+		lo = max(lo, math.floor(_minutes(createdAtGt)) + 1)
+	if updatedAtGe:
+		lo = max(lo, math.ceil(_minutes(updatedAtGe) - 5))
+	if updatedAtGt:
+		lo = max(lo, math.floor(_minutes(updatedAtGt) - 5) + 1)
+	out: List[Dict[str, Any]] = []
+	for i in range(hi, lo - 1, -1):
+		call = _call(i)
+		if assistantId and call["assistantId"] != assistantId:
+			continue
+		if phoneNumberId and call["phoneNumberId"] != phoneNumberId:
+			continue
+		if not LIST_ARTIFACTS:
+			call.pop("artifact", None)
+		out.append(call)
+		if len(out) >= n:
+			break
+	return out
+
+
+@app.post("/call")
+async def create_call(request: Request, body: Dict[str, Any] = Body(...)) -> Dict[str, Any]:
+	"""Single calls come back as a call; `customers` batches as {results, errors}."""
+	global _customers_scheduled
+	await _upstream(request)
+	customers = body.get("customers") or [body.get("customer") or {}]
+	results = []
+	for customer in customers:
+		call = {
+			"id": f"new-{uuid.uuid4().hex[:12]}",
+			"orgId": "org-1",
+			"assistantId": body.get("assistantId"),
+			"status": "scheduled" if body.get("schedulePlan") else "queued",
+			"type": "outboundPhoneCall",
+			"createdAt": _now(),
+			"updatedAt": _now(),
+			"customer": customer,
+		}
+		_created_calls[call["id"]] = call
+		results.append(call)
+		if CALL_SECONDS > 0 and not body.get("schedulePlan"):
+			call["status"] = "in-progress"
+			task = asyncio.create_task(_run_call(call))
+			_call_tasks.add(task)
+			task.add_done_callback(_call_tasks.discard)
+	_customers_scheduled += len(customers)
+	if "customers" in body:
+		return {"results": results, "errors": []}
+	return results[0]
+
+
+async def _run_call(call: Dict[str, Any]) -> None:
+	"""Keep an immediate call in progress for STUB_CALL_SECONDS, then end it and tell the webhook."""
+	global _live_calls, _peak_live_calls, _calls_ended
+	_live_calls += 1
+	_peak_live_calls = max(_peak_live_calls, _live_calls)
+	try:
+		await asyncio.sleep(CALL_SECONDS + _random.uniform(0, CALL_JITTER_SECONDS))
+	finally:
+		_live_calls -= 1
+		_calls_ended += 1
+		call.update(status="ended", endedReason="customer-ended-call", endedAt=_now(), updatedAt=_now())
+	if WEBHOOK_URL:
+		import httpx
+
+		message = {"type": "status-update", "status": "ended", "endedReason": "customer-ended-call", "call": call}
+		try:
+			async with httpx.AsyncClient(timeout=10) as client:
+				await client.post(WEBHOOK_URL, json={"message": message}, headers={"x-vapi-secret": WEBHOOK_SECRET})
+		except httpx.HTTPError:
+			pass
+
+
+@app.get("/call/{call_id}")
+async def get_call(call_id: str, request: Request) -> Dict[str, Any]:
+	await _upstream(request)
+	if call_id in _created_calls:
+		return _created_calls[call_id]
+	return _call(_index(call_id, DATASET_CALLS))
+
+
+@app.delete("/call/{call_id}")
+async def delete_call(call_id: str, request: Request) -> Dict[str, Any]:
+	await _upstream(request)
+	call = _created_calls.pop(call_id, None)
+	return call or {**_call(_index(call_id, DATASET_CALLS)), "status": "ended", "endedReason": "manually-canceled"}
+
+
+def _listing(
+	make: Any,
+	size: int,
+	limit: Optional[float],
+	createdAtLe: Optional[str],
+	createdAtLt: Optional[str],
+	updatedAtGe: Optional[str],
+	updatedAtGt: Optional[str],
+) -> List[Dict[str, Any]]:
+	"""Newest first; item i is created and updated at minute i, so filters map to an index range."""
+	hi, lo = size - 1, 0
+	if createdAtLe:
+		hi = min(hi, math.floor(_minutes(createdAtLe)))
+	if createdAtLt:
+		hi = min(hi, math.ceil(_minutes(createdAtLt)) - 1)
+	if updatedAtGe:
+		lo = max(lo, math.ceil(_minutes(updatedAtGe)))
+	if updatedAtGt:
+		lo = max(lo, math.floor(_minutes(updatedAtGt)) + 1)
+	return [make(i) for i in range(hi, max(lo, hi - int(limit or 100) + 1) - 1, -1)]
+
+
+@app.get("/assistant")
+async def list_assistants(
+	request: Request,
+	limit: Optional[float] = None,
+	createdAtLe: Optional[str] = None,
+	createdAtLt: Optional[str] = None,
+	updatedAtGe: Optional[str] = None,
+	updatedAtGt: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+	await _upstream(request)
+	return _listing(_assistant, DATASET_ASSISTANTS, limit, createdAtLe, createdAtLt, updatedAtGe, updatedAtGt)
+
+
+@app.get("/assistant/{assistant_id}")
+async def get_assistant(assistant_id: str, request: Request) -> Dict[str, Any]:
+	await _upstream(request)
+	return _assistant(_index(assistant_id, DATASET_ASSISTANTS))
+
+
+@app.patch("/assistant/{assistant_id}")
+async def update_assistant(assistant_id: str, request: Request, body: Dict[str, Any] = Body(...)) -> Dict[str, Any]:
+	await _upstream(request)
+	return {**_assistant(_index(assistant_id, DATASET_ASSISTANTS)), **body, "updatedAt": _now()}
+
+
+@app.get("/phone-number")
+async def list_numbers(
+	request: Request,
+	limit: Optional[float] = None,
+	createdAtLe: Optional[str] = None,
+	createdAtLt: Optional[str] = None,
+	updatedAtGe: Optional[str] = None,
+	updatedAtGt: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+	await _upstream(request)
+	return _listing(_number, DATASET_NUMBERS, limit, createdAtLe, createdAtLt, updatedAtGe, updatedAtGt)
+
+
+@app.get("/phone-number/{number_id}")
+async def get_number(number_id: str, request: Request) -> Dict[str, Any]:
+	await _upstream(request)
+	return _number(_index(number_id, DATASET_NUMBERS))
+
+
+@app.patch("/phone-number/{number_id}")
+async def update_number(number_id: str, request: Request, body: Dict[str, Any] = Body(...)) -> Dict[str, Any]:
+	await _upstream(request)
+	return {**_number(_index(number_id, DATASET_NUMBERS)), **body, "updatedAt": _now()}
+
+
+@app.get("/knowledge-base")
+async def list_knowledge_bases(request: Request) -> List[Dict[str, Any]]:
+	await _upstream(request)
+	return [_knowledge_base(i) for i in range(DATASET_KNOWLEDGE_BASES)]
+
+
+@app.get("/knowledge-base/{kb_id}")
+async def get_knowledge_base(kb_id: str, request: Request) -> Dict[str, Any]:
+	await _upstream(request)
+	return _knowledge_base(_index(kb_id, DATASET_KNOWLEDGE_BASES))
+
+
+@app.get("/session/{session_id}")
+async def get_session(session_id: str, request: Request) -> Dict[str, Any]:
+	await _upstream(request)
+	return {"id": session_id, "orgId": "org-1", "status": "active", "createdAt": _ts(0), "updatedAt": _now()}
+
+
+@app.patch("/session/{session_id}")
+async def update_session(session_id: str, request: Request, body: Dict[str, Any] = Body(...)) -> Dict[str, Any]:
+	await _upstream(request)
+	return {"id": session_id, "orgId": "org-1", "status": body.get("status") or "active", "createdAt": _ts(0), "updatedAt": _now()}
+
+
+@app.post("/openai/deployments/{deployment}/chat/completions")
+async def chat_completions(deployment: str, request: Request) -> Dict[str, Any]:
+	await _upstream(request, AZURE_LATENCY_MS)
+	content = "Helpfulness 8/10, clarity 9/10, tone 8/10, compliance 10/10. Confirm the order number earlier."
+	return {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion", "model": deployment, "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}]}
+
+
+@app.get("/recordings/{name}")
+async def get_recording(name: str, request: Request) -> Response:
+	"""Synthetic stereo WAV following conversation_script."""
+	await _upstream(request)
+	call_id = name.removesuffix("-stereo.wav")
+	return Response(_recording_wav(_index(call_id, DATASET_CALLS)), media_type="audio/wav")
+
+
+@app.get("/__stub/stats")
+def stub_stats() -> Dict[str, Any]:
+	"""Requests served per route, customers scheduled and immediate calls in progress, for checking scenario results."""
+	return {
+		"requests": dict(_requests),
+		"customersScheduled": _customers_scheduled,
+		"liveCalls": _live_calls,
+		"peakLiveCalls": _peak_live_calls,
+		"callsEnded": _calls_ended,
+	}
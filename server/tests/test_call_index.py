@@ -0,0 +1,138 @@
+"""Call index sync: full listings, updatedAt watermarks and reconciliation."""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from app.services.call_index import CallIndex
+
+BASE = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _at(minutes: int) -> str:
+	return (BASE + timedelta(minutes=minutes)).isoformat()
+
+
+class FakeCalls:
+	"""calls.list as the SDK pages it: newest first, createdAt/updatedAt filters inclusive."""
+
+	def __init__(self, count: int) -> None:
+		self.rows: Dict[str, Dict[str, Any]] = {
+			f"c{i}": {"id": f"c{i}", "status": "ended", "assistantId": "asst-1", "createdAt": _at(i), "updatedAt": _at(i)}
+			for i in range(count)
+		}
+		self.requests: List[Dict[str, Any]] = []
+
+	async def list(self, limit: int, created_at_le: Optional[datetime] = None, updated_at_ge: Optional[datetime] = None) -> List[Dict[str, Any]]:
+		self.requests.append({"limit": limit, "created_at_le": created_at_le, "updated_at_ge": updated_at_ge})
+		rows = sorted(self.rows.values(), key=lambda r: r["createdAt"], reverse=True)
+		if created_at_le is not None:
+			rows = [r for r in rows if datetime.fromisoformat(r["createdAt"]) <= created_at_le]
+		if updated_at_ge is not None:
+			rows = [r for r in rows if datetime.fromisoformat(r["updatedAt"]) >= updated_at_ge]
+		return [dict(r) for r in rows[:limit]]
+
+
+class FakeClient:
+	def __init__(self, count: int) -> None:
+		self.calls = FakeCalls(count)
+
+
+def _index(**kwargs) -> CallIndex:
+	return CallIndex(page_size=100, max_calls=5000, full_every=900.0, full_min_interval=60.0, **kwargs)
+
+
+def test_full_sync_pages_the_whole_history():
+	async def scenario():
+		client, index = FakeClient(300), _index()
+		await index.refresh(client, wait=True)
+		assert len(index.calls) == 300
+		assert not index.syncing
+		limits = [r["limit"] for r in client.calls.requests]
+		assert limits[:3] == [50, 100, 100]
+		assert all(r["updated_at_ge"] is None for r in client.calls.requests)
+		assert index.stats()["watermark"] == _at(299)
+
+	asyncio.run(scenario())
+
+
+def test_incremental_sync_fetches_from_the_watermark():
+	async def scenario():
+		client, index = FakeClient(120), _index()
+		await index.refresh(client, wait=True)
+		client.calls.rows["c5"].update(status="in-progress", updatedAt=_at(500))
+		client.calls.rows["c200"] = {"id": "c200", "status": "queued", "createdAt": _at(200), "updatedAt": _at(200)}
+		client.calls.requests.clear()
+		await index.refresh(client)
+		assert [r["updated_at_ge"] for r in client.calls.requests] == [BASE + timedelta(minutes=119)]
+		assert index.calls["c5"]["status"] == "in-progress"
+		assert "c200" in index.calls
+		total, page = index.query(status="in-progress")
+		assert (total, [c["id"] for c in page]) == (1, ["c5"])
+		assert index.query(status="ended")[0] == 119
+		assert index.stats()["watermark"] == _at(500)
+
+	asyncio.run(scenario())
+
+
+def test_upserts_do_not_move_the_watermark():
+	async def scenario():
+		client, index = FakeClient(10), _index()
+		await index.refresh(client, wait=True)
+		# A webhook delivers a newer call before the listing has seen the change to c3.
+		index.upsert({"id": "c50", "status": "ended", "createdAt": _at(50), "updatedAt": _at(50)})
+		client.calls.rows["c3"].update(status="in-progress", updatedAt=_at(20))
+		client.calls.requests.clear()
+		await index.refresh(client)
+		assert client.calls.requests[0]["updated_at_ge"] == BASE + timedelta(minutes=9)
+		assert index.calls["c3"]["status"] == "in-progress"
+
+	asyncio.run(scenario())
+
+
+def test_fresh_index_is_served_without_listing():
+	async def scenario():
+		client, index = FakeClient(10), _index()
+		await index.refresh(client, wait=True)
+		client.calls.requests.clear()
+		await index.refresh(client, max_age=60.0)
+		assert client.calls.requests == []
+		# A forced full sync inside full_min_interval falls back to an incremental one.
+		await index.refresh(client, max_age=60.0, full=True)
+		assert not index.syncing
+		assert [r["updated_at_ge"] is not None for r in client.calls.requests] == [True]
+
+	asyncio.run(scenario())
+
+
+def test_full_sync_drops_calls_deleted_upstream():
+	async def scenario():
+		client, index = FakeClient(50), _index()
+		await index.refresh(client, wait=True)
+		del client.calls.rows["c7"]
+		del client.calls.rows["c30"]
+		index.full_min_interval = 0.0
+		await index.refresh(client, full=True, wait=True)
+		assert len(index.calls) == 48
+		assert "c7" not in index.calls and "c30" not in index.calls
+		assert index.stats()["reconciledDeletes"] == 2
+		# Incremental syncs cannot see deletions.
+		del client.calls.rows["c8"]
+		await index.refresh(client)
+		assert "c8" in index.calls
+
+	asyncio.run(scenario())
+
+
+def test_capped_listing_keeps_calls_older_than_it_reached():
+	async def scenario():
+		client, index = FakeClient(20), _index()
+		await index.refresh(client, wait=True)
+		seen = {f"c{i}" for i in range(10, 20)}
+		index._reconcile(seen, started=(BASE + timedelta(days=1)).timestamp(), capped=True)
+		assert len(index.calls) == 20
+		index._reconcile(seen - {"c15"}, started=(BASE + timedelta(days=1)).timestamp(), capped=True)
+		assert "c15" not in index.calls and "c0" in index.calls
+
+	asyncio.run(scenario())
@@ -0,0 +1,130 @@
+"""AIMD admission control for one token's Vapi requests."""
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+
+from app.services.governor import Priority, TokenGovernor
+
+
+def _settle(gov: TokenGovernor) -> None:
+	"""Let the next observation count as a new round trip."""
+	gov._decrease_after = 0.0
+
+
+def test_fast_responses_grow_the_limit_additively():
+	gov = TokenGovernor(initial_limit=4.0, max_limit=5.0)
+	for _ in range(4):
+		gov.observe(0.1, 200, None)
+	assert 4.9 < gov.limit < 5.0
+	for _ in range(10):
+		gov.observe(0.1, 200, None)
+	assert gov.limit == 5.0
+
+
+def test_throttling_halves_the_limit_and_pauses():
+	gov = TokenGovernor(initial_limit=8.0)
+	gov.observe(0.1, 429, 2.0)
+	stats = gov.stats()
+	assert gov.limit == 4.0
+	assert stats["throttled"] == 1
+	assert 1.5 < stats["pausedSeconds"] <= 2.0
+	assert stats["tokens"] < 1.0
+
+
+def test_slow_responses_shrink_the_limit():
+	gov = TokenGovernor(initial_limit=10.0, latency_tolerance=2.0)
+	gov.observe(0.1, 200, None)
+	limit = gov.limit
+	_settle(gov)
+	gov.observe(0.5, 200, None)
+	assert gov.limit == pytest.approx(limit * 0.9)
+	assert gov.slowdowns == 1
+
+
+def test_one_decrease_per_round_trip():
+	gov = TokenGovernor(initial_limit=16.0)
+	for _ in range(5):
+		gov.observe(0.1, 503, None)
+	assert gov.limit == 8.0
+	assert gov.throttled == 5
+	_settle(gov)
+	gov.observe(0.1, 503, None)
+	assert gov.limit == 4.0
+
+
+def test_limit_never_drops_below_the_floor():
+	gov = TokenGovernor(initial_limit=4.0, min_limit=2.0)
+	for _ in range(5):
+		_settle(gov)
+		gov.observe(0.1, 429, 0.0)
+	assert gov.limit == 2.0
+
+
+def test_server_errors_are_ignored():
+	gov = TokenGovernor(initial_limit=8.0)
+	gov.observe(0.1, 500, None)
+	gov.observe(0.1, None, None)
+	assert gov.limit == 8.0
+	assert gov.stats()["latencyMs"] is None
+
+
+def test_control_uses_the_reserve_and_skips_the_pause():
+	async def scenario():
+		gov = TokenGovernor(initial_limit=2.0, control_reserve=1)
+		await gov.acquire(Priority.BULK)
+		await gov.acquire(Priority.BULK)
+		bulk = asyncio.create_task(gov.acquire(Priority.BULK))
+		await asyncio.sleep(0)
+		assert not bulk.done()
+		await asyncio.wait_for(gov.acquire(Priority.CONTROL), 0.1)
+		assert gov.inflight == 3
+		# The reserve is now used up too.
+		control = asyncio.create_task(gov.acquire(Priority.CONTROL))
+		await asyncio.sleep(0)
+		assert not control.done()
+		gov.release()
+		await asyncio.wait_for(control, 0.1)
+		assert not bulk.done()
+		bulk.cancel()
+
+	asyncio.run(scenario())
+
+
+def test_control_is_admitted_while_paused_and_out_of_tokens():
+	async def scenario():
+		gov = TokenGovernor(rate=1.0, burst=1, initial_limit=4.0)
+		gov.observe(0.1, 429, 5.0)
+		started = time.monotonic()
+		await asyncio.wait_for(gov.acquire(Priority.CONTROL), 0.1)
+		assert time.monotonic() - started < 0.1
+		interactive = asyncio.create_task(gov.acquire(Priority.INTERACTIVE))
+		await asyncio.sleep(0.05)
+		assert not interactive.done()
+		assert gov.stats()["queued"]["interactive"] == 1
+		interactive.cancel()
+
+	asyncio.run(scenario())
+
+
+def test_waiters_are_admitted_in_priority_order():
+	async def scenario():
+		gov = TokenGovernor(initial_limit=1.0, control_reserve=0)
+		await gov.acquire(Priority.INTERACTIVE)
+		order = []
+
+		async def wait(priority):
+			await gov.acquire(priority)
+			order.append(priority)
+
+		tasks = [asyncio.create_task(wait(p)) for p in (Priority.BULK, Priority.INTERACTIVE, Priority.CONTROL)]
+		await asyncio.sleep(0)
+		for _ in tasks:
+			gov.release()
+			await asyncio.sleep(0)
+		await asyncio.gather(*tasks)
+		assert order == [Priority.CONTROL, Priority.INTERACTIVE, Priority.BULK]
+
+	asyncio.run(scenario())
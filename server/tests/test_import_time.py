@@ -0,0 +1,28 @@
+"""Cold import of app.main stays within the budget `bench.import_time --budget-ms` reports against."""
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_MS = float(os.environ.get("IMPORT_BUDGET_MS", "2000"))
+RUNS = 3
+
+
+def cold_import_ms(tmp_path) -> float:
+	code = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+	proc = subprocess.run(
+		[sys.executable, "-c", code],
+		cwd=SERVER_DIR,
+		env={**os.environ, "DATA_DIR": str(tmp_path)},
+		capture_output=True,
+		text=True,
+		check=True,
+	)
+	return float(proc.stdout.strip().splitlines()[-1]) * 1000
+
+
+def test_app_main_cold_import_within_budget(tmp_path):
+	fastest = min(cold_import_ms(tmp_path) for _ in range(RUNS))
+	assert fastest <= BUDGET_MS, f"cold `import app.main` took {fastest:.0f} ms, budget {BUDGET_MS:.0f} ms; see python -m bench.import_time"
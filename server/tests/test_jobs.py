@@ -0,0 +1,122 @@
+"""Durable job queue: chunk claims, restart recovery and idempotent submissions."""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services.jobs import JobQueue
+from app.services.schedule_ingest import RowError, ScheduleRow
+
+TOKEN = "test-token"
+START = datetime(2026, 1, 5, 9, tzinfo=timezone.utc)
+
+
+def _rows(count: int):
+	for i in range(count):
+		yield ScheduleRow(row=i + 2, name=f"Customer {i}", number=f"+1555000{i:04d}", earliest_at=START, latest_at=START + timedelta(hours=1))
+
+
+def _queue(path, **kwargs) -> JobQueue:
+	queue = JobQueue(str(path), **kwargs)
+	queue.open()
+	return queue
+
+
+def _submit(queue: JobQueue, rows, **kwargs):
+	return asyncio.run(queue.submit_rows(TOKEN, "asst-1", rows, **kwargs))
+
+
+@pytest.fixture
+def db(tmp_path):
+	return tmp_path / "jobs.sqlite3"
+
+
+def test_submission_is_chunked_and_queued(db):
+	queue = _queue(db)
+	job = _submit(queue, iter([*_rows(5), RowError(row=9, error="Invalid phone number")]), chunk_size=2)
+	assert job["status"] == "queued"
+	assert (job["rows"], job["batches"], job["pending"], job["invalid"]) == (6, 3, 5, 1)
+	assert job["errors"] == [{"row": 9, "error": "Invalid phone number"}]
+	queue.close()
+
+
+def test_claims_are_exclusive_across_processes(db):
+	first, second = _queue(db), _queue(db)
+	job = _submit(first, _rows(40), chunk_size=1)
+	claims = {first.instance: [], second.instance: []}
+
+	def drain(queue):
+		while (claim := queue._claim()) is not None:
+			claims[queue.instance].append(claim)
+
+	threads = [threading.Thread(target=drain, args=(q,)) for q in (first, second)]
+	for t in threads:
+		t.start()
+	for t in threads:
+		t.join()
+	seqs = [claim[1] for batch in claims.values() for claim in batch]
+	assert sorted(seqs) == list(range(40))
+	job_id, _, payload, token, assistant_id, _ = next(batch[0] for batch in claims.values() if batch)
+	assert (job_id, token, assistant_id) == (job["jobId"], TOKEN, "asst-1")
+	assert payload["customers"][0]["number"].startswith("+1555")
+	snapshot = asyncio.run(first.get(job["jobId"], TOKEN))
+	assert snapshot["status"] == "running" and snapshot["pending"] == 40
+	first.close()
+	second.close()
+
+
+def test_completed_chunks_finish_the_job(db):
+	queue = _queue(db)
+	job = _submit(queue, _rows(2), chunk_size=1)
+	while (claim := queue._claim()) is not None:
+		queue._complete_chunk(claim[0], claim[1], claim[2]["customers"], None)
+	snapshot = asyncio.run(queue.get(job["jobId"], TOKEN))
+	assert (snapshot["status"], snapshot["created"], snapshot["pending"]) == ("completed", 2, 0)
+	queue.close()
+
+
+def test_recover_interrupts_only_chunks_of_dead_workers(db):
+	crashed, alive, restarted = _queue(db, worker_timeout=30.0), _queue(db, worker_timeout=30.0), _queue(db, worker_timeout=30.0)
+	job = _submit(crashed, _rows(3), chunk_size=1)
+	lost = crashed._claim()
+	kept = alive._claim()
+	with crashed._db() as conn:
+		conn.execute("UPDATE job_workers SET heartbeat = ? WHERE id = ?", (time.time() - 60, crashed.instance))
+	restarted._recover()
+	snapshot = asyncio.run(restarted.get(job["jobId"], TOKEN))
+	assert snapshot["interrupted"] == 1
+	assert snapshot["pending"] == 2
+	assert snapshot["status"] == "running"
+	with restarted._db() as conn:
+		status = {r["seq"]: r["status"] for r in conn.execute("SELECT seq, status FROM job_chunks WHERE job_id = ?", (job["jobId"],))}
+		workers = {r["id"] for r in conn.execute("SELECT id FROM job_workers")}
+	assert status[lost[1]] == "interrupted"
+	assert status[kept[1]] == "sending"
+	assert crashed.instance not in workers
+	# The interrupted chunk is never resent; only the untouched one is still claimable.
+	assert restarted._claim()[1] not in (lost[1], kept[1])
+	assert restarted._claim() is None
+	for queue in (crashed, alive, restarted):
+		queue.close()
+
+
+def test_repeated_idempotency_key_returns_the_same_job(db):
+	queue = _queue(db)
+	first = _submit(queue, _rows(3), idempotency_key="upload-1")
+
+	def unread():
+		raise AssertionError("rows of a repeated submission must not be read")
+		yield
+
+	again = _submit(queue, unread(), idempotency_key="upload-1")
+	other = _submit(queue, _rows(1), idempotency_key="upload-2")
+	assert again["jobId"] == first["jobId"]
+	assert again["rows"] == 3
+	assert other["jobId"] != first["jobId"]
+	assert [j["jobId"] for j in asyncio.run(queue.list_jobs(TOKEN))].count(first["jobId"]) == 1
+	assert asyncio.run(queue.get(first["jobId"], "another-token")) is None
+	queue.close()
@@ -0,0 +1,47 @@
+"""Opaque pagination cursors for /api/numbers."""
+from __future__ import annotations
+
+import base64
+import json
+
+import pytest
+
+from app.services.number_index import BadCursor, decode_cursor, encode_cursor
+
+
+def _raw(*fields) -> str:
+	return base64.urlsafe_b64encode(json.dumps(list(fields)).encode()).decode().rstrip("=")
+
+
+def test_round_trip():
+	assert decode_cursor(encode_cursor("createdAt", "desc", (1767225600.5, "pn-1")), "createdAt", "desc") == (1767225600.5, "pn-1")
+	assert decode_cursor(encode_cursor("name", "asc", ("sales", "pn-2")), "name", "asc") == ("sales", "pn-2")
+
+
+def test_numeric_sort_value_comes_back_as_float():
+	assert decode_cursor(_raw("updatedAt", "asc", 5, "pn-1"), "updatedAt", "asc") == (5.0, "pn-1")
+
+
+def test_cursor_for_another_sort_or_order_is_rejected():
+	cursor = encode_cursor("createdAt", "desc", (1.0, "pn-1"))
+	with pytest.raises(BadCursor, match="different sort"):
+		decode_cursor(cursor, "createdAt", "asc")
+	with pytest.raises(BadCursor, match="different sort"):
+		decode_cursor(cursor, "name", "desc")
+
+
+@pytest.mark.parametrize(
+	"cursor, sort",
+	[
+		("not base64 !", "createdAt"),
+		(_raw("createdAt", "desc"), "createdAt"),
+		(base64.urlsafe_b64encode(b"{").decode(), "createdAt"),
+		(_raw("createdAt", "desc", "yesterday", "pn-1"), "createdAt"),
+		(_raw("createdAt", "desc", True, "pn-1"), "createdAt"),
+		(_raw("createdAt", "desc", 1.0, 7), "createdAt"),
+		(_raw("name", "desc", 1.0, "pn-1"), "name"),
+	],
+)
+def test_malformed_cursor_is_rejected(cursor, sort):
+	with pytest.raises(BadCursor, match="Malformed"):
+		decode_cursor(cursor, sort, "desc")
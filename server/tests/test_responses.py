@@ -0,0 +1,31 @@
+"""Range header parsing for cached recordings."""
+from __future__ import annotations
+
+import pytest
+
+from app.services.responses import parse_range
+
+
+@pytest.mark.parametrize(
+	"header, expected",
+	[
+		("bytes=0-99", (0, 99)),
+		("bytes=100-", (100, 999)),
+		("bytes=-200", (800, 999)),
+		("bytes=-5000", (0, 999)),
+		("bytes=900-5000", (900, 999)),
+		("bytes=0-0", (0, 0)),
+		("BYTES = 10-19", (10, 19)),
+		("bytes=10-19, 50-59", (10, 19)),
+	],
+)
+def test_satisfiable_ranges(header, expected):
+	assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize(
+	"header",
+	["bytes=1000-", "bytes=50-10", "bytes=-0", "bytes=a-b", "bytes=", "items=0-10", "0-10"],
+)
+def test_unsatisfiable_ranges(header):
+	assert parse_range(header, 1000) is None
@@ -0,0 +1,8 @@
+import { useQuery } from '@tanstack/react-query'
+import { api } from '../lib/api'
+
+// Audio elements cannot send the token header, so the src carries a short-lived recording ticket.
+export default function RecordingPlayer({ callId }: { callId: string }) {
+	const { data: src } = useQuery({ queryKey: ['recording-url', callId], queryFn: () => api.recordingUrl(callId), staleTime: 4 * 60 * 1000, refetchOnWindowFocus: false })
+	return src ? <audio controls src={src} /> : null
+}
@@ -0,0 +1,71 @@
+import { useEffect } from 'react'
+import { useQueryClient } from '@tanstack/react-query'
+import { api } from '../lib/api'
+
+// Subscribes to /api/live/events and patches cached call lists in place,
+// so live status arrives over one stream instead of repeated /api/calls polls.
+export function useLiveEvents() {
+	const qc = useQueryClient()
+
+	useEffect(() => {
+		if (!sessionStorage.getItem('vapi_token')) return
+		let es: EventSource | null = null
+		let retry: ReturnType<typeof setTimeout> | undefined
+		let closed = false
+
+		const patch = (callId: string, fields: Record<string, any>) => {
+			qc.setQueriesData<any[]>({ queryKey: ['calls'] }, (old) => {
+				if (!Array.isArray(old)) return old
+				const i = old.findIndex((c: any) => c.id === callId)
+				if (i < 0) {
+					qc.invalidateQueries({ queryKey: ['calls'] })
+					return old
+				}
+				const next = old.slice()
+				next[i] = { ...old[i], ...fields }
+				return next
+			})
+		}
+
+		// The browser reconnects with the same URL; once its ticket expires the stream closes and a new ticket is fetched.
+		const open = async () => {
+			let url: string
+			try {
+				url = await api.liveEventsUrl()
+			} catch {
+				if (!closed) retry = setTimeout(open, 5000)
+				return
+			}
+			if (closed) return
+			const source = new EventSource(url)
+			source.onerror = () => {
+				if (source.readyState === EventSource.CLOSED && !closed) retry = setTimeout(open, 1000)
+			}
+			listen(source)
+			es = source
+		}
+
+		const listen = (es: EventSource) => {
+			es.addEventListener('snapshot', (evt) => {
+				const { calls = [] } = JSON.parse((evt as MessageEvent).data)
+				for (const c of calls) patch(c.id, { status: c.status, endedReason: c.endedReason })
+			})
+			es.addEventListener('status', (evt) => {
+				const d = JSON.parse((evt as MessageEvent).data)
+				patch(d.callId, { status: d.status, endedReason: d.endedReason })
+			})
+			es.addEventListener('ended', (evt) => {
+				const d = JSON.parse((evt as MessageEvent).data)
+				patch(d.callId, { status: 'ended', endedReason: d.endedReason })
+				qc.invalidateQueries({ queryKey: ['artifacts', d.callId] })
+			})
+		}
+
+		open()
+		return () => {
+			closed = true
+			clearTimeout(retry)
+			es?.close()
+		}
+	}, [qc])
+}
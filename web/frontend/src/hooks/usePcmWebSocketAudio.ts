@@ -1,6 +1,6 @@
 import { useCallback, useEffect, useRef, useState } from 'react'
 
-// Simple PCM (s16le, mono, 16kHz) WebSocket audio player using Web Audio API.
+// Simple PCM (s16le, mono) WebSocket audio player using Web Audio API; 16kHz unless told otherwise.
 // If the AudioContext sampleRate differs, we resample by naive linear interpolation.
 
 function int16ToFloat32(int16: Int16Array): Float32Array {
@@ -26,7 +26,8 @@ function resampleLinear(input: Float32Array, inRate: number, outRate: number): F
 	return output
 }
 
-export function usePcmWebSocketAudio(url?: string) {
+// `url` may be a function so a fresh ticketed URL is fetched on each connect.
+export function usePcmWebSocketAudio(url?: string | (() => Promise<string>), sampleRate = 16000) {
 	const wsRef = useRef<WebSocket | null>(null)
 	const ctxRef = useRef<AudioContext | null>(null)
 	const gainRef = useRef<GainNode | null>(null)
@@ -34,7 +35,8 @@ export function usePcmWebSocketAudio(url?: string) {
 	const [connected, setConnected] = useState(false)
 	const [muted, setMuted] = useState(false)
 	const [volume, setVolume] = useState(1)
-	const targetRateRef = useRef(16000)
+	const targetRateRef = useRef(sampleRate)
+	targetRateRef.current = sampleRate
 
 	useEffect(() => {
 		if (!gainRef.current) return
@@ -80,7 +82,7 @@ export function usePcmWebSocketAudio(url?: string) {
 		if (!url) return
 		await ensureAudio()
 		if (wsRef.current) { try { wsRef.current.close() } catch {} }
-		const ws = new WebSocket(url)
+		const ws = new WebSocket(typeof url === 'function' ? await url() : url)
 		ws.binaryType = 'arraybuffer'
 		ws.onopen = () => setConnected(true)
 		ws.onclose = () => setConnected(false)
@@ -13,6 +13,17 @@ async function handle<T>(res: Response): Promise<T> {
 	return res.json();
 }
 
+// Short-lived ticket for URLs that cannot carry the token header (audio src, EventSource, WebSocket).
+async function ticket(scope: 'recording' | 'monitor' | 'events', callId?: string): Promise<string> {
+	const res = await fetch(`${API_BASE}/api/tickets`, {
+		method: 'POST',
+		headers: { 'Content-Type': 'application/json', ...tokenHeader() },
+		body: JSON.stringify({ scope, call_id: callId }),
+	})
+	const { ticket } = await handle<{ ticket: string }>(res)
+	return ticket
+}
+
 export const api = {
 	listAgents: () => fetch(`${API_BASE}/api/agents`, { headers: { ...tokenHeader() } }).then(handle),
 	getAgent: (id: string) => fetch(`${API_BASE}/api/agents/${id}`, { headers: { ...tokenHeader() } }).then(handle),
@@ -41,6 +52,11 @@ export const api = {
 	listCalls: () => fetch(`${API_BASE}/api/calls`, { headers: { ...tokenHeader() } }).then(handle),
 	getCall: (id: string) => fetch(`${API_BASE}/api/calls/${id}`, { headers: { ...tokenHeader() } }).then(handle),
 	getArtifacts: (id: string) => fetch(`${API_BASE}/api/calls/${id}/artifacts`, { headers: { ...tokenHeader() } }).then(handle),
+	recordingUrl: async (id: string) => {
+		const url = new URL(`${API_BASE}/api/calls/${id}/recording`)
+		url.searchParams.set('ticket', await ticket('recording', id))
+		return url.toString()
+	},
 
 	getScheduleTemplate: () => fetch(`${API_BASE}/api/calls/schedule/template`, { headers: { ...tokenHeader() } }).then(handle),
 	scheduleUpload: (assistantId: string, file: File) => {
@@ -55,6 +71,17 @@ export const api = {
 	scheduleSingle: (data: { assistant_id: string; name?: string; number: string; earliest_at: string; latest_at?: string; context?: string }) =>
 		fetch(`${API_BASE}/api/calls/schedule/single`, { method: 'POST', headers: { 'Content-Type': 'application/json', ...tokenHeader() }, body: JSON.stringify(data) }).then(handle),
 
+	monitorStreamUrl: async (callId: string, rate = 8000) => {
+		const url = new URL(`${API_BASE.replace(/^http/, 'ws')}/api/live/monitor/${callId}`)
+		url.searchParams.set('rate', String(rate))
+		url.searchParams.set('ticket', await ticket('monitor', callId))
+		return url.toString()
+	},
+	liveEventsUrl: async () => {
+		const url = new URL(`${API_BASE}/api/live/events`)
+		url.searchParams.set('ticket', await ticket('events'))
+		return url.toString()
+	},
 	getLiveSessionInfo: (callId: string) => fetch(`${API_BASE}/api/live/session/${callId}`, { headers: { ...tokenHeader() } }).then(handle),
 	terminateSession: (sessionId: string) =>
 		fetch(`${API_BASE}/api/live/session/${sessionId}/terminate`, { method: "POST", headers: { ...tokenHeader() } }).then(handle),
@@ -67,7 +94,19 @@ export const api = {
 		fetch(`${API_BASE}/api/calls/web/start`, { method: 'POST', headers: { 'Content-Type': 'application/json', ...tokenHeader() }, body: JSON.stringify({ assistant_id: assistantId, customer_name: customerName }) }).then(handle),
 	endWebCall: (callId: string) => fetch(`${API_BASE}/api/calls/web/end/${callId}`, { method: 'POST', headers: { ...tokenHeader() } }).then(handle),
 
-	listNumbers: () => fetch(`${API_BASE}/api/numbers`, { headers: { ...tokenHeader() } }).then(handle),
+	listNumbers: async () => {
+		const all: any[] = []
+		let cursor: string | null = null
+		do {
+			const url = new URL(`${API_BASE}/api/numbers`)
+			url.searchParams.set('limit', '1000')
+			if (cursor) url.searchParams.set('cursor', cursor)
+			const res = await fetch(url.toString(), { headers: { ...tokenHeader() } })
+			all.push(...await handle<any[]>(res))
+			cursor = res.headers.get('X-Next-Cursor')
+		} while (cursor)
+		return all
+	},
 	updateNumberAssistant: (numberId: string, assistantId?: string) =>
 		fetch(`${API_BASE}/api/numbers/${encodeURIComponent(numberId)}/assistant${assistantId ? `?assistant_id=${encodeURIComponent(assistantId)}` : ''}`, { method: 'PUT', headers: { ...tokenHeader() } }).then(handle),
 
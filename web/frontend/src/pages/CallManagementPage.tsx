@@ -1,9 +1,11 @@
 import { useQuery, useQueryClient } from '@tanstack/react-query'
 import { api, API_BASE } from '../lib/api'
-import { useMemo, useState } from 'react'
+import { useCallback, useMemo, useState } from 'react'
 import { Box, Button, Chip, CircularProgress, Divider, Link as MuiLink, Paper, Slider, Stack, Switch, Tab, Tabs, TextField, Typography } from '@mui/material'
+import RecordingPlayer from '../components/RecordingPlayer'
 import StatusBadge from '../components/StatusBadge'
 import { usePcmWebSocketAudio } from '../hooks/usePcmWebSocketAudio'
+import { useLiveEvents } from '../hooks/useLiveEvents'
 import { motion } from 'framer-motion'
 
 
@@ -11,6 +13,7 @@ type TabType = 'active' | 'queued' | 'all'
 
 export default function CallManagementPage() {
 	const qc = useQueryClient()
+	useLiveEvents()
 	const { data: agents = [] } = useQuery<any[]>({ queryKey: ['agents'], queryFn: api.listAgents as any })
 	const [tab, setTab] = useState<TabType>('active')
 	const { data: calls = [], isLoading: callsLoading } = useQuery<any[]>({ queryKey: ['calls', tab], queryFn: api.listCalls as any })
@@ -100,8 +103,9 @@ function CallDetails({ call, onRefresh }: { call: any, onRefresh: () => void })
 	const [context, setContext] = useState('')
 
 	const listenAvailable = Boolean((monitor as any)?.monitor?.listenUrl)
-    const listenUrl = (monitor as any)?.monitor?.listenUrl as string | undefined
-    const { connected, muted, volume, setMuted, setVolume, connect, disconnect } = usePcmWebSocketAudio(listenUrl)
+    // Listen through the server relay: one upstream stream per call however many supervisors join
+    const relayUrl = useCallback(() => api.monitorStreamUrl(call.id, 8000), [call.id])
+    const { connected, muted, volume, setMuted, setVolume, connect, disconnect } = usePcmWebSocketAudio(listenAvailable ? relayUrl : undefined, 8000)
 
 	return (
 		<Stack spacing={2} sx={{ mt: 1 }}>
@@ -128,7 +132,7 @@ function CallDetails({ call, onRefresh }: { call: any, onRefresh: () => void })
 
 			<Box>
 				<Typography variant="caption">Recording</Typography>
-				{artifacts?.recordingUrl ? <audio controls src={artifacts.recordingUrl} /> : <Typography color="text.secondary">No recording available</Typography>}
+				{artifacts?.recordingUrl ? <RecordingPlayer callId={call.id} /> : <Typography color="text.secondary">No recording available</Typography>}
 			</Box>
 
 			<Box>
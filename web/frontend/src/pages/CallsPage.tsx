@@ -1,4 +1,5 @@
 import { useQuery } from '@tanstack/react-query'
+import RecordingPlayer from '../components/RecordingPlayer'
 import { api } from '../lib/api'
 import { useMemo, useState } from 'react'
 import { Box, CircularProgress, Paper, Stack, Table, TableBody, TableCell, TableHead, TableRow, Typography } from '@mui/material'
@@ -69,7 +70,7 @@ function CallDetail({ call }: { call: any }) {
 			{data?.recordingUrl && (
 				<Box sx={{ mt: 1 }}>
 					<Typography variant="caption" sx={{ opacity: 0.8 }}>Recording</Typography>
-					<audio controls src={data.recordingUrl} />
+					<RecordingPlayer callId={call.id} />
 				</Box>
 			)}
 		</Paper>
@@ -30,8 +30,8 @@ export default function SchedulePage() {
 	const onUpload = async () => {
 		const f = fileRef.current?.files?.[0]
 		if (!numberId || !f) { alert('Phone number and file required'); return }
-		await api.scheduleUpload(associatedAssistant, f)
-		alert('Bulk calls scheduled')
+		const res: any = await api.scheduleUpload(associatedAssistant, f)
+		alert(`Queued ${res.pending} of ${res.rows} rows (job ${res.jobId})` + (res.invalid ? `, ${res.invalid} invalid` : ''))
 	}
 
 	return (
@@ -64,7 +64,7 @@ export default function SchedulePage() {
 				<Box sx={{ flex: 1 }}>
 					<Typography variant="subtitle2" sx={{ mb: 1 }}>Bulk Upload</Typography>
 					<Paper variant="outlined" sx={{ p: 2, width: '100%' }}>
-						<Typography variant="body2" sx={{ mb: 1 }}>Upload .xlsx with headers: name, number, earliest_at, latest_at (optional).</Typography>
+						<Typography variant="body2" sx={{ mb: 1 }}>Upload .xlsx or .csv with headers: name, number, earliest_at, latest_at (optional).</Typography>
 						<Stack spacing={2}>
 							<div>
 								<Typography variant="caption">Phone Number</Typography>
@@ -74,7 +74,7 @@ export default function SchedulePage() {
 								</Select>
 							</div>
 							{associatedAssistant && <Typography variant="body2">Associated assistant: {agentNameById[associatedAssistant] || associatedAssistant}</Typography>}
-							<input type="file" ref={fileRef} accept=".xlsx" />
+							<input type="file" ref={fileRef} accept=".xlsx,.csv" />
 							<Button variant="outlined" onClick={onUpload}>Upload & Schedule</Button>
 						</Stack>
 					</Paper>